@@ -0,0 +1,88 @@
+"""Python语法检查每次按键开销基准测试
+
+对比20000行文件上全量检查（每次按键重新split并compile整个文件）
+与增量检查（只重新检查脏行，非结构性修改不重新compile）的单次按键耗时。
+
+运行: python benchmarks/bench_python_check.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from my_ide import PythonSyntaxChecker
+
+LINE_COUNT = 20000
+KEYSTROKES = 200
+
+
+def make_source(line_count):
+    """生成指定行数的Python源码"""
+    block = [
+        "def func_{n}(value):",
+        "    total = value * 2",
+        "    if total > 10:",
+        "        total -= 1",
+        "    return total",
+        "",
+    ]
+    lines = []
+    n = 0
+    while len(lines) < line_count:
+        lines.extend(line.format(n=n) for line in block)
+        n += 1
+    return lines[:line_count]
+
+
+def edit_line(lines, i):
+    """模拟一次按键：在某个函数体内的行尾输入一个字符（非结构性修改）"""
+    line = (i * 37) % len(lines)
+    while not lines[line].startswith("    total = "):
+        line = (line + 1) % len(lines)
+    lines[line] = lines[line] + "1"
+    return line
+
+
+def bench_full(lines):
+    """每次按键都全量检查（原有行为：重新split、逐行检查并compile整个文件）"""
+    elapsed = 0.0
+    for i in range(KEYSTROKES):
+        edit_line(lines, i)
+        content = "\n".join(lines)
+        start = time.perf_counter()
+        PythonSyntaxChecker().check(content)
+        elapsed += time.perf_counter() - start
+    return elapsed / KEYSTROKES
+
+
+def bench_incremental(lines):
+    """每次按键只更新脏行"""
+    checker = PythonSyntaxChecker()
+    checker.check("\n".join(lines))
+    elapsed = 0.0
+    compiles = 0
+    for i in range(KEYSTROKES):
+        line = edit_line(lines, i)
+        start = time.perf_counter()
+        checker.mark_dirty(line, 0)
+        needs_compile = checker.update(lines.__getitem__, len(lines))
+        content = "\n".join(lines) if needs_compile else None
+        checker.finish(list(checker.line_results), content)
+        elapsed += time.perf_counter() - start
+        compiles += 1 if needs_compile else 0
+    return elapsed / KEYSTROKES, compiles
+
+
+def main():
+    lines = make_source(LINE_COUNT)
+    full = bench_full(list(lines))
+    incremental, compiles = bench_incremental(list(lines))
+    print(f"文件行数: {LINE_COUNT}, 模拟按键: {KEYSTROKES}")
+    print(f"全量检查:   {full * 1000:8.3f} ms/按键")
+    print(f"增量检查:   {incremental * 1000:8.3f} ms/按键 (重新compile {compiles} 次)")
+    print(f"加速比:     {full / incremental:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
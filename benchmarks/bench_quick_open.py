@@ -0,0 +1,134 @@
+"""快速打开模糊匹配基准测试
+
+在内存中生成一个20万文件的目录树（按目录组织，文件名由随机音节组成），
+测量建立索引的耗时，以及各类查询取得前50个结果的耗时：
+文件名前缀、文件名缩写（按顺序的部分字符）、跨目录的路径缩写和输入错误的查询（通常没有结果，需要扫描所有路径）。
+"名称"列为文件名匹配的耗时，"完整"列为包括路径匹配在内、直到取满50个结果或扫描结束的总耗时。
+快速打开对话框每次事件循环最多匹配15毫秒，超出的路径匹配在后续事件循环中继续。
+
+运行: python benchmarks/bench_quick_open.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from my_ide import QuickOpenIndex
+
+FILE_COUNT = 200000
+QUERIES_PER_KIND = 100
+LIMIT = 50
+
+SYLLABLES = ["ab", "ac", "al", "an", "ar", "be", "ca", "co", "de", "di", "el", "en", "er", "fi", "ge",
+             "in", "io", "la", "le", "li", "lo", "ma", "me", "mo", "na", "ne", "no", "or", "pa", "pe",
+             "po", "ra", "re", "ri", "ro", "sa", "se", "si", "so", "ta", "te", "ti", "to", "tr", "un",
+             "ur", "va", "ve", "vi", "za"]
+EXTENSIONS = [".py", ".py", ".py", ".js", ".ts", ".md", ".json", ".c", ".h", ".txt", ".html", ".css"]
+
+
+def make_paths(rng):
+    """生成按目录组织的相对路径，每个目录3-25个文件，最多7层"""
+    words = sorted({rng.choice(SYLLABLES) + rng.choice(SYLLABLES) + rng.choice(["", "", rng.choice(SYLLABLES)])
+                    for _ in range(2000)})
+    paths = []
+
+    def walk(prefix, depth):
+        for _ in range(rng.randint(3, 25)):
+            if len(paths) >= FILE_COUNT:
+                return
+            name = rng.choice(words)
+            if rng.random() < 0.4:
+                name += "_" + rng.choice(words)
+            paths.append(prefix + name + rng.choice(EXTENSIONS))
+        if depth < 7:
+            for _ in range(rng.randint(0, 5) if depth > 1 else 8):
+                if len(paths) >= FILE_COUNT:
+                    return
+                walk(prefix + rng.choice(words) + "/", depth + 1)
+
+    while len(paths) < FILE_COUNT:
+        walk(rng.choice(words) + "/", 1)
+    return paths
+
+
+def make_queries(rng, paths):
+    """每类查询从随机选取的路径中生成"""
+    def pick(path, count):
+        positions = sorted(rng.sample(range(len(path)), min(count, len(path))))
+        return "".join(path[i] for i in positions)
+
+    kinds = {"文件名前缀": [], "文件名缩写": [], "路径缩写": [], "输入错误": []}
+    for _ in range(QUERIES_PER_KIND):
+        path = rng.choice(paths)
+        name = path[path.rfind("/") + 1:]
+        kinds["文件名前缀"].append(name[:rng.randint(2, 8)])
+        kinds["文件名缩写"].append(pick(name, rng.randint(2, 6)))
+        kinds["路径缩写"].append(pick(path, rng.randint(3, 8)))
+        kinds["输入错误"].append(name[:rng.randint(2, 5)] + rng.choice(SYLLABLES) + rng.choice(SYLLABLES))
+    return kinds
+
+
+def run_query(index, query):
+    """返回(文件名匹配耗时, 完整耗时, 结果数)"""
+    start = time.perf_counter()
+    results = 0
+    for path in index.matches(query):
+        if path is None:
+            continue
+        results += 1
+        if results >= LIMIT:
+            break
+    total = time.perf_counter() - start
+    # 单独测量只匹配文件名的耗时
+    query = index.normalize_query(query)
+    subsequence = index.subsequence_pattern(query)
+    start = time.perf_counter()
+    candidates = index.candidate_rows(query)
+    found = 0
+    for tier in (0, 1):
+        for row in index.tier_rows(tier, query, subsequence, candidates):
+            if row is not None:
+                found += 1
+                if found >= LIMIT:
+                    break
+        if found >= LIMIT:
+            break
+    names_done = time.perf_counter() - start
+    return names_done, total, results
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    rng = random.Random(1)
+    paths = make_paths(rng)
+    start = time.perf_counter()
+    index = QuickOpenIndex("/workspace", paths)
+    print(f"建立索引: {len(paths)} 个文件 {time.perf_counter() - start:.2f} s")
+
+    start = time.perf_counter()
+    for path in paths[:1000]:
+        index.remove(path)
+        index.add(path + ".bak")
+    print(f"增量更新: 1000 次删除和添加 {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    print(f"{'查询类型':<8} {'名称p50':>9} {'名称p95':>9} {'完整p50':>9} {'完整p95':>9} {'完整max':>9}")
+    for kind, queries in make_queries(rng, paths).items():
+        names_times = []
+        totals = []
+        for query in queries:
+            names_time, total, results = run_query(index, query)
+            names_times.append(names_time * 1000)
+            totals.append(total * 1000)
+        print(f"{kind:<8} {percentile(names_times, 0.5):>7.1f}ms {percentile(names_times, 0.95):>7.1f}ms "
+              f"{percentile(totals, 0.5):>7.1f}ms {percentile(totals, 0.95):>7.1f}ms {max(totals):>7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
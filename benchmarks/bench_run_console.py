@@ -0,0 +1,114 @@
+"""运行面板基准测试
+
+1. 启动开销：空脚本分别直接用QProcess运行和在RunConsole中运行（经过启动器和等待结果）RUNS次，对比平均耗时；
+2. 测量准确性：脚本分配ALLOC_MB的内存、计算约CPU_SECONDS秒并输出OUTPUT_LINES行，
+   对比RunConsole报告的CPU时间和峰值内存与脚本自己测量的值（resource.getrusage），并给出输出的吞吐量；
+3. 热点函数表：使用cProfile运行调用FUNCTION_COUNT个不同函数的脚本，测量读取统计文件、填充表格和按各列排序的耗时。
+需要Linux或macOS（启动器使用os.fork和os.wait4）。
+
+运行: python benchmarks/bench_run_console.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import QEventLoop, QProcess, Qt
+from PyQt6.QtWidgets import QApplication
+
+RUNS = 10
+ALLOC_MB = 200
+CPU_SECONDS = 1.0
+OUTPUT_LINES = 200000
+FUNCTION_COUNT = 5000
+
+WORKLOAD = f"""
+import resource, sys, time
+data = bytearray({ALLOC_MB} * 1024 * 1024)
+for i in range(0, len(data), 4096):
+    data[i] = 1
+end = time.process_time() + {CPU_SECONDS}
+while time.process_time() < end:
+    pass
+start = time.perf_counter()
+for i in range({OUTPUT_LINES}):
+    print(f"line {{i}} of the workload output")
+usage = resource.getrusage(resource.RUSAGE_SELF)
+rss = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+print(f"SELF {{usage.ru_utime + usage.ru_stime}} {{rss}} {{time.perf_counter() - start}}")
+"""
+
+PROFILED = "\n".join(f"def f{i}(n):\n    return sum(range(n))\n" for i in range(FUNCTION_COUNT)) + f"""
+for i in range({FUNCTION_COUNT}):
+    globals()[f"f{{i}}"](i % 100)
+"""
+
+
+def wait(app, condition):
+    while not condition():
+        app.processEvents(QEventLoop.ProcessEventsFlag.AllEvents, 50)
+
+
+def run_direct(app, path):
+    process = QProcess()
+    start = time.perf_counter()
+    process.start(sys.executable, [path])
+    wait(app, lambda: process.state() == QProcess.ProcessState.NotRunning)
+    return time.perf_counter() - start
+
+
+def run_console(app, console, path, profile=False):
+    results = []
+    console.run_finished.connect(results.append)
+    start = time.perf_counter()
+    console.start_run(sys.executable, path, profile)
+    wait(app, lambda: results)
+    console.run_finished.disconnect(results.append)
+    return time.perf_counter() - start, results[0]
+
+
+def main():
+    app = QApplication(sys.argv)
+    from my_ide import ProfileTableModel, RunConsole
+    console = RunConsole()
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {}
+        for name, source in (("empty", ""), ("workload", WORKLOAD), ("profiled", PROFILED)):
+            paths[name] = os.path.join(directory, f"{name}.py")
+            with open(paths[name], "w", encoding="utf-8") as f:
+                f.write(source)
+
+        run_direct(app, paths["empty"])  # 预热
+        direct = sum(run_direct(app, paths["empty"]) for _ in range(RUNS)) / RUNS
+        launched = sum(run_console(app, console, paths["empty"])[0] for _ in range(RUNS)) / RUNS
+        print(f"空脚本: 直接运行 {direct * 1000:.0f} ms，RunConsole {launched * 1000:.0f} ms"
+              f"（启动器和读取结果 +{(launched - direct) * 1000:.0f} ms）")
+
+        elapsed, result = run_console(app, console, paths["workload"])
+        console.flush_output()
+        line = next(text for text in (console.output.line(i)[0] for i in range(console.output.end - 1, 0, -1))
+                    if text.startswith("SELF "))
+        self_cpu, self_rss, print_time = map(float, line.split()[1:])
+        print(f"报告: {RunConsole.summary(result)}")
+        print(f"脚本自己测量: CPU {self_cpu:.3f} s，峰值内存 {self_rss / 1024 / 1024:.1f} MB")
+        print(f"输出 {OUTPUT_LINES} 行: 脚本中 {print_time:.2f} s，显示完成 {elapsed:.2f} s")
+
+        elapsed, result = run_console(app, console, paths["profiled"], profile=True)
+        model = ProfileTableModel()
+        start = time.perf_counter()
+        model.set_stats(result["profile_stats"])
+        fill = time.perf_counter() - start
+        start = time.perf_counter()
+        for column in range(len(model.HEADERS)):
+            model.sort(column, Qt.SortOrder.DescendingOrder)
+        sort = (time.perf_counter() - start) / len(model.HEADERS)
+        print(f"cProfile: {model.rowCount()} 个函数，运行 {elapsed:.2f} s，"
+              f"填充表格 {fill * 1000:.1f} ms，按一列排序 {sort * 1000:.1f} ms")
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
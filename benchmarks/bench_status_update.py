@@ -0,0 +1,68 @@
+"""状态栏更新每次按键开销基准测试
+
+对比不同大小的文件上，原有做法（每次按键复制整个文档并split统计行数）
+与现在的做法（只使用Scintilla的length()/lines()查询）的单次更新耗时。
+现在的做法耗时应当不随文件大小增长。
+
+运行: python benchmarks/bench_status_update.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication
+
+SIZES_MB = [1, 10, 50]
+KEYSTROKES = 200
+OLD_KEYSTROKES = 10  # 原有做法太慢，只测少量按键
+
+
+def make_text(size_mb):
+    """生成指定大小的日志文本"""
+    line = "2024-01-01 12:00:00,000 INFO worker-3 processed request id=12345 status=200 elapsed=12ms\n"
+    return line * (size_mb * 1024 * 1024 // len(line))
+
+
+def old_update(editor, status_info):
+    """原有的update_status：复制整个文档并split"""
+    line, col = editor.getCursorPosition()
+    status_info["pos"].setText(f"Ln: {line+1}, Col: {col+1}")
+    text = editor.text()
+    length = len(text)
+    lines = len(text.split('\n'))
+    status_info["length"].setText(f"length: {length}, lines: {lines}")
+
+
+def bench(editor, update, keystrokes):
+    """每次模拟按键（在文档中间移动光标）后更新状态栏，返回平均耗时"""
+    middle = editor.lines() // 2
+    elapsed = 0.0
+    for i in range(keystrokes):
+        editor.setCursorPosition(middle + i, i % 40)
+        start = time.perf_counter()
+        update()
+        elapsed += time.perf_counter() - start
+    return elapsed / keystrokes
+
+
+def main():
+    app = QApplication(sys.argv)
+    from my_ide import MyIDE
+    ide = MyIDE()
+    ide.settings["syntax_check_enabled"] = False
+    editor = ide.tab_widget.currentWidget()
+
+    print(f"{'文件大小':>8} {'原有做法':>14} {'现在的做法':>14}")
+    for size_mb in SIZES_MB:
+        editor.setText(make_text(size_mb))
+        old = bench(editor, lambda: old_update(editor, ide.status_info), OLD_KEYSTROKES)
+        new = bench(editor, editor.refresh_status, KEYSTROKES)
+        print(f"{size_mb:>6} MB {old * 1000:>11.3f} ms {new * 1000:>11.4f} ms")
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""终端输出解码基准测试
+
+生成UTF-8和GBK行随机混合的输出（中文、ASCII和GBK的单字节尾字节混合，
+排除GBK字节恰好也是合法UTF-8的行，这样的行无法区分），然后：
+1. 按随机大小（包括逐字节）切成数据块交给TerminalDecoder，检查解码结果与原文完全一致，
+   并对比原有做法（每块先试UTF-8再试GBK，失败后重新读取已经读空的缓冲区）丢失或错误的行数；
+2. 测量纯UTF-8、纯GBK和混合输出的解码吞吐量；
+3. 在终端的bash中cat混合输出的文件，检查终端显示的每一行都与原文一致，并测量吞吐量。需要Linux或macOS。
+
+运行: python benchmarks/bench_terminal_decode.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import QEventLoop
+from PyQt6.QtWidgets import QApplication
+
+LINE_COUNT = 100000
+CHUNK_TRIALS = 5
+THROUGHPUT_CHUNK = 65536
+MARKER = "__BENCH_DONE__"
+CHINESE = "中文输出测试编译完成错误警告文件目录进程终端丂亐乗丟丣并串兂"
+
+
+def make_lines(rng):
+    """生成混合编码的行，返回(原文的行, 编码后的字节)"""
+    lines = []
+    encoded = []
+    while len(lines) < LINE_COUNT:
+        line = f"{len(lines):06d} " + "".join(
+            rng.choice(CHINESE) if rng.random() < 0.6 else rng.choice("abcdefgh =:/")
+            for _ in range(rng.randint(0, 40)))
+        encoding = rng.choice(["utf-8", "gbk"])
+        data = (line + "\n").encode(encoding)
+        if encoding == "gbk" and not line.isascii():
+            try:
+                data.decode("utf-8")
+                continue
+            except UnicodeDecodeError:
+                pass
+        lines.append(line)
+        encoded.append(data)
+    return lines, b"".join(encoded)
+
+
+def split(rng, data, max_size):
+    pos = 0
+    while pos < len(data):
+        size = rng.randint(1, max_size)
+        yield data[pos:pos + size]
+        pos += size
+
+
+def old_decode(chunk):
+    """原有的read_output：解码失败后重新读取的是已经读空的缓冲区"""
+    try:
+        return chunk.decode("utf-8")
+    except UnicodeDecodeError:
+        try:
+            return b"".decode("gbk")
+        except UnicodeDecodeError:
+            return b"".decode("utf-8", errors="replace")
+
+
+def count_wrong(text, lines):
+    """与原文相比丢失或错误的行数"""
+    got = set(text.split("\n"))
+    return sum(1 for line in lines if line not in got)
+
+
+def check_chunks(rng, lines, data, expected):
+    from my_ide import TerminalDecoder
+    print(f"{'数据块大小':>10} {'现在的做法':>10} {'原有做法错误行':>14}")
+    for max_size in [1, 16, 512, 4096, 65536]:
+        for _ in range(1 if max_size == 1 else CHUNK_TRIALS):
+            decoder = TerminalDecoder()
+            chunks = list(split(rng, data, max_size))
+            text = "".join(decoder.decode(chunk) for chunk in chunks) + decoder.decode(b"", True)
+            if text != expected:
+                raise AssertionError(f"数据块最大{max_size}字节时解码结果与原文不一致")
+        old = count_wrong("".join(map(old_decode, chunks)), lines)
+        print(f"{max_size:>8} B {'一致':>10} {old:>14}")
+
+
+def throughput(data):
+    from my_ide import TerminalDecoder
+    decoder = TerminalDecoder()
+    start = time.perf_counter()
+    for pos in range(0, len(data), THROUGHPUT_CHUNK):
+        decoder.decode(data[pos:pos + THROUGHPUT_CHUNK])
+    decoder.decode(b"", True)
+    return len(data) / (time.perf_counter() - start) / 1024 / 1024
+
+
+def wait_marker(app, terminal, command, marker):
+    """执行命令并处理事件直到结束标记显示在终端中，返回耗时"""
+    start = time.perf_counter()
+    terminal.send_command(command)
+    view = terminal.output
+    while time.perf_counter() - start < 600:
+        app.processEvents(QEventLoop.ProcessEventsFlag.WaitForMoreEvents)
+        if any((view.line(line) or ("",))[0] == marker for line in range(view.end - 3, view.end)):
+            return time.perf_counter() - start
+    raise TimeoutError("输出没有在限定时间内显示")
+
+
+def run_terminal(app, lines, data):
+    from my_ide import TerminalWidget
+    with tempfile.NamedTemporaryFile(suffix=".txt", delete=False) as f:
+        f.write(data)
+    terminal = TerminalWidget(scrollback_lines=LINE_COUNT + 100)
+    terminal.resize(800, 600)
+    terminal.show()
+    terminal.process.waitForStarted()
+    try:
+        # 等待shell启动完成，启动时间不计入
+        wait_marker(app, terminal, "echo __READY__", "__READY__")
+        elapsed = wait_marker(app, terminal, f"cat '{f.name}'; echo {MARKER}", MARKER)
+        view = terminal.output
+        shown = [view.line(line)[0] for line in range(terminal.scrollback.first, view.end)]
+        shown = shown[shown.index(MARKER) - len(lines):shown.index(MARKER)]
+        wrong = sum(1 for a, b in zip(shown, lines) if a != b)
+        print(f"终端: {len(data) / 1024 / 1024:.1f} MB {len(data) / elapsed / 1024 / 1024:.1f} MB/s，"
+              f"{len(lines)} 行中 {wrong} 行与原文不一致")
+    finally:
+        terminal.process.kill()
+        terminal.process.waitForFinished()
+        os.unlink(f.name)
+
+
+def main():
+    app = QApplication(sys.argv)
+    rng = random.Random(1)
+    lines, data = make_lines(rng)
+    expected = "".join(line + "\n" for line in lines)
+    print(f"混合输出: {len(lines)} 行 {len(data) / 1024 / 1024:.1f} MB")
+    check_chunks(rng, lines, data, expected)
+    print(f"解码吞吐量: UTF-8 {throughput(expected.encode('utf-8')):.1f} MB/s，"
+          f"GBK {throughput(expected.encode('gbk')):.1f} MB/s，混合 {throughput(data):.1f} MB/s")
+    run_terminal(app, lines, data)
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""终端命令历史基准测试
+
+生成ENTRY_COUNT条命令（由常见命令模板和随机参数组成，约四分之一是重复执行的命令，去重后约10万条），
+逐条add()到临时目录中的历史文件，测量追加耗时、历史文件的大小和重新读取的耗时，
+然后测量反向增量查找（Ctrl+R）：每次输入一个字符后查找最近的匹配，以及连续按Ctrl+R查找更早的匹配。
+对比在Python中从新到旧逐条判断是否包含查找内容的做法。
+
+运行: python benchmarks/bench_terminal_history.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from my_ide import CommandHistory
+
+ENTRY_COUNT = 130000
+QUERY_COUNT = 300
+REPEAT_PRESSES = 20
+
+TEMPLATES = ["git commit -m 'fix {w} in {f}'", "git checkout {w}-{n}", "python {f} --{w} {n}", "cd src/{w}/{w}",
+             "make -j{n} {w}", "grep -rn {w} {f}", "pip install {w}=={n}.{n}", "ls -la {w}/{w}",
+             "docker run --rm {w}:{n}", "ssh {w}@10.0.{n}.{n}", "vim {f}", "pytest tests/test_{w}.py -k {w}"]
+WORDS = ["parser", "render", "cache", "index", "worker", "config", "server", "client", "utils", "build",
+         "terminal", "history", "search", "widget", "layout", "theme", "loader", "main", "event", "socket"]
+
+
+def make_commands(rng):
+    commands = []
+    while len(commands) < ENTRY_COUNT:
+        if commands and rng.random() < 0.25:
+            commands.append(rng.choice(commands[-500:]))
+            continue
+        template = rng.choice(TEMPLATES)
+        commands.append(template.format(w=rng.choice(WORDS), f=f"{rng.choice(WORDS)}_{rng.randint(0, 9999)}.py",
+                                        n=rng.randint(0, 9999)))
+    return commands
+
+
+def naive_search(commands, query, before):
+    for i in range(min(before, len(commands)) - 1, -1, -1):
+        command = commands[i]
+        if command is not None and query in command:
+            return i
+    return None
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    rng = random.Random(1)
+    commands = make_commands(rng)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "history.jsonl")
+        history = CommandHistory(path)
+        start = time.perf_counter()
+        for command in commands:
+            history.add(command)
+        elapsed = time.perf_counter() - start
+        print(f"追加: {ENTRY_COUNT} 条 {elapsed:.2f} s（每条 {elapsed / ENTRY_COUNT * 1e6:.0f} µs），"
+              f"去重后 {len(history)} 条，文件 {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+        start = time.perf_counter()
+        history = CommandHistory(path)
+        print(f"读取历史文件: {(time.perf_counter() - start) * 1000:.0f} ms，{len(history)} 条")
+
+    # 从历史中随机取一段作为最终的查找内容，逐字符输入；另有一些没有匹配的查找
+    queries = []
+    for _ in range(QUERY_COUNT):
+        command = rng.choice(commands)
+        start = rng.randrange(len(command))
+        queries.append(command[start:start + rng.randint(3, 12)])
+    queries += [f"zz{rng.randint(0, 999)}" for _ in range(QUERY_COUNT // 10)]
+
+    print(f"{'做法':<10} {'输入p50':>9} {'输入p95':>9} {'输入max':>9} {'Ctrl+R p95':>11} {'Ctrl+R max':>11}")
+    for name, search in (("CommandHistory", history.search),
+                         ("逐条比较", lambda query, before=None: naive_search(
+                             history.commands, query, len(history.commands) if before is None else before))):
+        typed = []
+        repeats = []
+        for query in queries:
+            match = None
+            for end in range(1, len(query) + 1):
+                begin = time.perf_counter()
+                match = search(query[:end], None if match is None else match + 1)
+                typed.append(time.perf_counter() - begin)
+            for _ in range(REPEAT_PRESSES):
+                if match is None:
+                    break
+                begin = time.perf_counter()
+                match = search(query, match)
+                repeats.append(time.perf_counter() - begin)
+        print(f"{name:<10} {percentile(typed, 0.5) * 1000:>7.2f}ms {percentile(typed, 0.95) * 1000:>7.2f}ms "
+              f"{max(typed) * 1000:>7.2f}ms {percentile(repeats, 0.95) * 1000:>9.2f}ms {max(repeats) * 1000:>9.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""终端输出吞吐量基准测试
+
+在终端的bash中运行 yes ... | head -c N 产生大量输出，测量从发送命令到最后一行显示在终端中的耗时
+（MB/s），以及这期间事件循环最长一次没有响应的时间（界面卡顿）。
+对比原有做法（管道连接的shell，每个数据块insertPlainText并ensureCursorVisible，文档不限制行数，数据量较小）
+与现在的做法（在Linux上为伪终端中的shell，输出经屏幕缓冲区解析后按帧放入滚动历史，最多保留10000行，
+视图只绘制可见的行）。
+需要Linux或macOS（bash和yes）。
+
+运行: python benchmarks/bench_terminal_output.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import QEventLoop
+from PyQt6.QtWidgets import QApplication, QPlainTextEdit
+
+SIZES_MB = [10, 100]
+OLD_SIZE_MB = 10
+LINE = "2024-01-01 12:00:00,000 INFO worker-3 processed request id=12345 status=200 elapsed=12ms"
+MARKER = "__BENCH_DONE__"
+
+
+def wait_output(app, terminal, marker, timeout=600):
+    """处理事件直到结束标记显示在终端中，返回(耗时, 事件循环最长间隔)"""
+    start = time.perf_counter()
+    last = start
+    longest = 0.0
+    while time.perf_counter() - start < timeout:
+        # 与正常的事件循环相同，没有事件时等待
+        app.processEvents(QEventLoop.ProcessEventsFlag.WaitForMoreEvents)
+        now = time.perf_counter()
+        longest = max(longest, now - last)
+        last = now
+        if marker in last_lines(terminal):
+            return now - start, longest
+    raise TimeoutError("输出没有在限定时间内显示")
+
+
+def last_lines(terminal, count=3):
+    """终端最后几行的文本"""
+    if isinstance(terminal.output, QPlainTextEdit):
+        block = terminal.output.document().lastBlock()
+        lines = []
+        for _ in range(count):
+            lines.append(block.text())
+            block = block.previous()
+        return lines
+    view = terminal.output
+    return [(view.line(line) or ("",))[0] for line in range(view.end - count, view.end)]
+
+
+def line_count(terminal):
+    if isinstance(terminal.output, QPlainTextEdit):
+        return terminal.output.document().blockCount()
+    return terminal.output.end - terminal.scrollback.first
+
+
+def run(app, terminal, size_mb):
+    marker = f"{MARKER}{size_mb}"
+    terminal.send_command(f"yes '{LINE}' | head -c {size_mb * 1024 * 1024}; echo; echo {marker}")
+    elapsed, longest = wait_output(app, terminal, marker)
+    return size_mb / elapsed, longest, line_count(terminal)
+
+
+def main():
+    app = QApplication(sys.argv)
+    from my_ide import TerminalWidget
+    
+    class OldTerminal(TerminalWidget):
+        """原有的输出方式"""
+        def initUI(self):
+            super().initUI()
+            self.output.hide()
+            self.output = QPlainTextEdit()
+            self.layout.insertWidget(0, self.output)
+        
+        def send_command(self, command):
+            self.process.write((command + "\n").encode())
+        
+        def render_screen(self):
+            pass
+        
+        def append_output(self, text):
+            self.output.insertPlainText(text)
+            self.output.ensureCursorVisible()
+    
+    print(f"{'做法':<6} {'输出':>8} {'吞吐量':>12} {'最长卡顿':>10} {'保留行数':>10}")
+    for name, terminal, sizes in (("原有", OldTerminal(scrollback_lines=0, use_pty=False), [OLD_SIZE_MB]),
+                                  ("现在", TerminalWidget(scrollback_lines=10000), SIZES_MB)):
+        terminal.resize(800, 600)
+        terminal.show()
+        terminal.process.waitForStarted()
+        # 等待shell启动完成，启动时间不计入
+        terminal.send_command(f"echo {MARKER}")
+        wait_output(app, terminal, MARKER)
+        for size_mb in sizes:
+            throughput, longest, blocks = run(app, terminal, size_mb)
+            print(f"{name:<6} {size_mb:>5} MB {throughput:>8.1f} MB/s {longest * 1000:>7.0f} ms {blocks:>10}")
+        terminal.process.kill()
+        terminal.process.waitForFinished()
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
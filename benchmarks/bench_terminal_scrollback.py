@@ -0,0 +1,117 @@
+"""终端滚动历史内存和查找基准测试
+
+生成LINE_COUNT行类似构建日志的输出（WARNING和ERROR行带颜色，约三分之一），分别放入：
+1. 原有做法的QPlainTextEdit（每行一个文本块，setMaximumBlockCount限制行数）；
+2. 现在的TerminalScrollback（UTF-8字节加行偏移数组）。
+对比追加耗时和进程常驻内存（RSS）的增长，然后在滚动历史中从末尾向上查找只出现在开头的文本
+（需要扫描整个缓冲区），并测量TerminalView在底部和中间绘制一屏的耗时。需要Linux（/proc/self/statm）。
+
+运行: python benchmarks/bench_terminal_scrollback.py
+"""
+import gc
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication, QPlainTextEdit
+
+LINE_COUNT = 500000
+BATCH = 2000
+PAINT_TRIALS = 20
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+
+def make_batches(rng):
+    """每批BATCH行(文本, 样式段)，第一行含有只出现一次的标记"""
+    levels = ["INFO", "INFO", "INFO", "DEBUG", "WARNING", "ERROR"]
+    batches = []
+    for base in range(0, LINE_COUNT, BATCH):
+        batch = []
+        for i in range(base, min(base + BATCH, LINE_COUNT)):
+            level = rng.choice(levels)
+            text = (f"2024-01-01 12:{i // 60000 % 60:02d}:{i // 1000 % 60:02d},{i % 1000:03d} {level} "
+                    f"worker-{rng.randint(1, 16)} compiled src/module_{rng.randint(0, 9999)}.c in {rng.randint(1, 999)}ms")
+            if i == 0:
+                text += " FIRST_MARKER"
+            runs = ((24, 1), (24 + len(level), 0)) if level != "INFO" and level != "DEBUG" else ()
+            batch.append((text, runs))
+        batches.append(batch)
+    return batches
+
+
+def measure_plain_text_edit(batches):
+    output = QPlainTextEdit()
+    output.setReadOnly(True)
+    output.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+    output.setMaximumBlockCount(LINE_COUNT)
+    output.resize(800, 600)
+    gc.collect()
+    before = rss_mb()
+    start = time.perf_counter()
+    for batch in batches:
+        output.appendPlainText("\n".join(text for text, _ in batch))
+    elapsed = time.perf_counter() - start
+    grown = rss_mb() - before
+    output.deleteLater()
+    return elapsed, grown
+
+
+def measure_scrollback(batches):
+    from my_ide import TerminalScrollback
+    gc.collect()
+    before = rss_mb()
+    start = time.perf_counter()
+    scrollback = TerminalScrollback(LINE_COUNT)
+    for batch in batches:
+        scrollback.append(batch)
+    elapsed = time.perf_counter() - start
+    return scrollback, elapsed, rss_mb() - before
+
+
+def main():
+    app = QApplication(sys.argv)
+    from my_ide import TerminalScreen, TerminalView
+    batches = make_batches(random.Random(1))
+    text_mb = sum(len(text) + 1 for batch in batches for text, _ in batch) / 1024 / 1024
+    print(f"输出: {LINE_COUNT} 行 {text_mb:.1f} MB")
+
+    scrollback, elapsed, grown = measure_scrollback(batches)
+    print(f"{'做法':<18} {'追加耗时':>10} {'RSS增长':>10}")
+    print(f"{'TerminalScrollback':<18} {elapsed:>8.2f} s {grown:>7.1f} MB"
+          f"（缓冲区 {scrollback.nbytes() / 1024 / 1024:.1f} MB）")
+    elapsed, grown = measure_plain_text_edit(batches)
+    print(f"{'QPlainTextEdit':<18} {elapsed:>8.2f} s {grown:>7.1f} MB")
+
+    start = time.perf_counter()
+    found = scrollback.find("FIRST_MARKER", scrollback.end, 0, backwards=True)
+    print(f"从末尾向上查找开头的文本: {(time.perf_counter() - start) * 1000:.1f} ms，找到第 {found[0] + 1} 行")
+    start = time.perf_counter()
+    found = scrollback.find("NOT_PRESENT", scrollback.first, 0)
+    print(f"查找不存在的文本: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    screen = TerminalScreen(24, 80)
+    screen.styles.append((1, -1, True, False, False, False))
+    view = TerminalView(scrollback, screen)
+    view.setStyleSheet("background-color: black; color: white; font-family: Consolas, monospace;")
+    view.resize(800, 600)
+    view.show()
+    view.update_lines(1)
+    for name, value in (("底部", view.verticalScrollBar().maximum()), ("中间", view.verticalScrollBar().maximum() // 2)):
+        view.verticalScrollBar().setValue(value)
+        start = time.perf_counter()
+        for _ in range(PAINT_TRIALS):
+            view.viewport().grab()
+        print(f"绘制一屏（{name}）: {(time.perf_counter() - start) / PAINT_TRIALS * 1000:.1f} ms")
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
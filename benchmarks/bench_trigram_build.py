@@ -0,0 +1,149 @@
+"""三元组索引建立基准测试
+
+在临时目录中生成一个代码风格的工作区（默认2万个文件，约80 MB，生成后保留供下次和查询基准测试使用），
+测量在进程池中建立完整索引的耗时、索引文件大小、读取索引的耗时，
+没有变化时遍历核对的耗时，以及修改100个文件后增量更新的耗时。
+索引写入临时目录，不使用用户缓存目录。
+
+运行: python benchmarks/bench_trigram_build.py [文件数]
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from my_ide import TrigramIndex, TrigramIndexTask
+
+FILE_COUNT = 20000
+WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+TEMPLATES = [
+    "def {0}({1}, {2}):\n",
+    "    {0} = {1}.{2}({3})\n",
+    "    if {0} is not None and {1} > {n}:\n",
+    "        return {0}[{n}] + {1}\n",
+    "    for {0} in {1}.{2}:\n",
+    "class {C}({D}):\n",
+    "    \"\"\"{0} {1} {2} {3}\"\"\"\n",
+    "        self.{0} = {1}  # {2} {3}\n",
+    "import {0}.{1}\n",
+    "    raise {C}Error(\"{0} {1}: %d\" % {n})\n",
+]
+
+
+class Signals:
+    """在当前线程直接运行任务时使用的信号替代"""
+    class Signal:
+        def __init__(self):
+            self.calls = []
+        
+        def emit(self, *args):
+            self.calls.append(args)
+    
+    def __init__(self):
+        self.finished = self.Signal()
+        self.results = self.Signal()
+
+
+def make_words(rng, count=20000):
+    """随机字母组成的标识符，部分带有下划线或数字"""
+    words = set()
+    while len(words) < count:
+        word = "".join(rng.choice(LETTERS) for _ in range(rng.randint(3, 9)))
+        if rng.random() < 0.3:
+            word += "_" + "".join(rng.choice(LETTERS) for _ in range(rng.randint(2, 6)))
+        elif rng.random() < 0.2:
+            word += str(rng.randint(0, 99))
+        words.add(word)
+    return sorted(words)
+
+
+def make_corpus(file_count=FILE_COUNT):
+    """生成（或直接使用已生成的）工作区，返回根目录"""
+    root = os.path.join(tempfile.gettempdir(), f"myide_trigram_corpus_{file_count}")
+    done_marker = root + ".complete"
+    if os.path.exists(done_marker):
+        return root
+    rng = random.Random(1)
+    words = make_words(rng)
+    rng.shuffle(words)
+    # 常用词按幂律分布，少数词出现在大多数文件中
+    weights = list(accumulate(1 / (i + 1) for i in range(len(words))))
+    for i in range(file_count):
+        directory = os.path.join(root, words[i % 97], words[i % 13 + 100])
+        os.makedirs(directory, exist_ok=True)
+        lines = []
+        for _ in range(rng.randint(40, 160)):
+            picked = rng.choices(words, cum_weights=weights, k=4)
+            lines.append(rng.choice(TEMPLATES).format(*picked, n=rng.randint(0, 999),
+                                                      C=picked[0].capitalize(), D=picked[1].capitalize()))
+        with open(os.path.join(directory, f"{words[i % len(words)]}_{i}.py"), 'w', encoding='utf-8') as f:
+            f.write("".join(lines))
+    open(done_marker, 'w').close()
+    return root
+
+
+def run_task(executor, root, index_file, index=None, paths=None):
+    """在当前线程运行更新任务，返回(索引, 耗时)"""
+    task = TrigramIndexTask(executor, WORKERS, root, None, 1, Signals(), index, paths)
+    task.index_file = index_file
+    start = time.perf_counter()
+    task.run()
+    elapsed = time.perf_counter() - start
+    serial, index, message = task.signals.finished.calls[-1]
+    if index is None:
+        raise RuntimeError(message)
+    return index, elapsed
+
+
+def corpus_size(root):
+    total = 0
+    for directory, dirs, files in os.walk(root):
+        total += sum(os.path.getsize(os.path.join(directory, name)) for name in files)
+    return total
+
+
+def main():
+    file_count = int(sys.argv[1]) if len(sys.argv) > 1 else FILE_COUNT
+    start = time.perf_counter()
+    root = make_corpus(file_count)
+    print(f"工作区: {root}，{corpus_size(root) / 1048576:.1f} MB（准备 {time.perf_counter() - start:.1f} s）")
+    index_file = os.path.join(tempfile.mkdtemp(), "bench.idx")
+    executor = ProcessPoolExecutor(WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        index, elapsed = run_task(executor, root, index_file)
+        dense = sum(type(ids) is int for ids in index.postings.values())
+        print(f"建立索引: {len(index.ids)} 个文件 {elapsed:.2f} s（{WORKERS} 个进程），"
+              f"{len(index.postings)} 个三元组（{dense} 个使用位图）")
+        print(f"索引文件: {os.path.getsize(index_file) / 1048576:.1f} MB")
+        
+        start = time.perf_counter()
+        loaded = TrigramIndex.load(index_file, root, "")
+        print(f"读取索引: {(time.perf_counter() - start) * 1000:.0f} ms")
+        
+        index, elapsed = run_task(executor, root, index_file, loaded)
+        print(f"核对（没有变化）: {elapsed * 1000:.0f} ms")
+        
+        rng = random.Random(2)
+        changed = rng.sample(sorted(index.ids), 100)
+        for rel_path in changed:
+            with open(os.path.join(root, rel_path), 'a', encoding='utf-8') as f:
+                f.write("# touched\n")
+        _, elapsed = run_task(executor, root, index_file, index, changed)
+        print(f"增量更新: 100 个文件 {elapsed * 1000:.0f} ms")
+        _, elapsed = run_task(executor, root, index_file, index)
+        print(f"核对（已更新）: {elapsed * 1000:.0f} ms")
+    finally:
+        executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""三元组索引查询基准测试
+
+使用bench_trigram_build.py生成的工作区（不存在时先生成）建立索引，对不同类型的查询测量：
+从索引取得候选文件的耗时和候选文件数，以及在文件中查找的总耗时（遍历、核对修改时间、
+在进程池中读取并匹配候选文件），并与不使用索引、查找所有文件的耗时对比，确认两者结果相同。
+
+运行: python benchmarks/bench_trigram_query.py [文件数]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from my_ide import FindInFilesTask
+from bench_trigram_build import FILE_COUNT, WORKERS, Signals, make_corpus, run_task
+
+REPEAT = 20
+
+
+def pick_words(root, index):
+    """按出现的文件数取常见、中等和少见的标识符"""
+    counts = Counter()
+    for rel_path in sorted(index.ids)[:500]:
+        with open(os.path.join(root, rel_path), 'r', encoding='utf-8') as f:
+            counts.update(set(word for word in f.read().replace(".", " ").replace("(", " ").split()
+                              if word.isidentifier() and len(word) >= 6))
+    ranked = [word for word, n in counts.most_common()]
+    return ranked[0], ranked[len(ranked) // 20], ranked[-1]
+
+
+def search(executor, root, index, query, regex=False, case_sensitive=False):
+    """运行一次查找，返回(耗时, 匹配的文件集合, 查找的文件数)"""
+    signals = Signals()
+    task = FindInFilesTask(executor, WORKERS, root, None, query, regex, case_sensitive, 1, signals, index)
+    start = time.perf_counter()
+    task.run()
+    elapsed = time.perf_counter() - start
+    files = set()
+    searched = 0
+    for serial, (results, batch_searched, skipped) in signals.results.calls:
+        files.update(rel_path for rel_path, matches, truncated in results)
+        searched += batch_searched
+    return elapsed, files, searched
+
+
+def main():
+    file_count = int(sys.argv[1]) if len(sys.argv) > 1 else FILE_COUNT
+    root = make_corpus(file_count)
+    index_file = os.path.join(tempfile.mkdtemp(), "bench.idx")
+    executor = ProcessPoolExecutor(WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        index, elapsed = run_task(executor, root, index_file)
+        print(f"建立索引: {len(index.ids)} 个文件 {elapsed:.2f} s")
+        common, medium, rare = pick_words(root, index)
+        queries = [
+            ("少见标识符", rare, False, False),
+            ("中等标识符", medium, False, False),
+            ("常见标识符", common, False, False),
+            ("区分大小写", medium.capitalize(), False, True),
+            ("短语", f"self.{medium} = ", False, False),
+            ("正则表达式", f"raise \\w+Error\\(\"{rare}", True, False),
+            ("无字面量正则", r"\d{3}\]", True, False),
+        ]
+        print(f"{'查询':<10} {'候选p50':>9} {'候选文件':>8} {'匹配文件':>8} {'使用索引':>9} {'不使用索引':>10}")
+        for name, query, regex, case_sensitive in queries:
+            times = []
+            for _ in range(REPEAT):
+                start = time.perf_counter()
+                candidates = index.candidates(query, regex, case_sensitive)
+                times.append(time.perf_counter() - start)
+            times.sort()
+            indexed, indexed_files, searched = search(executor, root, index, query, regex, case_sensitive)
+            full, full_files, _ = search(executor, root, None, query, regex, case_sensitive)
+            assert indexed_files == full_files, name
+            count_text = "全部" if candidates is None else str(len(candidates))
+            print(f"{name:<10} {times[len(times) // 2] * 1000:>7.2f}ms {count_text:>8} {len(full_files):>8} "
+                  f"{indexed * 1000:>7.0f}ms {full * 1000:>8.0f}ms")
+    finally:
+        executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,273 @@
 import sys
 import os
 import json
+import codecs
+import re
+import time
+import heapq
+import hashlib
+import threading
+import struct
+import subprocess
+import mmap
+import marshal
+import pstats
+import signal
+import tempfile
+import multiprocessing
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait as futures_wait
+from functools import reduce
+from itertools import accumulate, compress, count, repeat
+from operator import and_, itemgetter
+from urllib.parse import unquote
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QDockWidget, QListWidget, 
-                             QMenuBar, QMenu, QFileDialog, QTabWidget, 
+                             QMenuBar, QMenu, QFileDialog, QTabWidget, QProgressBar, 
                              QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, 
                              QToolBar, QStatusBar, QPlainTextEdit, QLineEdit, QSplitter, 
                              QTreeWidget, QTreeWidgetItem, QMessageBox, QPushButton, 
-                             QListWidget, QListWidgetItem)
-from PyQt6.QtGui import QAction
-from PyQt6.QtCore import Qt, QFile, QTextStream, QTimer, QProcess
+                             QListWidget, QListWidgetItem, QTableView, QHeaderView, QAbstractItemView,
+                             QAbstractScrollArea, QDialog, QCheckBox)
+from PyQt6.QtGui import QAction, QColor, QPalette, QPainter, QFont
+from PyQt6.QtCore import (Qt, QFile, QTextStream, QTimer, QProcess, QObject, QRunnable,
+                          QThreadPool, pyqtSignal, QAbstractTableModel, QModelIndex,
+                          QFileSystemWatcher, QSocketNotifier, QProcessEnvironment)
 from PyQt6.Qsci import QsciScintilla, QsciLexerPython, QsciLexerCPP, QsciLexerJava, QsciLexerHTML, QsciLexerJavaScript
 
+class IgnoreMatcher:
+    """gitignore风格的排除规则，一次编译为正则表达式
+
+    支持 # 注释、! 取反、结尾 / 只匹配目录、开头或中间的 / 表示相对工作区根目录、
+    * ? [...] 和 **。不含取反规则时所有规则合并为一个正则表达式，每个条目只匹配一次。
+    路径使用 / 分隔的相对路径。
+    """
+    def __init__(self, patterns=()):
+        flags = re.IGNORECASE if os.name == 'nt' else 0
+        self.rules = []  # (正则, 是否取反, 是否只匹配目录)
+        for pattern in patterns:
+            self.rules.extend(self.compile_pattern(pattern, flags))
+        self.has_negation = any(negated for regex, negated, dir_only in self.rules)
+        if not self.has_negation:
+            # 合并为两个正则：匹配所有条目的和只匹配目录的
+            any_parts = [regex.pattern for regex, negated, dir_only in self.rules if not dir_only]
+            dir_parts = [regex.pattern for regex, negated, dir_only in self.rules]
+            self.any_regex = re.compile("|".join(any_parts), flags) if any_parts else None
+            self.dir_regex = re.compile("|".join(dir_parts), flags) if dir_parts else None
+    
+    @classmethod
+    def from_workspace(cls, root, patterns, use_gitignore=True):
+        """默认排除规则加上工作区根目录的.gitignore"""
+        patterns = list(patterns)
+        if use_gitignore:
+            try:
+                with open(os.path.join(root, ".gitignore"), 'r', encoding='utf-8', errors='replace') as f:
+                    patterns.extend(f.read().splitlines())
+            except OSError:
+                pass
+        return cls(patterns)
+    
+    @classmethod
+    def compile_pattern(cls, pattern, flags=0):
+        """编译一条规则，返回规则列表（空行和注释返回空列表）"""
+        pattern = pattern.rstrip("\r\n")
+        # 未转义的结尾空格被忽略
+        while pattern.endswith(" ") and not pattern.endswith("\\ "):
+            pattern = pattern[:-1]
+        if not pattern or pattern.startswith("#"):
+            return []
+        negated = pattern.startswith("!")
+        if negated:
+            pattern = pattern[1:]
+        dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        if not pattern:
+            return []
+        # 含有 / 的规则相对根目录，否则匹配任意层级的名称
+        if "/" in pattern:
+            body = cls.translate(pattern.lstrip("/"))
+        else:
+            body = "(?:.*/)?" + cls.translate(pattern)
+        rules = [(re.compile(f"(?:{body})\\Z", flags), negated, dir_only)]
+        # 目录下的所有内容（dir/**）同时排除目录本身，扫描时不再进入
+        if pattern.endswith("/**") and len(pattern) > 3:
+            rules.append((re.compile(f"(?:{body[:-3]})\\Z", flags), negated, True))
+        return rules
+    
+    @staticmethod
+    def translate(pattern):
+        """把通配符转换为正则表达式"""
+        out = []
+        i, n = 0, len(pattern)
+        while i < n:
+            c = pattern[i]
+            if c == "*":
+                if pattern.startswith("**/", i):
+                    out.append("(?:.*/)?")
+                    i += 3
+                    continue
+                if pattern.startswith("**", i):
+                    out.append(".*")
+                    i += 2
+                    continue
+                out.append("[^/]*")
+            elif c == "?":
+                out.append("[^/]")
+            elif c == "[":
+                end = pattern.find("]", i + 2)
+                if end == -1:
+                    out.append(re.escape(c))
+                else:
+                    content = pattern[i + 1:end]
+                    if content.startswith("!"):
+                        content = "^" + content[1:]
+                    out.append("[" + content.replace("\\", "\\\\") + "]")
+                    i = end
+            elif c == "\\" and i + 1 < n:
+                out.append(re.escape(pattern[i + 1]))
+                i += 2
+                continue
+            else:
+                out.append(re.escape(c))
+            i += 1
+        return "".join(out)
+    
+    def match(self, path, is_dir):
+        """判断相对路径是否被排除"""
+        if not self.has_negation:
+            if is_dir:
+                return self.dir_regex is not None and self.dir_regex.match(path) is not None
+            return self.any_regex is not None and self.any_regex.match(path) is not None
+        # 有取反规则时最后一个匹配的规则生效
+        for regex, negated, dir_only in reversed(self.rules):
+            if dir_only and not is_dir:
+                continue
+            if regex.match(path):
+                return not negated
+        return False
+
+
+class DirectoryScanSignals(QObject):
+    """目录扫描任务信号，由后台线程发出，在GUI线程处理"""
+    batch = pyqtSignal(int, object)  # 扫描序号, [(名称, 是否目录, 大小, 修改时间), ...]
+    finished = pyqtSignal(int, str)  # 扫描序号, 错误信息
+
+
+class DirectoryScanTask(QRunnable):
+    """后台目录扫描任务
+
+    使用os.scandir，目录判断使用DirEntry缓存的类型信息，只对文件取一次stat
+    （Windows上scandir已经带有stat信息，不需要额外的系统调用）。结果分批发出。
+    指定matcher时被排除的条目在扫描时直接跳过，rel_dir为目录相对工作区根目录的路径。
+    """
+    BATCH_SIZE = 512
+    
+    def __init__(self, path, serial, signals, matcher=None, rel_dir=""):
+        super().__init__()
+        self.path = path
+        self.serial = serial
+        self.signals = signals
+        self.matcher = matcher
+        self.prefix = rel_dir + "/" if rel_dir else ""
+        self.cancelled = False
+    
+    def run(self):
+        batch = []
+        error = ""
+        try:
+            with os.scandir(self.path) as entries:
+                for entry in entries:
+                    if self.cancelled:
+                        return
+                    try:
+                        is_dir = entry.is_dir()
+                        if self.matcher is not None and self.matcher.match(self.prefix + entry.name, is_dir):
+                            continue
+                        if is_dir:
+                            batch.append((entry.name, True, None, None))
+                        else:
+                            stat = entry.stat()
+                            batch.append((entry.name, False, stat.st_size, stat.st_mtime))
+                    except OSError:
+                        # 失效的符号链接等无法stat的条目仍然显示
+                        batch.append((entry.name, False, None, None))
+                    if len(batch) >= self.BATCH_SIZE:
+                        self.signals.batch.emit(self.serial, batch)
+                        batch = []
+        except OSError as e:
+            error = e.strerror or str(e)
+        if batch and not self.cancelled:
+            self.signals.batch.emit(self.serial, batch)
+        self.signals.finished.emit(self.serial, error)
+
+
+class ExplorerNode:
+    """资源管理器条目的路径和元数据，通过setData保存在树节点上
+
+    scan_serial为目录最近一次加载的扫描序号，None表示尚未加载（或折叠后需要重新加载）。
+    """
+    __slots__ = ('path', 'name', 'is_dir', 'size', 'mtime', 'scan_serial')
+    
+    def __init__(self, path, name, is_dir, size=None, mtime=None):
+        self.path = path
+        self.name = name
+        self.is_dir = is_dir
+        self.size = size
+        self.mtime = mtime
+        self.scan_serial = None
+
+
 class ResourceExplorer(QWidget):
-    """资源管理器类"""
+    """资源管理器类
+
+    目录在第一次展开时才在后台线程中扫描，扫描结果分批加入树中，
+    大目录不会阻塞界面。展开的目录由QFileSystemWatcher监视，变化合并后
+    重新扫描并只更新增删的条目。每个树节点保存一个ExplorerNode，
+    并按路径建立索引，按路径查找节点不需要遍历树。
+    """
+    # 每次事件循环最多加入树中的条目数
+    ITEMS_PER_TICK = 1000
+    # 目录变化合并的时间窗口（毫秒），git checkout或编译时的大量事件只触发一次刷新
+    REFRESH_DELAY = 300
+    # 刷新后目录中变化的条目：目录路径, [(名称, 是否目录), ...]新增, [(名称, 是否目录), ...]删除, [名称, ...]修改的文件
+    entries_changed = pyqtSignal(str, object, object, object)
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent_ide = parent
+        # 后台扫描线程池，网络目录可能很慢，不占用语法检查等其他线程池
+        self.scan_pool = QThreadPool(self)
+        self.scan_pool.setMaxThreadCount(2)
+        self.scan_signals = DirectoryScanSignals(self)
+        self.scan_signals.batch.connect(self.on_scan_batch)
+        self.scan_signals.finished.connect(self.on_scan_finished)
+        self.scan_serial = count(1)
+        self.scans = {}  # 扫描序号 -> (目录项, 扫描任务)
+        self.pending_batches = deque()  # (扫描序号, 条目列表)，由定时器分批加入树中
+        self.drain_timer = QTimer(self)
+        self.drain_timer.setInterval(0)
+        self.drain_timer.timeout.connect(self.drain_batches)
+        
+        # 路径 -> 树节点，键经过os.path.normcase处理（Windows上不区分大小写）
+        self.nodes = {}
+        # 等待加载完成后在树中显示的路径
+        self.pending_reveal = None
+        
+        # 监视已展开的目录，变化的目录先记录下来，定时器触发时统一刷新
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+        self.watched_dirs = set()
+        self.dirty_dirs = set()
+        self.refreshes = {}  # 扫描序号 -> (目录项, 扫描任务, 收集到的条目)
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(self.REFRESH_DELAY)
+        self.refresh_timer.timeout.connect(self.refresh_dirty_dirs)
+        
+        # 工作区根目录和排除规则，未打开工作区时显示所有驱动器或根目录
+        self.workspace_root = None
+        self.matcher = None
         self.initUI()
     
     def initUI(self):
@@ -26,16 +278,44 @@ class ResourceExplorer(QWidget):
         self.tree = QTreeWidget()
         self.tree.setHeaderLabels(["名称", "大小", "类型", "修改日期"])
         self.tree.setColumnWidth(0, 200)
+        # 展开由itemExpanded统一处理，双击目录时自行切换
+        self.tree.setExpandsOnDoubleClick(False)
+        self.tree.setUniformRowHeights(True)
         self.tree.itemDoubleClicked.connect(self.on_item_double_clicked)
+        self.tree.itemExpanded.connect(self.on_item_expanded)
+        self.tree.itemCollapsed.connect(self.on_item_collapsed)
         
         # 添加根目录
         self.populate_tree()
         
         self.layout.addWidget(self.tree)
     
+    def set_workspace(self, root):
+        """以root为根目录显示工作区，root为None时恢复显示所有根目录"""
+        self.workspace_root = os.path.abspath(root) if root else None
+        self.matcher = None
+        if self.workspace_root and self.parent_ide is not None:
+            settings = self.parent_ide.settings
+            self.matcher = IgnoreMatcher.from_workspace(
+                self.workspace_root,
+                settings.get("workspace_exclude_patterns", []),
+                settings.get("workspace_use_gitignore", True))
+        self.populate_tree()
+    
     def populate_tree(self):
-        """填充树视图"""
+        """填充树视图，根目录的内容在展开时才加载"""
+        self.cancel_scans()
         self.tree.clear()
+        self.nodes.clear()
+        
+        if self.workspace_root:
+            # 工作区根目录显示目录名
+            item = self.create_item(self.workspace_root,
+                                    os.path.basename(self.workspace_root) or self.workspace_root, True)
+            item.setToolTip(0, self.workspace_root)
+            self.tree.addTopLevelItem(item)
+            self.tree.expandItem(item)
+            return
         
         # 获取根目录
         if sys.platform == "win32":
@@ -49,100 +329,2960 @@ class ResourceExplorer(QWidget):
                     drives.append(drive_path)
             
             for drive in drives:
-                item = QTreeWidgetItem(self.tree, [drive])
-                self.tree.addTopLevelItem(item)
-                self.add_subdirectories(item, drive)
+                self.tree.addTopLevelItem(self.create_item(drive, drive, True))
         else:
             # Linux/Mac系统使用根目录
-            root_item = QTreeWidgetItem(self.tree, ["/"])
-            self.tree.addTopLevelItem(root_item)
-            self.add_subdirectories(root_item, "/")
+            self.tree.addTopLevelItem(self.create_item("/", "/", True))
     
-    def add_subdirectories(self, parent_item, path):
-        """添加子目录"""
-        try:
-            entries = os.listdir(path)
-            for entry in entries:
-                entry_path = os.path.join(path, entry)
-                if os.path.isdir(entry_path):
-                    item = QTreeWidgetItem(parent_item, [entry])
-                    parent_item.addChild(item)
-                    # 只添加一级子目录，避免加载过慢
-        except PermissionError:
-            pass
+    def create_item(self, path, name, is_dir, size=None, mtime=None):
+        """创建树节点并加入路径索引，目录在加载前也显示展开箭头"""
+        node = ExplorerNode(path, name, is_dir, size, mtime)
+        if is_dir:
+            item = QTreeWidgetItem([name])
+            item.setChildIndicatorPolicy(QTreeWidgetItem.ChildIndicatorPolicy.ShowIndicator)
+        else:
+            item = QTreeWidgetItem([name, self.size_text(size), os.path.splitext(name)[1], self.mtime_text(mtime)])
+        item.setData(0, Qt.ItemDataRole.UserRole, node)
+        self.nodes[os.path.normcase(path)] = item
+        return item
+    
+    @staticmethod
+    def size_text(size):
+        return str(size) if size is not None else ""
+    
+    @staticmethod
+    def mtime_text(mtime):
+        return time.strftime("%Y-%m-%d %H:%M", time.localtime(mtime)) if mtime is not None else ""
+    
+    def update_file_columns(self, item, node):
+        item.setText(1, self.size_text(node.size))
+        item.setText(3, self.mtime_text(node.mtime))
+    
+    def node_of(self, item):
+        """树节点对应的ExplorerNode，加载提示和错误信息返回None"""
+        return item.data(0, Qt.ItemDataRole.UserRole)
+    
+    def item_for_path(self, path):
+        """按路径查找已加载的树节点"""
+        return self.nodes.get(os.path.normcase(os.path.abspath(path)))
+    
+    def on_item_expanded(self, item):
+        """目录第一次展开（或折叠后再次展开）时在后台加载内容"""
+        node = self.node_of(item)
+        if node is not None and node.scan_serial is None:
+            self.load_subdirectories(item)
+    
+    def on_item_collapsed(self, item):
+        """折叠的目录不再监视，下次展开时重新加载"""
+        node = self.node_of(item)
+        if node is not None and node.path in self.watched_dirs:
+            self.unwatch(node.path)
+            node.scan_serial = None
     
     def on_item_double_clicked(self, item, column):
         """双击项目处理"""
-        # 构建完整路径
-        path = self.get_full_path(item)
-        
-        if os.path.isfile(path):
+        node = self.node_of(item)
+        # 加载提示和错误信息
+        if node is None:
+            return
+        if not node.is_dir:
             # 打开文件
             if self.parent_ide:
-                self.parent_ide.open_specific_file(path)
-        elif os.path.isdir(path):
+                self.parent_ide.open_specific_file(node.path)
+        elif item.isExpanded():
             # 展开或折叠目录
-            if item.isExpanded():
-                self.tree.collapseItem(item)
-            else:
-                # 加载子目录
-                self.load_subdirectories(item, path)
-                self.tree.expandItem(item)
+            self.tree.collapseItem(item)
+        else:
+            # 重新加载目录内容后展开
+            self.load_subdirectories(item)
+            self.tree.expandItem(item)
     
     def get_full_path(self, item):
         """获取项目的完整路径"""
-        path = item.text(0)
-        parent = item.parent()
-        while parent:
-            path = os.path.join(parent.text(0), path)
-            parent = parent.parent()
-        return path
+        return self.node_of(item).path
+    
+    def reveal_path(self, path):
+        """在树中选中path，所在目录尚未加载时逐级展开，加载完成后继续"""
+        path = os.path.abspath(path)
+        item = self.item_for_path(path)
+        if item is not None:
+            self.pending_reveal = None
+            parent = item.parent()
+            while parent is not None:
+                parent.setExpanded(True)
+                parent = parent.parent()
+            self.tree.setCurrentItem(item)
+            self.tree.scrollToItem(item)
+            return True
+        # 找到已在树中的最近一级上级目录
+        parent_path = os.path.dirname(path)
+        while os.path.normcase(parent_path) not in self.nodes:
+            if os.path.dirname(parent_path) == parent_path:
+                # 不在资源管理器显示的范围内
+                self.pending_reveal = None
+                return False
+            parent_path = os.path.dirname(parent_path)
+        parent = self.nodes[os.path.normcase(parent_path)]
+        node = self.node_of(parent)
+        if node.scan_serial is not None and node.scan_serial not in self.scans:
+            # 已加载但找不到，文件不存在或被排除
+            self.pending_reveal = None
+            return False
+        self.pending_reveal = path
+        self.tree.expandItem(parent)
+        return True
+    
+    def scan_task(self, path, serial):
+        """创建扫描任务，工作区内的目录应用排除规则"""
+        if self.matcher is None:
+            return DirectoryScanTask(path, serial, self.scan_signals)
+        rel_dir = os.path.relpath(path, self.workspace_root).replace(os.sep, "/")
+        if rel_dir == ".":
+            rel_dir = ""
+        return DirectoryScanTask(path, serial, self.scan_signals, self.matcher, rel_dir)
+    
+    def load_subdirectories(self, item):
+        """在后台线程中扫描目录，结果分批加入目录项"""
+        node = self.node_of(item)
+        # 取消这个目录上一次尚未完成的扫描
+        if node.scan_serial in self.scans:
+            self.scans.pop(node.scan_serial)[1].cancelled = True
+        # 清空现有子项，子目录也不再监视
+        self.remove_children(item)
+        node.scan_serial = next(self.scan_serial)
+        item.addChild(QTreeWidgetItem(["加载中..."]))
+        # 先开始监视，扫描期间发生的变化在加载完成后刷新
+        self.watch(node.path)
+        task = self.scan_task(node.path, node.scan_serial)
+        self.scans[node.scan_serial] = (item, task)
+        self.scan_pool.start(task)
+    
+    def forget_subtree(self, item):
+        """把item下的所有节点移出路径索引，停止监视和加载其中的目录"""
+        stack = [item.child(i) for i in range(item.childCount())]
+        while stack:
+            child = stack.pop()
+            node = self.node_of(child)
+            if node is None:
+                continue
+            self.nodes.pop(os.path.normcase(node.path), None)
+            if node.is_dir:
+                if node.path in self.watched_dirs:
+                    self.unwatch(node.path)
+                if node.scan_serial in self.scans:
+                    self.scans.pop(node.scan_serial)[1].cancelled = True
+                stack.extend(child.child(i) for i in range(child.childCount()))
     
-    def load_subdirectories(self, item, path):
-        """加载子目录"""
-        # 清空现有子项
+    def remove_children(self, item):
+        """删除item的所有子节点"""
+        self.forget_subtree(item)
         item.takeChildren()
-        
+    
+    def on_scan_batch(self, serial, entries):
+        """收到一批扫描结果，放入队列由定时器加入树中"""
+        refresh = self.refreshes.get(serial)
+        if refresh is not None:
+            refresh[2].extend(entries)
+            return
+        scan = self.scans.get(serial)
+        if scan is None:
+            return
+        self.pending_batches.append((serial, entries))
+        if not self.drain_timer.isActive():
+            self.drain_timer.start()
+    
+    def on_scan_finished(self, serial, error):
+        """扫描结束，排在所有结果之后处理"""
+        if serial in self.refreshes:
+            self.apply_refresh(serial, error)
+            return
+        if serial in self.scans:
+            self.pending_batches.append((serial, error))
+            if not self.drain_timer.isActive():
+                self.drain_timer.start()
+    
+    def drain_batches(self):
+        """每次事件循环最多加入ITEMS_PER_TICK个条目，保持界面响应"""
+        budget = self.ITEMS_PER_TICK
+        while self.pending_batches and budget > 0:
+            serial, entries = self.pending_batches.popleft()
+            scan = self.scans.get(serial)
+            if scan is None:
+                continue
+            item = scan[0]
+            if isinstance(entries, str):
+                self.finish_scan(serial, item, entries)
+                continue
+            if len(entries) > budget:
+                # 剩余部分留到下一次
+                self.pending_batches.appendleft((serial, entries[budget:]))
+                entries = entries[:budget]
+            # 直接拼接路径，比逐个调用os.path.join快
+            prefix = os.path.join(self.node_of(item).path, "")
+            children = [self.create_item(prefix + name, name, is_dir, size, mtime)
+                        for name, is_dir, size, mtime in entries]
+            item.addChildren(children)
+            budget -= len(children)
+        if not self.pending_batches:
+            self.drain_timer.stop()
+    
+    def finish_scan(self, serial, item, error):
+        """移除加载提示，空目录不再显示展开箭头"""
+        del self.scans[serial]
+        placeholder = item.child(0)
+        if placeholder is not None and self.node_of(placeholder) is None:
+            item.removeChild(placeholder)
+        if error:
+            item.addChild(QTreeWidgetItem([f"无法读取: {error}"]))
+        item.setChildIndicatorPolicy(QTreeWidgetItem.ChildIndicatorPolicy.DontShowIndicatorWhenChildless)
+        if self.pending_reveal:
+            self.reveal_path(self.pending_reveal)
+    
+    def cancel_scans(self):
+        """取消所有尚未完成的扫描，停止监视所有目录"""
+        for item, task in self.scans.values():
+            task.cancelled = True
+        for item, task, entries in self.refreshes.values():
+            task.cancelled = True
+        self.scans.clear()
+        self.refreshes.clear()
+        self.pending_batches.clear()
+        self.pending_reveal = None
+        if self.watched_dirs:
+            self.watcher.removePaths(list(self.watched_dirs))
+        self.watched_dirs.clear()
+        self.dirty_dirs.clear()
+    
+    def watch(self, path):
+        if path not in self.watched_dirs:
+            self.watcher.addPath(path)
+            self.watched_dirs.add(path)
+    
+    def unwatch(self, path):
+        if path in self.watched_dirs:
+            self.watched_dirs.discard(path)
+            self.watcher.removePath(path)
+        self.dirty_dirs.discard(path)
+    
+    def on_directory_changed(self, path):
+        """目录内容变化，记录后等待合并刷新"""
+        if path in self.watched_dirs:
+            self.dirty_dirs.add(path)
+            # 定时器已启动时不重新计时，持续的事件也会按固定间隔刷新
+            if not self.refresh_timer.isActive():
+                self.refresh_timer.start()
+    
+    def refresh_dirty_dirs(self):
+        """重新扫描变化过的目录，正在加载或刷新的目录留到下一次"""
+        busy = {id(refresh[0]) for refresh in self.refreshes.values()}
+        for path in list(self.dirty_dirs):
+            item = self.nodes.get(os.path.normcase(path))
+            if item is None or path not in self.watched_dirs:
+                self.dirty_dirs.discard(path)
+                continue
+            if id(item) in busy or self.node_of(item).scan_serial in self.scans:
+                continue
+            self.dirty_dirs.discard(path)
+            serial = next(self.scan_serial)
+            task = self.scan_task(path, serial)
+            self.refreshes[serial] = (item, task, [])
+            self.scan_pool.start(task)
+        if self.dirty_dirs and not self.refresh_timer.isActive():
+            self.refresh_timer.start()
+    
+    def apply_refresh(self, serial, error):
+        """对比重新扫描的结果，只增删变化的条目，更新文件的大小和修改时间"""
+        item, task, entries = self.refreshes.pop(serial)
+        node = self.node_of(item)
+        if error or node.path not in self.watched_dirs or self.nodes.get(os.path.normcase(node.path)) is not item:
+            # 目录已被删除等情况由上级目录的刷新处理
+            return
+        existing = {}
+        for i in range(item.childCount()):
+            child = item.child(i)
+            child_node = self.node_of(child)
+            if child_node is not None:
+                existing[child_node.name] = child
+        
+        added = []
+        modified = []
+        replaced = set()
+        seen = set()
+        for name, is_dir, size, mtime in entries:
+            seen.add(name)
+            child = existing.get(name)
+            if child is not None:
+                child_node = self.node_of(child)
+                if child_node.is_dir == is_dir:
+                    if not is_dir and (child_node.size, child_node.mtime) != (size, mtime):
+                        child_node.size = size
+                        child_node.mtime = mtime
+                        self.update_file_columns(child, child_node)
+                        modified.append(name)
+                    continue
+                # 类型改变的条目（文件变为同名目录）先删除再添加
+                replaced.add(name)
+            added.append((name, is_dir, size, mtime))
+        removed = [child for name, child in existing.items() if name not in seen or name in replaced]
+        removed_entries = [(self.node_of(child).name, self.node_of(child).is_dir) for child in removed]
+        
+        for child in removed:
+            self.forget_subtree(child)
+            self.nodes.pop(os.path.normcase(self.node_of(child).path), None)
+            if self.node_of(child).is_dir:
+                self.unwatch(self.node_of(child).path)
+        if len(removed) > 100:
+            # 大量删除时重建子项列表，避免逐个删除的平方开销
+            removed_ids = {id(child) for child in removed}
+            expanded = [child for child in existing.values() if child.isExpanded()]
+            kept = [child for child in item.takeChildren() if id(child) not in removed_ids]
+            item.addChildren(kept)
+            for child in expanded:
+                if id(child) not in removed_ids:
+                    child.setExpanded(True)
+        else:
+            for child in removed:
+                item.removeChild(child)
+        if added:
+            prefix = os.path.join(node.path, "")
+            item.addChildren([self.create_item(prefix + name, name, is_dir, size, mtime)
+                              for name, is_dir, size, mtime in added])
+        if added or removed_entries or modified:
+            self.entries_changed.emit(node.path, [(name, is_dir) for name, is_dir, size, mtime in added],
+                                      removed_entries, modified)
+
+class QuickOpenIndex:
+    """快速打开的文件索引
+
+    路径按（文件名长度, 路径长度）排序，小写的文件名用换行连接成一个大字符串，
+    匹配用str.find和正则表达式在C代码中扫描，按排序顺序找到足够的结果即可停止。
+    匹配分为三级：文件名包含查询、文件名按顺序包含查询的所有字符、完整路径按顺序包含查询的所有字符。
+    每个字符记录包含它的文件名的位图，候选较少时只检查位图中的文件名。
+    完整路径分为目录和文件名匹配：每个目录只扫描一次，贪心匹配查询开头的部分，
+    再在这个目录的文件名（按目录连续存放）中匹配剩余部分。
+    较长的扫描分段进行，每段之间生成None，调用方可以在此暂停并在下一次事件循环继续。
+    建立后的增删记录在added和removed中，积累过多时应重新建立。
+    """
+    # 候选文件名少于该数量时逐个检查，否则扫描整个文件名字符串
+    SPARSE_CANDIDATES = 10000
+    # 每段扫描的字符数和目录数
+    SCAN_CHUNK = 256 * 1024
+    DIRS_PER_CHUNK = 2000
+    # 增删记录超过该数量时需要重新建立索引
+    MAX_PENDING_CHANGES = 5000
+    NONZERO_BYTE = re.compile(rb'[^\x00]')
+    
+    def __init__(self, root, paths, truncated=False, matcher=None):
+        self.root = root
+        self.truncated = truncated
+        self.matcher = matcher
+        self.created = time.monotonic()
+        # 路径为使用 / 分隔的相对路径，保留原始大小写
+        ranked = sorted((self.rank_key(path), path) for path in paths)
+        self.paths = [path for key, path in ranked]
+        self.path_set = set(self.paths)
+        lower_paths = [key[2] for key, path in ranked]
+        self.names = [path[path.rfind("/") + 1:] for path in lower_paths]
+        self.name_blob, self.name_starts = self.join_lines(self.names)
+        self.name_masks = self.build_masks(self.names)
+        self.mask_bytes = (len(self.names) + 7) // 8
+        
+        # 目录（小写，以 / 结尾，根目录为空字符串）和每个文件所在目录的编号
+        dir_ids = {}
+        row_dirs = array('I', [dir_ids.setdefault(path[:path.rfind("/") + 1], len(dir_ids))
+                               for path in lower_paths])
+        self.dir_blob, self.dir_starts = self.join_lines(list(dir_ids))
+        # 按目录排列的行号（同一目录内保持排名顺序），dir_first[d]为目录d的第一个位置
+        self.dir_order = array('I', sorted(range(len(row_dirs)), key=row_dirs.__getitem__))
+        self.dir_first = array('I', [0] * (len(dir_ids) + 1))
+        for d in row_dirs:
+            self.dir_first[d + 1] += 1
+        for d in range(len(dir_ids)):
+            self.dir_first[d + 1] += self.dir_first[d]
+        self.dir_name_blob, self.dir_name_starts = self.join_lines([self.names[row] for row in self.dir_order])
+        # 路径中出现过的字符，含有其他字符的查询不需要匹配路径
+        self.path_chars = set(self.name_blob) | set(self.dir_blob)
+        self.added = {}  # 相对路径 -> 排序键
+        self.removed = set()
+        self.removed_prefixes = ()
+    
+    def __len__(self):
+        return len(self.paths) - len(self.removed) + len(self.added)
+    
+    @staticmethod
+    def rank_key(path):
+        """文件名越短、路径越短排名越靠前"""
+        lower = path.lower()
+        return (len(lower) - lower.rfind("/") - 1, len(lower), lower)
+    
+    @staticmethod
+    def join_lines(lines):
+        """连接为一个字符串，返回(字符串, 每行起始位置)，起始位置末尾附加总长度"""
+        starts = array('Q')
+        pos = 0
+        for line in lines:
+            starts.append(pos)
+            pos += len(line) + 1
+        starts.append(pos)
+        return "\n".join(lines) + "\n", starts
+    
+    @staticmethod
+    def build_masks(lines):
+        """每个字符 -> 包含该字符的行的位图（Python整数）"""
+        rows = {}
+        for i, line in enumerate(lines):
+            for c in set(line):
+                row_list = rows.get(c)
+                if row_list is None:
+                    rows[c] = row_list = []
+                row_list.append(i)
+        masks = {}
+        size = (len(lines) + 7) // 8
+        for c, row_list in rows.items():
+            bits = bytearray(size)
+            for i in row_list:
+                bits[i >> 3] |= 1 << (i & 7)
+            masks[c] = int.from_bytes(bits, 'little')
+        return masks
+    
+    @property
+    def needs_rebuild(self):
+        return len(self.added) + len(self.removed) > self.MAX_PENDING_CHANGES
+    
+    def full_path(self, path):
+        return os.path.join(self.root, *path.split("/"))
+    
+    def relative_path(self, file_path, is_dir=False):
+        """绝对路径对应的相对路径，不在根目录下或被排除规则匹配时返回None"""
         try:
-            entries = os.listdir(path)
-            for entry in entries:
-                entry_path = os.path.join(path, entry)
-                if os.path.isdir(entry_path):
-                    child_item = QTreeWidgetItem(item, [entry])
-                    item.addChild(child_item)
-                    # 预加载一级子目录
-                    self.add_subdirectories(child_item, entry_path)
-                elif os.path.isfile(entry_path):
-                    # 添加文件
-                    size = os.path.getsize(entry_path)
-                    item_type = os.path.splitext(entry)[1]
-                    mod_time = os.path.getmtime(entry_path)
-                    child_item = QTreeWidgetItem(item, [entry, str(size), item_type, str(mod_time)])
-                    item.addChild(child_item)
-        except PermissionError:
-            pass
+            rel_path = os.path.relpath(file_path, self.root)
+        except ValueError:
+            # Windows上位于其他驱动器
+            return None
+        if rel_path == os.curdir or rel_path == os.pardir or rel_path.startswith(os.pardir + os.sep):
+            return None
+        rel_path = rel_path.replace(os.sep, "/")
+        if self.matcher is not None:
+            parts = rel_path.split("/")
+            for i in range(1, len(parts)):
+                if self.matcher.match("/".join(parts[:i]), True):
+                    return None
+            if self.matcher.match(rel_path, is_dir):
+                return None
+        return rel_path
+    
+    def add(self, path):
+        if path in self.removed:
+            self.removed.discard(path)
+        elif path not in self.path_set:
+            self.added[path] = self.rank_key(path)
+    
+    def remove(self, path):
+        if self.added.pop(path, None) is None and path in self.path_set:
+            self.removed.add(path)
+    
+    def remove_prefix(self, prefix):
+        """删除目录prefix（以 / 结尾）下的所有文件"""
+        for path in [path for path in self.added if path.startswith(prefix)]:
+            del self.added[path]
+        self.removed_prefixes += (prefix,)
+    
+    @staticmethod
+    def normalize_query(query):
+        return "".join(query.lower().replace("\\", "/").split())
+    
+    @staticmethod
+    def subsequence_pattern(query):
+        """按顺序包含查询中所有字符的正则表达式，独占量词保证每行不回溯"""
+        e = re.escape
+        return re.compile(e(query[0]) + "".join(f"[^{e(c)}\\n]*+{e(c)}" for c in query[1:]))
+    
+    @staticmethod
+    def prefix_pattern(query):
+        """贪心匹配查询开头尽量多字符的正则表达式，匹配的字符数为1 + lastindex"""
+        e = re.escape
+        pattern = ""
+        for c in reversed(query[1:]):
+            pattern = f"(?:[^{e(c)}\\n]*+({e(c)}){pattern})?"
+        return re.compile(e(query[0]) + pattern)
+    
+    @staticmethod
+    def regex_find(pattern):
+        search = pattern.search
+        def find(blob, pos, end):
+            match = search(blob, pos, end)
+            return match.start() if match else -1
+        return find
+    
+    def scan(self, blob, starts, find, skip=None):
+        """分段扫描blob，生成匹配的行号，每段结束后生成None"""
+        pos = 0
+        total = len(blob)
+        while pos < total:
+            end = blob.find("\n", pos + self.SCAN_CHUNK)
+            end = total if end < 0 else end + 1
+            while True:
+                i = find(blob, pos, end)
+                if i < 0:
+                    break
+                row = bisect_right(starts, i) - 1
+                # 从下一行继续，每行最多匹配一次
+                pos = starts[row + 1]
+                if skip is None or not skip(row):
+                    yield row
+            pos = end
+            yield None
+    
+    def candidate_rows(self, query):
+        """文件名包含查询中所有字符的行号列表，候选过多时返回None"""
+        mask = -1
+        for c in set(query):
+            mask &= self.name_masks.get(c, 0)
+        if mask == -1 or mask.bit_count() > self.SPARSE_CANDIDATES:
+            return None
+        rows = []
+        data = mask.to_bytes(self.mask_bytes, 'little')
+        for match in self.NONZERO_BYTE.finditer(data):
+            byte = data[match.start()]
+            base = match.start() << 3
+            while byte:
+                low = byte & -byte
+                rows.append(base + low.bit_length() - 1)
+                byte ^= low
+        return rows
+    
+    def tier_rows(self, tier, query, subsequence, candidates):
+        """生成一级匹配的行号：0 文件名包含查询，1 文件名按顺序包含，2 路径按顺序包含"""
+        names = self.names
+        if tier == 2:
+            yield from self.path_rows(query, subsequence)
+        elif candidates is not None:
+            for row in candidates:
+                name = names[row]
+                if tier == 0:
+                    if query in name:
+                        yield row
+                elif query not in name and subsequence.search(name):
+                    yield row
+        elif tier == 0:
+            yield from self.scan(self.name_blob, self.name_starts,
+                                 lambda blob, pos, end: blob.find(query, pos, end))
+        else:
+            yield from self.scan(self.name_blob, self.name_starts, self.regex_find(subsequence),
+                                 lambda row: query in names[row])
+    
+    def path_rows(self, query, subsequence):
+        """生成完整路径按顺序包含查询、但文件名不包含的行号
 
-class TerminalWidget(QWidget):
-    """终端部件类"""
+        目录贪心匹配查询的前k个字符（贪心匹配得到的k最大），文件名只需按顺序包含剩余部分，
+        每个目录只在自己的文件名范围内扫描一次。全部找到后按排名排序再生成。
+        """
+        if not self.path_chars.issuperset(query):
+            return
+        prefix = self.prefix_pattern(query).search
+        suffixes = {}
+        dir_blob, dir_starts = self.dir_blob, self.dir_starts
+        name_blob, name_starts = self.dir_name_blob, self.dir_name_starts
+        order, first = self.dir_order, self.dir_first
+        rows = []
+        pos = 0
+        checked = 0
+        while True:
+            match = prefix(dir_blob, pos)
+            if match is None:
+                break
+            d = bisect_right(dir_starts, match.start()) - 1
+            pos = dir_starts[d + 1]
+            consumed = 1 + (match.lastindex or 0)
+            lo, hi = first[d], first[d + 1]
+            if consumed == len(query):
+                # 目录已经包含整个查询，其中所有文件都匹配
+                rows.extend(order[lo:hi])
+            else:
+                search = suffixes.get(consumed)
+                if search is None:
+                    search = suffixes[consumed] = self.subsequence_pattern(query[consumed:]).search
+                name_pos, end = name_starts[lo], name_starts[hi]
+                while True:
+                    name_match = search(name_blob, name_pos, end)
+                    if name_match is None:
+                        break
+                    i = bisect_right(name_starts, name_match.start(), lo, hi + 1) - 1
+                    rows.append(order[i])
+                    name_pos = name_starts[i + 1]
+            checked += 1
+            if checked % self.DIRS_PER_CHUNK == 0:
+                yield None
+        rows.sort()
+        names = self.names
+        for row in rows:
+            # 文件名本身匹配的已在前两级生成
+            if not subsequence.search(names[row]):
+                yield row
+    
+    def added_tier(self, path, query, subsequence):
+        """新增文件的匹配级别，不匹配时返回None"""
+        lower = path.lower()
+        name = lower[lower.rfind("/") + 1:]
+        if query in name:
+            return 0
+        if subsequence.search(name):
+            return 1
+        if subsequence.search(lower):
+            return 2
+        return None
+    
+    def matches(self, query):
+        """按排名生成匹配的相对路径，扫描较长时中间会生成None"""
+        query = self.normalize_query(query)
+        if not query:
+            return
+        subsequence = self.subsequence_pattern(query)
+        candidates = self.candidate_rows(query)
+        added = {}
+        for path, key in self.added.items():
+            tier = self.added_tier(path, query, subsequence)
+            if tier is not None:
+                added.setdefault(tier, []).append((key, path))
+        removed = self.removed
+        prefixes = self.removed_prefixes
+        for tier in range(3):
+            for row in self.tier_rows(tier, query, subsequence, candidates):
+                if row is None:
+                    yield None
+                    continue
+                path = self.paths[row]
+                if path in removed or (prefixes and path.startswith(prefixes)):
+                    continue
+                yield path
+            for key, path in sorted(added.get(tier, ())):
+                yield path
+
+
+class FileIndexSignals(QObject):
+    """文件索引任务信号"""
+    finished = pyqtSignal(int, object, str)  # 序号, QuickOpenIndex（失败时为None）, 错误信息
+
+
+class FileIndexTask(QRunnable):
+    """后台遍历工作区并建立快速打开索引"""
+    MAX_FILES = 1000000
+    
+    def __init__(self, root, serial, signals, matcher=None):
+        super().__init__()
+        self.root = root
+        self.serial = serial
+        self.signals = signals
+        self.matcher = matcher
+        self.cancelled = False
+    
+    @staticmethod
+    def walk(root, matcher=None):
+        """逐级遍历root，生成文件的相对路径（/ 分隔）
+
+        使用os.scandir，不进入符号链接的目录，被排除规则匹配的目录不再进入。
+        根目录无法读取时抛出OSError，无权限的子目录直接跳过。
+        """
+        stack = [""]
+        while stack:
+            rel_dir = stack.pop()
+            prefix = rel_dir + "/" if rel_dir else ""
+            try:
+                entries = os.scandir(os.path.join(root, rel_dir) if rel_dir else root)
+            except OSError:
+                if not rel_dir:
+                    raise
+                continue
+            with entries:
+                for entry in entries:
+                    rel_path = prefix + entry.name
+                    try:
+                        is_dir = entry.is_dir()
+                        if is_dir and entry.is_symlink():
+                            continue
+                    except OSError:
+                        continue
+                    if matcher is not None and matcher.match(rel_path, is_dir):
+                        continue
+                    if is_dir:
+                        stack.append(rel_path)
+                    else:
+                        yield rel_path
+    
+    def run(self):
+        paths = []
+        truncated = False
+        try:
+            for rel_path in self.walk(self.root, self.matcher):
+                if self.cancelled:
+                    return
+                paths.append(rel_path)
+                if len(paths) >= self.MAX_FILES:
+                    truncated = True
+                    break
+            index = QuickOpenIndex(self.root, paths, truncated, self.matcher)
+        except OSError as e:
+            self.signals.finished.emit(self.serial, None, e.strerror or str(e))
+            return
+        if not self.cancelled:
+            self.signals.finished.emit(self.serial, index, "")
+
+
+class QuickOpenDialog(QDialog):
+    """快速打开文件对话框（Ctrl+P）
+
+    输入框每次变化重新开始匹配，每次事件循环最多匹配TIME_BUDGET_MS毫秒，
+    未完成的路径匹配在下一次事件循环继续，输入不会被长时间扫描阻塞。
+    """
+    MAX_RESULTS = 50
+    TIME_BUDGET_MS = 15
+    
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.current_dir = os.getcwd()  # 当前工作目录
-        self.history = []  # 命令历史记录
-        self.history_index = 0  # 历史记录索引
+        self.index = None
+        self.building = False
+        self.matches = None
+        self.started = 0
+        self.selected_path = None
+        self.setWindowTitle("快速打开文件")
+        self.resize(640, 420)
+        layout = QVBoxLayout(self)
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("输入文件名，按顺序输入部分字符即可匹配（如 mip 匹配 my_ide.py）")
+        self.query_edit.textChanged.connect(self.start_search)
+        self.query_edit.installEventFilter(self)
+        layout.addWidget(self.query_edit)
+        self.result_list = QListWidget()
+        self.result_list.setUniformItemSizes(True)
+        self.result_list.itemActivated.connect(self.accept_item)
+        layout.addWidget(self.result_list)
+        self.info_label = QLabel("")
+        layout.addWidget(self.info_label)
+        self.pump_timer = QTimer(self)
+        self.pump_timer.setInterval(0)
+        self.pump_timer.timeout.connect(self.pump)
+    
+    def set_index(self, index, building=False):
+        """设置（或替换）索引，已输入的查询重新匹配"""
+        self.index = index
+        self.building = building
+        self.start_search()
+    
+    def index_text(self):
+        if self.index is None:
+            return "正在建立文件索引..."
+        text = f"{len(self.index)} 个文件"
+        if self.index.truncated:
+            text += "（文件过多，只索引了一部分）"
+        if self.building:
+            text += "，正在更新索引..."
+        return text
+    
+    def start_search(self):
+        self.pump_timer.stop()
+        self.result_list.clear()
+        self.matches = None
+        if self.index is not None and self.query_edit.text().strip():
+            self.matches = self.index.matches(self.query_edit.text())
+            self.started = time.perf_counter()
+            self.pump()
+        else:
+            self.info_label.setText(self.index_text())
+    
+    def pump(self):
+        """在时间预算内取出匹配结果"""
+        deadline = time.perf_counter() + self.TIME_BUDGET_MS / 1000
+        items = []
+        done = False
+        while self.result_list.count() + len(items) < self.MAX_RESULTS:
+            try:
+                path = next(self.matches)
+            except StopIteration:
+                done = True
+                break
+            if path is None:
+                if time.perf_counter() >= deadline:
+                    break
+                continue
+            slash = path.rfind("/")
+            item = QListWidgetItem(f"{path[slash + 1:]}    {path[:slash]}" if slash >= 0 else path)
+            item.setData(Qt.ItemDataRole.UserRole, path)
+            items.append(item)
+        for item in items:
+            self.result_list.addItem(item)
+        if self.result_list.currentRow() < 0 and self.result_list.count():
+            self.result_list.setCurrentRow(0)
+        if done or self.result_list.count() >= self.MAX_RESULTS:
+            self.pump_timer.stop()
+            elapsed = (time.perf_counter() - self.started) * 1000
+            self.info_label.setText(f"{self.result_list.count()} 个结果（{elapsed:.0f} ms），{self.index_text()}")
+        else:
+            self.info_label.setText(f"正在匹配... {self.index_text()}")
+            self.pump_timer.start()
+    
+    def eventFilter(self, obj, event):
+        """输入框中的上下键和翻页键移动结果列表的选择"""
+        if obj is self.query_edit and event.type() == event.Type.KeyPress:
+            key = event.key()
+            if key in (Qt.Key.Key_Up, Qt.Key.Key_Down, Qt.Key.Key_PageUp, Qt.Key.Key_PageDown):
+                QApplication.sendEvent(self.result_list, event)
+                return True
+            if key in (Qt.Key.Key_Return, Qt.Key.Key_Enter):
+                self.accept_item(self.result_list.currentItem())
+                return True
+        return super().eventFilter(obj, event)
+    
+    def accept_item(self, item):
+        if item is None:
+            return
+        self.selected_path = self.index.full_path(item.data(Qt.ItemDataRole.UserRole))
+        self.accept()
+    
+    def done(self, result):
+        self.pump_timer.stop()
+        self.matches = None
+        super().done(result)
+
+
+class FileSearcher:
+    """在一批文件中查找，在进程池的子进程中执行
+
+    文件以二进制读取，开头含有NUL字节的视为二进制文件直接跳过；较大的文件用mmap映射，
+    只在有匹配时复制匹配所在的行。查询只含ASCII字符时直接在字节上匹配，不需要解码整个文件，
+    否则按UTF-8解码后匹配；含有.、字符类或\\w等转义的正则表达式在字节上只匹配单个字节，
+    不能匹配多字节字符，也解码后匹配。每行只报告第一个匹配。
+    """
+    # 正则表达式中匹配单个任意字符的部分，转义的标点（如\.）先去掉
+    SINGLE_CHAR_REGEX = re.compile(r"\\[A-Za-z0-9]|[.\[]")
+    ESCAPED_PUNCTUATION = re.compile(r"\\[^A-Za-z0-9]")
+    BINARY_SNIFF_BYTES = 8192
+    MMAP_THRESHOLD = 16 * 1024 * 1024
+    MAX_MATCHES_PER_FILE = 1000
+    MAX_PREVIEW = 200
+    
+    @classmethod
+    def compile(cls, query, regex=False, case_sensitive=False):
+        """编译查询，返回(正则表达式, 是否在字节上匹配)，正则表达式无效时抛出re.error"""
+        source = query if regex else re.escape(query)
+        flags = re.MULTILINE | (0 if case_sensitive else re.IGNORECASE)
+        if query.isascii() and not (regex and cls.SINGLE_CHAR_REGEX.search(cls.ESCAPED_PUNCTUATION.sub("", query))):
+            return re.compile(source.encode('ascii'), flags), True
+        return re.compile(source, flags), False
+    
+    @classmethod
+    def search_batch(cls, root, rel_paths, query, regex=False, case_sensitive=False):
+        """返回([(相对路径, [(行号, 列号, 行内容), ...], 是否截断), ...], 已查找的文件数, 跳过的二进制文件数)"""
+        pattern, binary = cls.compile(query, regex, case_sensitive)
+        results = []
+        searched = 0
+        skipped = 0
+        for rel_path in rel_paths:
+            try:
+                found = cls.search_file(os.path.join(root, rel_path), pattern, binary)
+            except (OSError, ValueError):
+                continue
+            if found is None:
+                skipped += 1
+                continue
+            searched += 1
+            if found[0]:
+                results.append((rel_path, found[0], found[1]))
+        return results, searched, skipped
+    
+    @classmethod
+    def search_file(cls, file_path, pattern, binary):
+        """在一个文件中查找，二进制文件返回None，否则返回(匹配列表, 是否截断)"""
+        with open(file_path, 'rb') as f:
+            head = f.read(cls.BINARY_SNIFF_BYTES)
+            if b"\0" in head:
+                return None
+            if len(head) < cls.BINARY_SNIFF_BYTES:
+                data = head
+            elif os.fstat(f.fileno()).st_size >= cls.MMAP_THRESHOLD:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                data = head + f.read()
+        try:
+            if not binary:
+                data = bytes(data).decode('utf-8', errors='replace')
+            return cls.find_lines(data, pattern, binary)
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+    
+    @classmethod
+    def find_lines(cls, data, pattern, binary):
+        """逐个匹配并计算行号和列号，匹配之后跳到下一行继续"""
+        newline = b"\n" if binary else "\n"
+        matches = []
+        line = 1
+        counted = 0
+        pos = 0
+        size = len(data)
+        while pos <= size:
+            match = pattern.search(data, pos)
+            if match is None:
+                break
+            start = match.start()
+            line += data[counted:start].count(newline)
+            counted = start
+            line_start = data.rfind(newline, 0, start) + 1
+            line_end = data.find(newline, start)
+            if line_end < 0:
+                line_end = size
+            text = data[line_start:line_end]
+            if binary:
+                col = len(data[line_start:start].decode('utf-8', errors='replace'))
+                text = text.decode('utf-8', errors='replace')
+            else:
+                col = start - line_start
+            matches.append((line, col, cls.preview(text.rstrip("\r"), col)))
+            if len(matches) >= cls.MAX_MATCHES_PER_FILE:
+                return matches, True
+            pos = line_end + 1
+        return matches, False
+    
+    @classmethod
+    def preview(cls, text, col):
+        """过长的行只保留匹配附近的部分"""
+        if len(text) <= cls.MAX_PREVIEW:
+            return text
+        start = max(0, col - cls.MAX_PREVIEW // 4)
+        return ("…" if start else "") + text[start:start + cls.MAX_PREVIEW] + "…"
+
+
+class TrigramIndex:
+    """工作区的三元组索引，在文件中查找时用来缩小需要读取的文件范围
+
+    文件内容（ASCII字母转为小写）中每个连续的3字节组成一个三元组，倒排表记录每个三元组出现在哪些文件中。
+    查找时取出查询中必须出现的字面量，只有包含其所有三元组的文件才可能匹配。
+    出现在少量文件中的三元组用array保存文件编号，出现在很多文件中的用整数位图保存；
+    子进程按批返回同样形式的结果，合并时大多不需要逐个处理文件编号。
+    修改或删除的文件只把旧编号标记为无效，修改后的文件使用新编号；无效编号过多时重新建立整个索引。
+    超过MAX_FILE_BYTES的文件和尚未读取的文件不建立索引，查找时总是作为候选。
+    索引保存在用户缓存目录中，每个工作区一个文件；后台任务和界面线程都会访问，所以用锁保护。
+    """
+    VERSION = 1
+    MAX_FILE_BYTES = 8 * 1024 * 1024
+    # 包含某个三元组的文件超过总数的1/32时改用位图，位图更省内存，求交集也更快
+    DENSE_RATIO = 32
+    # 无效编号超过这个比例时重新建立索引
+    REBUILD_RATIO = 0.3
+    # 文件状态：已建立索引、文件过大、二进制文件、等待读取
+    INDEXED, LARGE, BINARY, PENDING = range(4)
+    # 三元组中含有非ASCII字节（不区分大小写时不能使用）
+    NON_ASCII = int.from_bytes(b"\x80\x80\x80\x00", sys.byteorder)
+    UNICODE_FOLDS = frozenset(b"iks")
+    BINARY_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+    NONZERO_BYTE = re.compile(rb'[^\x00]')
+    
+    def __init__(self, root, key="", matcher=None):
+        self.root = root
+        self.key = key
+        self.matcher = matcher
+        self.files = []  # 编号 -> (相对路径, 修改时间ns, 大小, 状态)，无效编号为None
+        self.ids = {}  # 相对路径 -> 编号
+        self.postings = {}  # 三元组 -> array('I')文件编号 或 位图整数
+        self.pending = defaultdict(list)  # 三元组 -> [(起始编号, 一批文件的位图), ...]，merge_pending时合并
+        self.unindexed = set()  # 总是作为候选的编号（文件过大或等待读取）
+        self.dead = 0
+        self.lock = threading.Lock()
+    
+    # 与快速打开索引相同，使用root和matcher属性
+    relative_path = QuickOpenIndex.relative_path
+    
+    @staticmethod
+    def cache_dir():
+        """每个用户的缓存目录"""
+        if os.name == 'nt':
+            base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+            return os.path.join(base, "MyIDE", "cache")
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        return os.path.join(base, "myide")
+    
+    @classmethod
+    def index_path(cls, root):
+        """工作区的索引文件，按根目录路径的哈希命名"""
+        name = os.path.normcase(os.path.abspath(root)).encode('utf-8', errors='surrogatepass')
+        return os.path.join(cls.cache_dir(), "trigrams", hashlib.sha1(name).hexdigest()[:16] + ".idx")
+    
+    @staticmethod
+    def matcher_key(matcher):
+        """排除规则的摘要，规则改变后不再使用已保存的索引"""
+        if matcher is None:
+            return ""
+        text = "\n".join(f"{regex.pattern}\0{negated}\0{dir_only}" for regex, negated, dir_only in matcher.rules)
+        return hashlib.sha1(text.encode('utf-8', errors='surrogatepass')).hexdigest()
+    
+    @staticmethod
+    def trigrams(data):
+        """data中所有连续3字节组成的整数集合
+
+        按起始位置除以3的余数分成三组，每组用切片一次把3字节拼成4字节整数的数组，不需要逐个位置循环。
+        """
+        result = set()
+        for offset in range(3):
+            groups = (len(data) - offset) // 3
+            if groups <= 0:
+                break
+            chunk = data[offset:offset + 3 * groups]
+            packed = bytearray(4 * groups)
+            packed[0::4] = chunk[0::3]
+            packed[1::4] = chunk[1::3]
+            packed[2::4] = chunk[2::3]
+            result.update(array('I', packed))
+        return result
+    
+    @staticmethod
+    def regex_literals(pattern):
+        """正则表达式中每个匹配都必须包含的字面量片段
+
+        只做保守的分析：含有 | 、(? 或按编码表示字符的转义（\\x41 等）时返回空列表；
+        分组和字符集整体跳过，后面跟着 * ? {m,n} 的字符不算在内。
+        """
+        if "|" in pattern or "(?" in pattern or re.search(r"\\[xuUN0-9]", pattern):
+            return []
+        literals = []
+        current = []
+        i, n = 0, len(pattern)
+        while i < n:
+            c = pattern[i]
+            if c == "\\":
+                if i + 1 < n and not pattern[i + 1].isalnum():
+                    current.append(pattern[i + 1])
+                else:
+                    # \d \w \b 等
+                    literals.append("".join(current))
+                    current = []
+                i += 2
+                continue
+            if c in "*?{":
+                # 前一个字符可以不出现
+                if current:
+                    current.pop()
+                literals.append("".join(current))
+                current = []
+                if c == "{":
+                    end = pattern.find("}", i)
+                    if end != -1:
+                        i = end
+            elif c == "[":
+                literals.append("".join(current))
+                current = []
+                i = TrigramIndex.class_end(pattern, i)
+            elif c == "(":
+                literals.append("".join(current))
+                current = []
+                depth = 0
+                while i < n:
+                    if pattern[i] == "\\":
+                        i += 1
+                    elif pattern[i] == "[":
+                        # 字符集中的括号不是分组的一部分
+                        i = TrigramIndex.class_end(pattern, i)
+                    elif pattern[i] == "(":
+                        depth += 1
+                    elif pattern[i] == ")":
+                        depth -= 1
+                        if depth == 0:
+                            break
+                    i += 1
+            elif c in ".^$)+":
+                # + 之前的字符至少出现一次，但与后面的字符不一定相邻
+                literals.append("".join(current))
+                current = []
+            else:
+                current.append(c)
+            i += 1
+        literals.append("".join(current))
+        return [literal for literal in literals if literal]
+    
+    @staticmethod
+    def class_end(pattern, i):
+        """pattern[i]为[时，返回字符集结尾]的位置，没有结尾时返回len(pattern)"""
+        end = i + 1
+        if pattern.startswith("^", end):
+            end += 1
+        if pattern.startswith("]", end):
+            end += 1
+        while end < len(pattern) and pattern[end] != "]":
+            end += 2 if pattern[end] == "\\" else 1
+        return end
+    
+    def query_trigrams(self, query, regex=False, case_sensitive=False):
+        """查询要求的三元组集合，查询中没有3字节以上的字面量时为空集合"""
+        wanted = set()
+        for literal in (self.regex_literals(query) if regex else [query]):
+            grams = self.trigrams(literal.encode('utf-8', errors='surrogatepass').lower())
+            if not case_sensitive:
+                # 非ASCII字母的大小写在文件中可能是不同的字节
+                grams = {gram for gram in grams if not gram & self.NON_ASCII}
+                if not query.isascii():
+                    # 按字符串匹配时i k s还与İ ı K ſ等非ASCII字符相互匹配
+                    grams = {gram for gram in grams if not self.UNICODE_FOLDS.intersection(
+                        gram.to_bytes(4, sys.byteorder)[:3])}
+            wanted |= grams
+        return wanted
+    
+    @classmethod
+    def index_batch(cls, root, base, rel_paths):
+        """在子进程中读取一批文件并提取三元组
+
+        第i个文件的编号为base + i，返回(base, {三元组: 这批中包含它的文件}, [(编号, 修改时间ns, 大小, 状态), ...])，
+        无法读取的文件状态为None。包含某个三元组的文件较少时为文件编号数组的字节，
+        否则为这批文件的位图（第i位对应第i个文件）。
+        """
+        # 三元组 -> 文件序号列表，用map在C中逐个追加，比Python循环快一倍
+        postings = defaultdict(list)
+        lookup = postings.__getitem__
+        append = list.append
+        metas = []
+        for i, rel_path in enumerate(rel_paths):
+            fid = base + i
+            try:
+                with open(os.path.join(root, rel_path), 'rb') as f:
+                    stat = os.fstat(f.fileno())
+                    if stat.st_size > cls.MAX_FILE_BYTES:
+                        metas.append((fid, stat.st_mtime_ns, stat.st_size, cls.LARGE))
+                        continue
+                    data = f.read()
+            except OSError:
+                metas.append((fid, 0, 0, None))
+                continue
+            if b"\0" in data[:FileSearcher.BINARY_SNIFF_BYTES]:
+                metas.append((fid, stat.st_mtime_ns, stat.st_size, cls.BINARY))
+                continue
+            deque(map(append, map(lookup, cls.trigrams(data.lower())), repeat(i)), maxlen=0)
+            metas.append((fid, stat.st_mtime_ns, stat.st_size, cls.INDEXED))
+        dense = max(8, len(rel_paths) // cls.DENSE_RATIO)
+        result = {}
+        for gram, indexes in postings.items():
+            if len(indexes) < dense:
+                result[gram] = array('I', [base + i for i in indexes]).tobytes()
+            else:
+                # 先写入每个文件一字节的数组，再整体转换为位图
+                flags = bytearray(len(rel_paths))
+                deque(map(flags.__setitem__, indexes, repeat(1)), maxlen=0)
+                result[gram] = int(flags[::-1].translate(cls.BINARY_DIGITS), 2)
+        return base, result, metas
+    
+    def allocate(self, rel_path):
+        """为新增或修改的文件分配新编号，旧编号标记为无效，调用方需持有锁
+
+        连续调用分配的编号是连续的，index_batch依赖这一点。
+        """
+        self.remove(rel_path)
+        fid = len(self.files)
+        self.files.append((rel_path, -1, -1, self.PENDING))
+        self.ids[rel_path] = fid
+        self.unindexed.add(fid)
+        return fid
+    
+    def remove(self, rel_path):
+        """调用方需持有锁"""
+        fid = self.ids.pop(rel_path, None)
+        if fid is not None:
+            self.files[fid] = None
+            self.unindexed.discard(fid)
+            self.dead += 1
+    
+    def remove_prefix(self, prefix):
+        """删除目录下的所有文件，调用方需持有锁"""
+        for rel_path in [rel_path for rel_path in self.ids if rel_path.startswith(prefix)]:
+            self.remove(rel_path)
+    
+    def add_batch(self, base, postings, metas):
+        """记录index_batch的结果，倒排表在merge_pending中更新，调用方需持有锁"""
+        pending = self.pending
+        for gram, ids in postings.items():
+            pending[gram].append((base, ids))
+        for fid, mtime, size, state in metas:
+            info = self.files[fid]
+            if info is None:
+                # 读取期间已被删除
+                continue
+            if state is None:
+                self.remove(info[0])
+                continue
+            self.files[fid] = (info[0], mtime, size, state)
+            if state != self.LARGE:
+                self.unindexed.discard(fid)
+    
+    def merge_pending(self):
+        """把add_batch记录的各批结果合并到倒排表，调用方需持有锁
+
+        合并后文件数超过阈值的三元组使用整个索引的位图，每批的位图直接按字节写入对应位置；
+        其余的三元组使用编号数组。大多数三元组每批的形式与合并后的形式相同，不需要逐个处理文件编号。
+        """
+        if not self.pending:
+            return
+        nbytes = (len(self.files) + 7) // 8
+        threshold = max(64, len(self.files) // self.DENSE_RATIO)
+        for gram, chunks in self.pending.items():
+            ids = self.postings.get(gram)
+            if type(ids) is not int:
+                total = len(ids) if ids is not None else 0
+                for base, part in chunks:
+                    total += part.bit_count() if type(part) is int else len(part) // 4
+                if total <= threshold:
+                    if ids is None:
+                        ids = self.postings[gram] = array('I')
+                    for base, part in chunks:
+                        if type(part) is int:
+                            while part:
+                                low = part & -part
+                                ids.append(base + low.bit_length() - 1)
+                                part ^= low
+                        else:
+                            ids.frombytes(part)
+                    continue
+            buffer = bytearray(ids.to_bytes(nbytes, 'little') if type(ids) is int else nbytes)
+            arrays = [array('I', part) for base, part in chunks if type(part) is not int]
+            if ids is not None and type(ids) is not int:
+                arrays.append(ids)
+            for fids in arrays:
+                for fid in fids:
+                    buffer[fid >> 3] |= 1 << (fid & 7)
+            for base, part in chunks:
+                if type(part) is int:
+                    start = base >> 3
+                    part <<= base & 7
+                    end = start + (part.bit_length() + 7) // 8
+                    buffer[start:end] = (int.from_bytes(buffer[start:end], 'little') | part).to_bytes(end - start, 'little')
+            self.postings[gram] = int.from_bytes(buffer, 'little')
+        self.pending = defaultdict(list)
+    
+    def candidate_ids(self, wanted):
+        """包含所有三元组的文件编号集合（可能含有无效编号），不含总是作为候选的编号，调用方需持有锁"""
+        self.merge_pending()
+        lists = []
+        for gram in wanted:
+            ids = self.postings.get(gram)
+            if ids is None:
+                return set()
+            lists.append(ids)
+        arrays = sorted((ids for ids in lists if type(ids) is not int), key=len)
+        bitmaps = [ids for ids in lists if type(ids) is int]
+        mask = reduce(and_, bitmaps).to_bytes((len(self.files) + 7) // 8, 'little') if bitmaps else None
+        if arrays:
+            found = set(arrays[0])
+            for ids in arrays[1:]:
+                if not found:
+                    break
+                found.intersection_update(ids)
+            if mask is not None:
+                found = {fid for fid in found if mask[fid >> 3] >> (fid & 7) & 1}
+            return found
+        found = set()
+        for match in self.NONZERO_BYTE.finditer(mask):
+            byte = mask[match.start()]
+            base = match.start() << 3
+            while byte:
+                low = byte & -byte
+                found.add(base + low.bit_length() - 1)
+                byte ^= low
+        return found
+    
+    def candidates(self, query, regex=False, case_sensitive=False):
+        """可能匹配的文件编号集合，查询中没有足够长的字面量时返回None（需要查找所有文件）"""
+        wanted = self.query_trigrams(query, regex, case_sensitive)
+        if not wanted:
+            return None
+        with self.lock:
+            return self.candidate_ids(wanted) | self.unindexed
+    
+    def save(self, path):
+        """原子写入索引文件"""
+        with self.lock:
+            self.merge_pending()
+            data = marshal.dumps({
+                "version": self.VERSION, "byteorder": sys.byteorder, "root": self.root, "key": self.key,
+                "files": self.files, "unindexed": list(self.unindexed),
+                "postings": {gram: ids if type(ids) is int else ids.tobytes() for gram, ids in self.postings.items()},
+            })
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        FileSaveTask.write_atomic(path, data)
+        return len(data)
+    
+    @classmethod
+    def load(cls, path, root, key, matcher=None):
+        """读取索引文件，不存在、损坏或与工作区和排除规则不符时返回None"""
+        try:
+            # marshal.load直接读取文件对象时慢得多
+            with open(path, 'rb') as f:
+                data = marshal.loads(f.read())
+            if (data["version"] != cls.VERSION or data["byteorder"] != sys.byteorder
+                    or data["root"] != root or data["key"] != key):
+                return None
+            index = cls(root, key, matcher)
+            index.files = data["files"]
+            index.unindexed = set(data["unindexed"])
+            index.postings = {gram: ids if type(ids) is int else array('I', ids)
+                              for gram, ids in data["postings"].items()}
+        except (OSError, EOFError, ValueError, TypeError, KeyError):
+            return None
+        index.ids = {info[0]: fid for fid, info in enumerate(index.files) if info is not None}
+        index.dead = len(index.files) - len(index.ids)
+        return index
+
+
+class TrigramIndexSignals(QObject):
+    """三元组索引任务信号"""
+    finished = pyqtSignal(int, object, str)  # 序号, TrigramIndex（失败时为None）, 说明或错误信息
+
+
+class TrigramIndexTask(QRunnable):
+    """在后台加载、核对并更新三元组索引，完成后保存到缓存目录
+
+    paths为None时遍历整个工作区，与索引中记录的修改时间和大小对比，找出新增、修改和删除的文件；
+    否则只更新给定的文件（资源管理器监视到的变化、保存的文件和查找时发现已修改的文件）。
+    读取文件和提取三元组在查找使用的进程池中执行。
+    """
+    BATCH_FILES = 512
+    
+    def __init__(self, executor, workers, root, matcher, serial, signals, index=None, paths=None):
+        super().__init__()
+        self.executor = executor
+        self.max_pending = workers * 2
+        self.root = root
+        self.matcher = matcher
+        self.serial = serial
+        self.signals = signals
+        self.index = index
+        self.paths = paths
+        self.index_file = TrigramIndex.index_path(root)
+        self.cancelled = False
+    
+    def run(self):
+        try:
+            index, message = self.update()
+        except OSError as e:
+            self.signals.finished.emit(self.serial, None, e.strerror or str(e))
+            return
+        except Exception as e:
+            # 进程池异常退出（BrokenProcessPool）等
+            self.signals.finished.emit(self.serial, None, str(e) or type(e).__name__)
+            return
+        if not self.cancelled:
+            self.signals.finished.emit(self.serial, index, message)
+    
+    def update(self):
+        """返回(索引, 说明)，取消时索引为None"""
+        start = time.perf_counter()
+        key = TrigramIndex.matcher_key(self.matcher)
+        index = self.index
+        if index is None:
+            index = TrigramIndex.load(self.index_file, self.root, key, self.matcher)
+            if index is None:
+                index = TrigramIndex(self.root, key, self.matcher)
+        if self.paths is None:
+            changed, removed = self.scan(index)
+            if changed is None:
+                return None, ""
+            if index.dead + len(removed) > len(index.files) * TrigramIndex.REBUILD_RATIO:
+                with index.lock:
+                    changed = list(set(changed).union(index.ids).difference(removed))
+                index = TrigramIndex(self.root, key, self.matcher)
+                removed = []
+        else:
+            changed = [rel_path for rel_path in self.paths if os.path.isfile(os.path.join(self.root, rel_path))]
+            removed = [rel_path for rel_path in self.paths if rel_path not in changed]
+        with index.lock:
+            for rel_path in removed:
+                index.remove(rel_path)
+            items = [(index.allocate(rel_path), rel_path) for rel_path in changed]
+        
+        pending = set()
+        for i in range(0, len(items), self.BATCH_FILES):
+            if self.cancelled:
+                break
+            batch = items[i:i + self.BATCH_FILES]
+            pending.add(self.executor.submit(TrigramIndex.index_batch, self.root, batch[0][0],
+                                             [rel_path for fid, rel_path in batch]))
+            while len(pending) >= self.max_pending and not self.cancelled:
+                pending = self.collect(index, pending)
+        while pending and not self.cancelled:
+            pending = self.collect(index, pending)
+        for future in pending:
+            future.cancel()
+        if self.cancelled:
+            return None, ""
+        size = index.save(self.index_file)
+        elapsed = time.perf_counter() - start
+        return index, (f"三元组索引: {len(index.ids)} 个文件，更新 {len(changed)} 个，删除 {len(removed)} 个，"
+                       f"{size / 1048576:.1f} MB，{elapsed:.2f} s")
+    
+    def scan(self, index):
+        """遍历工作区，返回(需要重新读取的相对路径, 已删除的相对路径)，取消时返回(None, None)"""
+        changed = []
+        seen = set()
+        for rel_path in FileIndexTask.walk(self.root, self.matcher):
+            if self.cancelled:
+                return None, None
+            seen.add(rel_path)
+            fid = index.ids.get(rel_path)
+            info = index.files[fid] if fid is not None else None
+            if info is None:
+                changed.append(rel_path)
+                continue
+            try:
+                stat = os.stat(os.path.join(self.root, rel_path))
+            except OSError:
+                continue
+            if (info[1], info[2]) != (stat.st_mtime_ns, stat.st_size):
+                changed.append(rel_path)
+        with index.lock:
+            removed = [rel_path for rel_path in index.ids if rel_path not in seen]
+        return changed, removed
+    
+    def collect(self, index, pending):
+        """等待至少一个批次完成并合并到索引，返回仍在执行的批次"""
+        done, pending = futures_wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+        for future in done:
+            base, bitmaps, metas = future.result()
+            with index.lock:
+                index.add_batch(base, bitmaps, metas)
+        return pending
+
+
+class FindSignals(QObject):
+    """在文件中查找任务信号"""
+    results = pyqtSignal(int, object)  # 序号, (FileSearcher.search_batch的返回值)
+    finished = pyqtSignal(int, str)  # 序号, 错误信息
+
+
+class FindInFilesTask(QRunnable):
+    """遍历工作区并把文件分批交给进程池查找
+
+    在后台线程中遍历，同时等待已提交的批次完成并发出结果；
+    正在执行的批次不超过进程数的几倍，遍历不会远远领先于查找。
+    给出三元组索引时只查找可能匹配的文件：索引中没有的文件、修改时间或大小与索引不符的文件
+    （记录在stale中，查找后更新索引）也会查找，所以索引过时不会漏掉结果。
+    候选集合在遍历开始前取得，之后索引的文件（修改过的文件总是分配新编号）不在其中，编号不小于
+    candidate_limit的文件都会查找。
+    """
+    BATCH_FILES = 64
+    
+    def __init__(self, executor, workers, root, matcher, query, regex, case_sensitive, serial, signals,
+                 trigram_index=None):
+        super().__init__()
+        self.executor = executor
+        self.max_pending = workers * 4
+        self.root = root
+        self.matcher = matcher
+        self.args = (query, regex, case_sensitive)
+        self.serial = serial
+        self.signals = signals
+        self.trigram_index = trigram_index
+        self.index_skipped = 0
+        self.stale = []
+        self.candidate_limit = 0  # 取得候选集合前索引中的文件编号数
+        self.cancelled = False
+    
+    def needs_search(self, rel_path, candidates):
+        """根据三元组索引判断文件是否可能匹配"""
+        index = self.trigram_index
+        fid = index.ids.get(rel_path)
+        info = index.files[fid] if fid is not None else None
+        if info is None:
+            self.stale.append(rel_path)
+            return True
+        if info[3] == TrigramIndex.PENDING:
+            # 正在建立索引
+            return True
+        try:
+            stat = os.stat(os.path.join(self.root, rel_path))
+        except OSError:
+            return True
+        if (info[1], info[2]) != (stat.st_mtime_ns, stat.st_size):
+            self.stale.append(rel_path)
+            return True
+        if fid in candidates or fid >= self.candidate_limit:
+            return True
+        self.index_skipped += 1
+        return False
+    
+    def run(self):
+        pending = set()
+        error = ""
+        try:
+            candidates = None
+            if self.trigram_index is not None:
+                # 先记录编号数，之后分配的编号即使在取得候选集合前已建立索引也会查找
+                self.candidate_limit = len(self.trigram_index.files)
+                candidates = self.trigram_index.candidates(*self.args)
+            batch = []
+            for rel_path in FileIndexTask.walk(self.root, self.matcher):
+                if self.cancelled:
+                    break
+                if candidates is not None and not self.needs_search(rel_path, candidates):
+                    continue
+                batch.append(rel_path)
+                if len(batch) >= self.BATCH_FILES:
+                    pending.add(self.executor.submit(FileSearcher.search_batch, self.root, batch, *self.args))
+                    batch = []
+                    while len(pending) >= self.max_pending and not self.cancelled:
+                        pending = self.collect(pending)
+            if batch and not self.cancelled:
+                pending.add(self.executor.submit(FileSearcher.search_batch, self.root, batch, *self.args))
+            while pending and not self.cancelled:
+                pending = self.collect(pending)
+        except OSError as e:
+            error = e.strerror or str(e)
+        except Exception as e:
+            # 进程池异常退出（BrokenProcessPool）等
+            error = str(e) or type(e).__name__
+        for future in pending:
+            future.cancel()
+        self.signals.finished.emit(self.serial, error)
+    
+    def collect(self, pending):
+        """等待至少一个批次完成并发出结果，返回仍在执行的批次"""
+        done, pending = futures_wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+        for future in done:
+            if not self.cancelled:
+                self.signals.results.emit(self.serial, future.result())
+        return pending
+
+
+class FindInFilesPanel(QWidget):
+    """在文件中查找面板
+
+    结果按文件分组，随着各批次完成逐步加入；双击结果在对应行打开文件。
+    进程池在第一次查找时创建并保留，之后的查找不再需要启动进程。
+    """
+    # 最多显示的匹配行数，超过后停止查找
+    MAX_RESULTS = 20000
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.parent_ide = parent
+        self.executor = None
+        self.workers = max(1, min(8, (os.cpu_count() or 2) - 1))
+        self.task_pool = QThreadPool(self)
+        self.task_pool.setMaxThreadCount(1)
+        self.signals = FindSignals(self)
+        self.signals.results.connect(self.on_results)
+        self.signals.finished.connect(self.on_finished)
+        self.serial = count(1)
+        self.task = None
+        self.started = 0
+        self.searched = 0
+        self.skipped = 0
+        self.index_skipped = 0
+        self.match_count = 0
         self.initUI()
-        self.start_process()
     
     def initUI(self):
-        """初始化终端界面"""
-        self.layout = QVBoxLayout(self)
-        
-        # 终端输出显示 - 只读
-        self.output = QPlainTextEdit()
-        self.output.setReadOnly(True)  # 输出区域只读，用户不能编辑历史内容
-        self.output.setStyleSheet("background-color: black; color: white; font-family: Consolas, monospace;")
-        self.output.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)  # 不自动换行
-        self.layout.addWidget(self.output)
-        
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(2)
+        
+        query_layout = QHBoxLayout()
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("在文件中查找")
+        self.query_edit.returnPressed.connect(self.start_search)
+        query_layout.addWidget(self.query_edit)
+        self.regex_check = QCheckBox("正则表达式")
+        query_layout.addWidget(self.regex_check)
+        self.case_check = QCheckBox("区分大小写")
+        query_layout.addWidget(self.case_check)
+        self.search_btn = QPushButton("查找")
+        self.search_btn.clicked.connect(self.start_search)
+        query_layout.addWidget(self.search_btn)
+        self.stop_btn = QPushButton("停止")
+        self.stop_btn.setEnabled(False)
+        self.stop_btn.clicked.connect(self.stop_search)
+        query_layout.addWidget(self.stop_btn)
+        layout.addLayout(query_layout)
+        
+        self.result_tree = QTreeWidget()
+        self.result_tree.setHeaderHidden(True)
+        self.result_tree.setUniformRowHeights(True)
+        self.result_tree.setStyleSheet("font-family: Consolas, monospace;")
+        self.result_tree.itemActivated.connect(self.on_item_activated)
+        layout.addWidget(self.result_tree)
+        
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+    
+    def get_executor(self):
+        """使用spawn方式启动子进程，不复制GUI进程的线程和Qt状态"""
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self.executor
+    
+    def start_search(self):
+        """取消正在进行的查找，开始新的查找"""
+        query = self.query_edit.text()
+        if not query:
+            return
+        regex = self.regex_check.isChecked()
+        case_sensitive = self.case_check.isChecked()
+        try:
+            FileSearcher.compile(query, regex, case_sensitive)
+        except re.error as e:
+            self.status_label.setText(f"正则表达式错误: {e}")
+            return
+        self.stop_search()
+        self.result_tree.clear()
+        self.searched = 0
+        self.skipped = 0
+        self.index_skipped = 0
+        self.match_count = 0
+        root = self.parent_ide.quick_open_root()
+        trigram_index = self.parent_ide.trigram_index
+        if trigram_index is not None and trigram_index.root != root:
+            trigram_index = None
+        self.task = FindInFilesTask(self.get_executor(), self.workers, root, self.parent_ide.workspace_matcher(root),
+                                    query, regex, case_sensitive, next(self.serial), self.signals, trigram_index)
+        self.started = time.perf_counter()
+        self.stop_btn.setEnabled(True)
+        self.status_label.setText(f"正在查找: {root}")
+        self.task_pool.start(self.task)
+    
+    def stop_search(self):
+        if self.task is not None:
+            self.task.cancelled = True
+            self.task = None
+            self.stop_btn.setEnabled(False)
+            self.update_status("已停止")
+    
+    def shutdown(self):
+        """停止查找并关闭进程池"""
+        self.stop_search()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+    
+    def on_results(self, serial, batch):
+        """一个批次完成，匹配的文件加入结果树"""
+        if self.task is None or serial != self.task.serial:
+            return
+        results, searched, skipped = batch
+        self.searched += searched
+        self.skipped += skipped
+        self.index_skipped = self.task.index_skipped
+        root = self.task.root
+        items = []
+        for rel_path, matches, truncated in results:
+            full_path = os.path.join(root, *rel_path.split("/"))
+            label = f"{rel_path}  ({len(matches)}{'+' if truncated else ''})"
+            file_item = QTreeWidgetItem([label])
+            file_item.setData(0, Qt.ItemDataRole.UserRole, (full_path, matches[0][0], matches[0][1]))
+            file_item.addChildren([self.match_item(full_path, line, col, text) for line, col, text in matches])
+            items.append(file_item)
+            self.match_count += len(matches)
+        self.result_tree.addTopLevelItems(items)
+        for item in items:
+            item.setExpanded(True)
+        if self.match_count >= self.MAX_RESULTS:
+            self.stop_search()
+            self.update_status(f"结果超过 {self.MAX_RESULTS} 行，已停止")
+        else:
+            self.update_status("正在查找...")
+    
+    @staticmethod
+    def match_item(full_path, line, col, text):
+        item = QTreeWidgetItem([f"{line}: {text}"])
+        item.setData(0, Qt.ItemDataRole.UserRole, (full_path, line, col))
+        return item
+    
+    def on_finished(self, serial, error):
+        if self.task is None or serial != self.task.serial:
+            return
+        task = self.task
+        self.task = None
+        self.index_skipped = task.index_skipped
+        self.stop_btn.setEnabled(False)
+        self.update_status(f"查找失败: {error}" if error else "完成")
+        if task.stale:
+            # 索引中没有或已修改的文件
+            self.parent_ide.update_trigram_index(task.stale)
+    
+    def update_status(self, state):
+        elapsed = time.perf_counter() - self.started
+        index_note = f"，索引排除 {self.index_skipped} 个文件" if self.index_skipped else ""
+        self.status_label.setText(
+            f"{state}：{self.result_tree.topLevelItemCount()} 个文件中 {self.match_count} 处匹配，"
+            f"已查找 {self.searched} 个文件，跳过 {self.skipped} 个二进制文件{index_note}，{elapsed:.2f} s")
+    
+    def on_item_activated(self, item, column):
+        """在匹配所在的行打开文件"""
+        location = item.data(0, Qt.ItemDataRole.UserRole)
+        if location is not None:
+            self.parent_ide.open_search_result(*location)
+
+
+class TerminalDecoder:
+    """终端输出流的增量解码器，每个输出流一个实例
+
+    多字节字符被数据块切开时，不完整的字节由codecs的增量解码器保留到下一块，不需要重新读取。
+    errors为"gbk"时（默认）按行回退：整行按encoding无法解码时改用GBK解码（Windows控制台程序的默认编码），
+    没有换行的末尾部分一旦按某种编码显示，这一行的其余部分也使用同一编码，
+    避免一行被切开后两部分分别被识别为不同编码；其他errors值直接交给增量解码器处理。
+    """
+    FALLBACK = "gbk"
+    # 包含无法解码字节（surrogateescape转义后的U+DC80-U+DCFF）的连续行
+    ESCAPED = re.compile("[\udc80-\udcff]")
+    ESCAPED_LINES = re.compile("^(?:[^\n]*[\udc80-\udcff][^\n]*(?:\n|\\Z))+", re.MULTILINE)
+    NON_ASCII = re.compile(rb"[\x80-\xff]")
+    # 末尾未确定编码的部分最多保留的字节数
+    MAX_HELD_BYTES = 4096
+
+    def __init__(self, encoding="utf-8", errors=FALLBACK):
+        self.encoding = codecs.lookup(encoding).name
+        self.fallback = errors == self.FALLBACK
+        self.decoder = codecs.getincrementaldecoder(self.encoding)("strict" if self.fallback else errors)
+        self.line_decoders = {
+            self.encoding: codecs.getincrementaldecoder(self.encoding)("replace"),
+            self.FALLBACK: codecs.getincrementaldecoder(self.FALLBACK)("replace"),
+        }
+        self.line_decoder = None  # 末尾未结束的行已确定的编码
+        self.pending = b""  # 末尾未确定编码的字节
+
+    def decode(self, data, final=False):
+        """解码一个数据块，final为True时输出所有保留的字节"""
+        if not self.fallback:
+            return self.decoder.decode(data, final)
+        if self.pending:
+            data = self.pending + data
+            self.pending = b""
+        parts = []
+        if self.line_decoder is not None:
+            end = data.find(b"\n") + 1
+            if not end and not final:
+                return self.line_decoder.decode(data)
+            end = end or len(data)
+            parts.append(self.line_decoder.decode(data[:end], True))
+            self.line_decoder.reset()
+            self.line_decoder = None
+            data = data[end:]
+        cut = len(data) if final else data.rfind(b"\n") + 1
+        parts.append(self.decode_lines(data[:cut]))
+        if cut < len(data):
+            parts.append(self.decode_tail(data[cut:]))
+        return "".join(parts)
+
+    def decode_lines(self, data):
+        """解码完整的行，无法按encoding解码的行改用GBK"""
+        text = data.decode(self.encoding, "surrogateescape")
+        if not self.ESCAPED.search(text):
+            return text
+        return self.ESCAPED_LINES.sub(self.decode_escaped, text)
+
+    def decode_escaped(self, match):
+        return match.group().encode(self.encoding, "surrogateescape").decode(self.FALLBACK, "replace")
+
+    def decode_tail(self, tail):
+        """解码末尾没有换行的部分
+
+        第一个非ASCII字节起的部分在能确定编码前保留：出现按encoding无法解码的字节时确定为GBK，
+        否则等到换行、超过MAX_HELD_BYTES或调用flush()时再确定（单个字符常常两种编码都合法）。
+        """
+        match = self.NON_ASCII.search(tail)
+        if match is None:
+            return tail.decode(self.encoding)
+        text = tail[:match.start()].decode(self.encoding)
+        held = tail[match.start():]
+        try:
+            self.decoder.decode(held)
+            decided = len(held) > self.MAX_HELD_BYTES
+        except UnicodeDecodeError:
+            decided = True
+        self.decoder.reset()
+        if decided:
+            return text + self.start_line(held)
+        self.pending = held
+        return text
+
+    def start_line(self, data):
+        """按已有的字节确定末尾这一行的编码并解码"""
+        try:
+            text = self.decoder.decode(data)
+        except UnicodeDecodeError:
+            self.decoder.reset()
+            self.line_decoder = self.line_decoders[self.FALLBACK]
+            return self.line_decoder.decode(data)
+        self.line_decoder = self.line_decoders[self.encoding]
+        self.line_decoder.setstate(self.decoder.getstate())
+        self.decoder.reset()
+        return text
+
+    def flush(self):
+        """输出等待确定编码的字节（输出暂停时调用，例如没有换行的提示符）"""
+        if not self.fallback or not self.pending:
+            return ""
+        data = self.pending
+        self.pending = b""
+        return self.start_line(data)
+
+
+class TerminalScreen:
+    """终端屏幕缓冲区，解析ANSI/VT100转义序列
+
+    屏幕是rows行的网格，每行保存为文本和样式段[(起始列, 样式编号), ...]，第一段之前使用默认样式，
+    样式编号指向styles中的(前景色, 背景色, 粗体, 斜体, 下划线, 反显)。
+    移出屏幕顶部的行连同样式段放入scrolled（最多scrollback_lines行），由终端部件插入滚动历史；
+    修改过的屏幕行记录在damage中，终端部件只重绘这些行。
+    换行符同时回到行首（管道输出没有回车），宽字符按一列处理，不支持滚动区域。
+    """
+    DEFAULT_STYLE = (-1, -1, False, False, False, False)
+    # 控制字符（换行符除外），普通文本在这些之间；只查找单个字符类比带分支的正则表达式快几倍
+    CONTROL = re.compile(r"[\x00-\x09\x0b-\x1f\x7f]")
+    # 从控制字符开始的CSI、OSC、其他ESC序列或单个控制字符
+    TOKEN = re.compile(r"\x1b\[([0-?]*)[ -/]*([@-~])|\x1b\]([^\x07\x1b]*)(?:\x07|\x1b\\)"
+                       r"|\x1b[()*+#%][0-~]|\x1b[^\[\]()*+#%]|.", re.DOTALL)
+    # 末尾不完整的转义序列最多保留的字符数
+    MAX_ESCAPE = 1024
+
+    def __init__(self, rows=24, cols=80, scrollback_lines=10000):
+        self.rows = rows
+        self.cols = cols
+        self.texts = [""] * rows
+        self.runs = [[] for _ in range(rows)]
+        self.row = 0
+        self.col = 0
+        self.style = 0
+        self.styles = [self.DEFAULT_STYLE]
+        self.style_ids = {self.DEFAULT_STYLE: 0}
+        self.saved_cursor = (0, 0, 0)
+        self.main_screen = None  # 切换到备用屏幕时保存的主屏幕
+        self.scrolled = deque(maxlen=scrollback_lines or None)
+        self.scrolled_count = 0  # 上次取出后滚出屏幕的行数，可能多于scrolled中保留的行数
+        self.damage = set()
+        self.partial = ""  # 末尾不完整的转义序列
+        self.responses = []  # 需要写回进程的应答（光标位置报告等）
+        self.cwd = None  # 通过OSC 7报告的当前目录
+
+    def set_scrollback_lines(self, lines):
+        self.scrolled = deque(self.scrolled, maxlen=lines or None)
+
+    def feed(self, text):
+        """解析一段输出"""
+        if self.partial:
+            text = self.partial + text
+            self.partial = ""
+        # 换行符本身就回到行首，回车换行和单独的换行相同，去掉回车后普通文本可以成段写入
+        text = text.replace("\r\n", "\n")
+        pos = 0
+        while True:
+            control = self.CONTROL.search(text, pos)
+            if control is None:
+                break
+            start = control.start()
+            if start > pos:
+                self.write(text[pos:start])
+            match = self.TOKEN.match(text, start)
+            pos = match.end()
+            token = match.group()
+            if token == "\x1b":
+                # 转义序列可能被数据块切开，保留到下一块
+                if len(text) - start < self.MAX_ESCAPE and "\n" not in text[start:]:
+                    self.partial = text[start:]
+                    return
+            elif match.group(2) is not None:
+                self.csi(match.group(1), match.group(2))
+            elif match.group(3) is not None:
+                self.osc(match.group(3))
+            elif token[0] == "\x1b":
+                self.escape(token[1:])
+            else:
+                self.control(token)
+        if pos < len(text):
+            self.write(text[pos:])
+
+    def write(self, text):
+        """写入普通文本，换行符开始新的一行"""
+        lines = text.split("\n")
+        if lines[0]:
+            self.put(lines[0])
+        if len(lines) > self.rows and not any(self.texts[self.row + 1:]):
+            # 大量输出：光标以下都是空行时，新的行直接按行宽折行后排在光标所在行之后
+            self.append_rows(lines[1:])
+            return
+        for line in lines[1:]:
+            self.line_feed()
+            self.col = 0
+            if line:
+                self.put(line)
+
+    def append_rows(self, lines):
+        """把lines作为光标所在行之后的新行写入，超出屏幕的部分滚出顶部"""
+        cols = self.cols
+        if max(map(len, lines)) > cols:
+            lines = [line[start:start + cols] for line in lines for start in range(0, len(line) or 1, cols)]
+        # 滚出屏幕的行共用同一个只读的样式段，留在屏幕上的行在下面复制
+        texts = self.texts[:self.row + 1] + lines
+        runs = self.runs[:self.row + 1] + [((0, self.style),) if self.style else ()] * len(lines)
+        count = max(len(texts) - self.rows, 0)
+        if count:
+            if self.main_screen is None:
+                self.scrolled.extend(zip(texts[:count], runs[:count]))
+                self.scrolled_count += count
+            self.damage = {row - count for row in self.damage if row >= count}
+        first = self.row + 1 - count
+        self.row = len(texts) - count - 1
+        self.col = len(texts[-1])
+        self.texts = (texts[count:] + [""] * self.rows)[:self.rows]
+        self.runs = ([list(line_runs) for line_runs in runs[count:]] + [[] for _ in range(self.rows)])[:self.rows]
+        self.damage.update(range(max(first, 0), self.row + 1))
+
+    def put(self, text):
+        """在光标处写入不含控制字符的文本，到达行尾时折行"""
+        while text:
+            if self.col >= self.cols:
+                self.line_feed()
+                self.col = 0
+            piece = text[:self.cols - self.col]
+            text = text[len(piece):]
+            self.put_row(piece)
+
+    def put_row(self, piece):
+        row = self.row
+        line = self.texts[row]
+        col = self.col
+        end = col + len(piece)
+        runs = self.runs[row]
+        if col >= len(line):
+            if col > len(line):
+                # 光标越过行尾，中间用空格填充
+                if runs and runs[-1][1] != 0:
+                    runs.append((len(line), 0))
+                line += " " * (col - len(line))
+            if (runs[-1][1] if runs else 0) != self.style:
+                runs.append((col, self.style))
+            self.texts[row] = line + piece
+        else:
+            self.texts[row] = line[:col] + piece + line[end:]
+            self.runs[row] = self.restyle(runs, col, end, self.style)
+        self.col = end
+        self.damage.add(row)
+
+    @staticmethod
+    def style_at(runs, col):
+        style = 0
+        for start, run_style in runs:
+            if start > col:
+                break
+            style = run_style
+        return style
+
+    def restyle(self, runs, start, end, style):
+        """返回把[start, end)列设为style后的样式段"""
+        after = self.style_at(runs, end)
+        result = [run for run in runs if run[0] < start]
+        if (result[-1][1] if result else 0) != style:
+            result.append((start, style))
+        if after != style:
+            result.append((end, after))
+        result.extend(run for run in runs if run[0] > end)
+        return result
+
+    def line_feed(self):
+        if self.row >= self.rows - 1:
+            self.scroll_up(1)
+        else:
+            self.row += 1
+
+    def scroll_up(self, count):
+        """屏幕内容上移count行，主屏幕移出顶部的行放入scrolled"""
+        count = min(count, self.rows)
+        if self.main_screen is None:
+            self.scrolled.extend(zip(self.texts[:count], self.runs[:count]))
+            self.scrolled_count += count
+        del self.texts[:count]
+        del self.runs[:count]
+        self.texts.extend([""] * count)
+        self.runs.extend([] for _ in range(count))
+        self.damage = {row - count for row in self.damage if row >= count}
+        if self.main_screen is not None:
+            # 备用屏幕的行不进入滚动历史，文档中对应的行直接重绘
+            self.damage.update(range(self.rows))
+
+    def erase_row(self, row, start=0, end=None):
+        """清除一行的[start, end)列，end为None时清除到行尾"""
+        line = self.texts[row]
+        if end is None or end >= len(line):
+            self.texts[row] = line[:start]
+            self.runs[row] = [run for run in self.runs[row] if run[0] < start]
+        else:
+            self.texts[row] = line[:start] + " " * (end - start) + line[end:]
+            self.runs[row] = self.restyle(self.runs[row], start, end, 0)
+        self.damage.add(row)
+
+    def control(self, char):
+        if char == "\r":
+            self.col = 0
+        elif char == "\b":
+            self.col = max(min(self.col, self.cols - 1) - 1, 0)
+        elif char == "\t":
+            self.col = min((self.col // 8 + 1) * 8, self.cols - 1)
+        elif char in "\x0b\x0c":
+            self.line_feed()
+            self.col = 0
+
+    def escape(self, sequence):
+        if sequence == "7":
+            self.saved_cursor = (self.row, self.col, self.style)
+        elif sequence == "8":
+            self.row, self.col, self.style = self.saved_cursor
+        elif sequence == "D":
+            self.line_feed()
+        elif sequence == "E":
+            self.line_feed()
+            self.col = 0
+        elif sequence == "M":
+            if self.row > 0:
+                self.row -= 1
+            else:
+                self.insert_rows(0, 1)
+        elif sequence == "c":
+            self.style = 0
+            self.row = self.col = 0
+            for row in range(self.rows):
+                self.erase_row(row)
+
+    def csi(self, params, final):
+        private = params[:1] in ("?", ">", "<", "=") and params[:1]
+        args = [int(arg) if arg.isdigit() else 0 for arg in params.lstrip("?><=").split(";")] if params else []
+        first = args[0] if args else 0
+        count = max(first, 1)
+        if final == "m":
+            if not private:
+                self.sgr(args)
+        elif final == "A":
+            self.row = max(self.row - count, 0)
+        elif final in "Be":
+            self.row = min(self.row + count, self.rows - 1)
+        elif final in "Ca":
+            self.col = min(self.col + count, self.cols - 1)
+        elif final == "D":
+            self.col = max(min(self.col, self.cols - 1) - count, 0)
+        elif final == "E":
+            self.row = min(self.row + count, self.rows - 1)
+            self.col = 0
+        elif final == "F":
+            self.row = max(self.row - count, 0)
+            self.col = 0
+        elif final in "G`":
+            self.col = min(count - 1, self.cols - 1)
+        elif final in "Hf":
+            self.row = min(count - 1, self.rows - 1)
+            self.col = min(max(args[1] if len(args) > 1 else 1, 1) - 1, self.cols - 1)
+        elif final == "d":
+            self.row = min(count - 1, self.rows - 1)
+        elif final == "J":
+            if first == 0:
+                self.erase_row(self.row, self.col)
+                for row in range(self.row + 1, self.rows):
+                    self.erase_row(row)
+            elif first == 1:
+                for row in range(self.row):
+                    self.erase_row(row)
+                self.erase_row(self.row, 0, self.col + 1)
+            else:
+                for row in range(self.rows):
+                    self.erase_row(row)
+        elif final == "K":
+            if first == 0:
+                self.erase_row(self.row, self.col)
+            elif first == 1:
+                self.erase_row(self.row, 0, self.col + 1)
+            else:
+                self.erase_row(self.row)
+        elif final == "X":
+            self.erase_row(self.row, self.col, self.col + count)
+        elif final == "P":
+            line = self.texts[self.row]
+            self.texts[self.row] = line[:self.col] + line[self.col + count:]
+            self.runs[self.row] = [(start if start <= self.col else max(start - count, self.col), style)
+                                   for start, style in self.runs[self.row]]
+            self.damage.add(self.row)
+        elif final == "@":
+            line = self.texts[self.row]
+            if self.col < len(line):
+                self.texts[self.row] = line[:self.col] + " " * count + line[self.col:]
+                self.runs[self.row] = self.restyle([(start + count if start > self.col else start, style)
+                                                    for start, style in self.runs[self.row]],
+                                                   self.col, self.col + count, 0)
+                self.damage.add(self.row)
+        elif final == "L":
+            self.insert_rows(self.row, count)
+        elif final == "M":
+            count = min(count, self.rows - self.row)
+            del self.texts[self.row:self.row + count]
+            del self.runs[self.row:self.row + count]
+            self.texts.extend([""] * count)
+            self.runs.extend([] for _ in range(count))
+            self.damage.update(range(self.row, self.rows))
+        elif final == "S":
+            self.scroll_up(count)
+        elif final == "T":
+            self.insert_rows(0, count)
+        elif final in "hl" and private == "?":
+            for mode in args:
+                if mode in (47, 1047, 1049):
+                    self.set_alternate(final == "h")
+        elif final == "s":
+            self.saved_cursor = (self.row, self.col, self.style)
+        elif final == "u":
+            self.row, self.col, self.style = self.saved_cursor
+        elif final == "n":
+            if first == 6:
+                self.responses.append(f"\x1b[{self.row + 1};{min(self.col, self.cols - 1) + 1}R")
+            elif first == 5:
+                self.responses.append("\x1b[0n")
+        elif final == "c" and not private and first == 0:
+            self.responses.append("\x1b[?1;2c")
+
+    def insert_rows(self, row, count):
+        count = min(count, self.rows - row)
+        self.texts[row:row] = [""] * count
+        self.runs[row:row] = [[] for _ in range(count)]
+        del self.texts[self.rows:]
+        del self.runs[self.rows:]
+        self.damage.update(range(row, self.rows))
+
+    def set_alternate(self, enabled):
+        """切换备用屏幕（全屏程序使用），退出时恢复主屏幕的内容"""
+        if enabled and self.main_screen is None:
+            self.main_screen = (self.texts, self.runs, self.row, self.col)
+            self.texts = [""] * self.rows
+            self.runs = [[] for _ in range(self.rows)]
+        elif not enabled and self.main_screen is not None:
+            texts, runs, self.row, self.col = self.main_screen
+            self.main_screen = None
+            # 备用屏幕期间窗口大小可能改变
+            self.texts = (texts + [""] * self.rows)[:self.rows]
+            self.runs = (runs + [[] for _ in range(self.rows)])[:self.rows]
+            self.row = min(self.row, self.rows - 1)
+        else:
+            return
+        self.damage.update(range(self.rows))
+
+    def sgr(self, args):
+        fg, bg, bold, italic, underline, inverse = self.styles[self.style]
+        args = args or [0]
+        i = 0
+        while i < len(args):
+            arg = args[i]
+            if arg == 0:
+                fg, bg, bold, italic, underline, inverse = self.DEFAULT_STYLE
+            elif arg == 1:
+                bold = True
+            elif arg == 22:
+                bold = False
+            elif arg == 3:
+                italic = True
+            elif arg == 23:
+                italic = False
+            elif arg == 4:
+                underline = True
+            elif arg == 24:
+                underline = False
+            elif arg == 7:
+                inverse = True
+            elif arg == 27:
+                inverse = False
+            elif 30 <= arg <= 37:
+                fg = arg - 30
+            elif 90 <= arg <= 97:
+                fg = arg - 90 + 8
+            elif arg == 39:
+                fg = -1
+            elif 40 <= arg <= 47:
+                bg = arg - 40
+            elif 100 <= arg <= 107:
+                bg = arg - 100 + 8
+            elif arg == 49:
+                bg = -1
+            elif arg in (38, 48):
+                # 256色（38;5;n）和真彩色（38;2;r;g;b），真彩色加上0x1000000与调色板区分
+                color = None
+                if args[i + 1:i + 2] == [5] and i + 2 < len(args):
+                    color = args[i + 2] & 0xFF
+                    i += 2
+                elif args[i + 1:i + 2] == [2] and i + 4 < len(args):
+                    r, g, b = (value & 0xFF for value in args[i + 2:i + 5])
+                    color = 0x1000000 | r << 16 | g << 8 | b
+                    i += 4
+                if color is not None:
+                    if arg == 38:
+                        fg = color
+                    else:
+                        bg = color
+            i += 1
+        style = (fg, bg, bold, italic, underline, inverse)
+        style_id = self.style_ids.get(style)
+        if style_id is None:
+            style_id = self.style_ids[style] = len(self.styles)
+            self.styles.append(style)
+        self.style = style_id
+
+    def osc(self, payload):
+        command, _, argument = payload.partition(";")
+        if command == "7" and argument.startswith("file://"):
+            # file://主机名/路径
+            path = argument[len("file://"):]
+            slash = path.find("/")
+            if slash >= 0:
+                self.cwd = unquote(path[slash:])
+
+    def resize(self, rows, cols):
+        """改变屏幕大小，行数减少时光标以上多出的行移入滚动历史"""
+        if rows < self.rows:
+            self.scroll_up(max(self.row + 1 - rows, 0))
+            self.row = min(self.row, rows - 1)
+            del self.texts[rows:]
+            del self.runs[rows:]
+        else:
+            self.texts.extend([""] * (rows - self.rows))
+            self.runs.extend([] for _ in range(rows - self.rows))
+        self.rows = rows
+        self.cols = cols
+        self.damage = {row for row in self.damage if row < rows}
+
+    def used_rows(self):
+        """需要显示的屏幕行数：到光标所在行或最后一个非空行为止"""
+        used = self.row + 1
+        for row in range(self.rows - 1, used - 1, -1):
+            if self.texts[row]:
+                return row + 1
+        return used
+
+    def take_scrolled(self):
+        """取出上次取出后滚出屏幕的行数和保留的行"""
+        count = self.scrolled_count
+        lines = list(self.scrolled)
+        self.scrolled.clear()
+        self.scrolled_count = 0
+        return count, lines
+
+    def take_damage(self):
+        damage = self.damage
+        self.damage = set()
+        return damage
+
+
+class TerminalScrollback:
+    """终端的滚动历史
+
+    所有行以UTF-8编码、以换行符结尾连续存放在一个bytearray中，starts（array('Q')）记录每行的起始偏移，
+    只有带样式的行在styled中保存样式段。行号从终端启动时开始累计，超过max_lines行后丢弃最早的行；
+    丢弃的行超过一半时才把剩余部分整体前移，追加和丢弃都是均摊O(1)，相当于按行滚动的环形缓冲区。
+    每行只占文本的字节数加8字节偏移，查找直接在字节上进行。
+    """
+
+    def __init__(self, max_lines=100000):
+        self.max_lines = max_lines
+        self.data = bytearray()
+        self.base = 0  # data[0]的累计字节偏移
+        self.starts = array('Q')  # 每行起始的累计字节偏移，starts[0]是第dropped行
+        self.dropped = 0  # 已从starts中删除的行数
+        self.first = 0  # 保留的第一行的行号
+        self.styled = {}  # 行号到样式段
+        self.styled_lines = deque()  # styled中的行号，按顺序丢弃
+
+    def __len__(self):
+        return self.end - self.first
+
+    @property
+    def end(self):
+        """下一行的行号"""
+        return self.dropped + len(self.starts)
+
+    def nbytes(self):
+        """占用的字节数（不含样式段）"""
+        return len(self.data) + self.starts.itemsize * len(self.starts)
+
+    def append(self, lines, skipped=0):
+        """追加(文本, 样式段)行；skipped为之前已经丢失的行数，这些行只占用行号"""
+        if skipped:
+            self.reset(self.end + skipped)
+        texts = [text for text, _ in lines]
+        if not texts:
+            return
+        line = self.end
+        for i, (_, runs) in enumerate(lines):
+            if runs:
+                self.styled[line + i] = runs
+                self.styled_lines.append(line + i)
+        joined = "\n".join(texts) + "\n"
+        data = joined.encode("utf-8", "surrogatepass")
+        # 纯ASCII时字节数等于字符数，不必逐行编码
+        lengths = (len(text) + 1 for text in texts) if len(data) == len(joined) else \
+            (len(text.encode("utf-8", "surrogatepass")) + 1 for text in texts)
+        position = self.base + len(self.data)
+        self.starts.extend(accumulate(lengths, initial=position))
+        self.starts.pop()
+        self.data += data
+        if self.max_lines and len(self) > self.max_lines:
+            self.drop(len(self) - self.max_lines)
+
+    def drop(self, count):
+        """丢弃最早的count行"""
+        self.first = min(self.first + count, self.end)
+        styled = self.styled_lines
+        while styled and styled[0] < self.first:
+            del self.styled[styled.popleft()]
+        head = self.first - self.dropped
+        if head * 2 >= len(self.starts):
+            cut = self.starts[head] - self.base if head < len(self.starts) else len(self.data)
+            del self.data[:cut]
+            del self.starts[:head]
+            self.base += cut
+            self.dropped = self.first
+
+    def reset(self, line=None):
+        """丢弃所有行，line为下一行的行号（默认接着原来的行号）"""
+        line = self.end if line is None else line
+        self.data = bytearray()
+        self.base = 0
+        self.starts = array('Q')
+        self.dropped = self.first = line
+        self.styled.clear()
+        self.styled_lines.clear()
+
+    def set_max_lines(self, max_lines):
+        self.max_lines = max_lines
+        if max_lines and len(self) > max_lines:
+            self.drop(len(self) - max_lines)
+
+    def span(self, line):
+        """行号为line的行在data中的(起始, 结束)位置，不含换行符"""
+        index = line - self.dropped
+        start = self.starts[index] - self.base
+        end = self.starts[index + 1] - self.base if index + 1 < len(self.starts) else len(self.data)
+        return start, end - 1
+
+    def line(self, line):
+        """行号为line的(文本, 样式段)"""
+        start, end = self.span(line)
+        return self.data[start:end].decode("utf-8", "surrogatepass"), self.styled.get(line, ())
+
+    def offset(self, line, col):
+        """(行号, 列)在data中的位置，超出范围时取最近的一端"""
+        if line >= self.end:
+            return len(self.data)
+        start, end = self.span(max(line, self.first))
+        if line < self.first or not col:
+            return start
+        text = self.data[start:end].decode("utf-8", "surrogatepass")
+        return start + len(text[:col].encode("utf-8", "surrogatepass"))
+
+    def position(self, offset):
+        """data中的位置对应的(行号, 列)"""
+        index = bisect_right(self.starts, self.base + offset) - 1
+        start = self.starts[index] - self.base
+        return self.dropped + index, len(self.data[start:offset].decode("utf-8", "replace"))
+
+    def find(self, text, line, col, backwards=False):
+        """从(line, col)开始查找文本（区分大小写），返回匹配的(行号, 列)，没有时返回None
+
+        向下查找匹配从该位置或之后开始的，向上查找匹配在该位置之前开始的；
+        行以换行符分隔，要查找的文本不含换行符，匹配不会跨行。
+        """
+        if not len(self) or not text:
+            return None
+        needle = text.encode("utf-8", "surrogatepass")
+        first = self.span(self.first)[0]
+        position = self.offset(line, col)
+        if backwards:
+            found = self.data.rfind(needle, first, position + len(needle) - 1)
+        else:
+            found = self.data.find(needle, max(position, first))
+        return None if found == -1 else self.position(found)
+
+
+class PtyProcess(QObject):
+    """在伪终端中运行shell（Linux），提供终端部件用到的QProcess接口
+
+    子进程通过sh重定向打开伪终端的从设备，成为会话首进程后这个终端就是它的控制终端，
+    shell可以进行作业控制，Ctrl+C（写入\\x03）由终端驱动发送SIGINT给前台进程组。
+    """
+    readyRead = pyqtSignal()
+    finished = pyqtSignal(int)
+    # 每次可读通知最多读取的字节数，其余的在下一次事件循环中读取
+    READ_LIMIT = 256 * 1024
+    # 连续读取时等待新输出的最长间隔和总时间（秒）
+    READ_GAP = 0.001
+    READ_WAIT = 0.01
+
+    @staticmethod
+    def available():
+        return sys.platform.startswith("linux")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.master = None
+        self.popen = None
+        self.notifier = None
+
+    def start(self, program, arguments=(), cwd=None, env=None, rows=24, cols=80):
+        self.master, slave = os.openpty()
+        try:
+            self.set_window_size(rows, cols)
+            self.popen = subprocess.Popen(
+                ["/bin/sh", "-c", 'tty="$1"; shift; exec "$@" <"$tty" >"$tty" 2>&1', "sh",
+                 os.ttyname(slave), program, *arguments],
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                cwd=cwd, env=env, start_new_session=True)
+        finally:
+            os.close(slave)
+        os.set_blocking(self.master, False)
+        self.notifier = QSocketNotifier(self.master, QSocketNotifier.Type.Read, self)
+        self.notifier.activated.connect(self.readyRead.emit)
+
+    def set_window_size(self, rows, cols):
+        if self.master is not None:
+            import fcntl
+            import termios
+            fcntl.ioctl(self.master, termios.TIOCSWINSZ, struct.pack("HHHH", rows, cols, 0, 0))
+
+    def read_all(self):
+        """读取当前可读的输出，子进程结束（读到EOF或EIO）时发出finished
+
+        伪终端的缓冲区只有几KB，大量输出时读空后短暂等待程序继续写入，
+        间隔不超过READ_GAP、总共不超过READ_WAIT时继续读取，避免每几KB就回到事件循环一次。
+        """
+        import select
+        chunks = []
+        size = 0
+        deadline = time.monotonic() + self.READ_WAIT
+        while size < self.READ_LIMIT:
+            try:
+                data = os.read(self.master, 65536)
+            except BlockingIOError:
+                remaining = min(deadline - time.monotonic(), self.READ_GAP)
+                if remaining > 0 and select.select([self.master], [], [], remaining)[0]:
+                    continue
+                break
+            except OSError:
+                data = b""
+            if not data:
+                self.close()
+                break
+            chunks.append(data)
+            size += len(data)
+        return b"".join(chunks)
+
+    def write(self, data):
+        import select
+        while data and self.master is not None:
+            try:
+                data = data[os.write(self.master, data):]
+            except BlockingIOError:
+                select.select([], [self.master], [], 1)
+            except OSError:
+                return
+
+    def close(self):
+        if self.master is None:
+            return
+        self.notifier.setEnabled(False)
+        os.close(self.master)
+        self.master = None
+        QTimer.singleShot(0, lambda: self.finished.emit(self.popen.wait()))
+
+    def kill(self):
+        if self.popen is not None and self.popen.poll() is None:
+            self.popen.kill()
+
+    def waitForStarted(self, msecs=30000):
+        return self.popen is not None
+
+    def waitForFinished(self, msecs=30000):
+        if self.popen is None:
+            return False
+        try:
+            self.popen.wait(msecs / 1000)
+        except subprocess.TimeoutExpired:
+            return False
+        return True
+
+
+class CommandHistory:
+    """终端命令历史，按工作区分别保存，同一工作区的所有终端标签页共享
+
+    保存在用户状态目录下的JSON Lines文件中，每行一条命令，只追加写入；
+    重复的命令以最后一次为准，原来的位置标记为已删除，最多保留MAX_ENTRIES条。
+    已删除的位置多于保留的命令时整理列表并重写文件。
+    反向增量查找（Ctrl+R）与快速打开相同，在按顺序连接所有命令的字符串上从后向前rfind，
+    匹配只需二分查找所在的命令，不必逐条比较。
+    """
+    MAX_ENTRIES = 100000
+    # 已删除的位置超过这个数并且多于保留的命令时整理
+    MIN_COMPACT = 1000
+
+    def __init__(self, path=None):
+        self.path = path  # None时只保存在内存中
+        self.commands = []  # 按执行顺序，被后来的相同命令取代或超出上限的位置为None
+        self.positions = {}  # 命令到在commands中的位置
+        self.removed = 0  # commands中None的个数
+        self.oldest = 0  # commands中第一个可能保留的位置
+        self.text = ""  # 所有命令（包括已删除的）各自加上换行符后连接
+        self.tail = []  # 尚未连接到text的部分，查找时才连接
+        self.text_length = 0
+        self.starts = array('Q')  # 每个位置的命令在text中的起始位置
+        if path:
+            self.load()
+
+    @staticmethod
+    def history_path(root=None):
+        """工作区的历史文件，按根目录路径的哈希命名；没有打开工作区时使用公共的历史文件"""
+        directory = os.path.join(RecoveryIndex.state_dir(), "history")
+        if not root:
+            return os.path.join(directory, "default.jsonl")
+        name = os.path.normcase(os.path.abspath(root)).encode('utf-8', errors='surrogatepass')
+        return os.path.join(directory, hashlib.sha1(name).hexdigest()[:16] + ".jsonl")
+
+    def __len__(self):
+        return len(self.commands) - self.removed
+
+    def load(self):
+        """读取历史文件，损坏的行跳过"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError:
+            return
+        for line in lines:
+            try:
+                command = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(command, str) and command:
+                self.insert(command)
+        if self.removed > max(len(self), self.MIN_COMPACT):
+            self.compact()
+
+    def insert(self, command):
+        """在末尾加入命令，之前相同的命令标记为已删除；超出上限时删除最早的命令"""
+        old = self.positions.get(command)
+        if old is not None:
+            self.commands[old] = None
+            self.removed += 1
+        self.positions[command] = len(self.commands)
+        self.commands.append(command)
+        self.starts.append(self.text_length)
+        self.tail.append(command + "\n")
+        self.text_length += len(command) + 1
+        while len(self) > self.MAX_ENTRIES:
+            oldest = self.commands[self.oldest]
+            if oldest is not None:
+                del self.positions[oldest]
+                self.commands[self.oldest] = None
+                self.removed += 1
+            self.oldest += 1
+
+    def add(self, command):
+        """记录执行的命令并追加到历史文件"""
+        if not command or (self.commands and self.commands[-1] == command):
+            return
+        self.insert(command)
+        if self.removed > max(len(self), self.MIN_COMPACT):
+            self.compact()
+        elif self.path:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(command, ensure_ascii=False) + "\n")
+            except OSError:
+                pass
+
+    def compact(self):
+        """去掉已删除的位置，重写历史文件"""
+        commands = [command for command in self.commands if command is not None]
+        self.commands = commands
+        self.positions = {command: i for i, command in enumerate(commands)}
+        self.removed = 0
+        self.oldest = 0
+        self.text = "".join(command + "\n" for command in commands)
+        self.tail = []
+        self.text_length = len(self.text)
+        self.starts = array('Q', accumulate((len(command) + 1 for command in commands), initial=0))
+        self.starts.pop()
+        if self.path:
+            data = "".join(json.dumps(command, ensure_ascii=False) + "\n" for command in commands)
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                FileSaveTask.write_atomic(self.path, data.encode('utf-8'))
+            except OSError:
+                pass
+
+    def joined(self):
+        if self.tail:
+            self.text += "".join(self.tail)
+            self.tail = []
+        return self.text
+
+    def search(self, query, before=None):
+        """查找before之前（默认从最新的命令开始）最近的包含query的命令，返回位置，没有时返回None"""
+        if not query:
+            return None
+        text = self.joined()
+        end = len(text) if before is None or before >= len(self.starts) else self.starts[before]
+        while True:
+            found = text.rfind(query, 0, end)
+            if found == -1:
+                return None
+            index = bisect_right(self.starts, found) - 1
+            if self.commands[index] is not None:
+                return index
+            # 已删除的命令，从它之前继续查找
+            end = self.starts[index]
+
+    def previous_index(self, index):
+        """index之前最近的命令的位置，没有时返回None"""
+        for i in range(min(index, len(self.commands)) - 1, self.oldest - 1, -1):
+            if self.commands[i] is not None:
+                return i
+        return None
+
+    def next_index(self, index):
+        """index之后最近的命令的位置，没有时返回None"""
+        for i in range(max(index + 1, self.oldest), len(self.commands)):
+            if self.commands[i] is not None:
+                return i
+        return None
+
+
+class TerminalView(QAbstractScrollArea):
+    """终端输出视图
+
+    显示滚动历史TerminalScrollback中的行和屏幕TerminalScreen使用的行，行号与滚动历史相同，
+    屏幕行接在滚动历史之后。与只读查看器相同，绘制时只读取可见的行；
+    在底部时随输出滚动，否则保持查看的内容不动。支持鼠标选择、复制和查找结果高亮。
+    """
+    # 16色调色板（xterm默认颜色）
+    ANSI_COLORS = ["#000000", "#cd0000", "#00cd00", "#cdcd00", "#0000ee", "#cd00cd", "#00cdcd", "#e5e5e5",
+                   "#7f7f7f", "#ff0000", "#00ff00", "#ffff00", "#5c5cff", "#ff00ff", "#00ffff", "#ffffff"]
+    MARGIN = 4
+    
+    def __init__(self, scrollback, screen, parent=None):
+        super().__init__(parent)
+        self.scrollback = scrollback
+        self.screen = screen
+        self.screen_rows = 1  # 显示的屏幕行数
+        self.first_line = scrollback.first  # 滚动条位置0对应的行号
+        self.max_columns = 0
+        self.selection = None  # (锚点, 当前位置)，位置为(行号, 列)
+        self.highlight = None  # 查找结果(行号, 列, 长度)
+        self.colors = {}  # 颜色编号到QColor
+        self.fonts = {}  # (粗体, 斜体, 下划线)到QFont
+        self.setFocusPolicy(Qt.FocusPolicy.ClickFocus)
+        self.viewport().setCursor(Qt.CursorShape.IBeamCursor)
+    
+    @property
+    def end(self):
+        """最后一行之后的行号"""
+        return self.scrollback.end + self.screen_rows
+    
+    def line(self, line):
+        """行号为line的(文本, 样式段)，不在显示范围内时返回None"""
+        if line < self.scrollback.first:
+            return None
+        if line < self.scrollback.end:
+            return self.scrollback.line(line)
+        row = line - self.scrollback.end
+        if row < self.screen_rows:
+            return self.screen.texts[row], self.screen.runs[row]
+        return None
+    
+    def line_height(self):
+        return max(self.fontMetrics().lineSpacing(), 1)
+    
+    def char_width(self):
+        return max(self.fontMetrics().horizontalAdvance("M"), 1)
+    
+    def visible_line_count(self):
+        return max(1, self.viewport().height() // self.line_height())
+    
+    def update_lines(self, screen_rows=None):
+        """滚动历史或屏幕变化后更新滚动范围并重绘；在底部时滚动到底部，否则保持查看的行"""
+        scrollbar = self.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum()
+        top = self.first_line + scrollbar.value()
+        if screen_rows is not None:
+            self.screen_rows = screen_rows
+        self.first_line = self.scrollback.first
+        self.update_scrollbars()
+        scrollbar.setValue(scrollbar.maximum() if at_bottom else top - self.first_line)
+        self.viewport().update()
+    
+    def update_scrollbars(self):
+        visible = self.visible_line_count()
+        self.verticalScrollBar().setRange(0, max(0, self.end - self.first_line - visible))
+        self.verticalScrollBar().setPageStep(visible)
+        columns = max(1, (self.viewport().width() - self.MARGIN) // self.char_width())
+        self.horizontalScrollBar().setRange(0, max(0, self.max_columns - columns))
+        self.horizontalScrollBar().setPageStep(columns)
+    
+    def scroll_to_bottom(self):
+        self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
+    
+    def ensure_visible(self, line, col=0):
+        """滚动到显示某一行的某一列"""
+        scrollbar = self.verticalScrollBar()
+        visible = self.visible_line_count()
+        row = line - self.first_line
+        if row < scrollbar.value() or row >= scrollbar.value() + visible:
+            scrollbar.setValue(max(0, row - visible // 2))
+        columns = self.horizontalScrollBar().pageStep()
+        if col < self.horizontalScrollBar().value() or col >= self.horizontalScrollBar().value() + columns:
+            self.horizontalScrollBar().setValue(max(0, col - columns // 2))
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_scrollbars()
+    
+    def ansi_color(self, color):
+        """调色板编号（0-255）或0x1000000|RGB转换为QColor，-1（默认颜色）返回None"""
+        if color < 0:
+            return None
+        qcolor = self.colors.get(color)
+        if qcolor is not None:
+            return qcolor
+        if color >= 0x1000000:
+            qcolor = QColor((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF)
+        elif color < 16:
+            qcolor = QColor(self.ANSI_COLORS[color])
+        elif color < 232:
+            levels = (0, 95, 135, 175, 215, 255)
+            index = color - 16
+            qcolor = QColor(levels[index // 36], levels[index // 6 % 6], levels[index % 6])
+        else:
+            gray = 8 + (color - 232) * 10
+            qcolor = QColor(gray, gray, gray)
+        self.colors[color] = qcolor
+        return qcolor
+    
+    def style_font(self, bold, italic, underline):
+        font = self.fonts.get((bold, italic, underline))
+        if font is None or font.family() != self.font().family() or font.pointSize() != self.font().pointSize():
+            font = QFont(self.font())
+            font.setBold(bold)
+            font.setItalic(italic)
+            font.setUnderline(underline)
+            self.fonts[(bold, italic, underline)] = font
+        return font
+    
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        palette = self.palette()
+        foreground = palette.color(QPalette.ColorRole.Text)
+        background = palette.color(QPalette.ColorRole.Base)
+        painter.fillRect(self.viewport().rect(), background)
+        metrics = self.fontMetrics()
+        line_height = self.line_height()
+        char_width = self.char_width()
+        first = self.first_line + self.verticalScrollBar().value()
+        first_column = self.horizontalScrollBar().value()
+        columns = self.viewport().width() // char_width + 1
+        selection = self.selection_range()
+        selection_color = palette.color(QPalette.ColorRole.Highlight)
+        selection_color.setAlpha(110)
+        max_columns = self.max_columns
+        
+        # 只读取可见的行
+        for i in range(self.visible_line_count() + 1):
+            entry = self.line(first + i)
+            if entry is None:
+                break
+            text, runs = entry
+            max_columns = max(max_columns, len(text))
+            y = i * line_height
+            ends = [start for start, _ in runs[1:]] + [len(text)]
+            segments = [(0, runs[0][0] if runs else len(text), 0)] + \
+                [(start, end, style) for (start, style), end in zip(runs, ends)]
+            for start, end, style in segments:
+                start = max(start, first_column)
+                end = min(end, len(text), first_column + columns)
+                if start >= end:
+                    continue
+                fg, bg, bold, italic, underline, inverse = self.screen.styles[style]
+                pen = self.ansi_color(fg)
+                brush = self.ansi_color(bg)
+                if pen is None:
+                    pen = foreground
+                if inverse:
+                    pen, brush = background if brush is None else brush, pen
+                x = self.MARGIN + (start - first_column) * char_width
+                if brush is not None:
+                    painter.fillRect(x, y, (end - start) * char_width, line_height, brush)
+                painter.setPen(pen)
+                painter.setFont(self.style_font(bold, italic, underline))
+                painter.drawText(x, y + metrics.ascent(), text[start:end])
+            # 选中部分和查找结果覆盖在文字上
+            if selection and selection[0][0] <= first + i <= selection[1][0]:
+                start = selection[0][1] if first + i == selection[0][0] else 0
+                end = selection[1][1] if first + i == selection[1][0] else max(len(text), 1)
+                painter.fillRect(self.MARGIN + (start - first_column) * char_width, y,
+                                 (end - start) * char_width, line_height, selection_color)
+            if self.highlight and self.highlight[0] == first + i:
+                _, col, length = self.highlight
+                painter.fillRect(self.MARGIN + (col - first_column) * char_width, y,
+                                 length * char_width, line_height, QColor(255, 200, 0, 130))
+        painter.end()
+        
+        # 遇到更长的行时扩大水平滚动范围
+        if max_columns != self.max_columns:
+            self.max_columns = max_columns
+            self.update_scrollbars()
+    
+    def position_at(self, point):
+        """视口中的点对应的(行号, 列)"""
+        char_width = self.char_width()
+        line = self.first_line + self.verticalScrollBar().value() + max(0, int(point.y())) // self.line_height()
+        col = self.horizontalScrollBar().value() + max(0, int(point.x()) - self.MARGIN + char_width // 2) // char_width
+        return min(line, self.end - 1), col
+    
+    def selection_range(self):
+        """选中的范围(开始, 结束)，没有选中时返回None"""
+        if not self.selection or self.selection[0] == self.selection[1]:
+            return None
+        return tuple(sorted(self.selection))
+    
+    def selected_text(self):
+        selection = self.selection_range()
+        if not selection:
+            return ""
+        (first, start), (last, end) = selection
+        lines = []
+        for line in range(max(first, self.scrollback.first), last + 1):
+            entry = self.line(line)
+            if entry is None:
+                break
+            text = entry[0]
+            lines.append(text[start if line == first else 0:end if line == last else len(text)])
+        return "\n".join(lines)
+    
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            position = self.position_at(event.position())
+            self.selection = (position, position)
+            self.viewport().update()
+        super().mousePressEvent(event)
+    
+    def mouseMoveEvent(self, event):
+        if self.selection and event.buttons() & Qt.MouseButton.LeftButton:
+            self.selection = (self.selection[0], self.position_at(event.position()))
+            self.viewport().update()
+        super().mouseMoveEvent(event)
+    
+    def keyPressEvent(self, event):
+        modifiers = event.modifiers()
+        if event.key() == Qt.Key.Key_C and modifiers & Qt.KeyboardModifier.ControlModifier and self.selection_range():
+            QApplication.clipboard().setText(self.selected_text())
+            return
+        if event.key() == Qt.Key.Key_A and modifiers & Qt.KeyboardModifier.ControlModifier:
+            self.selection = ((self.scrollback.first, 0), (self.end - 1, len((self.line(self.end - 1) or ("",))[0])))
+            self.viewport().update()
+            return
+        # 其他按键交给终端部件，焦点回到输入框
+        event.ignore()
+    
+    def find(self, text, line, col, backwards=False):
+        """从(line, col)开始在滚动历史和屏幕行中查找文本，返回匹配的(行号, 列)，没有时返回None
+
+        向下查找匹配从该位置或之后开始的，向上查找匹配在该位置之前开始的。
+        """
+        scrollback = self.scrollback
+        end = scrollback.end
+        screen_texts = self.screen.texts[:self.screen_rows]
+        if backwards:
+            if line >= end:
+                for row in range(min(line - end, len(screen_texts) - 1), -1, -1):
+                    limit = col + len(text) - 1 if row == line - end else len(screen_texts[row])
+                    found = screen_texts[row].rfind(text, 0, limit)
+                    if found != -1:
+                        return end + row, found
+                line, col = end, 0
+            return scrollback.find(text, line, col, True)
+        if line < end:
+            found = scrollback.find(text, line, col)
+            if found:
+                return found
+            line, col = end, 0
+        for row in range(line - end, len(screen_texts)):
+            found = screen_texts[row].find(text, col if row == line - end else 0)
+            if found != -1:
+                return end + row, found
+        return None
+    
+    def set_highlight(self, line, col, length):
+        self.highlight = (line, col, length)
+        self.ensure_visible(line, col)
+        self.viewport().update()
+
+
+class TerminalWidget(QWidget):
+    """终端部件类
+
+    Linux上shell运行在伪终端中（use_pty），程序按行输出而不是积攒成大块，shell通过OSC 7报告当前目录；
+    其他系统使用QProcess管道。进程输出先放入缓冲区，按固定帧率交给屏幕缓冲区TerminalScreen解析，
+    滚出屏幕的行放入紧凑的滚动历史TerminalScrollback（最多scrollback_lines行），
+    输出视图TerminalView只绘制可见的行；缓冲区中超出的部分在解析前直接丢弃。
+    Ctrl+F在滚动历史中查找，F3继续向上查找，Shift+F3向下查找。
+    命令历史CommandHistory由同一工作区的终端共享，上下键浏览，Ctrl+R反向增量查找。
+    """
+    # 输出刷新间隔（毫秒），约30帧每秒
+    FLUSH_INTERVAL = 33
+    # 缓冲区超过这个字符数时只保留末尾的行
+    MAX_PENDING_CHARS = 4 * 1024 * 1024
+    # 输出暂停这么久（毫秒）后，显示解码器中等待确定编码的末尾部分
+    DECODE_WAIT = 100
+    # 管道没有窗口大小，按这个列数折行
+    PIPE_COLUMNS = 65536
+    # bash每次显示提示符前通过OSC 7报告当前目录
+    REPORT_CWD_COMMAND = 'printf "\\033]7;file://%s%s\\007" "$HOSTNAME" "$PWD"'
+    
+    def __init__(self, parent=None, scrollback_lines=100000, encoding="utf-8", errors=TerminalDecoder.FALLBACK,
+                 use_pty=True, history=None):
+        super().__init__(parent)
+        self.current_dir = os.getcwd()  # 当前工作目录
+        self.history = history if history is not None else CommandHistory()  # 命令历史记录
+        self.history_index = None  # 上下键浏览到的位置，None表示新输入的命令
+        self.history_searching = False  # 是否在反向增量查找中
+        self.history_query = ""
+        self.history_match = None  # 查找到的命令的位置
+        self.history_saved = ""  # 开始查找时输入框中的内容
+        self.last_history_query = ""
+        self.scrollback_lines = scrollback_lines
+        self.encoding = encoding
+        self.errors = errors
+        # 标准输出和标准错误各自的解码器，保留被数据块切开的字符
+        self.stdout_decoder = TerminalDecoder(encoding, errors)
+        self.stderr_decoder = TerminalDecoder(encoding, errors)
+        self.decode_timer = QTimer(self)
+        self.decode_timer.setSingleShot(True)
+        self.decode_timer.setInterval(self.DECODE_WAIT)
+        self.decode_timer.timeout.connect(self.flush_decoders)
+        self.pending_output = []  # 等待解析的输出
+        self.pending_chars = 0
+        self.pending_since = 0.0  # 缓冲区中最早的输出到达的时间
+        self.use_pty = use_pty and PtyProcess.available()
+        self.screen = TerminalScreen(24, 80 if self.use_pty else self.PIPE_COLUMNS, scrollback_lines)
+        self.scrollback = TerminalScrollback(scrollback_lines)
+        self.search_text = ""
+        self.search_from = None  # 上次查找结果的(行号, 列)
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(self.FLUSH_INTERVAL)
+        self.flush_timer.timeout.connect(self.flush_output)
+        self.initUI()
+        self.start_process()
+    
+    def initUI(self):
+        """初始化终端界面"""
+        self.layout = QVBoxLayout(self)
+        
+        # 终端输出显示 - 只读
+        self.output = TerminalView(self.scrollback, self.screen)
+        self.output.setStyleSheet("background-color: black; color: white; font-family: Consolas, monospace;")
+        self.layout.addWidget(self.output)
+        
         # 命令输入区域 - 可编辑
         self.input_layout = QHBoxLayout()
         
@@ -157,166 +3297,3349 @@ class TerminalWidget(QWidget):
         self.input_line.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
         self.input_line.returnPressed.connect(self.handle_command)
         self.input_line.installEventFilter(self)
+        self.output.installEventFilter(self)  # 输出区域中也可以查找
         self.input_layout.addWidget(self.input_line, 1)  # 输入框占满剩余空间
         
         self.layout.addLayout(self.input_layout)
         
         # 显示欢迎信息和初始提示符
-        self.output.appendPlainText(f"PowerShell 终端 - 当前目录: {self.current_dir}")
-        self.output.appendPlainText("输入命令并按回车执行...")
-        self.output.appendPlainText("")
+        self.screen.feed(self.welcome_text())
+        self.render_screen()
         self.show_prompt()
+        # 伪终端中由shell自己显示提示符和回显命令
+        self.prompt_label.setVisible(not self.use_pty)
         
         # 设置焦点到输入框
         self.input_line.setFocus()
     
+    def welcome_text(self):
+        return (f"{'PowerShell' if sys.platform == 'win32' else 'bash'} 终端 - 当前目录: {self.current_dir}\n"
+                "输入命令并按回车执行...\n\n")
+    
     def show_prompt(self):
         """显示PowerShell风格的命令提示符"""
         prompt = f"PS {self.current_dir}>\ "
         self.prompt_label.setText(prompt)
     
-    def handle_command(self):
-        """处理用户输入的命令"""
-        command = self.input_line.text().strip()
-        
-        # 显示命令到输出区域
-        full_line = f"{self.prompt_label.text()}{command}"
-        self.output.appendPlainText(full_line)
-        
-        # 执行命令
-        self.send_command(command)
-        
-        # 清空输入框
-        self.input_line.clear()
-        
-        # 显示新提示符
-        self.show_prompt()
-        
-        # 滚动到底部
-        self.output.ensureCursorVisible()
+    def handle_command(self):
+        """处理用户输入的命令"""
+        command = self.input_line.text().strip()
+        
+        # 显示命令到输出区域，之前的输出先插入保证顺序
+        self.flush_output()
+        if not self.use_pty:
+            full_line = f"{self.prompt_label.text()}{command}"
+            self.screen.feed(("\n" if self.screen.col else "") + full_line + "\n")
+            self.render_screen()
+        
+        # 执行命令
+        self.send_command(command)
+        
+        # 清空输入框
+        self.input_line.clear()
+        
+        # 显示新提示符
+        self.show_prompt()
+        
+        # 滚动到底部
+        self.output.scroll_to_bottom()
+    
+    def eventFilter(self, obj, event):
+        """事件过滤器，处理命令历史导航"""
+        from PyQt6.QtCore import Qt
+        
+        if obj in (self.input_line, self.output) and event.type() == event.Type.KeyPress:
+            # 在滚动历史中查找
+            if event.key() == Qt.Key.Key_F and event.modifiers() & Qt.KeyboardModifier.ControlModifier:
+                self.prompt_search()
+                return True
+            if event.key() == Qt.Key.Key_F3:
+                self.find_next(backwards=not event.modifiers() & Qt.KeyboardModifier.ShiftModifier)
+                return True
+        
+        if obj == self.input_line and event.type() == event.Type.KeyPress:
+            if self.history_searching and self.history_search_key(event):
+                return True
+            if event.key() == Qt.Key.Key_R and event.modifiers() & Qt.KeyboardModifier.ControlModifier:
+                self.start_history_search()
+                return True
+            if event.key() == Qt.Key.Key_Up:
+                # 向上导航历史，从最新的命令开始（包括其他终端执行的命令）
+                start = len(self.history.commands) if self.history_index is None else self.history_index
+                index = self.history.previous_index(start)
+                if index is not None:
+                    self.history_index = index
+                    self.input_line.setText(self.history.commands[index])
+                    return True
+            elif event.key() == Qt.Key.Key_Down:
+                # 向下导航历史
+                index = None if self.history_index is None else self.history.next_index(self.history_index)
+                if index is not None:
+                    self.history_index = index
+                    self.input_line.setText(self.history.commands[index])
+                    return True
+                else:
+                    # 到达历史末尾，清空输入
+                    self.history_index = None
+                    self.input_line.clear()
+                    return True
+            elif self.use_pty and event.modifiers() & Qt.KeyboardModifier.ControlModifier:
+                if event.key() == Qt.Key.Key_C and not self.input_line.hasSelectedText():
+                    # 没有选中文本时中断前台程序
+                    self.process.write(b"\x03")
+                    return True
+                if event.key() == Qt.Key.Key_D and not self.input_line.text():
+                    # 输入为空时发送文件结束
+                    self.process.write(b"\x04")
+                    return True
+        
+        # 其他事件，调用默认处理
+        return super().eventFilter(obj, event)
+    
+    def start_history_search(self):
+        """开始反向增量查找命令历史（Ctrl+R）"""
+        self.history_searching = True
+        self.history_query = ""
+        self.history_match = None
+        self.history_saved = self.input_line.text()
+        self.prompt_label.setVisible(True)
+        self.search_history("")
+    
+    def history_search_key(self, event):
+        """反向增量查找中的按键，返回True表示已处理
+
+        输入的字符加入查找内容，Ctrl+R查找更早的匹配，Esc或Ctrl+G取消；
+        回车执行找到的命令，其他按键结束查找后照常处理。
+        """
+        key = event.key()
+        control = event.modifiers() & Qt.KeyboardModifier.ControlModifier
+        if key in (Qt.Key.Key_Control, Qt.Key.Key_Shift, Qt.Key.Key_Alt, Qt.Key.Key_Meta):
+            return False
+        if control and key == Qt.Key.Key_R:
+            # 查找内容为空时使用上一次的查找内容
+            self.history_query = self.history_query or self.last_history_query
+            self.search_history(self.history_query, self.history_match)
+            return True
+        if key == Qt.Key.Key_Escape or (control and key == Qt.Key.Key_G):
+            self.input_line.setText(self.history_saved)
+            self.stop_history_search()
+            return True
+        if key == Qt.Key.Key_Backspace:
+            self.history_query = self.history_query[:-1]
+            self.search_history(self.history_query)
+            return True
+        text = event.text()
+        if text and text.isprintable() and not control:
+            self.history_query += text
+            # 当前匹配的命令仍然包含新的查找内容时保持不变
+            self.search_history(self.history_query, None if self.history_match is None else self.history_match + 1)
+            return True
+        self.stop_history_search()
+        return False
+    
+    def search_history(self, query, before=None):
+        """查找before之前最近的包含query的命令，找到时显示在输入框中并选中匹配的部分"""
+        index = self.history.search(query, before)
+        if index is not None:
+            self.history_match = index
+            command = self.history.commands[index]
+            self.input_line.setText(command)
+            self.input_line.setSelection(command.rfind(query), len(query))
+        elif not query:
+            self.history_match = None
+            self.input_line.setText(self.history_saved)
+        failed = "failed " if query and index is None else ""
+        self.prompt_label.setText(f"({failed}reverse-i-search)`{query}':")
+    
+    def stop_history_search(self):
+        """结束反向增量查找，上下键从找到的命令继续浏览"""
+        self.history_searching = False
+        if self.history_query:
+            self.last_history_query = self.history_query
+        if self.history_match is not None:
+            self.history_index = self.history_match
+        self.input_line.deselect()
+        self.show_prompt()
+        self.prompt_label.setVisible(not self.use_pty)
+    
+    def set_history(self, history):
+        """改用另一个命令历史（切换工作区时）"""
+        if self.history_searching:
+            self.stop_history_search()
+        self.history = history
+        self.history_index = None
+    
+    def start_process(self):
+        """启动终端进程"""
+        if self.use_pty:
+            self.process = PtyProcess(self)
+            self.process.readyRead.connect(self.read_pty)
+            self.process.finished.connect(self.process_finished)
+            env = dict(os.environ, TERM="xterm-256color", PROMPT_COMMAND=self.REPORT_CWD_COMMAND)
+            self.process.start("bash", ["-i"], cwd=self.current_dir, env=env,
+                               rows=self.screen.rows, cols=self.screen.cols)
+            return
+        self.process = QProcess(self)
+        self.process.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
+        
+        # 连接信号
+        self.process.readyReadStandardOutput.connect(self.read_output)
+        self.process.readyReadStandardError.connect(self.read_error)
+        self.process.finished.connect(self.process_finished)
+        
+        # 启动shell - 使用NoLogo选项隐藏PowerShell启动信息
+        if sys.platform == "win32":
+            self.process.start("powershell.exe", ["-NoLogo"])
+        else:
+            self.process.start("bash")
+    
+    def read_output(self):
+        """读取标准输出"""
+        self.append_output(self.stdout_decoder.decode(self.process.readAllStandardOutput().data()))
+        if self.stdout_decoder.pending:
+            self.decode_timer.start()
+    
+    def read_error(self):
+        """读取标准错误"""
+        self.append_output(self.stderr_decoder.decode(self.process.readAllStandardError().data()))
+        if self.stderr_decoder.pending:
+            self.decode_timer.start()
+    
+    def read_pty(self):
+        """读取伪终端的输出"""
+        self.append_output(self.stdout_decoder.decode(self.process.read_all()))
+        if self.stdout_decoder.pending:
+            self.decode_timer.start()
+    
+    def flush_decoders(self):
+        """输出暂停时显示解码器中保留的末尾部分"""
+        self.append_output(self.stdout_decoder.flush() + self.stderr_decoder.flush())
+    
+    def append_output(self, text):
+        """输出放入缓冲区，在下一帧插入"""
+        if not text:
+            return
+        if not self.pending_output:
+            self.pending_since = time.monotonic()
+        self.pending_output.append(text)
+        self.pending_chars += len(text)
+        if self.pending_chars > self.MAX_PENDING_CHARS:
+            text = self.tail_lines("".join(self.pending_output))
+            self.pending_output = [text]
+            self.pending_chars = len(text)
+        if time.monotonic() - self.pending_since >= self.FLUSH_INTERVAL / 1000:
+            # 持续有输出可读时定时器可能迟迟不触发，到了一帧的时间直接插入
+            self.flush_output()
+        elif not self.flush_timer.isActive():
+            self.flush_timer.start()
+    
+    def tail_lines(self, text):
+        """只保留最后scrollback_lines行，单行过长时再按字符截断"""
+        if self.scrollback_lines and text.count("\n") > self.scrollback_lines:
+            text = "\n".join(text.rsplit("\n", self.scrollback_lines)[1:])
+        return text[-self.MAX_PENDING_CHARS:]
+    
+    def flush_output(self):
+        """把缓冲区的输出交给屏幕缓冲区解析，再更新文档"""
+        self.flush_timer.stop()
+        if self.pending_output:
+            text = "".join(self.pending_output)
+            self.pending_output = []
+            self.pending_chars = 0
+            self.screen.feed(text)
+            if self.screen.responses:
+                self.process.write("".join(self.screen.responses).encode())
+                self.screen.responses = []
+            if self.screen.cwd and self.screen.cwd != self.current_dir:
+                self.current_dir = self.screen.cwd
+                self.show_prompt()
+        self.render_screen()
+    
+    def render_screen(self):
+        """滚出屏幕的行放入滚动历史，再更新视图；视图只绘制可见的行，原来在底部时滚动到底部，否则保持查看的位置"""
+        count, lines = self.screen.take_scrolled()
+        damage = self.screen.take_damage()
+        used = self.screen.used_rows()
+        if not count and not damage and used == self.output.screen_rows:
+            return
+        # 滚出的行多于保留的行数时，之前的行已经丢弃
+        self.scrollback.append(lines, count - len(lines))
+        self.output.update_lines(used)
+    
+    def prompt_search(self):
+        """输入要查找的文本，从最新的输出开始向上查找"""
+        from PyQt6.QtWidgets import QInputDialog
+        text, ok = QInputDialog.getText(self, "在终端中查找", "查找内容（F3 继续向上查找，Shift+F3 向下查找）:",
+                                        text=self.search_text)
+        if ok and text:
+            self.search_text = text
+            self.search_from = None
+            self.find_next(backwards=True)
+    
+    def find_next(self, backwards=True):
+        """在滚动历史和屏幕中查找下一个匹配，到达一端后从另一端继续"""
+        if not self.search_text:
+            self.prompt_search()
+            return
+        self.flush_output()
+        view = self.output
+        if self.search_from is None or self.search_from[0] < self.scrollback.first:
+            line, col = (view.end, 0) if backwards else (self.scrollback.first, 0)
+        else:
+            line, col = self.search_from
+            if not backwards:
+                col += 1
+        found = view.find(self.search_text, line, col, backwards)
+        if found is None:
+            found = view.find(self.search_text, *((view.end, 0) if backwards else (self.scrollback.first, 0)),
+                              backwards)
+            if found is not None:
+                self.show_message("已到达开头，从末尾继续查找" if backwards else "已到达末尾，从开头继续查找")
+        else:
+            self.show_message("")
+        if found is None:
+            view.highlight = None
+            view.viewport().update()
+            self.show_message(f"未找到: {self.search_text}")
+            return
+        self.search_from = found
+        view.set_highlight(*found, len(self.search_text))
+    
+    def show_message(self, message):
+        window = self.window()
+        if isinstance(window, QMainWindow):
+            window.statusBar().showMessage(message)
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.use_pty:
+            self.update_window_size()
+    
+    def update_window_size(self):
+        """按输出区域的大小设置屏幕和伪终端的行列数"""
+        metrics = self.output.fontMetrics()
+        viewport = self.output.viewport()
+        cols = max(viewport.width() // max(metrics.horizontalAdvance("M"), 1), 20)
+        rows = max(viewport.height() // max(metrics.lineSpacing(), 1), 5)
+        if (rows, cols) != (self.screen.rows, self.screen.cols):
+            self.flush_output()
+            self.screen.resize(rows, cols)
+            self.process.set_window_size(rows, cols)
+            self.render_screen()
+
+    def set_scrollback_lines(self, lines):
+        self.scrollback_lines = lines
+        self.screen.set_scrollback_lines(lines)
+        self.scrollback.set_max_lines(lines)
+        self.output.update_lines()
+    
+    def set_encoding(self, encoding, errors):
+        """更换输出的编码，旧解码器保留的字节先输出"""
+        if (encoding, errors) == (self.encoding, self.errors):
+            return
+        self.append_output(self.stdout_decoder.decode(b"", True) + self.stderr_decoder.decode(b"", True))
+        self.encoding = encoding
+        self.errors = errors
+        self.stdout_decoder = TerminalDecoder(encoding, errors)
+        self.stderr_decoder = TerminalDecoder(encoding, errors)
+    
+    def send_command(self, command):
+        """发送命令"""
+        # 保存命令到历史记录，所有终端共享
+        self.history.add(command.strip())
+        self.history_index = None
+        
+        # 执行命令
+        self.process.write((command + "\n").encode())
+        self.output.scroll_to_bottom()
+        
+        # 如果是cd命令，更新当前目录（伪终端中由shell通过OSC 7报告）
+        if not self.use_pty and command.startswith("cd "):
+            # 提取目录
+            new_dir = command[3:].strip()
+            if new_dir:
+                # 处理相对路径和绝对路径
+                if os.path.isabs(new_dir):
+                    self.current_dir = new_dir
+                else:
+                    self.current_dir = os.path.abspath(os.path.join(self.current_dir, new_dir))
+                # 确保目录存在
+                if not os.path.exists(self.current_dir):
+                    self.current_dir = os.getcwd()
+    
+    def process_finished(self):
+        """进程结束处理"""
+        self.append_output(self.stdout_decoder.decode(b"", True) + self.stderr_decoder.decode(b"", True))
+        self.append_output("\nProcess finished.\n")
+        self.flush_output()
+    
+    def keyPressEvent(self, event):
+        """处理键盘事件"""
+        # 将焦点保持在输入框
+        self.input_line.setFocus()
+        super().keyPressEvent(event)
+
+
+class RunConsole(TerminalWidget):
+    """运行控制台
+
+    每次运行在单独的QProcess中启动脚本，不经过交互式shell，可以知道脚本何时结束、退出码和运行时间；
+    输出沿用终端的解码、缓冲和滚动历史，输入框中的内容发送到脚本的标准输入（输入为空时Ctrl+D关闭标准输入）。
+    支持fork的系统上由启动器LAUNCHER在新的进程组中启动脚本并用os.wait4等待，
+    结束时写出脚本的CPU时间和峰值内存（RSS）；其他系统只记录运行时间。
+    使用cProfile运行时统计结果写入临时文件，结束后和运行结果一起通过run_finished发出。
+    """
+    run_started = pyqtSignal(object)  # 运行信息
+    run_finished = pyqtSignal(object)  # 运行结果
+    # 停止后等待这么久（毫秒）仍未结束时强制结束
+    KILL_WAIT = 2000
+    # 启动器：参数为结果文件和脚本的命令行；忽略SIGTERM/SIGINT，停止时由脚本结束后写出结果
+    LAUNCHER = (
+        "import json, os, signal, sys, time\n"
+        "os.setpgid(0, 0)\n"
+        "start = time.perf_counter()\n"
+        "pid = os.fork()\n"
+        "if pid == 0:\n"
+        "    try:\n"
+        "        os.execvp(sys.argv[2], sys.argv[2:])\n"
+        "    except OSError as e:\n"
+        "        sys.stderr.write('%s: %s\\n' % (sys.argv[2], e))\n"
+        "        sys.stderr.flush()\n"
+        "        os._exit(127)\n"
+        "signal.signal(signal.SIGTERM, signal.SIG_IGN)\n"
+        "signal.signal(signal.SIGINT, signal.SIG_IGN)\n"
+        "status, usage = os.wait4(pid, 0)[1:]\n"
+        "wall = time.perf_counter() - start\n"
+        "code = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)\n"
+        "with open(sys.argv[1], 'w') as f:\n"
+        "    json.dump({'exit': code, 'wall': wall, 'user': usage.ru_utime, 'system': usage.ru_stime,\n"
+        "               'max_rss': usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)}, f)\n"
+        "sys.exit(code if code >= 0 else 128 - code)\n"
+    )
+    # cProfile运行器：参数为统计文件和脚本；python -m cProfile会吞掉SystemExit，退出码总是0，
+    # 这里像cProfile一样先编译脚本再在分析器中执行，在finally中写出统计后照常抛出，退出码和异常与直接运行相同
+    PROFILER = (
+        "import cProfile, os, sys\n"
+        "output, sys.argv = sys.argv[1], sys.argv[2:]\n"
+        "sys.path[0] = os.path.dirname(os.path.abspath(sys.argv[0]))\n"
+        "with open(sys.argv[0], 'rb') as f:\n"
+        "    code = compile(f.read(), sys.argv[0], 'exec')\n"
+        "namespace = {'__name__': '__main__', '__file__': sys.argv[0], '__package__': None,\n"
+        "             '__cached__': None, '__builtins__': __builtins__}\n"
+        "profiler = cProfile.Profile()\n"
+        "try:\n"
+        "    profiler.runctx(code, namespace, None)\n"
+        "finally:\n"
+        "    profiler.dump_stats(output)\n"
+    )
+    
+    def __init__(self, parent=None, scrollback_lines=100000, encoding="utf-8", errors=TerminalDecoder.FALLBACK):
+        self.run_info = None  # 正在运行的脚本
+        self.stats_path = None
+        self.profile_path = None
+        self.started_at = 0.0
+        self.stopping = False
+        super().__init__(parent, scrollback_lines, encoding, errors, use_pty=False)
+        self.kill_timer = QTimer(self)
+        self.kill_timer.setSingleShot(True)
+        self.kill_timer.setInterval(self.KILL_WAIT)
+        self.kill_timer.timeout.connect(self.kill_run)
+    
+    @staticmethod
+    def launcher_available():
+        return hasattr(os, "fork") and hasattr(os, "wait4")
+    
+    def welcome_text(self):
+        return "运行Python文件（F6）的输出显示在这里，输入框中的内容发送到程序的标准输入\n\n"
+    
+    def show_prompt(self):
+        self.prompt_label.setText("输入>")
+    
+    def start_process(self):
+        """同一个QProcess用于每次运行"""
+        self.process = QProcess(self)
+        self.process.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
+        self.process.readyReadStandardOutput.connect(self.read_output)
+        self.process.finished.connect(self.process_finished)
+        self.process.errorOccurred.connect(self.process_error)
+    
+    def is_running(self):
+        return self.run_info is not None
+    
+    def start_run(self, interpreter, file_path, profile=False):
+        """在单独的进程中运行脚本，返回是否已开始运行"""
+        if self.is_running():
+            return False
+        self.flush_output()
+        self.stdout_decoder = TerminalDecoder(self.encoding, self.errors)
+        self.profile_path = self.temp_path(".prof") if profile else None
+        if profile:
+            command = [interpreter, "-c", self.PROFILER, self.profile_path, file_path]
+        else:
+            command = [interpreter, file_path]
+        if self.launcher_available():
+            self.stats_path = self.temp_path(".json")
+            program, arguments = interpreter, ["-c", self.LAUNCHER, self.stats_path] + command
+        else:
+            program, arguments = interpreter, command[1:]
+        self.current_dir = os.path.dirname(os.path.abspath(file_path))
+        env = QProcessEnvironment.systemEnvironment()
+        env.insert("PYTHONUNBUFFERED", "1")  # 输出不在脚本中积攒，随时显示
+        self.process.setProcessEnvironment(env)
+        self.process.setWorkingDirectory(self.current_dir)
+        self.run_info = {"interpreter": interpreter, "file": file_path, "profile": profile}
+        self.stopping = False
+        self.screen.feed(("\n" if self.screen.col else "") + f"\x1b[1m▶ {subprocess.list2cmdline([interpreter, file_path])}"
+                         f"{'（cProfile）' if profile else ''}\x1b[0m\n")
+        self.render_screen()
+        self.output.scroll_to_bottom()
+        self.started_at = time.monotonic()
+        self.process.start(program, arguments)
+        self.run_started.emit(self.run_info)
+        return True
+    
+    @staticmethod
+    def temp_path(suffix):
+        fd, path = tempfile.mkstemp(prefix="myide-run-", suffix=suffix)
+        os.close(fd)
+        return path
+    
+    def stop(self):
+        """结束正在运行的脚本和它启动的子进程，一段时间后仍未结束时强制结束"""
+        if not self.is_running() or self.stopping:
+            return
+        self.stopping = True
+        self.signal_run(signal.SIGTERM if self.launcher_available() else None)
+        self.kill_timer.start()
+    
+    def kill_run(self):
+        if self.is_running():
+            self.signal_run(signal.SIGKILL if self.launcher_available() else None)
+    
+    def signal_run(self, signum):
+        """向启动器的进程组发送信号；启动器还没有建立进程组或不使用启动器时直接结束进程"""
+        pid = self.process.processId()
+        if signum is not None and pid > 0:
+            try:
+                os.killpg(pid, signum)
+                return
+            except OSError:
+                pass
+        self.process.kill()
+    
+    def send_command(self, command):
+        """一行输入发送到脚本的标准输入"""
+        if command.strip():
+            self.history.add(command.strip())
+        self.history_index = None
+        if self.is_running():
+            self.process.write((command + "\n").encode(self.encoding, "replace"))
+        else:
+            self.show_message("没有正在运行的程序")
+        self.output.scroll_to_bottom()
+    
+    def handle_command(self):
+        """像终端一样回显输入，接在脚本的提示后面"""
+        command = self.input_line.text()
+        self.flush_output()
+        self.screen.feed(command + "\n")
+        self.render_screen()
+        self.send_command(command)
+        self.input_line.clear()
+    
+    def eventFilter(self, obj, event):
+        if (obj == self.input_line and event.type() == event.Type.KeyPress and event.key() == Qt.Key.Key_D
+                and event.modifiers() & Qt.KeyboardModifier.ControlModifier and not self.input_line.text()):
+            # 输入为空时关闭标准输入，脚本读到文件结束
+            if self.is_running():
+                self.process.closeWriteChannel()
+            return True
+        return super().eventFilter(obj, event)
+    
+    def process_error(self, error):
+        """解释器无法启动时不会有finished信号，在这里结束运行"""
+        if error == QProcess.ProcessError.FailedToStart and self.is_running():
+            self.screen.feed(f"\x1b[31m无法启动 {self.run_info['interpreter']}: {self.process.errorString()}\x1b[0m\n")
+            self.finish_run(None, time.monotonic() - self.started_at, None)
+    
+    def process_finished(self, exit_code=0, exit_status=QProcess.ExitStatus.NormalExit):
+        """读取启动器写出的结果和cProfile统计，显示运行结果"""
+        if not self.is_running():
+            return
+        self.kill_timer.stop()
+        self.append_output(self.stdout_decoder.decode(b"", True))
+        self.flush_output()
+        stats = self.read_stats()
+        if stats is not None:
+            exit_code = stats.get("exit", exit_code)
+        elif exit_status == QProcess.ExitStatus.CrashExit:
+            exit_code = None
+        self.finish_run(exit_code, stats.get("wall") if stats else time.monotonic() - self.started_at, stats)
+    
+    def read_stats(self):
+        if not self.stats_path:
+            return None
+        try:
+            with open(self.stats_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # 启动器被强制结束，没有写出结果
+            return None
+    
+    def load_profile(self):
+        """读取cProfile的统计文件，脚本没有正常结束时可能没有统计"""
+        if not self.profile_path:
+            return None
+        try:
+            return pstats.Stats(self.profile_path).stats
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+    
+    def finish_run(self, exit_code, wall, stats):
+        result = dict(self.run_info, exit_code=exit_code, wall=wall, stopped=self.stopping,
+                      user=None, system=None, max_rss=None)
+        if stats:
+            result.update(user=stats.get("user"), system=stats.get("system"), max_rss=stats.get("max_rss"))
+        result["profile_stats"] = self.load_profile()
+        for path in (self.stats_path, self.profile_path):
+            if path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        self.stats_path = self.profile_path = None
+        self.run_info = None
+        self.stopping = False
+        color = 32 if exit_code == 0 else 31
+        self.screen.feed(("\n" if self.screen.col else "") + f"\x1b[1;{color}m{self.summary(result)}\x1b[0m\n\n")
+        self.render_screen()
+        self.run_finished.emit(result)
+    
+    @staticmethod
+    def exit_text(result):
+        exit_code = result["exit_code"]
+        if exit_code is None:
+            return "进程异常结束"
+        if exit_code < 0:
+            try:
+                name = signal.Signals(-exit_code).name
+            except ValueError:
+                name = str(-exit_code)
+            return f"进程被信号 {name} 结束"
+        return f"进程已结束，退出码 {exit_code}"
+    
+    @classmethod
+    def summary(cls, result):
+        """退出码、运行时间、CPU时间和峰值内存"""
+        parts = [("已停止，" if result["stopped"] else "") + cls.exit_text(result), f"运行时间 {result['wall']:.3f} s"]
+        if result["user"] is not None:
+            parts.append(f"CPU {result['user'] + result['system']:.3f} s"
+                         f"（用户 {result['user']:.3f} s，系统 {result['system']:.3f} s）")
+        if result["max_rss"] is not None:
+            parts.append(f"峰值内存 {result['max_rss'] / 1024 / 1024:.1f} MB")
+        return "，".join(parts)
+    
+    def shutdown(self):
+        """关闭窗口时立即结束正在运行的脚本"""
+        if self.is_running():
+            self.kill_run()
+            self.process.waitForFinished(1000)
+
+
+class ProfileTableModel(QAbstractTableModel):
+    """cProfile统计的热点函数表，每行一个函数，可以按列排序"""
+    HEADERS = ["函数", "位置", "调用次数", "自身时间 (s)", "自身 %", "累计时间 (s)", "每次调用 (ms)"]
+    # 行: (函数, 文件, 行号, 原始调用次数, 调用次数, 自身时间, 累计时间)
+    SORT_KEYS = [
+        itemgetter(0),
+        itemgetter(1, 2),
+        itemgetter(4),
+        itemgetter(5),
+        itemgetter(5),
+        itemgetter(6),
+        lambda row: row[6] / row[4] if row[4] else 0.0,
+    ]
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+        self.total_time = 0.0
+        self.sort_column = 3
+        self.sort_order = Qt.SortOrder.DescendingOrder
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+    
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+    
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        name, file_name, line, primitive_calls, calls, self_time, total_time = self.rows[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return name
+            if column == 1:
+                # 内置函数没有位置
+                return f"{os.path.basename(file_name)}:{line}" if line else ""
+            if column == 2:
+                return str(calls) if calls == primitive_calls else f"{calls}/{primitive_calls}"
+            if column == 3:
+                return f"{self_time:.4f}"
+            if column == 4:
+                return f"{self_time / self.total_time * 100:.1f}" if self.total_time else "0.0"
+            if column == 5:
+                return f"{total_time:.4f}"
+            return f"{total_time / calls * 1000:.4f}" if calls else ""
+        if role == Qt.ItemDataRole.TextAlignmentRole and column >= 2:
+            return int(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        if role == Qt.ItemDataRole.ToolTipRole and column == 1 and line:
+            return f"{file_name}:{line}"
+        return None
+    
+    def set_stats(self, stats):
+        """stats为pstats.Stats.stats: (文件, 行号, 函数) -> (原始调用次数, 调用次数, 自身时间, 累计时间, 调用者)"""
+        self.beginResetModel()
+        self.rows = [(name, file_name, line, primitive_calls, calls, self_time, total_time)
+                     for (file_name, line, name), (primitive_calls, calls, self_time, total_time, _)
+                     in (stats or {}).items()]
+        self.total_time = sum(row[5] for row in self.rows)
+        self.rows.sort(key=self.SORT_KEYS[self.sort_column], reverse=self.sort_order == Qt.SortOrder.DescendingOrder)
+        self.endResetModel()
+    
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self.sort_column = column
+        self.sort_order = order
+        self.layoutAboutToBeChanged.emit()
+        self.rows.sort(key=self.SORT_KEYS[column], reverse=order == Qt.SortOrder.DescendingOrder)
+        self.layoutChanged.emit()
+    
+    def location_at(self, row):
+        """第row行函数所在的(文件, 行号)，内置函数返回None"""
+        if 0 <= row < len(self.rows) and self.rows[row][2]:
+            return self.rows[row][1], self.rows[row][2]
+        return None
+
+
+class RunPanel(QWidget):
+    """运行面板
+
+    上方是运行状态和停止、重新运行按钮，下方是运行控制台RunConsole；
+    使用cProfile运行结束后在右侧显示热点函数表，双击跳转到函数定义的行。
+    运行中再次运行时先停止正在运行的脚本，结束后再开始。
+    """
+    
+    def __init__(self, parent=None, scrollback_lines=100000, encoding="utf-8", errors=TerminalDecoder.FALLBACK):
+        super().__init__(parent)
+        self.parent_ide = parent
+        self.last_run = None  # 上一次运行的(解释器, 文件, 是否使用cProfile)
+        self.pending_run = None  # 停止后要开始的运行
+        self.elapsed_timer = QTimer(self)
+        self.elapsed_timer.setInterval(1000)
+        self.elapsed_timer.timeout.connect(self.update_elapsed)
+        self.initUI(scrollback_lines, encoding, errors)
+    
+    def initUI(self, scrollback_lines, encoding, errors):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(2)
+        
+        bar_layout = QHBoxLayout()
+        self.status_label = QLabel("")
+        bar_layout.addWidget(self.status_label, 1)
+        self.stop_btn = QPushButton("停止")
+        self.stop_btn.setEnabled(False)
+        self.stop_btn.clicked.connect(self.stop)
+        bar_layout.addWidget(self.stop_btn)
+        self.rerun_btn = QPushButton("重新运行")
+        self.rerun_btn.setEnabled(False)
+        self.rerun_btn.clicked.connect(self.rerun)
+        bar_layout.addWidget(self.rerun_btn)
+        layout.addLayout(bar_layout)
+        
+        self.splitter = QSplitter(Qt.Orientation.Horizontal)
+        self.console = RunConsole(scrollback_lines=scrollback_lines, encoding=encoding, errors=errors)
+        self.console.run_started.connect(self.on_run_started)
+        self.console.run_finished.connect(self.on_run_finished)
+        self.splitter.addWidget(self.console)
+        
+        self.profile_widget = QWidget()
+        profile_layout = QVBoxLayout(self.profile_widget)
+        profile_layout.setContentsMargins(0, 0, 0, 0)
+        profile_layout.setSpacing(2)
+        self.profile_label = QLabel("")
+        profile_layout.addWidget(self.profile_label)
+        self.profile_model = ProfileTableModel(self)
+        self.profile_view = QTableView()
+        self.profile_view.setModel(self.profile_model)
+        self.profile_view.setStyleSheet("font-family: Consolas, monospace;")
+        self.profile_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.profile_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.profile_view.setShowGrid(False)
+        self.profile_view.setWordWrap(False)
+        self.profile_view.verticalHeader().hide()
+        self.profile_view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.profile_view.verticalHeader().setDefaultSectionSize(self.profile_view.fontMetrics().height() + 6)
+        self.profile_view.horizontalHeader().setStretchLastSection(True)
+        self.profile_view.setSortingEnabled(True)
+        self.profile_view.sortByColumn(3, Qt.SortOrder.DescendingOrder)
+        self.profile_view.doubleClicked.connect(self.jump_to_function)
+        profile_layout.addWidget(self.profile_view)
+        self.splitter.addWidget(self.profile_widget)
+        self.profile_widget.hide()
+        layout.addWidget(self.splitter)
+    
+    def run(self, interpreter, file_path, profile=False):
+        """运行脚本，正在运行时先停止"""
+        self.last_run = (interpreter, file_path, profile)
+        self.rerun_btn.setEnabled(True)
+        if self.console.is_running():
+            self.pending_run = self.last_run
+            self.console.stop()
+            return
+        self.console.start_run(interpreter, file_path, profile)
+    
+    def rerun(self):
+        if self.last_run is not None:
+            self.run(*self.last_run)
+    
+    def stop(self):
+        self.pending_run = None
+        self.console.stop()
+    
+    def on_run_started(self, info):
+        self.stop_btn.setEnabled(True)
+        mode = "使用cProfile运行" if info["profile"] else "正在运行"
+        self.status_label.setText(f"{mode}: {os.path.basename(info['file'])}")
+        self.elapsed_timer.start()
+    
+    def update_elapsed(self):
+        info = self.console.run_info
+        if info is not None:
+            mode = "使用cProfile运行" if info["profile"] else "正在运行"
+            elapsed = time.monotonic() - self.console.started_at
+            self.status_label.setText(f"{mode}: {os.path.basename(info['file'])}（已运行 {elapsed:.0f} s）")
+    
+    def on_run_finished(self, result):
+        self.elapsed_timer.stop()
+        self.stop_btn.setEnabled(False)
+        summary = RunConsole.summary(result)
+        self.status_label.setText(f"{os.path.basename(result['file'])}: {summary}")
+        if self.parent_ide is not None:
+            self.parent_ide.statusBar().showMessage(f"{os.path.basename(result['file'])}: {summary}")
+        if result["profile"]:
+            self.show_profile(result["profile_stats"])
+        if self.pending_run is not None:
+            run, self.pending_run = self.pending_run, None
+            self.console.start_run(*run)
+    
+    def show_profile(self, stats):
+        self.profile_model.set_stats(stats)
+        if stats is None:
+            self.profile_label.setText("没有cProfile统计（程序没有正常结束）")
+        else:
+            self.profile_label.setText(f"热点函数: {len(self.profile_model.rows)} 个函数，"
+                                       f"自身时间合计 {self.profile_model.total_time:.3f} s（双击跳转到函数）")
+        if not self.profile_widget.isVisible():
+            self.profile_widget.show()
+            self.splitter.setSizes([self.width() // 2, self.width() - self.width() // 2])
+    
+    def jump_to_function(self, index):
+        location = self.profile_model.location_at(index.row())
+        if location is not None and os.path.isfile(location[0]) and self.parent_ide is not None:
+            self.parent_ide.open_search_result(location[0], location[1], 0)
+    
+    def set_scrollback_lines(self, lines):
+        self.console.set_scrollback_lines(lines)
+    
+    def set_encoding(self, encoding, errors):
+        self.console.set_encoding(encoding, errors)
+    
+    def shutdown(self):
+        self.pending_run = None
+        self.console.shutdown()
+
+
+class PythonSyntaxChecker:
+    """Python语法检查器，支持按行增量检查
+    
+    每个编辑器持有一个实例，维护文档行的镜像和逐行检查结果。
+    编辑器的修改通知只标记脏行范围，检查时只重新检查脏行，
+    逐行结果按行内容缓存；只有改动可能影响代码块结构时才重新compile整个文件。
+    """
+    # 可能影响代码块结构的字符（括号、引号、续行符）
+    STRUCTURAL_CHARS = frozenset('()[]{}\'"\\')
+    # 不需要缩进检查的语句关键字
+    BLOCK_KEYWORDS = ('class ', 'def ', 'if ', 'elif ', 'else:', 'for ', 'while ', 'try:', 'except', 'finally:', 'with ', 'lambda ')
+    # 逐行结果缓存的最大条目数
+    CACHE_LIMIT = 65536
+    
+    def __init__(self):
+        self.lines = None  # 文档行镜像，None表示需要全量检查
+        self.line_results = []  # 每行的检查结果 [(列, 信息, 严重程度), ...]
+        self.result_cache = {}  # 行内容 -> 检查结果
+        self.compile_problem = None  # 最近一次compile的错误
+        self.compile_pending = True  # 是否有尚未完成的compile
+        self.clear_dirty()
+    
+    def clear_dirty(self):
+        """清除脏行范围"""
+        self.dirty_start = None
+        self.dirty_end = None
+        self.lines_delta = 0
+    
+    def mark_dirty(self, line, lines_added):
+        """记录一次修改，line为修改所在行（新文档坐标），lines_added为增加的行数（删除为负数）"""
+        if self.dirty_start is None:
+            self.dirty_start = line
+            self.dirty_end = line + max(lines_added, 0)
+            self.lines_delta = lines_added
+            return
+        # 修改点之后的行随行数变化平移
+        if self.dirty_end > line:
+            self.dirty_end = max(line, self.dirty_end + lines_added)
+        self.dirty_start = min(self.dirty_start, line)
+        self.dirty_end = max(self.dirty_end, line + max(lines_added, 0))
+        self.lines_delta += lines_added
+    
+    def dirty_line_count(self):
+        """脏行数量"""
+        if self.dirty_start is None:
+            return 0
+        return self.dirty_end - self.dirty_start + 1
+    
+    @classmethod
+    def check_line(cls, line):
+        """对单行执行静态检查，结果与行号无关"""
+        problems = []
+        stripped_line = line.strip()
+        
+        # 检查未闭合的字符串
+        if stripped_line.count('"') % 2 != 0 or stripped_line.count("'") % 2 != 0:
+            # 检查是否是注释
+            if not stripped_line.startswith('#'):
+                problems.append((1, "可能存在未闭合的字符串", "error"))
+        
+        # 检查缩进问题（简单示例）
+        if line and not line.startswith(' ') and not line.startswith('\t') and not stripped_line.startswith('#'):
+            # 检查是否是类或函数定义
+            if not any(keyword in stripped_line for keyword in cls.BLOCK_KEYWORDS):
+                problems.append((1, "可能存在缩进问题", "warning"))
+        
+        # 检查print语句（Python 3中应该使用print()函数）
+        if 'print ' in line and not 'print(' in line:
+            problems.append((line.find('print') + 1, "Python 3中print应该使用括号", "warning"))
+        
+        # 检查比较运算符
+        if '=' in line and not '==' in line and not '!=' in line and not '<=' in line and not '>=' in line and not '+=' in line and not '-=' in line and not '*=' in line and not '/=' in line:
+            # 检查是否是赋值语句
+            if 'if ' in line or 'elif ' in line or 'while ' in line:
+                problems.append((line.find('=') + 1, "可能应该使用==而不是=", "warning"))
+        
+        return problems
+    
+    @staticmethod
+    def compile_source(content):
+        """使用compile函数进行精确的语法检查，返回问题或None"""
+        try:
+            compile(content, '<string>', 'exec')
+        except SyntaxError as e:
+            # 解析语法错误，提供更详细的信息
+            error_msg = f"语法错误: {e.msg}"
+            # 根据错误类型提供更友好的提示
+            if "unexpected EOF" in e.msg:
+                error_msg = "语法错误: 遇到了意外的文件结束，可能缺少闭合括号、引号或缩进块"
+            elif "expected an indented block" in e.msg:
+                error_msg = "语法错误: 期望有缩进块，可能缺少冒号或缩进"
+            elif "invalid syntax" in e.msg:
+                error_msg = f"语法错误: 无效的语法，位置 {e.offset}"
+            return (e.lineno, e.offset, error_msg, "error")
+        except Exception as e:
+            # 其他错误
+            return (1, 1, f"未知错误: {str(e)}", "error")
+        return None
+    
+    def cached_check_line(self, line):
+        """带缓存的单行检查"""
+        results = self.result_cache.get(line)
+        if results is None:
+            if len(self.result_cache) >= self.CACHE_LIMIT:
+                self.result_cache.clear()
+            results = self.check_line(line)
+            self.result_cache[line] = results
+        return results
+    
+    def check(self, content):
+        """全量检查，同时重建行镜像"""
+        lines = content.split('\n')
+        line_results = [self.cached_check_line(line) for line in lines]
+        self.compile_problem = self.compile_source(content)
+        self.compile_pending = False
+        # 先安装结果再安装行镜像，GUI线程以lines判断镜像是否可用
+        self.line_results = line_results
+        self.lines = lines
+        return self.collect(line_results, self.compile_problem)
+    
+    def is_structural(self, old_line, new_line):
+        """判断一行的修改是否可能影响代码块结构"""
+        for line in (old_line, new_line):
+            if not self.STRUCTURAL_CHARS.isdisjoint(line):
+                return True
+            if line.rstrip().endswith(':'):
+                return True
+        # 缩进改变
+        old_indent = len(old_line) - len(old_line.lstrip())
+        new_indent = len(new_line) - len(new_line.lstrip())
+        return old_indent != new_indent
+    
+    def update(self, get_line, line_count):
+        """在GUI线程中应用脏行范围，只重新检查脏行
+        
+        get_line(i)返回第i行的文本（不含换行符）。
+        返回是否需要重新compile；返回None表示镜像失效，需要全量检查。
+        """
+        if self.lines is None:
+            return None
+        if self.dirty_start is None:
+            return self.compile_pending
+        
+        start = self.dirty_start
+        end = min(self.dirty_end, line_count - 1)
+        old_end = self.dirty_end - self.lines_delta
+        delta = self.lines_delta
+        self.clear_dirty()
+        if start < 0 or old_end >= len(self.lines) or end < start - 1:
+            return None
+        
+        new_lines = [get_line(i) for i in range(start, end + 1)]
+        old_lines = self.lines[start:old_end + 1]
+        self.lines[start:old_end + 1] = new_lines
+        self.line_results[start:old_end + 1] = [self.cached_check_line(line) for line in new_lines]
+        if len(self.lines) != line_count:
+            # 镜像与文档不一致，放弃增量模式
+            self.lines = None
+            return None
+        
+        needs_compile = self.compile_pending or delta != 0 or len(old_lines) != len(new_lines)
+        # 上次的编译错误位于改动范围内
+        if not needs_compile and self.compile_problem is not None:
+            error_line = (self.compile_problem[0] or 1) - 1
+            needs_compile = start <= error_line <= end
+        if not needs_compile:
+            for old_line, new_line in zip(old_lines, new_lines):
+                if self.is_structural(old_line, new_line):
+                    needs_compile = True
+                    break
+                # 非结构性修改，单独编译该行验证
+                stripped_line = new_line.strip()
+                if stripped_line and self.compile_source(stripped_line) is not None:
+                    needs_compile = True
+                    break
+        if needs_compile:
+            self.compile_pending = True
+        return needs_compile
+    
+    def collect(self, line_results, compile_problem):
+        """合并逐行结果和编译结果为问题列表"""
+        # compress在C层跳过没有问题的行，只遍历有问题的行
+        problems = [(line_num, col, msg, severity)
+                    for line_num in compress(range(1, len(line_results) + 1), line_results)
+                    for col, msg, severity in line_results[line_num - 1]]
+        if compile_problem is not None:
+            problems.append(compile_problem)
+        return problems
+    
+    def finish(self, line_results, content):
+        """在后台线程中完成增量检查，content为None表示沿用上次的编译结果"""
+        if content is not None:
+            self.compile_problem = self.compile_source(content)
+            self.compile_pending = False
+        return self.collect(line_results, self.compile_problem)
+
+
+class CodeScanner:
+    """C风格语言共享的单遍扫描器
+    
+    用一个预编译的正则一次性识别注释和字符串，生成与原文等长的代码文本
+    （注释和字符串内容替换为空格，列位置保持不变），再在代码文本上检查括号匹配。
+    语言规则只需要在代码部分上检查，不会被字符串或注释中的括号、关键字误导。
+    扫描器本身无状态，可以在多个线程中同时使用。
+    """
+    WORD_RE = re.compile(r'[A-Za-z_]\w*')
+    NON_NEWLINE_RE = re.compile(r'[^\n]')
+    
+    def __init__(self, brackets='()[]{}', quotes='"\'', multiline_quotes='', line_comment='//',
+                 block_comment=('/*', '*/'), unclosed_message="未闭合的括号: {brace}",
+                 report_unclosed_strings=False):
+        self.openers = {}
+        for i in range(0, len(brackets), 2):
+            self.openers[brackets[i]] = brackets[i + 1]
+        self.unclosed_message = unclosed_message
+        self.report_unclosed_strings = report_unclosed_strings
+        
+        # 预编译的注释和字符串正则，字符串缺少结束引号时也能匹配
+        patterns = []
+        if line_comment:
+            patterns.append(re.escape(line_comment) + r'[^\n]*')
+        if block_comment:
+            patterns.append(re.escape(block_comment[0]) + r'.*?(?:' + re.escape(block_comment[1]) + r'|\Z)')
+        for quote in quotes:
+            q = re.escape(quote)
+            patterns.append(q + r'(?:[^\\\n' + q + r']|\\.)*' + q + '?')
+        for quote in multiline_quotes:
+            q = re.escape(quote)
+            patterns.append(q + r'(?:[^\\' + q + r']|\\.)*' + q + '?')
+        self.quotes = quotes + multiline_quotes
+        self.literal_re = re.compile('|'.join(patterns), re.DOTALL)
+        self.bracket_re = re.compile('[' + re.escape(brackets) + ']')
+        self.non_bracket_re = re.compile('[^' + re.escape(brackets) + ']+')
+        self.pair_re = re.compile('|'.join(re.escape(brackets[i:i + 2]) for i in range(0, len(brackets), 2)))
+    
+    @classmethod
+    def words(cls, code):
+        """返回代码中的标识符集合，用于关键字集合查找"""
+        return set(cls.WORD_RE.findall(code))
+    
+    def blank_literals(self, content, problems):
+        """把注释和字符串内容替换为空格，字符串保留两侧引号"""
+        unclosed = []
+        
+        def blank(match):
+            text = match.group()
+            quote = text[0]
+            if quote not in self.quotes:
+                # 注释，保留换行
+                return self.NON_NEWLINE_RE.sub(' ', text)
+            body = text[1:-1]
+            # 结尾引号前有奇数个反斜杠时是转义引号，字符串未闭合
+            if len(text) < 2 or text[-1] != quote or (len(body) - len(body.rstrip('\\'))) % 2:
+                unclosed.append((match.start(), quote))
+                return quote + self.NON_NEWLINE_RE.sub(' ', text[1:])
+            return quote + self.NON_NEWLINE_RE.sub(' ', body) + quote
+        
+        code = self.literal_re.sub(blank, content)
+        if self.report_unclosed_strings:
+            for offset, quote in unclosed:
+                line = content.count('\n', 0, offset) + 1
+                col = offset - content.rfind('\n', 0, offset)
+                problems.append((line, col, f"未闭合的引号: {quote}", "error"))
+        return code
+    
+    def check_brackets(self, code, problems):
+        """检查括号匹配，括号完全配对时只在C层完成"""
+        # 快速路径：只保留括号字符，反复消去相邻的配对括号
+        remaining = self.non_bracket_re.sub('', code)
+        while remaining:
+            reduced = self.pair_re.sub('', remaining)
+            if len(reduced) == len(remaining):
+                break
+            remaining = reduced
+        if not remaining:
+            return
+        
+        # 存在不匹配，逐个括号定位问题
+        brace_stack = []
+        line_num = 1
+        line_start = 0
+        for match in self.bracket_re.finditer(code):
+            pos = match.start()
+            line_num += code.count('\n', line_start, pos)
+            line_start = code.rfind('\n', 0, pos) + 1
+            char = match.group()
+            if char in self.openers:
+                brace_stack.append((char, line_num, pos - line_start + 1))
+            elif not brace_stack:
+                problems.append((line_num, pos - line_start + 1, "多余的右括号", "error"))
+            else:
+                open_brace, open_line, open_pos = brace_stack.pop()
+                if self.openers[open_brace] != char:
+                    problems.append((line_num, pos - line_start + 1, f"括号不匹配: {open_brace} 和 {char}", "error"))
+        
+        # 检查未闭合的括号
+        for open_brace, open_line, open_pos in brace_stack:
+            problems.append((open_line, open_pos, self.unclosed_message.format(brace=open_brace), "error"))
+    
+    def scan(self, content, problems):
+        """扫描content，逐行产出(行号, 原始行, 代码部分)
+        
+        代码部分与原始行等长，注释和字符串内容被替换为空格。
+        括号和未闭合字符串问题在产出第一行之前追加到problems中。
+        """
+        code = self.blank_literals(content, problems)
+        self.check_brackets(code, problems)
+        return zip(count(1), content.split('\n'), code.split('\n'))
+
+
+class JavaScriptSyntaxError(Exception):
+    """JavaScript语法错误，记录出错位置"""
+    def __init__(self, message, line, col):
+        super().__init__(message)
+        self.message = message
+        self.line = line
+        self.col = col
+
+
+class JavaScriptTimeout(Exception):
+    """JavaScript语法检查超时"""
+
+
+class JavaScriptValidator:
+    """纯Python实现的JavaScript语法验证器
+
+    先用正则分词，再用递归下降解析验证语法结构（ES2022的常用语法），
+    只判断代码能否被解析，从不执行代码。解析耗时与代码长度成线性关系，
+    并受TIMEOUT限制，超大的打包文件也不会长时间占用检查线程。
+    """
+    TIMEOUT = 2.0  # 单次检查的最长时间（秒）
+
+    TOKEN_RE = re.compile(r'''
+        (?P<ws>[ \t\f\v\u00a0\ufeff\u2000-\u200a\u3000]+)
+      | (?P<nl>\r\n?|[\n\u2028\u2029])
+      | (?P<comment>//[^\r\n\u2028\u2029]*|/\*[\s\S]*?\*/)
+      | (?P<name>\#?[A-Za-z_$\u0080-\uffff][\w$\u0080-\uffff]*)
+      | (?P<num>0[xX][0-9a-fA-F_]+n?|0[oO][0-7_]+n?|0[bB][01_]+n?|(?:\d[\d_]*\.?[\d_]*|\.\d[\d_]*)(?:[eE][+-]?\d[\d_]*)?n?)
+      | (?P<string>"(?:[^"\\\r\n]|\\[\s\S])*"|'(?:[^'\\\r\n]|\\[\s\S])*')
+      | (?P<punct>>>>=|\.\.\.|===|!==|\*\*=|<<=|>>=|>>>|&&=|\|\|=|\?\?=|=>|==|!=|<=|>=|&&|\|\||\?\?|\?\.(?!\d)
+                 |\+\+|--|\+=|-=|\*=|/=|%=|&=|\|=|\^=|<<|>>|\*\*|[{}()\[\];,<>+\-*/%&|^!~?:=.@])
+    ''', re.VERBOSE)
+    REGEX_RE = re.compile(r'/(?:[^/\\\[\r\n]|\\.|\[(?:[^\]\\\r\n]|\\.)*\])+/[A-Za-z]*')
+    TEMPLATE_RE = re.compile(r'(?:[^`\\$]|\\[\s\S]|\$(?!\{))*')
+
+    # 这些关键字之后的 / 是正则表达式而不是除号
+    REGEX_PREFIX_KEYWORDS = frozenset([
+        'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw', 'case', 'do', 'else',
+        'yield', 'await', 'extends'])
+    RESERVED_WORDS = frozenset([
+        'break', 'case', 'catch', 'class', 'const', 'continue', 'debugger', 'default', 'delete', 'do', 'else',
+        'enum', 'export', 'extends', 'false', 'finally', 'for', 'function', 'if', 'import', 'in', 'instanceof',
+        'new', 'null', 'return', 'super', 'switch', 'this', 'throw', 'true', 'try', 'typeof', 'var', 'void',
+        'while', 'with'])
+    ASSIGNMENT_OPERATORS = frozenset([
+        '=', '+=', '-=', '*=', '/=', '%=', '**=', '<<=', '>>=', '>>>=', '&=', '|=', '^=', '&&=', '||=', '??='])
+    BINARY_PRECEDENCE = {
+        '??': 1, '||': 2, '&&': 3, '|': 4, '^': 5, '&': 6,
+        '==': 7, '!=': 7, '===': 7, '!==': 7,
+        '<': 8, '>': 8, '<=': 8, '>=': 8, 'instanceof': 8, 'in': 8,
+        '<<': 9, '>>': 9, '>>>': 9,
+        '+': 10, '-': 10,
+        '*': 11, '/': 11, '%': 11,
+        '**': 12,
+    }
+    UNARY_OPERATORS = frozenset(['!', '~', '+', '-', 'typeof', 'void', 'delete', 'await'])
+    EOF_MESSAGE = "遇到了意外的输入结束，可能缺少闭合括号、引号或代码块"
+
+    def __init__(self, timeout=None):
+        self.timeout = self.TIMEOUT if timeout is None else timeout
+
+    def validate(self, content):
+        """检查content的语法，返回问题(行, 列, 信息, 严重程度)或None"""
+        self.source = content
+        self.deadline = time.monotonic() + self.timeout
+        try:
+            self.tokens = self.tokenize(content)
+            self.match_index = self.build_match_index(self.tokens)
+            self.index = 0
+            self.tok = self.tokens[0]
+            self.no_in = False
+            self.parse_program()
+        except JavaScriptSyntaxError as e:
+            return (e.line, e.col, f"语法错误: {e.message}", "error")
+        except JavaScriptTimeout:
+            return (1, 1, f"JavaScript语法检查超过{self.timeout:g}秒，已跳过精确检查", "warning")
+        except RecursionError:
+            return (1, 1, "代码嵌套过深，已跳过精确语法检查", "warning")
+        finally:
+            self.tokens = None
+            self.match_index = None
+        return None
+
+    # ---------- 分词 ----------
+
+    def error_at(self, pos, message):
+        """在源码偏移pos处构造语法错误"""
+        line = self.source.count('\n', 0, pos) + 1
+        col = pos - self.source.rfind('\n', 0, pos)
+        return JavaScriptSyntaxError(message, line, col)
+
+    def regex_allowed(self, tokens, control_paren):
+        """根据上一个记号判断 / 是否开始一个正则表达式"""
+        if not tokens:
+            return True
+        kind, value = tokens[-1][0], tokens[-1][1]
+        if kind == 'punct':
+            if value == ')':
+                # if (...) /re/ 这样控制语句的条件之后是正则表达式
+                return control_paren
+            return value != ']'
+        if kind == 'name':
+            return value in self.REGEX_PREFIX_KEYWORDS
+        return kind in ('template_head', 'template_middle')
+
+    def read_template(self, source, pos, start, newline, tokens, continued):
+        """读取模板字符串的一段，返回结束位置和是否进入 ${ 替换"""
+        end = self.TEMPLATE_RE.match(source, pos).end()
+        if source.startswith('`', end):
+            kind = 'template_tail' if continued else 'template'
+            tokens.append((kind, source[start:end + 1], start, newline))
+            return end + 1, False
+        if source.startswith('${', end):
+            kind = 'template_middle' if continued else 'template_head'
+            tokens.append((kind, source[start:end + 2], start, newline))
+            return end + 2, True
+        raise self.error_at(start, "未闭合的模板字符串")
+
+    def tokenize(self, source):
+        """把源码切分为记号列表，每个记号为(类型, 值, 偏移, 前面是否有换行)"""
+        tokens = []
+        append = tokens.append
+        match_token = self.TOKEN_RE.match
+        pos = 0
+        length = len(source)
+        newline = False
+        depth = 0  # 大括号深度
+        template_stack = []  # 每个 ${ 替换开始时的大括号深度
+        paren_stack = []  # 每个左圆括号是否属于 if/for/while/with 的条件
+        control_paren = False  # 上一个右圆括号是否结束了控制语句的条件
+
+        # 跳过文件开头的 #! 行
+        if source.startswith('#!'):
+            end = source.find('\n')
+            pos = length if end == -1 else end
+
+        while pos < length:
+            if len(tokens) & 4095 == 0 and time.monotonic() > self.deadline:
+                raise JavaScriptTimeout()
+            ch = source[pos]
+            if ch == '`':
+                pos, opened = self.read_template(source, pos + 1, pos, newline, tokens, False)
+                if opened:
+                    depth += 1
+                    template_stack.append(depth)
+                newline = False
+                continue
+            if ch == '}' and template_stack and template_stack[-1] == depth:
+                # ${ 替换结束，继续读取模板字符串
+                template_stack.pop()
+                depth -= 1
+                pos, opened = self.read_template(source, pos + 1, pos, newline, tokens, True)
+                if opened:
+                    depth += 1
+                    template_stack.append(depth)
+                newline = False
+                continue
+            if ch == '/' and source[pos + 1:pos + 2] not in ('/', '*') and self.regex_allowed(tokens, control_paren):
+                match = self.REGEX_RE.match(source, pos)
+                if match is None:
+                    raise self.error_at(pos, "未闭合的正则表达式")
+                append(('regex', match.group(), pos, newline))
+                newline = False
+                pos = match.end()
+                continue
+
+            match = match_token(source, pos)
+            if match is None:
+                if ch in '"\'':
+                    raise self.error_at(pos, "未闭合的字符串")
+                if source.startswith('/*', pos):
+                    raise self.error_at(pos, "未闭合的注释")
+                raise self.error_at(pos, f"无效的字符 '{ch}'")
+            kind = match.lastgroup
+            end = match.end()
+            if kind == 'nl':
+                newline = True
+            elif kind == 'comment':
+                if '\n' in match.group() or '\r' in match.group():
+                    newline = True
+            elif kind != 'ws':
+                value = match.group()
+                if kind == 'punct':
+                    if value == '{':
+                        depth += 1
+                    elif value == '}':
+                        depth -= 1
+                    elif value == '(':
+                        paren_stack.append(bool(tokens) and tokens[-1][1] in ('if', 'for', 'while', 'with'))
+                    elif value == ')':
+                        control_paren = paren_stack.pop() if paren_stack else False
+                    elif value == '/' and source.startswith('/*', pos):
+                        raise self.error_at(pos, "未闭合的注释")
+                append((kind, value, pos, newline))
+                newline = False
+            pos = end
+
+        append(('eof', '', length, True))
+        return tokens
+
+    def build_match_index(self, tokens):
+        """记录每个左括号记号对应的右括号记号位置，用于箭头函数的前瞻判断"""
+        match_index = {}
+        stack = []
+        for i, (kind, value, pos, newline) in enumerate(tokens):
+            if kind != 'punct':
+                continue
+            if value in ('(', '[', '{'):
+                stack.append(i)
+            elif value in (')', ']', '}') and stack:
+                match_index[stack.pop()] = i
+        return match_index
+
+    # ---------- 解析辅助 ----------
+
+    def advance(self):
+        """前进到下一个记号"""
+        self.index += 1
+        if self.index & 1023 == 0 and time.monotonic() > self.deadline:
+            raise JavaScriptTimeout()
+        self.tok = self.tokens[self.index]
+
+    def peek(self, offset=1):
+        """查看之后第offset个记号"""
+        index = min(self.index + offset, len(self.tokens) - 1)
+        return self.tokens[index]
+
+    def is_punct(self, value):
+        return self.tok[0] == 'punct' and self.tok[1] == value
+
+    def is_name(self, value):
+        return self.tok[0] == 'name' and self.tok[1] == value
+
+    def unexpected(self, token=None):
+        """构造“意外的记号”错误"""
+        token = token or self.tok
+        if token[0] == 'eof':
+            return self.error_at(token[2], self.EOF_MESSAGE)
+        return self.error_at(token[2], f"意外的记号 '{token[1][:20]}'")
+
+    def expect(self, value):
+        """要求当前记号为value并前进"""
+        if not self.is_punct(value):
+            if self.tok[0] == 'eof':
+                raise self.unexpected()
+            raise self.error_at(self.tok[2], f"期望 '{value}'，但遇到了 '{self.tok[1][:20]}'")
+        self.advance()
+
+    def eat(self, value):
+        """当前记号为value时前进并返回True"""
+        if self.tok[0] == 'punct' and self.tok[1] == value:
+            self.advance()
+            return True
+        return False
+
+    def consume_semicolon(self):
+        """语句结束：分号，或按自动分号插入规则结束"""
+        if self.eat(';'):
+            return
+        if self.is_punct('}') or self.tok[0] == 'eof' or self.tok[3]:
+            return
+        raise self.error_at(self.tok[2], f"意外的记号 '{self.tok[1][:20]}'，前面可能缺少分号或运算符")
+
+    def parse_identifier(self):
+        """解析绑定标识符"""
+        if self.tok[0] != 'name' or self.tok[1] in self.RESERVED_WORDS or self.tok[1].startswith('#'):
+            raise self.unexpected()
+        self.advance()
+
+    def parse_property_name(self):
+        """解析属性名：标识符（含关键字）、字符串、数字或计算属性"""
+        kind = self.tok[0]
+        if kind in ('name', 'string', 'num'):
+            self.advance()
+        elif self.eat('['):
+            self.parse_assignment()
+            self.expect(']')
+        else:
+            raise self.unexpected()
+
+    # ---------- 语句 ----------
+
+    def parse_program(self):
+        while self.tok[0] != 'eof':
+            self.parse_statement()
+
+    def parse_statement(self):
+        """解析一条语句或声明"""
+        kind, value = self.tok[0], self.tok[1]
+        if kind == 'punct':
+            if value == '{':
+                self.parse_block()
+                return
+            if value == ';':
+                self.advance()
+                return
+        elif kind == 'name':
+            handler = self.STATEMENT_HANDLERS.get(value)
+            if handler is not None:
+                if handler(self) is not False:
+                    return
+            elif value == 'async' and self.peek()[1] == 'function' and not self.peek()[3]:
+                self.advance()
+                self.advance()
+                self.parse_function(is_async=True)
+                return
+            elif self.peek()[0] == 'punct' and self.peek()[1] == ':' and value not in self.RESERVED_WORDS:
+                # 标签语句
+                self.advance()
+                self.advance()
+                self.parse_statement()
+                return
+
+        self.parse_expression()
+        self.consume_semicolon()
+
+    def parse_block(self):
+        self.expect('{')
+        no_in, self.no_in = self.no_in, False
+        while not self.is_punct('}'):
+            if self.tok[0] == 'eof':
+                raise self.unexpected()
+            self.parse_statement()
+        self.no_in = no_in
+        self.advance()
+
+    def parse_var_statement(self):
+        kind = self.tok[1]
+        if kind == 'let':
+            # let 后面不是绑定时作为普通标识符
+            following = self.peek()
+            if not (following[0] == 'name' or following[1] in ('[', '{')):
+                return False
+        self.advance()
+        self.parse_variable_declarations(kind)
+        self.consume_semicolon()
+
+    def parse_variable_declarations(self, kind, in_for=False):
+        """解析 var/let/const 的声明列表，返回声明个数和是否带初始值"""
+        declarations = 0
+        has_init = False
+        while True:
+            pattern = self.tok[1] in ('[', '{')
+            self.parse_binding_target()
+            declarations += 1
+            if self.eat('='):
+                has_init = True
+                self.parse_assignment()
+            elif not in_for:
+                if kind == 'const':
+                    raise self.error_at(self.tok[2], "const 声明缺少初始值")
+                if pattern:
+                    raise self.error_at(self.tok[2], "解构声明缺少初始值")
+            if not self.eat(','):
+                break
+        return declarations, has_init
+
+    def parse_binding_target(self):
+        """解析绑定目标：标识符、数组解构或对象解构"""
+        if self.eat('['):
+            no_in, self.no_in = self.no_in, False
+            while not self.eat(']'):
+                if self.eat(','):
+                    continue
+                if self.eat('...'):
+                    self.parse_binding_target()
+                    self.expect(']')
+                    break
+                self.parse_binding_element()
+                if not self.is_punct(']'):
+                    self.expect(',')
+            self.no_in = no_in
+        elif self.eat('{'):
+            no_in, self.no_in = self.no_in, False
+            while not self.eat('}'):
+                if self.eat('...'):
+                    self.parse_identifier()
+                    self.expect('}')
+                    break
+                if self.tok[0] == 'name' and self.peek()[1] != ':' and self.peek()[1] != '(':
+                    # 简写属性
+                    self.parse_identifier()
+                    if self.eat('='):
+                        self.parse_assignment()
+                else:
+                    self.parse_property_name()
+                    self.expect(':')
+                    self.parse_binding_element()
+                if not self.is_punct('}'):
+                    self.expect(',')
+            self.no_in = no_in
+        else:
+            self.parse_identifier()
+
+    def parse_binding_element(self):
+        self.parse_binding_target()
+        if self.eat('='):
+            self.parse_assignment()
+
+    def parse_params(self):
+        """解析函数参数列表"""
+        self.expect('(')
+        no_in, self.no_in = self.no_in, False
+        while not self.eat(')'):
+            if self.eat('...'):
+                self.parse_binding_target()
+                self.expect(')')
+                break
+            self.parse_binding_element()
+            if not self.is_punct(')'):
+                self.expect(',')
+        self.no_in = no_in
+
+    def parse_function_body(self):
+        self.parse_block()
+
+    def parse_function(self, is_async=False, is_expression=False):
+        """解析 function 关键字之后的函数声明或表达式"""
+        self.eat('*')
+        if self.tok[0] == 'name' and not self.is_punct('('):
+            self.parse_identifier()
+        elif not is_expression:
+            raise self.error_at(self.tok[2], "函数声明缺少函数名")
+        self.parse_params()
+        self.parse_function_body()
+
+    def parse_function_statement(self):
+        self.advance()
+        self.parse_function()
+
+    def parse_class(self, is_expression=False):
+        """解析 class 关键字之后的类声明或表达式"""
+        if self.tok[0] == 'name' and self.tok[1] != 'extends':
+            self.parse_identifier()
+        elif not is_expression:
+            raise self.error_at(self.tok[2], "类声明缺少类名")
+        if self.tok[1] == 'extends' and self.tok[0] == 'name':
+            self.advance()
+            self.parse_unary()
+        self.expect('{')
+        while not self.eat('}'):
+            if self.tok[0] == 'eof':
+                raise self.unexpected()
+            self.parse_class_member()
+
+    def parse_class_statement(self):
+        self.advance()
+        self.parse_class()
+
+    def parse_class_member(self):
+        """解析类成员：方法、访问器、字段或静态初始化块"""
+        if self.eat(';'):
+            return
+        # 修饰词后面紧跟 ( = ; } 时它本身就是成员名
+        while self.tok[0] == 'name' and self.tok[1] in ('static', 'async', 'get', 'set'):
+            following = self.peek()
+            if following[0] == 'punct' and following[1] in ('(', '=', ';', '}'):
+                break
+            if self.tok[1] == 'async' and following[3]:
+                break
+            if self.tok[1] == 'static' and following[1] == '{':
+                self.advance()
+                self.parse_block()
+                return
+            self.advance()
+        self.eat('*')
+        self.parse_property_name()
+        if self.is_punct('('):
+            self.parse_params()
+            self.parse_function_body()
+            return
+        # 类字段
+        if self.eat('='):
+            self.parse_assignment()
+        self.consume_semicolon()
+
+    def parse_if(self):
+        self.advance()
+        self.expect('(')
+        self.parse_expression()
+        self.expect(')')
+        self.parse_statement()
+        if self.is_name('else'):
+            self.advance()
+            self.parse_statement()
+
+    def parse_for(self):
+        self.advance()
+        if self.is_name('await'):
+            self.advance()
+        self.expect('(')
+        self.no_in = True
+        if self.eat(';'):
+            init_done = True
+        else:
+            init_done = False
+            if self.tok[0] == 'name' and self.tok[1] in ('var', 'let', 'const') and (
+                    self.tok[1] != 'let' or self.peek()[0] == 'name' or self.peek()[1] in ('[', '{')):
+                kind = self.tok[1]
+                self.advance()
+                declarations, has_init = self.parse_variable_declarations(kind, in_for=True)
+                iteration = self.tok[0] == 'name' and self.tok[1] in ('in', 'of')
+                if iteration and declarations != 1:
+                    raise self.error_at(self.tok[2], "for-in/for-of 只能声明一个变量")
+                if not iteration and kind == 'const' and not has_init:
+                    raise self.error_at(self.tok[2], "const 声明缺少初始值")
+            else:
+                self.parse_expression()
+        self.no_in = False
+        if not init_done and self.tok[0] == 'name' and self.tok[1] in ('in', 'of'):
+            self.advance()
+            if self.tok[1] == 'of':
+                self.parse_assignment()
+            else:
+                self.parse_expression()
+            self.expect(')')
+        else:
+            if not init_done:
+                self.expect(';')
+            if not self.is_punct(';'):
+                self.parse_expression()
+            self.expect(';')
+            if not self.is_punct(')'):
+                self.parse_expression()
+            self.expect(')')
+        self.parse_statement()
+
+    def parse_while(self):
+        self.advance()
+        self.expect('(')
+        self.parse_expression()
+        self.expect(')')
+        self.parse_statement()
+
+    def parse_do(self):
+        self.advance()
+        self.parse_statement()
+        if not self.is_name('while'):
+            raise self.error_at(self.tok[2], "do 语句缺少 while")
+        self.advance()
+        self.expect('(')
+        self.parse_expression()
+        self.expect(')')
+        # do-while 之后总是可以省略分号
+        self.eat(';')
+
+    def parse_return(self):
+        """return/throw：参数不能与关键字之间换行"""
+        keyword = self.tok[1]
+        self.advance()
+        if self.is_punct(';') or self.is_punct('}') or self.tok[0] == 'eof' or self.tok[3]:
+            if keyword == 'throw':
+                raise self.error_at(self.tok[2], "throw 之后缺少表达式")
+        else:
+            self.parse_expression()
+        self.consume_semicolon()
+
+    def parse_break(self):
+        self.advance()
+        if self.tok[0] == 'name' and not self.tok[3] and self.tok[1] not in self.RESERVED_WORDS:
+            self.advance()
+        self.consume_semicolon()
+
+    def parse_try(self):
+        self.advance()
+        self.parse_block()
+        handled = False
+        if self.is_name('catch'):
+            self.advance()
+            if self.eat('('):
+                self.parse_binding_target()
+                self.expect(')')
+            self.parse_block()
+            handled = True
+        if self.is_name('finally'):
+            self.advance()
+            self.parse_block()
+            handled = True
+        if not handled:
+            raise self.error_at(self.tok[2], "try 语句缺少 catch 或 finally")
+
+    def parse_switch(self):
+        self.advance()
+        self.expect('(')
+        self.parse_expression()
+        self.expect(')')
+        self.expect('{')
+        while not self.eat('}'):
+            if self.is_name('case'):
+                self.advance()
+                self.parse_expression()
+                self.expect(':')
+            elif self.is_name('default'):
+                self.advance()
+                self.expect(':')
+            elif self.tok[0] == 'eof':
+                raise self.unexpected()
+            else:
+                raise self.error_at(self.tok[2], "switch 中的语句必须位于 case 或 default 之后")
+            while not (self.is_punct('}') or self.is_name('case') or self.is_name('default')):
+                if self.tok[0] == 'eof':
+                    raise self.unexpected()
+                self.parse_statement()
+
+    def parse_simple_keyword_statement(self):
+        """debugger 等无参数语句"""
+        self.advance()
+        self.consume_semicolon()
+
+    def parse_with(self):
+        self.parse_while()
+
+    def parse_module_specifiers(self):
+        """解析 { a, b as c } 形式的导入导出列表"""
+        self.expect('{')
+        while not self.eat('}'):
+            if self.tok[0] not in ('name', 'string'):
+                raise self.unexpected()
+            self.advance()
+            if self.is_name('as'):
+                self.advance()
+                if self.tok[0] not in ('name', 'string'):
+                    raise self.unexpected()
+                self.advance()
+            if not self.is_punct('}'):
+                self.expect(',')
+
+    def expect_module_source(self):
+        if not self.is_name('from'):
+            raise self.error_at(self.tok[2], "期望 'from'")
+        self.advance()
+        if self.tok[0] != 'string':
+            raise self.error_at(self.tok[2], "模块路径必须是字符串")
+        self.advance()
+
+    def parse_import(self):
+        following = self.peek()
+        if following[0] == 'punct' and following[1] in ('(', '.'):
+            # import() 或 import.meta 表达式
+            return False
+        self.advance()
+        if self.tok[0] == 'string':
+            self.advance()
+        else:
+            if self.tok[0] == 'name':
+                self.parse_identifier()
+                if not self.eat(','):
+                    self.expect_module_source()
+                    self.consume_semicolon()
+                    return
+            if self.eat('*'):
+                if not self.is_name('as'):
+                    raise self.error_at(self.tok[2], "期望 'as'")
+                self.advance()
+                self.parse_identifier()
+            else:
+                self.parse_module_specifiers()
+            self.expect_module_source()
+        self.consume_semicolon()
+
+    def parse_export(self):
+        self.advance()
+        if self.is_name('default'):
+            self.advance()
+            if self.is_name('function'):
+                self.advance()
+                self.parse_function(is_expression=True)
+            elif self.is_name('class'):
+                self.advance()
+                self.parse_class(is_expression=True)
+            elif self.is_name('async') and self.peek()[1] == 'function' and not self.peek()[3]:
+                self.advance()
+                self.advance()
+                self.parse_function(is_async=True, is_expression=True)
+            else:
+                self.parse_assignment()
+                self.consume_semicolon()
+        elif self.eat('*'):
+            if self.is_name('as'):
+                self.advance()
+                if self.tok[0] not in ('name', 'string'):
+                    raise self.unexpected()
+                self.advance()
+            self.expect_module_source()
+            self.consume_semicolon()
+        elif self.is_punct('{'):
+            self.parse_module_specifiers()
+            if self.is_name('from'):
+                self.expect_module_source()
+            self.consume_semicolon()
+        elif self.tok[0] == 'name' and self.tok[1] in ('var', 'let', 'const', 'function', 'class', 'async'):
+            self.parse_statement()
+        else:
+            raise self.unexpected()
+
+    def parse_keyword_misuse(self):
+        """关键字出现在语句开头但不能开始语句"""
+        raise self.unexpected()
+
+    # ---------- 表达式 ----------
+
+    def parse_expression(self):
+        self.parse_assignment()
+        while self.eat(','):
+            self.parse_assignment()
+
+    def is_arrow_ahead(self):
+        """当前位置是否为箭头函数参数（标识符或括号参数列表后跟 =>）"""
+        kind, value = self.tok[0], self.tok[1]
+        if kind == 'name':
+            following = self.peek()
+            return following[1] == '=>' and following[0] == 'punct' and not following[3]
+        if kind == 'punct' and value == '(':
+            close = self.match_index.get(self.index)
+            if close is None or close + 1 >= len(self.tokens):
+                return False
+            arrow = self.tokens[close + 1]
+            return arrow[0] == 'punct' and arrow[1] == '=>' and not arrow[3]
+        return False
+
+    def parse_arrow_function(self):
+        """解析箭头函数的参数和函数体"""
+        if self.is_punct('('):
+            self.parse_params()
+        else:
+            self.parse_identifier()
+        self.expect('=>')
+        if self.is_punct('{'):
+            self.parse_function_body()
+        else:
+            no_in, self.no_in = self.no_in, False
+            self.parse_assignment()
+            self.no_in = no_in
+        return 'arrow'
+
+    def parse_assignment(self):
+        """解析赋值表达式，返回表达式类型"""
+        kind, value = self.tok[0], self.tok[1]
+        if kind == 'name':
+            if value == 'async' and not self.peek()[3]:
+                following = self.peek()
+                if following[0] == 'name' and following[1] != 'function':
+                    self.advance()
+                    if self.is_arrow_ahead():
+                        return self.parse_arrow_function()
+                    raise self.unexpected()
+                if following[1] == '(' and following[0] == 'punct':
+                    self.advance()
+                    if self.is_arrow_ahead():
+                        return self.parse_arrow_function()
+                    # async(...) 普通函数调用
+                    self.index -= 1
+                    self.tok = self.tokens[self.index]
+            elif value == 'yield':
+                self.advance()
+                following = self.tok
+                if following[3] or following[0] == 'eof' or (
+                        following[0] == 'punct' and following[1] in (')', ']', '}', ',', ';', ':')):
+                    return 'other'
+                self.eat('*')
+                self.parse_assignment()
+                return 'other'
+        if self.is_arrow_ahead():
+            return self.parse_arrow_function()
+
+        target = self.parse_conditional()
+        if self.tok[0] == 'punct' and self.tok[1] in self.ASSIGNMENT_OPERATORS:
+            if target not in ('ident', 'member') and not (target == 'pattern' and self.tok[1] == '='):
+                raise self.error_at(self.tok[2], "赋值语句左侧无效，可能是语法错误或使用了保留字")
+            self.advance()
+            self.parse_assignment()
+            return 'other'
+        return target
+
+    def parse_conditional(self):
+        target = self.parse_binary(0)
+        if self.eat('?'):
+            no_in, self.no_in = self.no_in, False
+            self.parse_assignment()
+            self.no_in = no_in
+            self.expect(':')
+            self.parse_assignment()
+            return 'other'
+        return target
+
+    def parse_binary(self, min_precedence):
+        """按优先级解析二元运算"""
+        target = self.parse_unary()
+        while True:
+            kind, value = self.tok[0], self.tok[1]
+            if kind != 'punct' and not (kind == 'name' and value in ('instanceof', 'in')):
+                return target
+            precedence = self.BINARY_PRECEDENCE.get(value)
+            if precedence is None or precedence <= min_precedence and not (value == '**' and precedence == min_precedence):
+                return target
+            if value == 'in' and self.no_in:
+                return target
+            self.advance()
+            # ** 是右结合的
+            self.parse_binary(precedence - 1 if value == '**' else precedence)
+            target = 'other'
+
+    def parse_unary(self):
+        kind, value = self.tok[0], self.tok[1]
+        if value in self.UNARY_OPERATORS and kind in ('punct', 'name'):
+            if value == 'await' and (self.peek()[0] == 'punct' and self.peek()[1] in (')', ']', '}', ';', ',', '=', '=>')):
+                # 作为普通标识符使用
+                return self.parse_postfix()
+            self.advance()
+            self.parse_unary()
+            return 'other'
+        if kind == 'punct' and value in ('++', '--'):
+            self.advance()
+            if self.parse_unary() not in ('ident', 'member'):
+                raise self.error_at(self.tok[2], "自增/自减运算的对象无效")
+            return 'other'
+        return self.parse_postfix()
+
+    def parse_postfix(self):
+        target = self.parse_call_member()
+        if self.tok[0] == 'punct' and self.tok[1] in ('++', '--') and not self.tok[3]:
+            if target not in ('ident', 'member'):
+                raise self.error_at(self.tok[2], "自增/自减运算的对象无效")
+            self.advance()
+            return 'other'
+        return target
+
+    def parse_arguments(self):
+        self.expect('(')
+        no_in, self.no_in = self.no_in, False
+        while not self.eat(')'):
+            self.eat('...')
+            self.parse_assignment()
+            if not self.is_punct(')'):
+                self.expect(',')
+        self.no_in = no_in
+
+    def parse_call_member(self):
+        """解析成员访问、调用、可选链和带标签的模板"""
+        if self.is_name('new'):
+            self.advance()
+            if self.eat('.'):
+                # new.target
+                self.parse_member_name()
+                target = 'member'
+            else:
+                self.parse_new_callee()
+                if self.is_punct('('):
+                    self.parse_arguments()
+                target = 'other'
+        else:
+            target = self.parse_primary()
+
+        while True:
+            kind, value = self.tok[0], self.tok[1]
+            if kind == 'punct':
+                if value == '.':
+                    self.advance()
+                    self.parse_member_name()
+                    target = 'member'
+                    continue
+                if value == '?.':
+                    self.advance()
+                    if self.is_punct('('):
+                        self.parse_arguments()
+                    elif self.eat('['):
+                        self.parse_expression_in_brackets(']')
+                    else:
+                        self.parse_member_name()
+                    target = 'other'
+                    continue
+                if value == '[':
+                    self.advance()
+                    self.parse_expression_in_brackets(']')
+                    target = 'member'
+                    continue
+                if value == '(':
+                    self.parse_arguments()
+                    target = 'call'
+                    continue
+            elif kind in ('template', 'template_head'):
+                self.parse_template()
+                target = 'other'
+                continue
+            return target
+
+    def parse_new_callee(self):
+        """new 之后的构造函数表达式，不包含调用参数"""
+        if self.is_name('new'):
+            self.advance()
+            self.parse_new_callee()
+            if self.is_punct('('):
+                self.parse_arguments()
+            return
+        self.parse_primary()
+        while True:
+            if self.eat('.'):
+                self.parse_member_name()
+            elif self.eat('['):
+                self.parse_expression_in_brackets(']')
+            elif self.tok[0] in ('template', 'template_head'):
+                self.parse_template()
+            else:
+                return
+
+    def parse_member_name(self):
+        if self.tok[0] != 'name':
+            raise self.unexpected()
+        self.advance()
+
+    def parse_expression_in_brackets(self, close):
+        no_in, self.no_in = self.no_in, False
+        self.parse_expression()
+        self.no_in = no_in
+        self.expect(close)
+
+    def parse_template(self):
+        """解析模板字符串及其中的 ${} 表达式"""
+        if self.tok[0] == 'template':
+            self.advance()
+            return
+        self.advance()
+        while True:
+            no_in, self.no_in = self.no_in, False
+            self.parse_expression()
+            self.no_in = no_in
+            kind = self.tok[0]
+            if kind == 'template_tail':
+                self.advance()
+                return
+            if kind != 'template_middle':
+                raise self.unexpected()
+            self.advance()
+
+    def parse_primary(self):
+        """解析基本表达式"""
+        kind, value = self.tok[0], self.tok[1]
+        if kind == 'name':
+            if value in ('this', 'null', 'true', 'false', 'super'):
+                self.advance()
+                return 'member' if value == 'super' else 'other'
+            if value == 'function':
+                self.advance()
+                self.parse_function(is_expression=True)
+                return 'other'
+            if value == 'async' and self.peek()[1] == 'function' and not self.peek()[3]:
+                self.advance()
+                self.advance()
+                self.parse_function(is_async=True, is_expression=True)
+                return 'other'
+            if value == 'class':
+                self.advance()
+                self.parse_class(is_expression=True)
+                return 'other'
+            if value == 'import':
+                self.advance()
+                if self.eat('.'):
+                    self.parse_member_name()
+                    return 'other'
+                if not self.is_punct('('):
+                    raise self.unexpected()
+                return 'ident'
+            if value in self.RESERVED_WORDS:
+                raise self.unexpected()
+            self.advance()
+            # #name 只能出现在 #name in obj 中
+            return 'ident' if not value.startswith('#') else 'other'
+        if kind in ('num', 'string', 'regex'):
+            self.advance()
+            return 'other'
+        if kind in ('template', 'template_head'):
+            self.parse_template()
+            return 'other'
+        if kind == 'punct':
+            if value == '(':
+                self.advance()
+                if self.is_punct(')'):
+                    raise self.error_at(self.tok[2], "期望有表达式，可能缺少运算符或括号")
+                no_in, self.no_in = self.no_in, False
+                target = self.parse_assignment()
+                if self.is_punct(','):
+                    target = 'other'
+                    while self.eat(','):
+                        self.parse_assignment()
+                self.no_in = no_in
+                self.expect(')')
+                # 括号内的标识符或成员仍可被赋值
+                return target if target in ('ident', 'member') else 'other'
+            if value == '[':
+                self.parse_array_literal()
+                return 'pattern'
+            if value == '{':
+                self.parse_object_literal()
+                return 'pattern'
+        if kind == 'eof':
+            raise self.unexpected()
+        raise self.error_at(self.tok[2], f"期望有表达式，但遇到了 '{value[:20]}'")
+
+    def parse_array_literal(self):
+        self.expect('[')
+        no_in, self.no_in = self.no_in, False
+        while not self.eat(']'):
+            if self.eat(','):
+                continue
+            self.eat('...')
+            self.parse_assignment()
+            if not self.is_punct(']'):
+                self.expect(',')
+        self.no_in = no_in
+
+    def parse_object_literal(self):
+        self.expect('{')
+        no_in, self.no_in = self.no_in, False
+        while not self.eat('}'):
+            if self.tok[0] == 'eof':
+                raise self.unexpected()
+            self.parse_object_property()
+            if not self.is_punct('}'):
+                self.expect(',')
+        self.no_in = no_in
+
+    def parse_object_property(self):
+        """解析对象字面量中的一个属性"""
+        if self.eat('...'):
+            self.parse_assignment()
+            return
+        # get/set/async/生成器方法
+        while self.tok[0] == 'name' and self.tok[1] in ('get', 'set', 'async'):
+            following = self.peek()
+            if following[0] == 'punct' and following[1] in (',', ':', '(', '}', '='):
+                break
+            self.advance()
+        self.eat('*')
+        shorthand = self.tok[0] == 'name'
+        name = self.tok[1]
+        self.parse_property_name()
+        if self.is_punct('('):
+            self.parse_params()
+            self.parse_function_body()
+        elif self.eat(':'):
+            self.parse_assignment()
+        elif shorthand and name not in self.RESERVED_WORDS:
+            # 简写属性，带默认值的形式只在解构赋值中有效
+            if self.eat('='):
+                self.parse_assignment()
+        else:
+            raise self.unexpected()
+
+    STATEMENT_HANDLERS = {
+        'var': parse_var_statement,
+        'let': parse_var_statement,
+        'const': parse_var_statement,
+        'function': parse_function_statement,
+        'class': parse_class_statement,
+        'if': parse_if,
+        'for': parse_for,
+        'while': parse_while,
+        'do': parse_do,
+        'return': parse_return,
+        'throw': parse_return,
+        'break': parse_break,
+        'continue': parse_break,
+        'try': parse_try,
+        'switch': parse_switch,
+        'debugger': parse_simple_keyword_statement,
+        'with': parse_with,
+        'import': parse_import,
+        'export': parse_export,
+        'else': parse_keyword_misuse,
+        'case': parse_keyword_misuse,
+        'default': parse_keyword_misuse,
+        'catch': parse_keyword_misuse,
+        'finally': parse_keyword_misuse,
+        'extends': parse_keyword_misuse,
+        'in': parse_keyword_misuse,
+        'instanceof': parse_keyword_misuse,
+    }
+
+
+class SyntaxCheckSignals(QObject):
+    """语法检查任务信号，由后台线程发出，在GUI线程处理"""
+    finished = pyqtSignal(object, int, object)  # 编辑器, 生成号, 问题列表
+
+
+class SyntaxResultCache:
+    """语法检查结果的LRU缓存，在所有标签页之间共享
+
+    键为(语言, 检查器版本, 内容长度, 内容哈希)。检查线程查询和写入，
+    界面线程读取命中统计，所以用锁保护。
+    """
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(language, version, content):
+        """计算缓存键，内容哈希在检查线程中计算"""
+        digest = hashlib.blake2b(content.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        return (language, version, len(content), digest)
+    
+    def get(self, key):
+        """查找缓存的问题列表，未命中返回None"""
+        with self.lock:
+            problems = self.entries.get(key)
+            if problems is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return problems
+    
+    def put(self, key, problems):
+        """缓存问题列表，超过上限时淘汰最久未使用的结果"""
+        problems = tuple(problems)
+        with self.lock:
+            self.entries[key] = problems
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return problems
+    
+    def stats(self):
+        """返回(命中次数, 未命中次数, 缓存条目数)"""
+        with self.lock:
+            return self.hits, self.misses, len(self.entries)
+
+
+class SyntaxCheckTask(QRunnable):
+    """后台语法检查任务，在文本快照上运行检查器
+
+    指定cache_prefix（语言, 检查器版本）时先按内容哈希查询共享缓存。
+    """
+    def __init__(self, checker, content, editor, generation, signals, cache=None, cache_prefix=None):
+        super().__init__()
+        self.checker = checker
+        self.content = content
+        self.editor = editor
+        self.generation = generation
+        self.signals = signals
+        self.cache = cache
+        self.cache_prefix = cache_prefix
+    
+    def run(self):
+        # 编辑器已有更新的版本，跳过过期任务
+        if getattr(self.editor, 'syntax_generation', self.generation) != self.generation:
+            return
+        key = None
+        if self.cache is not None and self.cache_prefix is not None and self.content is not None:
+            key = self.cache.make_key(*self.cache_prefix, self.content)
+            problems = self.cache.get(key)
+            if problems is not None:
+                self.signals.finished.emit(self.editor, self.generation, problems)
+                return
+        try:
+            problems = self.checker(self.content)
+        except Exception as e:
+            # 检查失败的结果不缓存
+            problems = [(1, 1, f"语法检查失败: {str(e)}", "error")]
+        else:
+            if key is not None:
+                problems = self.cache.put(key, problems)
+        self.signals.finished.emit(self.editor, self.generation, problems)
+
+class ProblemTableModel(QAbstractTableModel):
+    """问题列表的数据模型
+
+    视图只绘制可见的行，更新时按公共前缀和后缀比较新旧列表，只通知变化的行；
+    超过max_rows的问题折叠为一行“还有 N 个问题”。
+    """
+    HEADERS = ["文件", "行", "列", "严重程度", "信息"]
+    SEVERITY_NAMES = {"error": "错误", "warning": "警告"}
+    SEVERITY_COLORS = {"error": Qt.GlobalColor.red, "warning": Qt.GlobalColor.darkYellow}
+    MORE = "more"  # “还有 N 个问题”汇总行的严重程度标记
+    # 按列排序的关键字
+    SORT_KEYS = [
+        itemgetter(0, 1),
+        itemgetter(0, 1),
+        itemgetter(1, 0),
+        lambda problem: (problem[3] != "error", problem[0], problem[1]),
+        itemgetter(2, 0, 1),
+    ]
+    # 修复建议，按顺序匹配信息中的关键字
+    SUGGESTIONS = [
+        ("未闭合", "检查并添加缺失的闭合符号"),
+        ("括号不匹配", "检查括号配对"),
+        ("缺少分号", "在行尾添加分号"),
+        ("可能应该使用==", "将 = 替换为 =="),
+        ("未初始化", "初始化变量或分配默认值"),
+        ("无效的", "检查语法或拼写"),
+        ("缩进问题", "检查缩进是否一致"),
+        ("print ", "使用 print() 函数"),
+    ]
+    
+    def __init__(self, parent=None, max_rows=1000):
+        super().__init__(parent)
+        self.problems = []  # 全部问题 (行, 列, 信息, 严重程度)
+        self.rows = []  # 过滤、排序并截断后显示的问题
+        self.file_name = ""
+        self.max_rows = max_rows
+        self.severities = {"error", "warning"}  # 显示的严重程度
+        self.sort_column = 3
+        self.sort_order = Qt.SortOrder.AscendingOrder
+        self.detail_cache = {}  # 信息 -> 带修复建议的信息
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+    
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+    
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        line, col, msg, severity = self.rows[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if severity == self.MORE:
+                return msg if column == 4 else ""
+            if column == 0:
+                return self.file_name
+            if column == 1:
+                return line
+            if column == 2:
+                return col
+            if column == 3:
+                return self.SEVERITY_NAMES.get(severity, severity)
+            return self.detailed_message(msg)
+        if role == Qt.ItemDataRole.ForegroundRole:
+            color = self.SEVERITY_COLORS.get(severity)
+            return QColor(color) if color is not None else None
+        if role == Qt.ItemDataRole.ToolTipRole and severity != self.MORE:
+            return f"ERR_{severity.upper()}_{line}_{col}: {self.detailed_message(msg)}"
+        return None
+    
+    def detailed_message(self, msg):
+        """附加修复建议，只在显示时计算并按信息缓存"""
+        detailed = self.detail_cache.get(msg)
+        if detailed is None:
+            detailed = msg
+            for keyword, suggestion in self.SUGGESTIONS:
+                if keyword in msg:
+                    detailed = f"{msg} (修复建议: {suggestion})"
+                    break
+            if len(self.detail_cache) > 4096:
+                self.detail_cache.clear()
+            self.detail_cache[msg] = detailed
+        return detailed
+    
+    def problem_at(self, row):
+        """返回第row行的问题，汇总行返回None"""
+        if 0 <= row < len(self.rows) and self.rows[row][3] != self.MORE:
+            return self.rows[row]
+        return None
+    
+    def set_problems(self, problems, file_name=""):
+        """设置新的问题列表"""
+        self.problems = problems
+        if file_name != self.file_name:
+            self.file_name = file_name
+            if self.rows:
+                self.dataChanged.emit(self.index(0, 0), self.index(len(self.rows) - 1, 0))
+        self.refresh()
+    
+    def set_severities(self, severities):
+        """设置显示的严重程度"""
+        self.severities = set(severities)
+        self.refresh()
+    
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self.sort_column = column
+        self.sort_order = order
+        self.refresh()
+    
+    def build_rows(self):
+        """按过滤条件、排序和上限生成显示的行"""
+        rows = self.problems
+        if not self.severities.issuperset(("error", "warning")):
+            rows = [problem for problem in rows if problem[3] in self.severities]
+        key = self.SORT_KEYS[self.sort_column]
+        descending = self.sort_order == Qt.SortOrder.DescendingOrder
+        hidden = len(rows) - self.max_rows
+        if hidden <= 0:
+            return sorted(rows, key=key, reverse=descending)
+        # 只需要前max_rows个，不必对全部问题排序
+        select = heapq.nlargest if descending else heapq.nsmallest
+        rows = select(self.max_rows, rows, key=key)
+        rows.append((0, 0, f"… 还有 {hidden} 个问题未显示", self.MORE))
+        return rows
+    
+    def refresh(self):
+        """重新生成显示的行，只通知发生变化的部分"""
+        old_rows = self.rows
+        new_rows = self.build_rows()
+        limit = min(len(old_rows), len(new_rows))
+        
+        # 新旧列表的公共前缀和公共后缀保持不变
+        prefix = 0
+        while prefix < limit and old_rows[prefix] == new_rows[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old_rows[-1 - suffix] == new_rows[-1 - suffix]:
+            suffix += 1
+        old_end = len(old_rows) - suffix
+        new_end = len(new_rows) - suffix
+        changed_end = min(old_end, new_end)
+        
+        # 多出或缺少的行作为插入或删除通知，其余变化的行原地更新
+        if old_end > new_end:
+            self.beginRemoveRows(QModelIndex(), new_end, old_end - 1)
+            self.rows = new_rows
+            self.endRemoveRows()
+        elif new_end > old_end:
+            self.beginInsertRows(QModelIndex(), old_end, new_end - 1)
+            self.rows = new_rows
+            self.endInsertRows()
+        else:
+            self.rows = new_rows
+        if changed_end > prefix:
+            self.dataChanged.emit(self.index(prefix, 0), self.index(changed_end - 1, len(self.HEADERS) - 1))
+    
+    def counts(self):
+        """返回全部问题中的错误数和警告数"""
+        error_count = sum(1 for problem in self.problems if problem[3] == "error")
+        return error_count, len(self.problems) - error_count
+
+
+class ChunkedFileLoader(QObject):
+    """分块把大文件载入编辑器
+
+    每次定时器触发只读取一块原始字节并直接追加到Scintilla文档，两块之间界面可以处理事件。
+    Python端只持有当前这一块，不需要把整个文件解码成字符串再转换给编辑器。
+    """
+    CHUNK_SIZE = 4 * 1024 * 1024
+    progress = pyqtSignal(int)  # 已加载的百分比
+    finished = pyqtSignal(bool, str)  # 是否成功, 错误信息
+    
+    def __init__(self, editor, file_path, parent=None):
+        super().__init__(parent)
+        self.editor = editor
+        self.file_path = file_path
+        self.file = None
+        self.total = 0
+        self.loaded = 0
+        self.event_mask = 0
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.load_chunk)
+    
+    def start(self):
+        """打开文件并开始加载"""
+        self.file = open(self.file_path, 'rb')
+        self.total = os.fstat(self.file.fileno()).st_size
+        # 加载期间不记录撤销信息，否则撤销缓冲区会再保存一份文件内容
+        self.editor.SendScintilla(QsciScintilla.SCI_SETUNDOCOLLECTION, 0)
+        # 加载期间关闭修改通知，每次追加的通知处理开销随文档增大而增长
+        self.event_mask = self.editor.SendScintilla(QsciScintilla.SCI_GETMODEVENTMASK)
+        self.editor.SendScintilla(QsciScintilla.SCI_SETMODEVENTMASK, 0)
+        # 加载完成前不允许编辑
+        self.editor.setReadOnly(True)
+        self.timer.start(0)
+    
+    def load_chunk(self):
+        """读取并追加一块内容"""
+        try:
+            chunk = self.file.read(self.CHUNK_SIZE)
+        except OSError as e:
+            self.finish(False, str(e))
+            return
+        if not chunk:
+            self.finish(True, "")
+            return
+        if self.loaded == 0:
+            # 一次分配好整个文档的空间，避免文档增长时反复重新分配并复制；
+            # 放在第一次定时器触发时执行，先让标签页和进度条显示出来
+            self.editor.SendScintilla(QsciScintilla.SCI_ALLOCATE, self.total + 1)
+        # 只读状态会拒绝所有修改，追加时临时解除
+        self.editor.setReadOnly(False)
+        self.editor.SendScintilla(QsciScintilla.SCI_APPENDTEXT, len(chunk), chunk)
+        self.editor.setReadOnly(True)
+        self.loaded += len(chunk)
+        self.progress.emit(self.loaded * 100 // self.total if self.total else 100)
+    
+    def cancel(self):
+        """取消加载（标签页被关闭时），不再访问编辑器"""
+        self.timer.stop()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+    
+    def finish(self, ok, error):
+        """结束加载，恢复撤销记录和可编辑状态"""
+        self.timer.stop()
+        self.file.close()
+        self.file = None
+        self.editor.SendScintilla(QsciScintilla.SCI_SETMODEVENTMASK, self.event_mask)
+        self.editor.SendScintilla(QsciScintilla.SCI_SETUNDOCOLLECTION, 1)
+        self.editor.SendScintilla(QsciScintilla.SCI_EMPTYUNDOBUFFER)
+        self.editor.setReadOnly(False)
+        self.editor.setModified(False)
+        self.finished.emit(ok, error)
+
+
+class FileSaveSignals(QObject):
+    """保存任务信号，由后台线程发出，在GUI线程处理"""
+    # 编辑器, 文件路径, 文本版本号, 是否成功, 错误信息, 写入字节数, 耗时（秒）
+    finished = pyqtSignal(object, str, int, bool, str, int, float)
+
+
+class FileSaveTask(QRunnable):
+    """后台保存任务，把文本快照原子地写入文件
+
+    先写入同目录下的临时文件并fsync，再用os.replace替换原文件，
+    写入过程中崩溃或出错时原文件保持不变。成功后删除对应的.autosave文件和编辑日志。
+    """
+    def __init__(self, text, file_path, editor, generation, signals, recovery=None):
+        super().__init__()
+        self.text = text
+        self.file_path = file_path
+        self.editor = editor
+        self.generation = generation
+        self.signals = signals
+        self.recovery = recovery
+    
+    def run(self):
+        start = time.perf_counter()
+        size = 0
+        try:
+            data = self.text.encode('utf-8')
+            self.text = None
+            size = len(data)
+            self.write_atomic(self.file_path, data)
+            autosave_path = self.file_path + ".autosave"
+            for path in (autosave_path, AutosaveJournal.journal_path(autosave_path)):
+                if os.path.exists(path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            if self.recovery is not None:
+                self.recovery.remove(self.file_path)
+        except Exception as e:
+            # 错误信息中不显示临时文件的路径
+            error = e.strerror if isinstance(e, OSError) and e.strerror else str(e)
+            self.signals.finished.emit(self.editor, self.file_path, self.generation, False, error,
+                                       size, time.perf_counter() - start)
+            return
+        self.signals.finished.emit(self.editor, self.file_path, self.generation, True, "",
+                                   size, time.perf_counter() - start)
+    
+    @staticmethod
+    def write_atomic(file_path, data):
+        """写入临时文件后原子替换目标文件"""
+        # 符号链接保存到链接指向的文件，保留链接本身
+        target = os.path.realpath(file_path)
+        directory = os.path.dirname(target)
+        temp_path = os.path.join(directory, f".{os.path.basename(target)}.{os.getpid()}.{threading.get_ident()}.tmp")
+        # 新文件的权限由umask决定，已有文件保留原来的权限
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+        try:
+            try:
+                view = memoryview(data)
+                while view:
+                    written = os.write(fd, view)
+                    view = view[written:]
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            if os.path.exists(target):
+                os.chmod(temp_path, os.stat(target).st_mode & 0o7777)
+            os.replace(temp_path, target)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        # 同步目录项，保证重命名在断电后仍然有效（Windows不支持打开目录）
+        if os.name != 'nt':
+            try:
+                dir_fd = os.open(directory, os.O_RDONLY)
+            except OSError:
+                return
+            try:
+                os.fsync(dir_fd)
+            except OSError:
+                pass
+            finally:
+                os.close(dir_fd)
+
+
+class AutosaveJournal:
+    """自动保存的编辑日志
+
+    <文件>.autosave 保存某一时刻的完整内容，<文件>.autosave.journal 在其后
+    追加记录Scintilla的插入/删除操作（UTF-8字节位置），恢复时在完整内容上重放。
+    日志头记录完整内容的哈希，与当前.autosave不匹配的日志会被忽略；
+    崩溃时写了一半的最后一条记录也会被忽略。
+    """
+    HEADER = b"MYIDE-JOURNAL 1\n"
+    RECORD = struct.Struct('<cQQ')  # 操作类型, 字节位置, 长度；插入操作后跟插入的字节
+    
+    @staticmethod
+    def journal_path(autosave_path):
+        return autosave_path + ".journal"
+    
+    @classmethod
+    def header(cls, base):
+        """完整内容对应的日志头"""
+        return cls.HEADER + hashlib.blake2b(base, digest_size=16).digest()
+    
+    @staticmethod
+    def record(ops, op, position, data=None, length=0):
+        """添加一条操作，连续输入和连续退格合并为一条，返回新增的字节数"""
+        if ops:
+            last_op, last_position, last_data, last_length = ops[-1]
+            if op == b'I' and last_op == b'I' and position == last_position + len(last_data):
+                ops[-1] = (b'I', last_position, last_data + data, 0)
+                return len(data)
+            if op == b'D' and last_op == b'D' and position + length == last_position:
+                ops[-1] = (b'D', position, None, last_length + length)
+                return 0
+        ops.append((op, position, data, length))
+        return AutosaveJournal.RECORD.size + (len(data) if data is not None else 0)
+    
+    @classmethod
+    def encode(cls, ops):
+        """把操作列表编码为日志记录"""
+        parts = []
+        for op, position, data, length in ops:
+            if op == b'I':
+                parts.append(cls.RECORD.pack(op, position, len(data)))
+                parts.append(data)
+            else:
+                parts.append(cls.RECORD.pack(op, position, length))
+        return b''.join(parts)
+    
+    @classmethod
+    def replay(cls, base, journal):
+        """在完整内容上重放日志，返回(内容, 重放的操作数)"""
+        header = cls.header(base)
+        if not journal.startswith(header):
+            return base, 0
+        content = bytearray(base)
+        pos = len(header)
+        count = 0
+        while pos + cls.RECORD.size <= len(journal):
+            op, position, length = cls.RECORD.unpack_from(journal, pos)
+            pos += cls.RECORD.size
+            if position > len(content):
+                break
+            if op == b'I':
+                if pos + length > len(journal):
+                    break
+                content[position:position] = journal[pos:pos + length]
+                pos += length
+            elif op == b'D':
+                del content[position:position + length]
+            else:
+                break
+            count += 1
+        return bytes(content), count
+    
+    @classmethod
+    def read(cls, autosave_path):
+        """读取自动保存的内容，存在编辑日志时重放，返回(文本, 重放的操作数)"""
+        with open(autosave_path, 'rb') as f:
+            base = f.read()
+        count = 0
+        journal_path = cls.journal_path(autosave_path)
+        if os.path.exists(journal_path):
+            with open(journal_path, 'rb') as f:
+                base, count = cls.replay(base, f.read())
+        return base.decode('utf-8', errors='replace'), count
+
+
+class RecoveryIndex:
+    """崩溃恢复索引，记录所有存在自动保存文件的原文件
+
+    保存在用户状态目录下的JSON Lines文件中，每行一条put或remove记录，只追加写入；
+    启动时按顺序读取得到当前条目，不需要扫描磁盘查找.autosave文件。
+    自动保存和保存任务在后台线程更新索引，所以用锁保护。
+    """
+    FILE_NAME = "recovery.jsonl"
+    
+    def __init__(self, path=None):
+        self.path = path or os.path.join(self.state_dir(), self.FILE_NAME)
+        self.entries = {}  # 原文件绝对路径 -> 条目
+        self.line_count = 0
+        self.lock = threading.Lock()
+        self.load()
+    
+    @staticmethod
+    def state_dir():
+        """每个用户的状态目录"""
+        if os.name == 'nt':
+            base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+            return os.path.join(base, "MyIDE")
+        base = os.environ.get("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state")
+        return os.path.join(base, "myide")
+    
+    def load(self):
+        """读取索引文件，损坏的行跳过"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError:
+            return
+        for line in lines:
+            try:
+                record = json.loads(line)
+                self.apply(record)
+            except (ValueError, KeyError, TypeError):
+                continue
+        self.line_count = len(lines)
+    
+    def apply(self, record):
+        if record["op"] == "put":
+            self.entries[record["path"]] = record
+        elif record["op"] == "remove":
+            self.entries.pop(record["path"], None)
+    
+    def append(self, record):
+        """追加一条记录，调用方需持有锁"""
+        self.apply(record)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.line_count += 1
+        except OSError:
+            pass
+    
+    def put(self, file_path, autosave_path, digest=None, full=True):
+        """记录一次自动保存，只追加日志时沿用上次完整保存的哈希"""
+        path = os.path.abspath(file_path)
+        with self.lock:
+            if digest is None and path in self.entries:
+                digest = self.entries[path].get("hash")
+            self.append({"op": "put", "path": path, "autosave": os.path.abspath(autosave_path),
+                         "time": time.time(), "hash": digest, "journal": not full})
+    
+    def remove(self, file_path):
+        """原文件已保存或自动保存已处理，删除条目"""
+        path = os.path.abspath(file_path)
+        with self.lock:
+            if path in self.entries:
+                self.append({"op": "remove", "path": path})
+    
+    def pending(self):
+        """返回自动保存文件仍然存在的条目，按时间从新到旧排列
+
+        自动保存文件已不存在的条目被清理；记录行数远多于条目数时重写索引文件。
+        """
+        with self.lock:
+            stale = [path for path, entry in self.entries.items() if not os.path.exists(entry["autosave"])]
+            for path in stale:
+                del self.entries[path]
+            if stale or self.line_count > 4 * len(self.entries) + 64:
+                self.compact()
+            return sorted(self.entries.values(), key=lambda entry: entry["time"], reverse=True)
+    
+    def compact(self):
+        """只保留当前条目重写索引文件，调用方需持有锁"""
+        data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in self.entries.values())
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            FileSaveTask.write_atomic(self.path, data.encode('utf-8'))
+            self.line_count = len(self.entries)
+        except OSError:
+            pass
+
+
+class AutosaveSignals(QObject):
+    """自动保存任务信号"""
+    # 原文件路径, 是否完整保存, 是否成功, 错误信息, 写入字节数, 耗时（秒）
+    finished = pyqtSignal(str, bool, bool, str, int, float)
+
+
+class AutosaveTask(QRunnable):
+    """后台自动保存任务
+
+    指定text时写入完整内容（journal为True时同时开始新的编辑日志，否则删除旧日志），
+    指定records时把编码好的操作追加到编辑日志。
+    """
+    def __init__(self, file_path, signals, text=None, journal=False, records=None, recovery=None):
+        super().__init__()
+        self.file_path = file_path
+        self.signals = signals
+        self.text = text
+        self.journal = journal
+        self.records = records
+        self.recovery = recovery
+    
+    def run(self):
+        start = time.perf_counter()
+        autosave_path = self.file_path + ".autosave"
+        journal_path = AutosaveJournal.journal_path(autosave_path)
+        full = self.text is not None
+        size = 0
+        digest = None
+        try:
+            if full:
+                data = self.text.encode('utf-8')
+                self.text = None
+                size = len(data)
+                digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+                FileSaveTask.write_atomic(autosave_path, data)
+                if self.journal:
+                    FileSaveTask.write_atomic(journal_path, AutosaveJournal.header(data))
+                elif os.path.exists(journal_path):
+                    os.remove(journal_path)
+            else:
+                size = len(self.records)
+                with open(journal_path, 'ab') as f:
+                    f.write(self.records)
+                    f.flush()
+                    os.fsync(f.fileno())
+            if self.recovery is not None:
+                self.recovery.put(self.file_path, autosave_path, digest, full)
+        except Exception as e:
+            error = e.strerror if isinstance(e, OSError) and e.strerror else str(e)
+            self.signals.finished.emit(self.file_path, full, False, error, size, time.perf_counter() - start)
+            return
+        self.signals.finished.emit(self.file_path, full, True, "", size, time.perf_counter() - start)
+
+
+class SparseLineIndex:
+    """映射文件的稀疏行索引
+
+    每隔约STEP字节记录一个行首偏移和它的行号，只占用很少的内存；
+    定位某一行时先二分查找最近的记录点，再向后最多扫描STEP字节。
+    索引在后台线程中建立，界面线程可以同时使用已建立的部分。
+    """
+    STEP = 64 * 1024
+    READ_SIZE = 4 * 1024 * 1024
+    
+    def __init__(self, data):
+        self.data = data
+        self.size = len(data)
+        self.offsets = array('Q', [0])  # 记录点的行首偏移
+        self.lines = array('Q', [0])  # 记录点的行号（从0开始）
+        self.indexed_bytes = 0  # 已扫描的字节数
+        self.line_count = 1  # 目前可以定位的行数
+        self.complete = self.size == 0
+        self.cancelled = False
+    
+    def build(self, report):
+        """扫描整个文件建立索引，每读取一块调用一次report()"""
+        data = self.data
+        counted = 0  # 换行符已统计到的位置
+        line = 0  # counted之前的换行符个数
+        for base in range(0, self.size, self.READ_SIZE):
+            if self.cancelled:
+                return
+            block = data[base:base + self.READ_SIZE]
+            # 上一块最后一个记录点之后没有换行符
+            start = max(counted - base, 0)
+            for step in range(0, len(block), self.STEP):
+                newline = block.rfind(b'\n', step, step + self.STEP)
+                if newline == -1 or newline < start:
+                    continue
+                line += block.count(b'\n', start, newline + 1)
+                start = newline + 1
+                if start + base < self.size:
+                    # 先追加偏移再追加行号，读取方按行号查找时偏移一定已存在
+                    self.offsets.append(start + base)
+                    self.lines.append(line)
+            counted = start + base
+            self.indexed_bytes = base + len(block)
+            self.line_count = line + 1
+            report()
+        self.line_count = line + 1
+        self.indexed_bytes = self.size
+        self.complete = True
+        report()
+    
+    def line_offset(self, line):
+        """返回某一行的行首偏移，尚未建立索引时返回None"""
+        if line >= self.line_count:
+            return None
+        i = bisect_right(self.lines, line) - 1
+        position = self.offsets[i]
+        find = self.data.find
+        for _ in range(line - self.lines[i]):
+            newline = find(b'\n', position)
+            if newline == -1:
+                return None
+            position = newline + 1
+        return position
     
-    def eventFilter(self, obj, event):
-        """事件过滤器，处理命令历史导航"""
-        from PyQt6.QtCore import Qt
-        
-        if obj == self.input_line and event.type() == event.Type.KeyPress:
-            if event.key() == Qt.Key.Key_Up:
-                # 向上导航历史
-                if self.history_index > 0:
-                    self.history_index -= 1
-                    self.input_line.setText(self.history[self.history_index])
-                    return True
-            elif event.key() == Qt.Key.Key_Down:
-                # 向下导航历史
-                if self.history_index < len(self.history) - 1:
-                    self.history_index += 1
-                    self.input_line.setText(self.history[self.history_index])
-                    return True
-                else:
-                    # 到达历史末尾，清空输入
-                    self.history_index = len(self.history)
-                    self.input_line.clear()
-                    return True
-        
-        # 其他事件，调用默认处理
-        return super().eventFilter(obj, event)
+    def line_of_offset(self, offset):
+        """返回偏移所在的行号，尚未建立索引时返回None"""
+        if offset >= self.indexed_bytes and not self.complete:
+            return None
+        i = bisect_right(self.offsets, offset) - 1
+        return self.lines[i] + self.data[self.offsets[i]:offset].count(b'\n')
     
-    def start_process(self):
-        """启动终端进程"""
-        self.process = QProcess(self)
-        self.process.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
-        
-        # 连接信号
-        self.process.readyReadStandardOutput.connect(self.read_output)
-        self.process.readyReadStandardError.connect(self.read_error)
-        self.process.finished.connect(self.process_finished)
-        
-        # 启动shell - 使用NoLogo选项隐藏PowerShell启动信息
-        if sys.platform == "win32":
-            self.process.start("powershell.exe", ["-NoLogo"])
-        else:
-            self.process.start("bash")
+    def read_lines(self, first, count, max_bytes):
+        """读取从first开始的count行，每行最多max_bytes字节"""
+        position = self.line_offset(first)
+        result = []
+        if position is None:
+            return result
+        data = self.data
+        count = min(count, self.line_count - first)
+        for _ in range(count):
+            newline = data.find(b'\n', position)
+            end = self.size if newline == -1 else newline
+            result.append(data[position:min(end, position + max_bytes)])
+            if newline == -1:
+                break
+            position = newline + 1
+        return result
+
+
+class MappedFileSignals(QObject):
+    """映射文件查看器的后台任务信号"""
+    index_progress = pyqtSignal()
+    search_finished = pyqtSignal(int, int)  # 搜索序号, 匹配偏移（-1表示未找到）
+
+
+class LineIndexTask(QRunnable):
+    """后台建立行索引"""
+    def __init__(self, index, signals):
+        super().__init__()
+        self.index = index
+        self.signals = signals
     
-    def read_output(self):
-        """读取标准输出"""
+    def run(self):
         try:
-            # 尝试使用UTF-8解码
-            output = self.process.readAllStandardOutput().data().decode('utf-8')
-        except UnicodeDecodeError:
-            # 如果UTF-8失败，尝试使用GBK解码（Windows默认编码）
-            try:
-                output = self.process.readAllStandardOutput().data().decode('gbk')
-            except UnicodeDecodeError:
-                # 如果都失败，使用替换字符
-                output = self.process.readAllStandardOutput().data().decode('utf-8', errors='replace')
-        
-        # 显示输出
-        self.output.insertPlainText(output)
-        self.output.ensureCursorVisible()
+            self.index.build(self.signals.index_progress.emit)
+        except (ValueError, OSError):
+            # 文件在查看器关闭后被释放
+            pass
+
+
+class MappedSearchTask(QRunnable):
+    """后台在映射文件中查找文本，分窗口查找，每次只占用很短时间"""
+    WINDOW = 16 * 1024 * 1024
     
-    def read_error(self):
-        """读取标准错误"""
+    def __init__(self, data, pattern, start, serial, signals, viewer):
+        super().__init__()
+        self.data = data
+        self.pattern = pattern
+        self.start = start
+        self.serial = serial
+        self.signals = signals
+        self.viewer = viewer
+    
+    def find_range(self, start, end):
+        overlap = len(self.pattern) - 1
+        for window in range(start, end, self.WINDOW):
+            if self.viewer.search_serial != self.serial:
+                return None
+            found = self.data.find(self.pattern, window, min(window + self.WINDOW + overlap, end))
+            if found != -1:
+                return found
+        return -1
+    
+    def run(self):
         try:
-            # 尝试使用UTF-8解码
-            error = self.process.readAllStandardError().data().decode('utf-8')
-        except UnicodeDecodeError:
-            # 如果UTF-8失败，尝试使用GBK解码（Windows默认编码）
-            try:
-                error = self.process.readAllStandardError().data().decode('gbk')
-            except UnicodeDecodeError:
-                # 如果都失败，使用替换字符
-                error = self.process.readAllStandardError().data().decode('utf-8', errors='replace')
-        self.output.insertPlainText(error)
-        self.output.ensureCursorVisible()
+            # 从起点查到文件末尾，再从头查到起点
+            found = self.find_range(self.start, len(self.data))
+            if found == -1:
+                found = self.find_range(0, min(self.start + len(self.pattern), len(self.data)))
+        except (ValueError, OSError):
+            return
+        if found is not None:
+            self.signals.search_finished.emit(self.serial, found)
+
+
+class MappedFileViewer(QAbstractScrollArea):
+    """基于mmap的只读文件查看器
+
+    文件通过mmap映射，不读入内存；绘制时只读取可见的行，
+    滚动和跳转只访问需要显示的页面。行索引在后台逐步建立，
+    建立完成前可以浏览已索引的部分。
+    """
+    MAX_LINE_BYTES = 16 * 1024  # 每行最多显示的字节数
     
-    def send_command(self, command):
-        """发送命令"""
-        # 保存命令到历史记录
-        self.history.append(command)
-        self.history_index = len(self.history)
-        
-        # 执行命令
-        self.process.write((command + "\n").encode())
-        self.output.ensureCursorVisible()
-        
-        # 如果是cd命令，更新当前目录
-        if command.startswith("cd "):
-            # 提取目录
-            new_dir = command[3:].strip()
-            if new_dir:
-                # 处理相对路径和绝对路径
-                if os.path.isabs(new_dir):
-                    self.current_dir = new_dir
-                else:
-                    self.current_dir = os.path.abspath(os.path.join(self.current_dir, new_dir))
-                # 确保目录存在
-                if not os.path.exists(self.current_dir):
-                    self.current_dir = os.getcwd()
+    def __init__(self, file_path, parent_ide=None):
+        super().__init__()
+        self.parent_ide = parent_ide
+        self.file_path = file_path
+        with open(file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            # 空文件不能映射
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self.index = SparseLineIndex(self.data)
+        self.current_line = 0
+        self.current_col = 0
+        self.max_columns = 0
+        self.search_pattern = b''
+        self.search_serial = 0
+        self.search_from = 0
+        self.margin_color = QColor(240, 240, 240)
+        self.current_line_color = QColor(250, 250, 200)
+        
+        font = self.font()
+        font.setFamily("Consolas")
+        font.setStyleHint(font.StyleHint.Monospace)
+        font.setPointSize(12)
+        self.setFont(font)
+        self.viewport().setBackgroundRole(QPalette.ColorRole.Base)
+        self.viewport().setAutoFillBackground(True)
+        self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
+        
+        self.signals = MappedFileSignals(self)
+        self.signals.index_progress.connect(self.on_index_progress)
+        self.signals.search_finished.connect(self.on_search_finished)
+        self.index_task = LineIndexTask(self.index, self.signals)
+        QThreadPool.globalInstance().start(self.index_task)
     
-    def process_finished(self):
-        """进程结束处理"""
-        self.output.appendPlainText("\nProcess finished.")
-        self.output.setReadOnly(True)
+    def close_file(self):
+        """停止后台任务并释放映射（由关闭标签页调用）"""
+        self.index.cancelled = True
+        self.search_serial += 1
+        self.data = b''
+    
+    def set_colors(self, background, foreground, margin, current_line):
+        """应用主题颜色"""
+        palette = self.viewport().palette()
+        palette.setColor(QPalette.ColorRole.Base, background)
+        palette.setColor(QPalette.ColorRole.Text, foreground)
+        self.viewport().setPalette(palette)
+        self.margin_color = margin
+        self.current_line_color = current_line
+        self.viewport().update()
+    
+    def line_height(self):
+        return self.fontMetrics().height()
+    
+    def visible_line_count(self):
+        return max(1, self.viewport().height() // self.line_height())
+    
+    def gutter_width(self):
+        digits = len(str(self.index.line_count))
+        return self.fontMetrics().horizontalAdvance('9' * max(digits, 3)) + 12
+    
+    def update_scrollbars(self):
+        visible = self.visible_line_count()
+        self.verticalScrollBar().setRange(0, max(0, self.index.line_count - visible))
+        self.verticalScrollBar().setPageStep(visible)
+        char_width = max(1, self.fontMetrics().horizontalAdvance('M'))
+        columns = max(1, (self.viewport().width() - self.gutter_width()) // char_width)
+        self.horizontalScrollBar().setRange(0, max(0, self.max_columns - columns))
+        self.horizontalScrollBar().setPageStep(columns)
+    
+    def on_index_progress(self):
+        """索引建立了一部分，扩大可滚动范围"""
+        self.update_scrollbars()
+        self.viewport().update()
+        if self.parent_ide is not None and self.parent_ide.tab_widget.currentWidget() is self:
+            self.update_status()
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_scrollbars()
+    
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        palette = self.viewport().palette()
+        metrics = self.fontMetrics()
+        line_height = metrics.height()
+        char_width = max(1, metrics.horizontalAdvance('M'))
+        gutter = self.gutter_width()
+        first = self.verticalScrollBar().value()
+        first_column = self.horizontalScrollBar().value()
+        columns = (self.viewport().width() - gutter) // char_width + 1
+        
+        # 只读取可见的行
+        lines = self.index.read_lines(first, self.visible_line_count() + 1, self.MAX_LINE_BYTES)
+        max_columns = self.max_columns
+        painter.setPen(palette.color(QPalette.ColorRole.Text))
+        for i, raw in enumerate(lines):
+            y = i * line_height
+            if first + i == self.current_line:
+                painter.fillRect(gutter, y, self.viewport().width() - gutter, line_height, self.current_line_color)
+            text = raw.decode('utf-8', errors='replace').rstrip('\r').expandtabs(4)
+            max_columns = max(max_columns, len(text))
+            painter.drawText(gutter + 4, y + metrics.ascent(), text[first_column:first_column + columns])
+        
+        # 行号边距
+        painter.fillRect(0, 0, gutter, self.viewport().height(), self.margin_color)
+        painter.setPen(palette.color(QPalette.ColorRole.PlaceholderText))
+        for i in range(len(lines)):
+            painter.drawText(0, i * line_height, gutter - 6, line_height,
+                             Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter, str(first + i + 1))
+        painter.end()
+        
+        # 遇到更长的行时扩大水平滚动范围
+        if max_columns != self.max_columns:
+            self.max_columns = max_columns
+            self.update_scrollbars()
+    
+    def goto_line(self, line, col=0):
+        """跳转到某一行（从0开始），超出已索引的范围时跳到已知的最后一行"""
+        line = max(0, min(line, self.index.line_count - 1))
+        self.current_line = line
+        self.current_col = col
+        visible = self.visible_line_count()
+        scroll = self.verticalScrollBar()
+        if line < scroll.value() or line >= scroll.value() + visible:
+            scroll.setValue(max(0, line - visible // 2))
+        self.viewport().update()
+        self.update_status()
+    
+    def mousePressEvent(self, event):
+        position = event.position()
+        char_width = max(1, self.fontMetrics().horizontalAdvance('M'))
+        line = self.verticalScrollBar().value() + int(position.y()) // self.line_height()
+        col = self.horizontalScrollBar().value() + max(0, int(position.x()) - self.gutter_width() - 4) // char_width
+        if line < self.index.line_count:
+            self.current_line = line
+            self.current_col = col
+            self.viewport().update()
+            self.update_status()
     
     def keyPressEvent(self, event):
-        """处理键盘事件"""
-        # 将焦点保持在输入框
-        self.input_line.setFocus()
-        super().keyPressEvent(event)
+        key = event.key()
+        modifiers = event.modifiers()
+        page = self.visible_line_count()
+        if key == Qt.Key.Key_Up:
+            self.goto_line(self.current_line - 1)
+        elif key == Qt.Key.Key_Down:
+            self.goto_line(self.current_line + 1)
+        elif key == Qt.Key.Key_PageUp:
+            self.goto_line(self.current_line - page)
+        elif key == Qt.Key.Key_PageDown:
+            self.goto_line(self.current_line + page)
+        elif key == Qt.Key.Key_Home and modifiers & Qt.KeyboardModifier.ControlModifier:
+            self.goto_line(0)
+        elif key == Qt.Key.Key_End and modifiers & Qt.KeyboardModifier.ControlModifier:
+            self.goto_line(self.index.line_count - 1)
+        elif key == Qt.Key.Key_F and modifiers & Qt.KeyboardModifier.ControlModifier:
+            self.prompt_search()
+        elif key == Qt.Key.Key_F3:
+            self.find_next()
+        else:
+            super().keyPressEvent(event)
+    
+    def prompt_search(self):
+        """输入要查找的文本"""
+        from PyQt6.QtWidgets import QInputDialog
+        text, ok = QInputDialog.getText(self, "查找", "查找内容（F3 查找下一个）:",
+                                        text=self.search_pattern.decode('utf-8', errors='replace'))
+        if ok and text:
+            self.search_pattern = text.encode('utf-8')
+            self.search_from = self.index.line_offset(self.current_line) or 0
+            self.find_next(from_current=True)
     
-    def update_current_line(self, text):
-        """更新当前行内容"""
-        cursor = self.output.textCursor()
-        cursor.movePosition(cursor.MoveOperation.StartOfLine)
-        cursor.movePosition(cursor.MoveOperation.EndOfLine, cursor.MoveMode.KeepAnchor)
-        cursor.removeSelectedText()
-        cursor.insertText(f"PS {self.current_dir}>\ {text}")
-        # 将光标移动到行尾
-        cursor.movePosition(cursor.MoveOperation.EndOfLine)
-        self.output.setTextCursor(cursor)
-        self.output.ensureCursorVisible()
+    def find_next(self, from_current=False):
+        """在后台从当前位置查找下一个匹配"""
+        if not self.search_pattern:
+            self.prompt_search()
+            return
+        if not from_current:
+            self.search_from += 1
+        self.search_serial += 1
+        task = MappedSearchTask(self.data, self.search_pattern, self.search_from, self.search_serial,
+                                self.signals, self)
+        QThreadPool.globalInstance().start(task)
+        self.show_message("正在查找...")
+    
+    def on_search_finished(self, serial, offset):
+        """查找完成，跳转到匹配所在的行"""
+        if serial != self.search_serial:
+            return
+        if offset == -1:
+            self.show_message(f"未找到: {self.search_pattern.decode('utf-8', errors='replace')}")
+            return
+        line = self.index.line_of_offset(offset)
+        if line is None:
+            self.show_message("匹配位置尚未建立索引，请稍后再试")
+            return
+        self.search_from = offset
+        line_start = self.index.line_offset(line) or 0
+        col = len(self.data[line_start:offset].decode('utf-8', errors='replace'))
+        self.goto_line(line, col)
+        self.show_message(f"找到匹配: 行 {line + 1}")
+    
+    def show_message(self, message):
+        if self.parent_ide is not None:
+            self.parent_ide.statusBar().showMessage(message)
+    
+    def update_status(self):
+        """更新共享的状态栏位置显示"""
+        if self.parent_ide is None or not hasattr(self.parent_ide, 'status_info'):
+            return
+        status_info = self.parent_ide.status_info
+        status_info["pos"].setText(f"Ln: {self.current_line + 1}, Col: {self.current_col + 1}")
+        lines = f"{self.index.line_count}" if self.index.complete else f"{self.index.line_count}+"
+        status_info["length"].setText(f"length: {self.index.size}, lines: {lines}")
+        # 状态栏改由查看器更新，编辑器下次需要重新刷新
+        self.parent_ide.last_editor_status = None
+
 
 class MyIDE(QMainWindow):
+    # 语法检查规则的版本，修改检查器后递增，使缓存中的旧结果失效
+    SYNTAX_CHECKER_VERSION = 1
+    # 超过该耗时（毫秒）的保存在状态栏中标出
+    SLOW_SAVE_MS = 500
+    # 编辑日志：未写入的操作超过该字节数时改为完整保存
+    JOURNAL_MAX_PENDING_BYTES = 4 * 1024 * 1024
+    # 日志文件超过该大小且超过文件本身大小时重新写入完整内容
+    JOURNAL_MIN_COMPACT_BYTES = 1024 * 1024
+    # 重放每条记录最多移动一次整个文件，记录数乘文件大小超过该值时重新写入完整内容
+    JOURNAL_REPLAY_BUDGET = 8 * 1024 * 1024 * 1024
+    # 大文件模式只读取文件开头用于检测语言
+    LARGE_FILE_DETECT_BYTES = 4096
+    # 快速打开索引超过该时间（秒）后，下次打开时在后台重新遍历，补上未展开目录中的变化
+    FILE_INDEX_MAX_AGE = 60
+    # 三元组索引合并文件变化的时间窗口（毫秒）
+    TRIGRAM_UPDATE_DELAY = 1000
+    
+    # C风格语言的共享扫描器
+    CPP_SCANNER = CodeScanner()
+    JAVA_SCANNER = CodeScanner()
+    JAVASCRIPT_SCANNER = CodeScanner(multiline_quotes='`')
+    CSS_SCANNER = CodeScanner(brackets='{}', line_comment=None, unclosed_message="未闭合的左括号")
+    QML_SCANNER = CodeScanner(multiline_quotes='`', report_unclosed_strings=True)
+    
+    # 预编译的关键字集合，语言规则通过集合查找完成
+    COMPOUND_OPERATOR_RE = re.compile(r'==|!=|<=|>=|\+=|-=|\*=|/=')
+    CONDITION_KEYWORDS = frozenset(['if', 'else', 'while', 'for', 'switch', 'case'])
+    CPP_STATEMENT_KEYWORDS = frozenset([
+        'if', 'else', 'for', 'while', 'do', 'switch', 'case', 'default', 'break', 'continue', 'return', 'goto',
+        'try', 'catch', 'throw', 'new', 'delete', 'class', 'struct', 'enum', 'union', 'typedef', 'namespace',
+        'using', 'template', 'extern', 'inline', 'static', 'const', 'volatile', 'mutable', 'friend', 'virtual',
+        'override', 'final', 'explicit', 'constexpr', 'consteval', 'constinit', 'noexcept', 'decltype', 'auto',
+        'declspec', '__declspec', '__attribute__'])
+    CPP_TYPE_KEYWORDS = frozenset([
+        'int', 'float', 'double', 'char', 'bool', 'short', 'long', 'unsigned', 'signed', 'void', 'auto',
+        'const', 'volatile', 'mutable', 'static', 'extern'])
+    CPP_DECLARATION_KEYWORDS = frozenset([
+        'class', 'struct', 'enum', 'union', 'typedef', 'namespace', 'using', 'template', 'friend', 'virtual',
+        'override', 'final', 'explicit', 'constexpr', 'consteval', 'constinit', 'noexcept', 'decltype',
+        'declspec', '__declspec', '__attribute__'])
+    JAVA_DECLARATION_KEYWORDS = frozenset([
+        'class', 'interface', 'enum', 'record', 'annotation', 'extends', 'implements', 'throws', 'native',
+        'abstract', 'final', 'static', 'private', 'protected', 'public', 'default', 'strictfp', 'transient',
+        'volatile', 'synchronized', 'instanceof', 'new', 'super', 'this', 'assert', 'var', 'const', 'goto'])
+    JAVA_STATEMENT_KEYWORDS = JAVA_DECLARATION_KEYWORDS | frozenset([
+        'if', 'else', 'for', 'while', 'do', 'switch', 'case', 'break', 'continue', 'return', 'throw', 'try',
+        'catch', 'finally'])
+    JAVA_TYPE_KEYWORDS = frozenset([
+        'int', 'float', 'double', 'char', 'boolean', 'short', 'long', 'byte', 'void', 'var', 'private',
+        'protected', 'public', 'static', 'final', 'abstract', 'synchronized', 'transient', 'volatile', 'native',
+        'strictfp', 'default', 'record', 'enum', 'interface', 'class'])
+    JAVA_MEMBER_KEYWORDS = frozenset([
+        'class', 'interface', 'enum', 'record', 'annotation', 'void', 'int', 'float', 'double', 'char',
+        'boolean', 'short', 'long', 'byte', 'var'])
+    JAVA_ACCESS_MODIFIERS = ('public', 'protected', 'private')
+    CSS_SELECTOR_SPECIAL = frozenset('()^$*+?.|\\!@#%&_=[]{};:"\'<>,/~`-')
+    CSS_SELECTOR_COMBINATORS = frozenset('#.>+~ *[]:=')
+    
     def __init__(self):
         super().__init__()
         self.current_file = None
@@ -327,7 +6650,54 @@ class MyIDE(QMainWindow):
         # 初始化设置
         self.settings_file = "ide_settings.json"
         self.settings = self.load_settings()
-        
+
+        # 后台语法检查线程池，单线程执行，避免多个检查互相争抢
+        self.syntax_thread_pool = QThreadPool(self)
+        self.syntax_thread_pool.setMaxThreadCount(1)
+        self.syntax_signals = SyntaxCheckSignals(self)
+        self.syntax_signals.finished.connect(self.on_syntax_check_finished)
+        # 语法检查结果缓存，所有标签页共享
+        self.syntax_cache = SyntaxResultCache()
+        
+        # 后台保存线程池，保存和自动保存共用一个线程按提交顺序写入，同一文件的多次写入不会乱序
+        self.save_thread_pool = QThreadPool(self)
+        self.save_thread_pool.setMaxThreadCount(1)
+        self.save_signals = FileSaveSignals(self)
+        self.save_signals.finished.connect(self.on_save_finished)
+        self.autosave_signals = AutosaveSignals(self)
+        self.autosave_signals.finished.connect(self.on_autosave_finished)
+        # 崩溃恢复索引，记录所有目录中的自动保存文件
+        self.recovery_index = RecoveryIndex()
+        self.save_callbacks = {}  # (编辑器id, 文本版本号) -> 保存成功后执行的回调
+        
+        # 快速打开的文件索引，在后台线程中遍历工作区建立
+        self.index_thread_pool = QThreadPool(self)
+        self.index_thread_pool.setMaxThreadCount(1)
+        self.file_index_signals = FileIndexSignals(self)
+        self.file_index_signals.finished.connect(self.on_file_index_finished)
+        self.file_index_serial = count(1)
+        self.file_index = None
+        self.file_index_task = None  # 正在执行的遍历任务
+        # 终端命令历史，按工作区保存，所有终端标签页共享
+        self.command_history = None
+        self.command_history_root = None
+        self.quick_open_dialog = None
+        # 在文件中查找使用的三元组索引（可选），在后台线程中核对和更新，文件读取在查找的进程池中执行
+        self.trigram_thread_pool = QThreadPool(self)
+        self.trigram_thread_pool.setMaxThreadCount(1)
+        self.trigram_signals = TrigramIndexSignals(self)
+        self.trigram_signals.finished.connect(self.on_trigram_index_finished)
+        self.trigram_serial = count(1)
+        self.trigram_index = None
+        self.trigram_task = None
+        self.trigram_pending = set()  # 等待更新的相对路径
+        self.trigram_full_check = False  # 等待遍历整个工作区核对
+        # 合并短时间内的多次变化（如git checkout），只启动一次更新任务
+        self.trigram_timer = QTimer(self)
+        self.trigram_timer.setSingleShot(True)
+        self.trigram_timer.setInterval(self.TRIGRAM_UPDATE_DELAY)
+        self.trigram_timer.timeout.connect(self.flush_trigram_updates)
+
         self.initUI()
         self.init_auto_save()
         
@@ -357,6 +6727,25 @@ class MyIDE(QMainWindow):
         open_action.triggered.connect(self.open_file)
         file_menu.addAction(open_action)
         
+        quick_open_action = QAction("快速打开...", self)
+        quick_open_action.setShortcut("Ctrl+P")
+        quick_open_action.triggered.connect(self.quick_open)
+        file_menu.addAction(quick_open_action)
+        
+        view_file_action = QAction("只读查看...", self)
+        view_file_action.setShortcut("Ctrl+Shift+O")
+        view_file_action.triggered.connect(self.view_file)
+        file_menu.addAction(view_file_action)
+        
+        open_folder_action = QAction("打开文件夹...", self)
+        open_folder_action.setShortcut("Ctrl+K")
+        open_folder_action.triggered.connect(self.open_workspace)
+        file_menu.addAction(open_folder_action)
+        
+        close_folder_action = QAction("关闭文件夹", self)
+        close_folder_action.triggered.connect(self.close_workspace)
+        file_menu.addAction(close_folder_action)
+        
         save_action = QAction("保存", self)
         save_action.setShortcut("Ctrl+S")
         save_action.triggered.connect(self.save_file)
@@ -385,6 +6774,16 @@ class MyIDE(QMainWindow):
         redo_action.triggered.connect(self.redo)
         edit_menu.addAction(redo_action)
         
+        goto_line_action = QAction("跳转到行...", self)
+        goto_line_action.setShortcut("Ctrl+G")
+        goto_line_action.triggered.connect(self.goto_line)
+        edit_menu.addAction(goto_line_action)
+        
+        find_in_files_action = QAction("在文件中查找...", self)
+        find_in_files_action.setShortcut("Ctrl+Shift+F")
+        find_in_files_action.triggered.connect(self.show_find_in_files)
+        edit_menu.addAction(find_in_files_action)
+        
         # 设置菜单
         settings_menu = menubar.addMenu("设置")
         
@@ -399,7 +6798,7 @@ class MyIDE(QMainWindow):
         
         self.check_syntax_action = QAction("检查语法", self)
         self.check_syntax_action.setShortcut("F7")
-        self.check_syntax_action.triggered.connect(self.check_syntax)
+        self.check_syntax_action.triggered.connect(lambda: self.check_syntax())
         self.check_menu.addAction(self.check_syntax_action)
         
         # 视图菜单
@@ -433,10 +6832,17 @@ class MyIDE(QMainWindow):
         # 添加Python运行按钮
         self.run_python_action = QAction("运行Python文件", self)
         self.run_python_action.setShortcut("F6")
-        self.run_python_action.triggered.connect(self.run_python_file)
+        self.run_python_action.triggered.connect(lambda: self.run_python_file())
         self.toolbar.addAction(self.run_python_action)
         self.run_python_action.setVisible(False)  # 默认隐藏
         
+        # 使用cProfile运行，结束后显示热点函数
+        self.profile_python_action = QAction("使用cProfile运行", self)
+        self.profile_python_action.setShortcut("Shift+F6")
+        self.profile_python_action.triggered.connect(lambda: self.run_python_file(profile=True))
+        self.toolbar.addAction(self.profile_python_action)
+        self.profile_python_action.setVisible(False)  # 默认隐藏
+        
         # 语言菜单 - 实现层级结构
         self.language_menu = menubar.addMenu("语言")
         
@@ -486,7 +6892,14 @@ class MyIDE(QMainWindow):
         self.resource_dock = QDockWidget("资源管理器", self)
         self.resource_dock.setAllowedAreas(Qt.DockWidgetArea.LeftDockWidgetArea | Qt.DockWidgetArea.RightDockWidgetArea)
         self.resource_explorer = ResourceExplorer(self)
+        self.resource_explorer.entries_changed.connect(self.on_explorer_entries_changed)
         self.resource_dock.setWidget(self.resource_explorer)
+        # 恢复上次打开的工作区
+        workspace_root = self.settings.get("workspace_root")
+        if workspace_root and os.path.isdir(workspace_root):
+            self.resource_explorer.set_workspace(workspace_root)
+            self.setWindowTitle(f"MyIDE - {os.path.basename(workspace_root)}")
+            self.reset_file_index()
         self.addDockWidget(Qt.DockWidgetArea.LeftDockWidgetArea, self.resource_dock)
         
         # 创建终端停靠窗口
@@ -546,14 +6959,59 @@ class MyIDE(QMainWindow):
         self.statusBar().addPermanentWidget(QLabel("语言: "))
         self.statusBar().addPermanentWidget(self.current_language_label)
         
+        # 大文件加载进度
+        self.file_load_progress = QProgressBar()
+        self.file_load_progress.setRange(0, 100)
+        self.file_load_progress.setFormat("加载 %p%")
+        self.file_load_progress.setMaximumWidth(160)
+        self.file_load_progress.hide()
+        self.statusBar().addPermanentWidget(self.file_load_progress)
+        
+        # 语法检查缓存命中统计
+        self.status_info["syntax_cache"] = QLabel("缓存: 0/0")
+        self.status_info["syntax_cache"].setToolTip("语法检查缓存 命中/未命中")
+        self.statusBar().addPermanentWidget(self.status_info["syntax_cache"])
+        
         # 创建问题选项卡
         self.problems_dock = QDockWidget("问题", self)
         self.problems_dock.setAllowedAreas(Qt.DockWidgetArea.BottomDockWidgetArea | Qt.DockWidgetArea.RightDockWidgetArea)
         
-        # 创建问题列表
-        self.problems_list = QListWidget()
-        self.problems_list.setStyleSheet("font-family: Consolas, monospace;")
-        self.problems_dock.setWidget(self.problems_list)
+        # 创建问题列表，由模型提供数据，视图只绘制可见的行
+        problems_widget = QWidget()
+        problems_layout = QVBoxLayout(problems_widget)
+        problems_layout.setContentsMargins(0, 0, 0, 0)
+        problems_layout.setSpacing(2)
+        
+        # 按严重程度过滤
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("显示:"))
+        self.problems_filter_combo = QComboBox()
+        self.problems_filter_combo.addItems(["全部", "仅错误", "仅警告"])
+        self.problems_filter_combo.currentIndexChanged.connect(self.apply_problems_filter)
+        filter_layout.addWidget(self.problems_filter_combo)
+        filter_layout.addStretch()
+        problems_layout.addLayout(filter_layout)
+        
+        self.problems_model = ProblemTableModel(self, self.settings.get("problems_max_rows", 1000))
+        self.problems_editor = None  # 问题列表对应的编辑器
+        self.problems_view = QTableView()
+        self.problems_view.setModel(self.problems_model)
+        self.problems_view.setStyleSheet("font-family: Consolas, monospace;")
+        self.problems_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.problems_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.problems_view.setShowGrid(False)
+        self.problems_view.setWordWrap(False)
+        self.problems_view.verticalHeader().hide()
+        # 固定行高，滚动时不需要逐行计算尺寸
+        self.problems_view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.problems_view.verticalHeader().setDefaultSectionSize(self.problems_view.fontMetrics().height() + 6)
+        self.problems_view.horizontalHeader().setStretchLastSection(True)
+        self.problems_view.setSortingEnabled(True)
+        self.problems_view.sortByColumn(3, Qt.SortOrder.AscendingOrder)
+        self.problems_view.doubleClicked.connect(self.jump_to_problem)
+        problems_layout.addWidget(self.problems_view)
+        self.problems_dock.setWidget(problems_widget)
+        self.apply_problems_filter()
         
         # 添加问题选项卡
         self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.problems_dock)
@@ -561,8 +7019,28 @@ class MyIDE(QMainWindow):
         # 默认隐藏问题选项卡
         self.problems_dock.hide()
         
-        # 添加视图菜单选项，用于显示/隐藏问题选项卡
+        # 创建在文件中查找面板
+        self.find_dock = QDockWidget("查找", self)
+        self.find_dock.setAllowedAreas(Qt.DockWidgetArea.BottomDockWidgetArea | Qt.DockWidgetArea.RightDockWidgetArea)
+        self.find_panel = FindInFilesPanel(self)
+        self.find_dock.setWidget(self.find_panel)
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.find_dock)
+        self.find_dock.hide()
+        
+        # 创建运行面板，脚本在单独的进程中运行
+        self.run_dock = QDockWidget("运行", self)
+        self.run_dock.setAllowedAreas(Qt.DockWidgetArea.BottomDockWidgetArea | Qt.DockWidgetArea.RightDockWidgetArea)
+        self.run_panel = RunPanel(self, scrollback_lines=self.settings.get("terminal_scrollback_lines", 100000),
+                                  encoding=self.settings.get("terminal_encoding", "utf-8"),
+                                  errors=self.settings.get("terminal_encoding_errors", "gbk"))
+        self.run_dock.setWidget(self.run_panel)
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.run_dock)
+        self.run_dock.hide()
+        
+        # 添加视图菜单选项，用于显示/隐藏问题选项卡、查找面板和运行面板
         view_menu.addAction(self.problems_dock.toggleViewAction())
+        view_menu.addAction(self.find_dock.toggleViewAction())
+        view_menu.addAction(self.run_dock.toggleViewAction())
         
         # 创建第一个编辑器标签
         self.new_file()
@@ -575,6 +7053,11 @@ class MyIDE(QMainWindow):
         view_menu.addAction(self.resource_dock.toggleViewAction())
         view_menu.addAction(self.terminal_dock.toggleViewAction())
         
+        reveal_action = QAction("在资源管理器中显示当前文件", self)
+        reveal_action.setShortcut("Ctrl+Shift+E")
+        reveal_action.triggered.connect(self.reveal_current_file)
+        view_menu.addAction(reveal_action)
+        
         # 延迟主题设置，确保所有UI组件已经初始化
         QTimer.singleShot(100, lambda: self.apply_initial_theme())
     
@@ -592,6 +7075,11 @@ class MyIDE(QMainWindow):
                     "'": "'"
                 }
                 self.parent_ide = parent
+                # 状态栏更新合并到短定时器中，连续按键只刷新一次
+                self.status_timer = QTimer(self)
+                self.status_timer.setSingleShot(True)
+                self.status_timer.setInterval(30)
+                self.status_timer.timeout.connect(self.refresh_status)
             
             def keyPressEvent(self, event):
                 # 标记为已修改
@@ -728,17 +7216,33 @@ class MyIDE(QMainWindow):
                 self.update_status()
             
             def update_status(self):
-                # 更新光标位置
-                line, col = self.getCursorPosition()
-                if hasattr(self.parent_ide, 'status_info'):
-                    # 更新行号列号
-                    self.parent_ide.status_info["pos"].setText(f"Ln: {line+1}, Col: {col+1}")
-                    
-                    # 更新文件长度和行数
-                    text = self.text()
-                    length = len(text)
-                    lines = len(text.split('\n'))
-                    self.parent_ide.status_info["length"].setText(f"length: {length}, lines: {lines}")
+                # 请求更新状态栏，由定时器合并多次请求
+                if not self.status_timer.isActive():
+                    self.status_timer.start()
+            
+            def refresh_status(self):
+                """刷新状态栏，只使用Scintilla的O(1)查询，不复制文档内容"""
+                ide = self.parent_ide
+                if not hasattr(ide, 'status_info'):
+                    return
+                # 状态栏只显示当前标签页，后台标签页延迟触发的刷新直接忽略
+                if ide.tab_widget.currentWidget() is not self:
+                    return
+                # 光标位置和长度都没有变化时跳过，状态栏由所有标签页共享，所以记录在IDE上
+                status = (self, self.getCursorPosition(), self.length(), self.lines())
+                last = getattr(ide, 'last_editor_status', None)
+                if status == last:
+                    return
+                ide.last_editor_status = status
+                editor, (line, col), length, lines = status
+                
+                # 更新行号列号
+                if last is None or last[:2] != status[:2]:
+                    ide.status_info["pos"].setText(f"Ln: {line+1}, Col: {col+1}")
+                
+                # 更新文件长度（字节数）和行数
+                if last is None or last[0] is not self or last[2:] != status[2:]:
+                    ide.status_info["length"].setText(f"length: {length}, lines: {lines}")
         
         # 创建编辑器，传递父IDE引用
         editor = CustomEditor(self)
@@ -798,7 +7302,28 @@ class MyIDE(QMainWindow):
         # 移除下划线样式配置，简化实现，专注于问题选项卡中的详细错误信息
         
         # 添加文本改变事件监听，用于实时语法检查
-        editor.textChanged.connect(lambda: self.check_syntax(editor=editor))
+        # 每个编辑器一个防抖定时器，停止输入syntax_check_interval毫秒后才检查
+        editor.syntax_generation = 0  # 文本版本号，用于丢弃过期的检查结果
+        # 编辑版本号，每次文本改变加一，保存完成时用来判断保存期间是否又有修改
+        editor.edit_generation = 0
+        editor.textChanged.connect(lambda: setattr(editor, 'edit_generation', editor.edit_generation + 1))
+        # 自动保存状态：上次自动保存时的编辑版本号，以及编辑日志
+        editor.autosave_generation = 0
+        editor.journal_base = False  # 已写入完整内容，之后的操作可以追加到日志
+        editor.journal_ops = []  # 上次自动保存之后的操作
+        editor.journal_pending = 0  # journal_ops编码后的字节数
+        editor.journal_bytes = 0  # 日志文件中已有的字节数
+        editor.journal_records = 0  # 日志文件中已有的记录数
+        editor.syntax_timer = QTimer(editor)
+        editor.syntax_timer.setSingleShot(True)
+        editor.syntax_timer.timeout.connect(lambda: self.check_syntax(editor=editor))
+        editor.textChanged.connect(lambda: self.schedule_syntax_check(editor))
+        
+        # Python增量检查：通过Scintilla修改通知记录脏行范围
+        editor.python_checker = PythonSyntaxChecker()
+        editor.SCN_MODIFIED.connect(
+            lambda position, mod_type, text, length, lines_added, *args:
+                self.on_editor_modified(editor, position, mod_type, text, length, lines_added))
         
         return editor
     
@@ -808,6 +7333,7 @@ class MyIDE(QMainWindow):
             "changes_log_opened": False,
             "theme": "light",  # 默认使用亮色模式
             "auto_save_interval": 30000,  # 30秒自动保存
+            "auto_save_journal": True,  # 自动保存时只追加编辑日志，不重写整个文件
             "show_line_numbers": True,  # 显示行号
             "show_indentation_guides": True,  # 显示缩进指南
             "show_caret_line": False,  # 显示光标行
@@ -841,13 +7367,27 @@ class MyIDE(QMainWindow):
             "syntax_check_interval": 1000,  # 语法检查间隔
             "show_warnings": True,  # 显示警告
             "show_errors": True,  # 显示错误
+            "problems_max_rows": 1000,  # 问题列表最多显示的行数
             "default_encoding": 0,  # 默认文件编码：0=UTF-8
             "auto_detect_encoding": True,  # 自动检测编码
             "add_newline_at_end": True,  # 保存时自动添加换行符
+            "large_file_threshold": 20,  # 超过该大小（MB）的文件使用大文件模式打开
+            "workspace_root": None,  # 当前工作区根目录
+            # 工作区中不显示的文件和目录，gitignore语法
+            "workspace_exclude_patterns": [".git/", "node_modules/", ".venv/", "venv/", "__pycache__/",
+                                           ".mypy_cache/", ".pytest_cache/", ".tox/", "build/", "dist/",
+                                           "*.pyc", "*.autosave", "*.autosave.journal"],
+            "workspace_use_gitignore": True,  # 同时使用工作区根目录的.gitignore
+            "search_trigram_index": False,  # 为工作区建立三元组索引，加速在文件中查找
+            "mmap_viewer_threshold": 1024,  # 超过该大小（MB）的文件用只读查看器打开
             "font_family": "Consolas",  # 字体
             "font_size": 12,  # 字体大小
             "terminal_font_size": 12,  # 终端字体大小
             "terminal_font_family": "Consolas",  # 终端字体
+            "terminal_scrollback_lines": 100000,  # 终端滚动历史最多保留的行数
+            "terminal_encoding": "utf-8",  # 终端输出的编码
+            "terminal_encoding_errors": "gbk",  # 无法解码时的处理方式：gbk（整行按GBK解码）、replace、backslashreplace
+            "terminal_pty": True,  # 在伪终端中运行shell（仅Linux）
             "resource_explorer_visible": False,  # 资源管理器可见性
             "terminal_visible": False,  # 终端可见性
             "problems_visible": False,  # 问题选项卡可见性
@@ -871,7 +7411,8 @@ class MyIDE(QMainWindow):
         if os.path.exists(self.settings_file):
             try:
                 with open(self.settings_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    # 旧版本的设置文件没有的项使用默认值
+                    return {**default_settings, **json.load(f)}
             except Exception as e:
                 print(f"加载设置失败: {e}")
                 return default_settings
@@ -1230,6 +7771,10 @@ class MyIDE(QMainWindow):
         auto_save_layout.addWidget(QLabel("自动保存间隔:"))
         auto_save_layout.addWidget(self.auto_save_interval_spin)
         
+        self.auto_save_journal_check = QCheckBox("使用编辑日志（只追加修改，不重写整个文件）")
+        self.auto_save_journal_check.setChecked(self.settings.get("auto_save_journal", True))
+        auto_save_layout.addWidget(self.auto_save_journal_check)
+        
         # 4. 语法检查设置
         syntax_tab = QWidget()
         tab_widget.addTab(syntax_tab, "语法检查")
@@ -1255,6 +7800,14 @@ class MyIDE(QMainWindow):
         self.show_errors_check.setChecked(self.settings.get("show_errors", True))
         syntax_layout.addWidget(self.show_errors_check)
         
+        syntax_layout.addWidget(QLabel("问题列表最多显示:"))
+        self.problems_max_rows_spin = QSpinBox()
+        self.problems_max_rows_spin.setRange(100, 100000)
+        self.problems_max_rows_spin.setSingleStep(100)
+        self.problems_max_rows_spin.setValue(self.settings.get("problems_max_rows", 1000))
+        self.problems_max_rows_spin.setSuffix(" 条")
+        syntax_layout.addWidget(self.problems_max_rows_spin)
+        
         # 5. 文件设置
         file_tab = QWidget()
         tab_widget.addTab(file_tab, "文件")
@@ -1283,6 +7836,45 @@ class MyIDE(QMainWindow):
         
         file_layout.addWidget(encoding_group)
         
+        # 大文件设置
+        large_file_group = QGroupBox("大文件")
+        large_file_layout = QGridLayout(large_file_group)
+        large_file_layout.setSpacing(15)
+        large_file_layout.setColumnStretch(1, 1)
+        
+        large_file_layout.addWidget(QLabel("大文件模式阈值:"), 0, 0, alignment=Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        self.large_file_threshold_spin = QSpinBox()
+        self.large_file_threshold_spin.setRange(1, 4096)
+        self.large_file_threshold_spin.setValue(self.settings.get("large_file_threshold", 20))
+        self.large_file_threshold_spin.setSuffix(" MB")
+        self.large_file_threshold_spin.setToolTip("超过该大小的文件分块加载，并关闭自动换行和语法检查")
+        large_file_layout.addWidget(self.large_file_threshold_spin, 0, 1)
+        
+        large_file_layout.addWidget(QLabel("只读查看阈值:"), 1, 0, alignment=Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        self.mmap_viewer_threshold_spin = QSpinBox()
+        self.mmap_viewer_threshold_spin.setRange(1, 1024 * 1024)
+        self.mmap_viewer_threshold_spin.setValue(self.settings.get("mmap_viewer_threshold", 1024))
+        self.mmap_viewer_threshold_spin.setSuffix(" MB")
+        self.mmap_viewer_threshold_spin.setToolTip("超过该大小的文件用只读查看器打开，不载入内存")
+        large_file_layout.addWidget(self.mmap_viewer_threshold_spin, 1, 1)
+        
+        file_layout.addWidget(large_file_group)
+        
+        # 工作区设置
+        workspace_group = QGroupBox("工作区")
+        workspace_layout = QVBoxLayout(workspace_group)
+        workspace_layout.addWidget(QLabel("排除的文件和目录（每行一条，gitignore语法）:"))
+        self.workspace_exclude_edit = QPlainTextEdit()
+        self.workspace_exclude_edit.setPlainText("\n".join(self.settings.get("workspace_exclude_patterns", [])))
+        workspace_layout.addWidget(self.workspace_exclude_edit)
+        self.workspace_use_gitignore_check = QCheckBox("同时使用工作区根目录的 .gitignore")
+        self.workspace_use_gitignore_check.setChecked(self.settings.get("workspace_use_gitignore", True))
+        workspace_layout.addWidget(self.workspace_use_gitignore_check)
+        self.search_trigram_index_check = QCheckBox("为工作区建立三元组索引，加速在文件中查找（保存在缓存目录）")
+        self.search_trigram_index_check.setChecked(self.settings.get("search_trigram_index", False))
+        workspace_layout.addWidget(self.search_trigram_index_check)
+        file_layout.addWidget(workspace_group)
+        
         # 6. 终端设置
         terminal_tab = QWidget()
         tab_widget.addTab(terminal_tab, "终端")
@@ -1307,6 +7899,43 @@ class MyIDE(QMainWindow):
         
         terminal_layout.addWidget(terminal_font_group)
         
+        # 终端输出设置
+        terminal_output_group = QGroupBox("终端输出")
+        terminal_output_layout = QGridLayout(terminal_output_group)
+        terminal_output_layout.setSpacing(15)
+        terminal_output_layout.setColumnStretch(1, 1)
+        
+        terminal_output_layout.addWidget(QLabel("最多保留的行数:"), 0, 0, alignment=Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        self.terminal_scrollback_spin = QSpinBox()
+        self.terminal_scrollback_spin.setRange(1000, 10000000)
+        self.terminal_scrollback_spin.setSingleStep(10000)
+        self.terminal_scrollback_spin.setToolTip("滚动历史按UTF-8紧凑保存，每行约为文本的字节数加8字节")
+        self.terminal_scrollback_spin.setValue(self.settings.get("terminal_scrollback_lines", 100000))
+        terminal_output_layout.addWidget(self.terminal_scrollback_spin, 0, 1)
+        
+        terminal_output_layout.addWidget(QLabel("输出编码:"), 1, 0, alignment=Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        self.terminal_encoding_combo = QComboBox()
+        self.terminal_encoding_combo.setEditable(True)
+        self.terminal_encoding_combo.addItems(["utf-8", "gbk", "gb18030", "big5", "shift_jis", "latin-1"])
+        self.terminal_encoding_combo.setCurrentText(self.settings.get("terminal_encoding", "utf-8"))
+        terminal_output_layout.addWidget(self.terminal_encoding_combo, 1, 1)
+        
+        terminal_output_layout.addWidget(QLabel("无法解码时:"), 2, 0, alignment=Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        self.terminal_encoding_errors_combo = QComboBox()
+        self.terminal_encoding_errors_combo.addItem("整行按GBK解码", "gbk")
+        self.terminal_encoding_errors_combo.addItem("显示替换字符", "replace")
+        self.terminal_encoding_errors_combo.addItem("显示字节值（\\xNN）", "backslashreplace")
+        self.terminal_encoding_errors_combo.setCurrentIndex(
+            max(0, self.terminal_encoding_errors_combo.findData(self.settings.get("terminal_encoding_errors", "gbk"))))
+        terminal_output_layout.addWidget(self.terminal_encoding_errors_combo, 2, 1)
+        
+        self.terminal_pty_check = QCheckBox("在伪终端中运行shell（支持颜色、光标控制和交互程序，新建的终端生效）")
+        self.terminal_pty_check.setChecked(self.settings.get("terminal_pty", True))
+        self.terminal_pty_check.setEnabled(PtyProcess.available())
+        terminal_output_layout.addWidget(self.terminal_pty_check, 3, 0, 1, 2)
+        
+        terminal_layout.addWidget(terminal_output_group)
+        
         # 7. 主题颜色设置
         theme_color_tab = QWidget()
         tab_widget.addTab(theme_color_tab, "主题颜色")
@@ -1519,15 +8148,37 @@ class MyIDE(QMainWindow):
         self.settings["folding_margin"] = self.folding_margin_check.isChecked()
         self.settings["folding_style"] = self.folding_style_combo.currentIndex()
         self.settings["auto_save_interval"] = self.auto_save_interval_spin.value()
+        self.settings["auto_save_journal"] = self.auto_save_journal_check.isChecked()
         self.settings["syntax_check_enabled"] = self.syntax_check_enabled_check.isChecked()
         self.settings["syntax_check_interval"] = self.syntax_check_interval_spin.value()
         self.settings["show_warnings"] = self.show_warnings_check.isChecked()
         self.settings["show_errors"] = self.show_errors_check.isChecked()
+        self.settings["problems_max_rows"] = self.problems_max_rows_spin.value()
         self.settings["default_encoding"] = self.default_encoding_combo.currentIndex()
         self.settings["auto_detect_encoding"] = self.auto_detect_encoding_check.isChecked()
         self.settings["add_newline_at_end"] = self.add_newline_at_end_check.isChecked()
+        self.settings["large_file_threshold"] = self.large_file_threshold_spin.value()
+        self.settings["mmap_viewer_threshold"] = self.mmap_viewer_threshold_spin.value()
+        exclude_patterns = [line.strip() for line in self.workspace_exclude_edit.toPlainText().splitlines()]
+        exclude_patterns = [line for line in exclude_patterns if line]
+        workspace_changed = (exclude_patterns != self.settings.get("workspace_exclude_patterns")
+                             or self.workspace_use_gitignore_check.isChecked() != self.settings.get("workspace_use_gitignore", True))
+        self.settings["workspace_exclude_patterns"] = exclude_patterns
+        self.settings["workspace_use_gitignore"] = self.workspace_use_gitignore_check.isChecked()
+        trigram_changed = self.search_trigram_index_check.isChecked() != self.settings.get("search_trigram_index", False)
+        self.settings["search_trigram_index"] = self.search_trigram_index_check.isChecked()
         self.settings["terminal_font_size"] = self.terminal_font_size_spin.value()
         self.settings["terminal_font_family"] = self.terminal_font_family_edit.text()
+        self.settings["terminal_scrollback_lines"] = self.terminal_scrollback_spin.value()
+        terminal_encoding = self.terminal_encoding_combo.currentText().strip()
+        try:
+            codecs.lookup(terminal_encoding)
+        except LookupError:
+            terminal_encoding = None
+        else:
+            self.settings["terminal_encoding"] = terminal_encoding
+        self.settings["terminal_encoding_errors"] = self.terminal_encoding_errors_combo.currentData()
+        self.settings["terminal_pty"] = self.terminal_pty_check.isChecked()
         
         # 保存主题颜色设置
         self.settings["light_editor_bg"] = self.light_editor_bg_edit.text()
@@ -1558,8 +8209,32 @@ class MyIDE(QMainWindow):
         # 更新自动保存定时器
         self.init_auto_save()
         
+        # 排除规则改变时重新加载工作区
+        if workspace_changed and self.resource_explorer.workspace_root:
+            self.resource_explorer.set_workspace(self.resource_explorer.workspace_root)
+            self.reset_file_index()
+        elif trigram_changed:
+            self.reset_trigram_index()
+        
+        # 更新问题列表的显示上限和过滤条件
+        self.problems_model.max_rows = self.settings.get("problems_max_rows", 1000)
+        self.apply_problems_filter()
+        
+        # 更新终端的最多保留行数和输出编码
+        for i in range(self.terminal_tab.count()):
+            terminal = self.terminal_tab.widget(i)
+            terminal.set_scrollback_lines(self.settings.get("terminal_scrollback_lines", 100000))
+            terminal.set_encoding(self.settings.get("terminal_encoding", "utf-8"),
+                                  self.settings.get("terminal_encoding_errors", "gbk"))
+        self.run_panel.set_scrollback_lines(self.settings.get("terminal_scrollback_lines", 100000))
+        self.run_panel.set_encoding(self.settings.get("terminal_encoding", "utf-8"),
+                                    self.settings.get("terminal_encoding_errors", "gbk"))
+        
         # 更新状态栏信息
-        self.statusBar().showMessage("设置已应用")
+        if terminal_encoding is None:
+            self.statusBar().showMessage(f"设置已应用，未知的终端输出编码: {self.terminal_encoding_combo.currentText()}")
+        else:
+            self.statusBar().showMessage("设置已应用")
     
     def update_editor_settings(self):
         """更新所有编辑器的设置"""
@@ -1621,7 +8296,7 @@ class MyIDE(QMainWindow):
                     
                     # 更新换行设置
                     wrap_mode = self.settings.get("wrap_mode", 1)
-                    if wrap_mode == 0:
+                    if wrap_mode == 0 or getattr(editor, 'large_file', False):
                         editor.setWrapMode(QsciScintilla.WrapMode.WrapNone)
                     elif wrap_mode == 1:
                         editor.setWrapMode(QsciScintilla.WrapMode.WrapWord)
@@ -1708,55 +8383,89 @@ class MyIDE(QMainWindow):
                 self.save_settings()
     
     def check_autosave_files(self):
-        """检查是否存在自动保存文件"""
-        # 遍历当前目录，查找所有.autosave文件
-        current_dir = os.getcwd()
-        autosave_files = []
+        """从崩溃恢复索引中查找自动保存文件，在一个对话框中统一处理"""
+        entries = self.recovery_index.pending()
+        if not entries:
+            return
+        
+        action, selected = self.show_recovery_dialog(entries)
+        if action == "open":
+            for entry in selected:
+                self.open_autosave_file(entry["autosave"], entry["path"], confirm=False)
+        elif action == "discard":
+            for entry in selected:
+                self.discard_autosave_file(entry["autosave"], entry["path"])
+        # 稍后处理时保留索引条目，下次启动时再次提示
+    
+    def show_recovery_dialog(self, entries):
+        """显示待恢复文件列表，返回(操作, 选中的条目)，操作为open、discard或None"""
+        from PyQt6.QtWidgets import QDialog
+        
+        dialog = QDialog(self)
+        dialog.setWindowTitle("恢复自动保存的文件")
+        dialog.resize(720, 360)
+        layout = QVBoxLayout(dialog)
+        layout.addWidget(QLabel(f"发现 {len(entries)} 个未保存文件的自动保存内容，请选择要恢复或舍弃的文件:"))
+        
+        tree = QTreeWidget()
+        tree.setHeaderLabels(["文件", "自动保存时间", "大小"])
+        tree.setRootIsDecorated(False)
+        for entry in entries:
+            try:
+                size = os.path.getsize(entry["autosave"])
+            except OSError:
+                size = 0
+            item = QTreeWidgetItem([entry["path"], time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["time"])),
+                                    f"{size / 1024:.1f} KB"])
+            item.setCheckState(0, Qt.CheckState.Checked)
+            item.setToolTip(0, f"{entry['autosave']}\n哈希: {entry.get('hash') or '未知'}")
+            item.setData(0, Qt.ItemDataRole.UserRole, entry)
+            tree.addTopLevelItem(item)
+        tree.header().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(tree)
+        
+        result = {"action": None}
+        def finish(action):
+            result["action"] = action
+            dialog.accept()
+        
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        open_btn = QPushButton("恢复所选")
+        open_btn.setDefault(True)
+        open_btn.clicked.connect(lambda: finish("open"))
+        discard_btn = QPushButton("舍弃所选")
+        discard_btn.clicked.connect(lambda: finish("discard"))
+        later_btn = QPushButton("稍后处理")
+        later_btn.clicked.connect(dialog.reject)
+        button_layout.addWidget(open_btn)
+        button_layout.addWidget(discard_btn)
+        button_layout.addWidget(later_btn)
+        layout.addLayout(button_layout)
         
+        dialog.exec()
+        selected = [tree.topLevelItem(i).data(0, Qt.ItemDataRole.UserRole)
+                    for i in range(tree.topLevelItemCount())
+                    if tree.topLevelItem(i).checkState(0) == Qt.CheckState.Checked]
+        return result["action"], selected
+    
+    def discard_autosave_file(self, autosave_path, original_file):
+        """舍弃自动保存文件和编辑日志"""
         try:
-            for file in os.listdir(current_dir):
-                if file.endswith(".autosave"):
-                    autosave_files.append(os.path.join(current_dir, file))
+            os.remove(autosave_path)
+            journal_path = AutosaveJournal.journal_path(autosave_path)
+            if os.path.exists(journal_path):
+                os.remove(journal_path)
+            self.recovery_index.remove(original_file)
+            self.statusBar().showMessage(f"已舍弃自动保存文件: {autosave_path}")
         except Exception as e:
-            return
-        
-        # 处理每个自动保存文件
-        for autosave_path in autosave_files:
-            original_file = autosave_path[:-9]  # 移除.autosave后缀
-            
-            # 显示消息框，询问用户如何处理
-            msg_box = QMessageBox()
-            msg_box.setWindowTitle("发现自动保存文件")
-            msg_box.setText(f"发现自动保存文件: {autosave_path}\n\n您想要如何处理？")
-            
-            # 添加按钮
-            open_btn = msg_box.addButton("打开", QMessageBox.ButtonRole.AcceptRole)
-            discard_btn = msg_box.addButton("舍弃", QMessageBox.ButtonRole.RejectRole)
-            cancel_btn = msg_box.addButton("取消", QMessageBox.ButtonRole.ActionRole)
-            
-            msg_box.setDefaultButton(open_btn)
-            msg_box.exec()
-            
-            # 获取用户选择
-            clicked_btn = msg_box.clickedButton()
-            
-            if clicked_btn == open_btn:
-                # 打开自动保存文件
-                self.open_autosave_file(autosave_path, original_file)
-            elif clicked_btn == discard_btn:
-                # 舍弃自动保存文件
-                try:
-                    os.remove(autosave_path)
-                    self.statusBar().showMessage(f"已舍弃自动保存文件: {autosave_path}")
-                except Exception as e:
-                    self.statusBar().showMessage(f"舍弃自动保存文件失败: {str(e)}")
-            # 如果用户点击取消，什么都不做
-    
-    def open_autosave_file(self, autosave_path, original_file):
-        """打开自动保存文件"""
+            self.statusBar().showMessage(f"舍弃自动保存文件失败: {str(e)}")
+    
+    def open_autosave_file(self, autosave_path, original_file, confirm=True):
+        """打开自动保存文件，confirm为False时不再询问是否替换原文件内容"""
         try:
-            with open(autosave_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            # 读取自动保存的内容并重放编辑日志
+            content, replayed = AutosaveJournal.read(autosave_path)
             
             # 打开原始文件或创建新标签页
             if os.path.exists(original_file):
@@ -1764,21 +8473,31 @@ class MyIDE(QMainWindow):
                 self.open_specific_file(original_file)
                 # 获取最后打开的编辑器
                 editor = self.tab_widget.currentWidget()
-                # 提示用户是否替换内容
-                msg_box = QMessageBox()
-                msg_box.setWindowTitle("替换文件内容")
-                msg_box.setText(f"是否用自动保存的内容替换 {original_file} 的内容？")
-                msg_box.setIcon(QMessageBox.Icon.Question)
-                
-                yes_btn = msg_box.addButton("是", QMessageBox.ButtonRole.AcceptRole)
-                no_btn = msg_box.addButton("否", QMessageBox.ButtonRole.RejectRole)
-                
-                msg_box.exec()
+                replace = True
+                if confirm:
+                    # 提示用户是否替换内容
+                    msg_box = QMessageBox()
+                    msg_box.setWindowTitle("替换文件内容")
+                    msg_box.setText(f"是否用自动保存的内容替换 {original_file} 的内容？")
+                    msg_box.setIcon(QMessageBox.Icon.Question)
+                    
+                    yes_btn = msg_box.addButton("是", QMessageBox.ButtonRole.AcceptRole)
+                    no_btn = msg_box.addButton("否", QMessageBox.ButtonRole.RejectRole)
+                    
+                    msg_box.exec()
+                    replace = msg_box.clickedButton() == yes_btn
                 
-                if msg_box.clickedButton() == yes_btn:
-                    editor.setText(content)
-                    editor.setModified(True)
-                    self.statusBar().showMessage(f"已用自动保存内容替换: {original_file}")
+                if replace and getattr(editor, 'file_loader', None) is not None:
+                    # 大文件还在分块加载，加载完成后再替换，否则之后加载的块会接在替换的内容后面；
+                    # 加载失败时保留自动保存文件
+                    editor.file_loader.finished.connect(
+                        lambda ok, error: ok and self.replace_with_autosave(editor, content, replayed, autosave_path,
+                                                                            original_file))
+                    self.statusBar().showMessage(f"文件加载完成后用自动保存内容替换: {original_file}")
+                    return
+                if replace:
+                    self.replace_with_autosave(editor, content, replayed, autosave_path, original_file)
+                    return
             else:
                 # 创建新标签页
                 editor = self.setup_editor()
@@ -1790,19 +8509,40 @@ class MyIDE(QMainWindow):
                 filename = os.path.basename(original_file)
                 index = self.tab_widget.addTab(editor, filename)
                 self.tab_widget.setCurrentIndex(index)
-                self.statusBar().showMessage(f"已打开自动保存文件: {autosave_path}")
+                self.statusBar().showMessage(f"已打开自动保存文件: {autosave_path}（重放 {replayed} 条编辑记录）")
             
-            # 删除自动保存文件
+            self.remove_autosave_file(autosave_path, original_file)
+        except Exception as e:
+            self.statusBar().showMessage(f"打开自动保存文件失败: {str(e)}")
+    
+    def replace_with_autosave(self, editor, content, replayed, autosave_path, original_file):
+        """用自动保存的内容替换编辑器的内容"""
+        editor.setText(content)
+        editor.setModified(True)
+        self.statusBar().showMessage(f"已用自动保存内容替换: {original_file}（重放 {replayed} 条编辑记录）")
+        self.remove_autosave_file(autosave_path, original_file)
+    
+    def remove_autosave_file(self, autosave_path, original_file):
+        """删除自动保存文件和编辑日志"""
+        for path in (autosave_path, AutosaveJournal.journal_path(autosave_path)):
             try:
-                os.remove(autosave_path)
+                os.remove(path)
             except Exception as e:
                 pass
-        except Exception as e:
-            self.statusBar().showMessage(f"打开自动保存文件失败: {str(e)}")
+        self.recovery_index.remove(original_file)
     
     def open_specific_file(self, file_path):
         """打开指定文件"""
         try:
+            # 超大文件用只读查看器打开，较大的文件使用大文件模式分块加载
+            size = os.path.getsize(file_path)
+            if size >= self.settings.get("mmap_viewer_threshold", 1024) * 1024 * 1024:
+                self.open_mapped_file(file_path)
+                return
+            if size >= self.settings.get("large_file_threshold", 20) * 1024 * 1024:
+                self.open_large_file(file_path)
+                return
+            
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
             
@@ -1831,28 +8571,402 @@ class MyIDE(QMainWindow):
         except Exception as e:
             self.statusBar().showMessage(f"打开文件失败: {str(e)}")
     
+    def open_large_file(self, file_path):
+        """大文件模式：只用文件开头检测语言，关闭自动换行和语法检查，分块加载"""
+        with open(file_path, 'rb') as f:
+            head = f.read(self.LARGE_FILE_DETECT_BYTES).decode('utf-8', errors='ignore')
+        
+        editor = self.setup_editor()
+        editor.large_file = True
+        editor.setWrapMode(QsciScintilla.WrapMode.WrapNone)
+        
+        file_ext = file_path.split('.')[-1].lower() if '.' in file_path else None
+        self.change_language(self.detect_language(head, file_ext), editor)
+        
+        index = self.tab_widget.addTab(editor, os.path.basename(file_path))
+        self.tab_widget.setCurrentIndex(index)
+        editor.current_file = file_path
+        
+        loader = ChunkedFileLoader(editor, file_path, self)
+        editor.file_loader = loader
+        loader.progress.connect(self.file_load_progress.setValue)
+        loader.finished.connect(lambda ok, error: self.on_large_file_loaded(editor, file_path, ok, error))
+        self.file_load_progress.setValue(0)
+        self.file_load_progress.show()
+        loader.start()
+        self.statusBar().showMessage(f"正在加载大文件: {file_path}")
+    
+    def open_workspace(self):
+        """选择文件夹作为工作区，资源管理器以它为根目录"""
+        root = QFileDialog.getExistingDirectory(self, "打开文件夹", self.settings.get("workspace_root") or "")
+        if not root:
+            return
+        root = os.path.abspath(root)
+        self.settings["workspace_root"] = root
+        self.save_settings()
+        self.resource_explorer.set_workspace(root)
+        self.reset_file_index()
+        self.update_terminal_history()
+        self.resource_dock.setVisible(True)
+        self.setWindowTitle(f"MyIDE - {os.path.basename(root)}")
+        self.statusBar().showMessage(f"打开工作区: {root}")
+    
+    def close_workspace(self):
+        """关闭工作区，资源管理器恢复显示所有根目录"""
+        self.settings["workspace_root"] = None
+        self.save_settings()
+        self.resource_explorer.set_workspace(None)
+        self.reset_file_index()
+        self.update_terminal_history()
+        self.setWindowTitle("MyIDE")
+    
+    def reveal_current_file(self):
+        """在资源管理器中定位当前文件"""
+        editor = self.tab_widget.currentWidget()
+        file_path = getattr(editor, 'current_file', None) or getattr(editor, 'file_path', None)
+        if not file_path:
+            self.statusBar().showMessage("当前文件尚未保存")
+            return
+        self.resource_dock.setVisible(True)
+        if not self.resource_explorer.reveal_path(file_path):
+            self.statusBar().showMessage(f"资源管理器中没有该文件: {file_path}")
+    
+    def quick_open_root(self):
+        """快速打开的根目录：工作区，未打开工作区时为当前文件所在目录"""
+        if self.resource_explorer.workspace_root:
+            return self.resource_explorer.workspace_root
+        editor = self.tab_widget.currentWidget()
+        file_path = getattr(editor, 'current_file', None) or getattr(editor, 'file_path', None)
+        return os.path.dirname(os.path.abspath(file_path)) if file_path else os.getcwd()
+    
+    def workspace_matcher(self, root):
+        """遍历root时使用的排除规则：工作区使用资源管理器的规则，其他目录只使用默认规则"""
+        if root == self.resource_explorer.workspace_root:
+            return self.resource_explorer.matcher
+        return IgnoreMatcher(self.settings.get("workspace_exclude_patterns", []))
+    
+    def reset_file_index(self):
+        """工作区或排除规则改变后丢弃索引，打开了工作区时立即在后台重新建立"""
+        if self.file_index_task is not None:
+            self.file_index_task.cancelled = True
+            self.file_index_task = None
+        self.file_index = None
+        if self.resource_explorer.workspace_root:
+            self.rebuild_file_index()
+        # 三元组索引同样取决于工作区和排除规则
+        self.reset_trigram_index()
+    
+    def rebuild_file_index(self):
+        """在后台遍历根目录建立新的索引，完成前继续使用旧索引"""
+        root = self.quick_open_root()
+        if self.file_index_task is not None:
+            if self.file_index_task.root == root:
+                return
+            self.file_index_task.cancelled = True
+        self.file_index_task = FileIndexTask(root, next(self.file_index_serial), self.file_index_signals,
+                                             self.workspace_matcher(root))
+        self.index_thread_pool.start(self.file_index_task)
+    
+    def on_file_index_finished(self, serial, index, error):
+        """索引建立完成，打开的快速打开对话框改用新索引"""
+        if self.file_index_task is None or self.file_index_task.serial != serial:
+            return
+        self.file_index_task = None
+        if index is None:
+            self.statusBar().showMessage(f"建立文件索引失败: {error}")
+        else:
+            self.file_index = index
+        if self.quick_open_dialog is not None:
+            self.quick_open_dialog.set_index(self.file_index)
+    
+    def on_explorer_entries_changed(self, dir_path, added, removed, modified):
+        """资源管理器监视到的变化同步到索引，新增目录需要重新遍历"""
+        self.on_trigram_entries_changed(dir_path, added, removed, modified)
+        index = self.file_index
+        if index is None or index.root != self.resource_explorer.workspace_root:
+            return
+        prefix = os.path.join(dir_path, "")
+        for name, is_dir in removed:
+            rel_path = index.relative_path(prefix + name, is_dir)
+            if rel_path is None:
+                continue
+            if is_dir:
+                index.remove_prefix(rel_path + "/")
+            else:
+                index.remove(rel_path)
+        new_dirs = False
+        for name, is_dir in added:
+            rel_path = index.relative_path(prefix + name, is_dir)
+            if rel_path is None:
+                continue
+            if is_dir:
+                new_dirs = True
+            else:
+                index.add(rel_path)
+        if new_dirs or index.needs_rebuild:
+            self.rebuild_file_index()
+    
+    def reset_trigram_index(self):
+        """丢弃三元组索引，启用且打开了工作区时在后台加载已保存的索引并与磁盘核对"""
+        if self.trigram_task is not None:
+            self.trigram_task.cancelled = True
+            self.trigram_task = None
+        self.trigram_index = None
+        self.trigram_pending.clear()
+        self.trigram_full_check = False
+        self.trigram_timer.stop()
+        if self.settings.get("search_trigram_index", False) and self.resource_explorer.workspace_root:
+            # 在事件循环中启动，启动时恢复工作区的时候查找面板还未创建
+            self.trigram_full_check = True
+            self.trigram_timer.start()
+    
+    def update_trigram_index(self, rel_paths=None):
+        """稍后更新三元组索引中的文件，rel_paths为None时遍历整个工作区核对"""
+        if not self.settings.get("search_trigram_index", False) or not self.resource_explorer.workspace_root:
+            return
+        if rel_paths is None:
+            self.trigram_full_check = True
+        else:
+            self.trigram_pending.update(rel_paths)
+        self.trigram_timer.start()
+    
+    def flush_trigram_updates(self):
+        """启动更新任务，已有任务在执行时等它完成后再启动"""
+        if self.trigram_task is not None or not (self.trigram_full_check or self.trigram_pending):
+            return
+        root = self.resource_explorer.workspace_root
+        if not root or not self.settings.get("search_trigram_index", False):
+            return
+        index = self.trigram_index
+        if index is None and not self.trigram_full_check:
+            # 首次加载尚未完成，变化在加载时的核对中处理
+            self.trigram_pending.clear()
+            return
+        paths = None if self.trigram_full_check else sorted(self.trigram_pending)
+        self.trigram_full_check = False
+        self.trigram_pending.clear()
+        self.trigram_task = TrigramIndexTask(self.find_panel.get_executor(), self.find_panel.workers, root,
+                                             self.workspace_matcher(root), next(self.trigram_serial),
+                                             self.trigram_signals, index, paths)
+        self.trigram_thread_pool.start(self.trigram_task)
+    
+    def on_trigram_index_finished(self, serial, index, message):
+        if self.trigram_task is None or self.trigram_task.serial != serial:
+            return
+        self.trigram_task = None
+        if index is None:
+            self.statusBar().showMessage(f"更新三元组索引失败: {message}")
+        else:
+            self.trigram_index = index
+            self.statusBar().showMessage(message)
+        self.flush_trigram_updates()
+    
+    def on_trigram_entries_changed(self, dir_path, added, removed, modified):
+        """删除的文件直接从三元组索引中去掉，新增和修改的文件稍后重新读取，新增目录需要遍历核对"""
+        index = self.trigram_index
+        if index is None or index.root != self.resource_explorer.workspace_root:
+            return
+        prefix = os.path.join(dir_path, "")
+        with index.lock:
+            for name, is_dir in removed:
+                rel_path = index.relative_path(prefix + name, is_dir)
+                if rel_path is None:
+                    continue
+                if is_dir:
+                    index.remove_prefix(rel_path + "/")
+                else:
+                    index.remove(rel_path)
+        changed = []
+        for name, is_dir in added + [(name, False) for name in modified]:
+            rel_path = index.relative_path(prefix + name, is_dir)
+            if rel_path is None:
+                continue
+            if is_dir:
+                self.update_trigram_index()
+            else:
+                changed.append(rel_path)
+        if changed:
+            self.update_trigram_index(changed)
+    
+    def quick_open(self):
+        """快速打开文件（Ctrl+P），按名称模糊匹配索引中的文件"""
+        root = self.quick_open_root()
+        index = self.file_index
+        if index is None or index.root != root:
+            index = None
+            self.rebuild_file_index()
+        elif time.monotonic() - index.created > self.FILE_INDEX_MAX_AGE or index.needs_rebuild:
+            self.rebuild_file_index()
+        
+        dialog = QuickOpenDialog(self)
+        self.quick_open_dialog = dialog
+        dialog.set_index(index, building=self.file_index_task is not None)
+        try:
+            accepted = dialog.exec()
+        finally:
+            self.quick_open_dialog = None
+        if accepted and dialog.selected_path:
+            self.open_quick_open_result(dialog.selected_path)
+    
+    def open_quick_open_result(self, file_path):
+        """已经打开的文件切换到对应标签页，否则用open_specific_file打开"""
+        key = os.path.normcase(os.path.abspath(file_path))
+        for i in range(self.tab_widget.count()):
+            widget = self.tab_widget.widget(i)
+            current = getattr(widget, 'current_file', None) or getattr(widget, 'file_path', None)
+            if current and os.path.normcase(os.path.abspath(current)) == key:
+                self.tab_widget.setCurrentIndex(i)
+                return
+        self.open_specific_file(file_path)
+    
+    def show_find_in_files(self):
+        """显示查找面板，当前编辑器中的选中文本作为查询"""
+        editor = self.tab_widget.currentWidget()
+        if isinstance(editor, QsciScintilla) and editor.hasSelectedText() and "\n" not in editor.selectedText():
+            self.find_panel.query_edit.setText(editor.selectedText())
+        self.find_dock.setVisible(True)
+        self.find_panel.query_edit.setFocus()
+        self.find_panel.query_edit.selectAll()
+    
+    def open_search_result(self, file_path, line, col):
+        """打开文件并跳转到查找结果所在的行（行号从1开始）"""
+        self.open_quick_open_result(file_path)
+        editor = self.tab_widget.currentWidget()
+        current = getattr(editor, 'current_file', None) or getattr(editor, 'file_path', None)
+        if not current or os.path.normcase(os.path.abspath(current)) != os.path.normcase(os.path.abspath(file_path)):
+            # 打开失败
+            return
+        if isinstance(editor, MappedFileViewer):
+            editor.goto_line(line - 1, col)
+        elif getattr(editor, 'file_loader', None) is not None:
+            # 大文件模式加载完成后再跳转
+            editor.file_loader.finished.connect(lambda ok, error: ok and self.goto_position(editor, line - 1, col))
+        else:
+            self.goto_position(editor, line - 1, col)
+        editor.setFocus()
+    
+    def goto_position(self, editor, line, col):
+        editor.setCursorPosition(line, col)
+        editor.ensureLineVisible(line)
+    
+    def view_file(self):
+        """选择文件并用只读查看器打开"""
+        file_path, _ = QFileDialog.getOpenFileName(self, "只读查看", "", "所有文件 (*);;日志文件 (*.log *.txt)")
+        if file_path:
+            try:
+                self.open_mapped_file(file_path)
+            except Exception as e:
+                self.statusBar().showMessage(f"打开文件失败: {str(e)}")
+    
+    def open_mapped_file(self, file_path):
+        """用基于mmap的只读查看器打开文件"""
+        viewer = MappedFileViewer(file_path, self)
+        if hasattr(self, 'viewer_colors'):
+            viewer.set_colors(*self.viewer_colors)
+        index = self.tab_widget.addTab(viewer, f"{os.path.basename(file_path)} [只读]")
+        self.tab_widget.setCurrentIndex(index)
+        viewer.setFocus()
+        self.statusBar().showMessage(f"只读查看: {file_path}（Ctrl+F 查找，Ctrl+G 跳转到行）")
+    
+    def goto_line(self):
+        """跳转到指定行"""
+        from PyQt6.QtWidgets import QInputDialog
+        editor = self.tab_widget.currentWidget()
+        if isinstance(editor, MappedFileViewer):
+            line_count = editor.index.line_count
+            current = editor.current_line
+        elif isinstance(editor, QsciScintilla):
+            line_count = editor.lines()
+            current = editor.getCursorPosition()[0]
+        else:
+            return
+        line, ok = QInputDialog.getInt(self, "跳转到行", f"行号 (1 - {line_count}):", current + 1, 1, line_count)
+        if not ok:
+            return
+        if isinstance(editor, MappedFileViewer):
+            editor.goto_line(line - 1)
+        else:
+            editor.setCursorPosition(line - 1, 0)
+            editor.ensureLineVisible(line - 1)
+        editor.setFocus()
+    
+    def on_large_file_loaded(self, editor, file_path, ok, error):
+        """大文件加载完成"""
+        editor.file_loader.deleteLater()
+        editor.file_loader = None
+        self.file_load_progress.hide()
+        if ok:
+            editor.update_status()
+            self.statusBar().showMessage(f"打开文件: {file_path}（大文件模式，已关闭自动换行和语法检查）")
+        else:
+            self.statusBar().showMessage(f"打开文件失败: {error}")
+    
     def init_auto_save(self):
         """初始化自动保存功能"""
-        # 创建自动保存定时器
-        self.auto_save_timer = QTimer(self)
-        self.auto_save_timer.timeout.connect(self.auto_save_all)
+        # 重新应用设置时复用已有的定时器
+        self.auto_save_interval = self.settings.get("auto_save_interval", self.auto_save_interval)
+        if self.auto_save_timer is None:
+            self.auto_save_timer = QTimer(self)
+            self.auto_save_timer.timeout.connect(self.auto_save_all)
         self.auto_save_timer.start(self.auto_save_interval)
     
     def auto_save_all(self):
-        """自动保存所有修改过的文件"""
+        """自动保存所有修改过的文件，写入在后台线程执行
+
+        上次自动保存后没有编辑的文件跳过。启用编辑日志时只追加这段时间的操作，
+        日志过大时重新写入完整内容。
+        """
+        use_journal = self.settings.get("auto_save_journal", True)
         for i in range(self.tab_widget.count()):
             editor = self.tab_widget.widget(i)
-            if hasattr(editor, 'current_file') and editor.current_file:
-                # 检查文件是否被修改
-                if editor.isModified():
-                    try:
-                        # 创建自动保存文件，使用 .autosave 后缀
-                        autosave_path = editor.current_file + ".autosave"
-                        with open(autosave_path, 'w', encoding='utf-8') as f:
-                            f.write(editor.text())
-                        self.statusBar().showMessage(f"自动保存: {editor.current_file}")
-                    except Exception as e:
-                        self.statusBar().showMessage(f"自动保存失败: {str(e)}")
+            if not isinstance(editor, QsciScintilla) or not getattr(editor, 'current_file', None):
+                continue
+            # 正在分块加载的大文件内容还不完整
+            if getattr(editor, 'file_loader', None) is not None:
+                continue
+            # 检查文件是否被修改，以及上次自动保存后是否有新的编辑
+            generation = editor.edit_generation
+            if not editor.isModified() or generation == editor.autosave_generation:
+                continue
+            editor.autosave_generation = generation
+            
+            records = None
+            if use_journal and editor.journal_base:
+                journal_bytes = editor.journal_bytes + editor.journal_pending
+                journal_records = editor.journal_records + len(editor.journal_ops)
+                if (journal_bytes <= max(self.JOURNAL_MIN_COMPACT_BYTES, editor.length())
+                        and journal_records * editor.length() <= self.JOURNAL_REPLAY_BUDGET):
+                    records = AutosaveJournal.encode(editor.journal_ops)
+                    editor.journal_bytes = journal_bytes
+                    editor.journal_records = journal_records
+            
+            if records is not None:
+                task = AutosaveTask(editor.current_file, self.autosave_signals, records=records,
+                                    recovery=self.recovery_index)
+            else:
+                # 写入完整内容，之后的操作记录到新的日志中
+                task = AutosaveTask(editor.current_file, self.autosave_signals,
+                                    text=editor.text(), journal=use_journal, recovery=self.recovery_index)
+                editor.journal_base = use_journal
+                editor.journal_bytes = 0
+                editor.journal_records = 0
+            editor.journal_ops = []
+            editor.journal_pending = 0
+            self.save_thread_pool.start(task)
+    
+    def on_autosave_finished(self, file_path, full, ok, error, size, elapsed):
+        """后台自动保存完成"""
+        if not ok:
+            self.statusBar().showMessage(f"自动保存失败: {file_path}: {error}")
+            # 写入失败后日志已不完整，下次重新写入完整内容
+            for i in range(self.tab_widget.count()):
+                editor = self.tab_widget.widget(i)
+                if isinstance(editor, QsciScintilla) and getattr(editor, 'current_file', None) == file_path:
+                    editor.autosave_generation = -1
+                    self.reset_autosave_journal(editor)
+            return
+        kind = "完整" if full else "增量"
+        self.statusBar().showMessage(f"自动保存: {file_path}（{kind} {size / 1024:.1f} KB，{elapsed * 1000:.0f} ms）")
     
     def build_language_menu(self):
         """构建层级语言菜单"""
@@ -1879,90 +8993,141 @@ class MyIDE(QMainWindow):
     def open_file(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "打开文件", "", "所有文件 (*);;Python 文件 (*.py);;C++ 文件 (*.cpp *.h);;Java 文件 (*.java);;HTML 文件 (*.html);;JavaScript 文件 (*.js)")
         if file_path:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            editor = self.setup_editor()
-            editor.setText(content)
-            
-            # 自动检测语言
-            file_ext = file_path.split('.')[-1].lower() if '.' in file_path else None
-            detected_lang = self.detect_language(content, file_ext)
-            
-            # 设置语言
-            self.change_language(detected_lang, editor)
-            
-            # 获取文件名（处理不同操作系统的路径分隔符）
-            if '\\' in file_path:
-                filename = file_path.split('\\')[-1]
-            else:
-                filename = file_path.split('/')[-1]
-            
-            index = self.tab_widget.addTab(editor, filename)
-            self.tab_widget.setCurrentIndex(index)
-            editor.current_file = file_path
-            # 标记为未修改
-            editor.setModified(False)
-            self.statusBar().showMessage(f"打开文件: {file_path}")
+            self.open_specific_file(file_path)
     
-    def save_file(self):
+    def save_file(self, on_saved=None):
+        """保存当前文件，on_saved在写入成功后调用"""
         editor = self.tab_widget.currentWidget()
+        if isinstance(editor, MappedFileViewer):
+            self.statusBar().showMessage("只读查看器不能保存")
+            return
         if hasattr(editor, 'current_file') and editor.current_file:
-            with open(editor.current_file, 'w', encoding='utf-8') as f:
-                f.write(editor.text())
-            # 标记为未修改
-            editor.setModified(False)
-            # 删除对应的自动保存文件
-            autosave_path = editor.current_file + ".autosave"
-            if os.path.exists(autosave_path):
-                try:
-                    os.remove(autosave_path)
-                except Exception as e:
-                    pass
-            self.statusBar().showMessage(f"保存文件: {editor.current_file}")
+            self.start_save(editor, editor.current_file, on_saved)
         else:
-            self.save_as_file()
+            self.save_as_file(on_saved)
     
-    def save_as_file(self):
+    def save_as_file(self, on_saved=None):
+        if self.is_loading(self.tab_widget.currentWidget()):
+            return
         file_path, _ = QFileDialog.getSaveFileName(self, "另存为", "", "所有文件 (*);;Python 文件 (*.py);;C++ 文件 (*.cpp);;Java 文件 (*.java);;HTML 文件 (*.html);;JavaScript 文件 (*.js)")
         if file_path:
             editor = self.tab_widget.currentWidget()
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(editor.text())
-            editor.current_file = file_path
-            # 标记为未修改
-            editor.setModified(False)
-            # 删除对应的自动保存文件
-            autosave_path = file_path + ".autosave"
-            if os.path.exists(autosave_path):
-                try:
-                    os.remove(autosave_path)
-                except Exception as e:
-                    pass
-            # 获取文件名（处理不同操作系统的路径分隔符）
-            if '\\' in file_path:
-                filename = file_path.split('\\')[-1]
-            else:
-                filename = file_path.split('/')[-1]
-            self.tab_widget.setTabText(self.tab_widget.currentIndex(), filename)
-            self.statusBar().showMessage(f"保存文件: {file_path}")
+            if isinstance(editor, MappedFileViewer):
+                self.statusBar().showMessage("只读查看器不能保存")
+                return
+            # 写入成功后才更新标签页的文件路径和标题
+            self.start_save(editor, file_path, on_saved)
+    
+    def start_save(self, editor, file_path, on_saved=None):
+        """在GUI线程取文本快照，交给后台线程原子写入"""
+        if self.is_loading(editor):
+            return
+        generation = getattr(editor, 'edit_generation', 0)
+        if on_saved is not None:
+            self.save_callbacks.setdefault((id(editor), generation), []).append(on_saved)
+        task = FileSaveTask(editor.text(), file_path, editor, generation, self.save_signals,
+                            recovery=self.recovery_index)
+        # 保存任务会删除自动保存文件和日志，之后的编辑重新从完整内容开始记录
+        editor.autosave_generation = generation
+        self.reset_autosave_journal(editor)
+        self.save_thread_pool.start(task)
+        self.statusBar().showMessage(f"正在保存: {file_path}")
+    
+    def is_loading(self, editor):
+        """正在分块加载的大文件内容还不完整，保存会用已加载的部分替换原文件，显示提示并返回True"""
+        if getattr(editor, 'file_loader', None) is None:
+            return False
+        self.statusBar().showMessage(f"文件还在加载，加载完成后才能保存: {editor.current_file}")
+        return True
+    
+    def on_save_finished(self, editor, file_path, generation, ok, error, size, elapsed):
+        """后台保存完成，更新标签页状态并显示耗时"""
+        callbacks = self.save_callbacks.pop((id(editor), generation), [])
+        if not ok:
+            self.statusBar().showMessage(f"保存失败: {file_path}: {error}")
+            # 内容没有写入文件，下次自动保存时仍需保存
+            if any(self.tab_widget.widget(i) is editor for i in range(self.tab_widget.count())):
+                editor.autosave_generation = -1
+            return
+        # 标签页可能已在保存期间关闭，只比较对象，不访问可能已释放的编辑器
+        index = next((i for i in range(self.tab_widget.count()) if self.tab_widget.widget(i) is editor), -1)
+        if index != -1:
+            if getattr(editor, 'current_file', None) != file_path:
+                # 另存为
+                editor.current_file = file_path
+                self.tab_widget.setTabText(index, os.path.basename(file_path))
+            # 保存期间又有修改时保持修改状态
+            if editor.edit_generation == generation:
+                editor.setModified(False)
+        
+        # 新建的文件加入快速打开索引
+        if self.file_index is not None:
+            rel_path = self.file_index.relative_path(file_path)
+            if rel_path is not None:
+                self.file_index.add(rel_path)
+        if self.trigram_index is not None:
+            rel_path = self.trigram_index.relative_path(file_path)
+            if rel_path is not None:
+                self.update_trigram_index([rel_path])
+        
+        elapsed_ms = elapsed * 1000
+        message = f"保存文件: {file_path}（{size / 1024:.1f} KB，{elapsed_ms:.0f} ms）"
+        if elapsed_ms >= self.SLOW_SAVE_MS:
+            message = f"保存较慢 {message}"
+        self.statusBar().showMessage(message)
+        for callback in callbacks:
+            callback()
+    
+    def closeEvent(self, event):
+        """关闭窗口时停止查找、索引更新和正在运行的脚本，并关闭查找进程池"""
+        if self.trigram_task is not None:
+            self.trigram_task.cancelled = True
+            self.trigram_task = None
+        self.find_panel.shutdown()
+        self.run_panel.shutdown()
+        super().closeEvent(event)
     
     def close_tab(self, index):
+        editor = self.tab_widget.widget(index)
+        # 只读查看器停止后台任务并释放映射
+        if isinstance(editor, MappedFileViewer):
+            editor.close_file()
+        # 正在加载的大文件停止加载
+        loader = getattr(editor, 'file_loader', None)
+        if loader is not None:
+            loader.cancel()
+            loader.deleteLater()
+            editor.file_loader = None
+            self.file_load_progress.hide()
+        # 关闭的标签页的问题不再显示
+        if editor is not None and editor is self.problems_editor:
+            self.problems_editor = None
+            self.problems_model.set_problems([])
+            self.problems_dock.setWindowTitle("问题")
         self.tab_widget.removeTab(index)
+        # removeTab不会删除编辑器，需要手动释放文档占用的内存
+        if editor is not None:
+            editor.deleteLater()
     
     def undo(self):
         editor = self.tab_widget.currentWidget()
-        editor.undo()
+        if isinstance(editor, QsciScintilla):
+            editor.undo()
     
     def redo(self):
         editor = self.tab_widget.currentWidget()
-        editor.redo()
+        if isinstance(editor, QsciScintilla):
+            editor.redo()
     
     def on_tab_changed(self, index):
         # 标签页切换时更新状态栏
         editor = self.tab_widget.currentWidget()
         if editor:
             editor.update_status()
+            # 问题列表切换到当前标签页，内容未变时直接使用缓存的结果
+            if (hasattr(editor, 'syntax_timer') and editor.length() > 0
+                    and self.settings.get("syntax_check_enabled", True)):
+                self.check_syntax(editor=editor)
     
     def detect_language(self, content, file_ext=None):
         """根据文件内容和扩展名自动检测编程语言"""
@@ -1977,7 +9142,7 @@ class MyIDE(QMainWindow):
                 'html': 'HTML',
                 'htm': 'HTML',
                 'js': 'JavaScript',
-                'json': 'JavaScript',
+                'json': 'JSON',
                 'xml': 'XML',
                 'md': 'Markdown (preinstalled)',
                 'markdown': 'Markdown (preinstalled)'
@@ -2023,6 +9188,9 @@ class MyIDE(QMainWindow):
     def change_language(self, language, editor=None):
         if editor is None:
             editor = self.tab_widget.currentWidget()
+        if not isinstance(editor, QsciScintilla):
+            self.statusBar().showMessage("只读查看器不支持语法高亮")
+            return
         
         font = editor.font()
         
@@ -2297,6 +9465,7 @@ class MyIDE(QMainWindow):
         # 更新Python运行按钮可见性
         if hasattr(self, 'run_python_action'):
             self.run_python_action.setVisible(language == "Python")
+            self.profile_python_action.setVisible(language == "Python")
         
         # 更新运行菜单可见性
         # 运行菜单已被删除，不再需要更新可见性
@@ -2305,22 +9474,16 @@ class MyIDE(QMainWindow):
         """在浏览器中打开当前HTML文件"""
         editor = self.tab_widget.currentWidget()
         if editor and hasattr(editor, 'current_file') and editor.current_file:
-            # 保存文件
-            self.save_file()
-            
-            # 在浏览器中打开
+            # 保存完成后在浏览器中打开
             import webbrowser
-            webbrowser.open(editor.current_file)
+            self.save_file(on_saved=lambda: webbrowser.open(editor.current_file))
         else:
             self.statusBar().showMessage("请先保存HTML文件")
     
-    def run_python_file(self):
-        """运行当前Python文件，允许选择解释器"""
+    def run_python_file(self, profile=False):
+        """运行当前Python文件，允许选择解释器；profile为True时使用cProfile运行"""
         editor = self.tab_widget.currentWidget()
         if editor and hasattr(editor, 'current_file') and editor.current_file:
-            # 保存文件
-            self.save_file()
-            
             # 检查是否是Python文件
             file_ext = editor.current_file.split('.')[-1].lower() if '.' in editor.current_file else None
             if file_ext != 'py':
@@ -2332,22 +9495,19 @@ class MyIDE(QMainWindow):
             if not python_interpreter:
                 return
             
-            # 显示终端
-            self.terminal_dock.setVisible(True)
-            
-            # 获取当前终端或创建新终端
-            if self.terminal_tab.count() == 0:
-                self.add_terminal_tab()
-            terminal = self.terminal_tab.currentWidget()
-            
-            # 运行Python文件
-            command = f'{python_interpreter} "{editor.current_file}"\n'
-            terminal.process.write(command.encode('utf-8'))
-            
-            self.statusBar().showMessage(f"正在运行Python文件: {editor.current_file}")
+            # 保存完成后再运行，保证运行的是最新内容
+            self.save_file(on_saved=lambda: self.run_python_in_console(python_interpreter, editor.current_file, profile))
         else:
             self.statusBar().showMessage("请先保存Python文件")
     
+    def run_python_in_console(self, python_interpreter, file_path, profile=False):
+        """在运行面板中运行Python文件"""
+        # 显示运行面板
+        self.run_dock.setVisible(True)
+        self.run_panel.run(python_interpreter, file_path, profile)
+        
+        self.statusBar().showMessage(f"{'使用cProfile运行' if profile else '正在运行'}Python文件: {file_path}")
+    
     def get_python_interpreter(self):
         """获取Python解释器路径，允许用户选择"""
         import sys
@@ -2400,233 +9560,280 @@ class MyIDE(QMainWindow):
     
     def add_terminal_tab(self):
         """添加新的终端标签页"""
-        terminal = TerminalWidget()
+        terminal = TerminalWidget(scrollback_lines=self.settings.get("terminal_scrollback_lines", 100000),
+                                  encoding=self.settings.get("terminal_encoding", "utf-8"),
+                                  errors=self.settings.get("terminal_encoding_errors", "gbk"),
+                                  use_pty=self.settings.get("terminal_pty", True),
+                                  history=self.terminal_history())
         index = self.terminal_tab.addTab(terminal, f"终端 {self.terminal_tab.count() + 1}")
         self.terminal_tab.setCurrentIndex(index)
     
+    def terminal_history(self):
+        """当前工作区的终端命令历史，工作区改变后读取新工作区的历史文件"""
+        root = self.resource_explorer.workspace_root
+        if self.command_history is None or self.command_history_root != root:
+            self.command_history = CommandHistory(CommandHistory.history_path(root))
+            self.command_history_root = root
+        return self.command_history
+    
+    def update_terminal_history(self):
+        """工作区改变后所有终端改用新工作区的命令历史"""
+        history = self.terminal_history()
+        for i in range(self.terminal_tab.count()):
+            terminal = self.terminal_tab.widget(i)
+            if hasattr(terminal, "set_history"):
+                terminal.set_history(history)
+    
     def close_terminal_tab(self, index):
         """关闭终端标签页"""
         if self.terminal_tab.count() > 1:  # 至少保留一个终端
             self.terminal_tab.removeTab(index)
     
-    def check_syntax(self, editor=None):
-        """检查当前文件的语法"""
-        # 获取当前编辑器
-        if editor is None:
-            editor = self.tab_widget.currentWidget()
-        if not editor:
-            self.statusBar().showMessage("没有打开的文件")
+    def schedule_syntax_check(self, editor):
+        """文本改变时重置防抖定时器，延迟执行语法检查"""
+        # 文本已改变，之前提交的检查结果全部过期
+        editor.syntax_generation += 1
+        if not self.settings.get("syntax_check_enabled", True) or getattr(editor, 'large_file', False):
+            editor.syntax_timer.stop()
             return
-        
-        # 获取文件内容
-        content = editor.text()
-        if not content:
-            self.statusBar().showMessage("文件内容为空")
+        editor.syntax_timer.start(self.settings.get("syntax_check_interval", 1000))
+    
+    def on_editor_modified(self, editor, position, mod_type, text, length, lines_added):
+        """Scintilla修改通知，记录增量检查的脏行范围和自动保存的编辑日志"""
+        if not mod_type & (QsciScintilla.SC_MOD_INSERTTEXT | QsciScintilla.SC_MOD_DELETETEXT):
             return
-        
-        # 获取当前语言
-        current_lang = self.current_language_label.text()
-        problems = []
-        
-        # 根据语言选择语法检查器
+        line = editor.SendScintilla(QsciScintilla.SCI_LINEFROMPOSITION, position)
+        editor.python_checker.mark_dirty(line, lines_added)
+        
+        if editor.journal_base:
+            if mod_type & QsciScintilla.SC_MOD_INSERTTEXT:
+                # 文本中含有NUL时通知里的内容不完整，下次改为完整保存
+                if text is None or len(text) != length:
+                    self.reset_autosave_journal(editor)
+                    return
+                editor.journal_pending += AutosaveJournal.record(editor.journal_ops, b'I', position, data=text)
+            else:
+                editor.journal_pending += AutosaveJournal.record(editor.journal_ops, b'D', position, length=length)
+            # 未写入的操作过多时不再记录，下次直接完整保存
+            if editor.journal_pending > self.JOURNAL_MAX_PENDING_BYTES:
+                self.reset_autosave_journal(editor)
+    
+    def reset_autosave_journal(self, editor):
+        """丢弃编辑日志，下次自动保存时写入完整内容"""
+        editor.journal_base = False
+        editor.journal_ops = []
+        editor.journal_pending = 0
+    
+    def get_syntax_checker(self, current_lang):
+        """根据语言返回对应的语法检查函数"""
         if "Python" in current_lang:
-            problems = self.check_python_syntax(content)
+            return self.check_python_syntax
         elif "C++" in current_lang or "C" in current_lang:
-            problems = self.check_cpp_syntax(content)
+            return self.check_cpp_syntax
+        elif "JavaScript" in current_lang:
+            return self.check_javascript_syntax
+        elif "JSON5" in current_lang:
+            return lambda content: self.check_json_syntax(content, json5=True)
+        elif "JSON" in current_lang:
+            return self.check_json_syntax
         elif "Java" in current_lang:
-            problems = self.check_java_syntax(content)
+            return self.check_java_syntax
         elif "HTML" in current_lang:
-            problems = self.check_html_syntax(content)
-        elif "JavaScript" in current_lang or "JSON" in current_lang:
-            problems = self.check_javascript_syntax(content)
+            return self.check_html_syntax
         elif "CSS" in current_lang:
-            problems = self.check_css_syntax(content)
+            return self.check_css_syntax
         elif "PHP" in current_lang:
-            problems = self.check_php_syntax(content)
+            return self.check_php_syntax
         elif "Bash" in current_lang or "Shell" in current_lang or "Batch" in current_lang:
-            problems = self.check_bash_syntax(content)
+            return self.check_bash_syntax
         elif "SQL" in current_lang:
-            problems = self.check_sql_syntax(content)
+            return self.check_sql_syntax
         elif "Asm" in current_lang or "NASM" in current_lang:
-            problems = self.check_asm_syntax(content)
+            return self.check_asm_syntax
         elif "QML" in current_lang:
-            problems = self.check_qml_syntax(content)
+            return self.check_qml_syntax
         else:
             # 为其他语言提供基本的语法检查
-            problems = self.check_generic_syntax(content, current_lang)
+            return lambda content: self.check_generic_syntax(content, current_lang)
+    
+    def check_syntax(self, editor=None):
+        """检查当前文件的语法，在后台线程中对文本快照执行检查"""
+        # 未指定编辑器时视为手动检查
+        manual = editor is None
+        # 获取当前编辑器
+        if editor is None:
+            editor = self.tab_widget.currentWidget()
+        if not editor:
+            self.statusBar().showMessage("没有打开的文件")
+            return
+        if isinstance(editor, MappedFileViewer):
+            if manual:
+                self.statusBar().showMessage("只读查看器不支持语法检查")
+            return
+        
+        # 手动触发时取消尚未执行的防抖检查
+        if hasattr(editor, 'syntax_timer'):
+            editor.syntax_timer.stop()
+        
+        # 大文件模式下不做语法检查
+        if getattr(editor, 'large_file', False):
+            if manual:
+                self.statusBar().showMessage("大文件模式下已禁用语法检查")
+            return
+        
+        if editor.length() == 0:
+            self.statusBar().showMessage("文件内容为空")
+            return
+        
+        # 使用编辑器自己的语言，状态栏的语言标签只在切换语言时更新
+        current_lang = getattr(editor, 'current_language', None) or self.current_language_label.text()
+        
+        if "Python" in current_lang and hasattr(editor, 'python_checker'):
+            # 手动检查（F7）时强制全量检查
+            checker, content, incremental = self.prepare_python_check(editor, incremental=not manual)
+        else:
+            # 获取文件内容快照
+            content = editor.text()
+            checker = self.get_syntax_checker(current_lang)
+            incremental = False
+        
+        # 全量检查的结果按内容缓存，增量检查本身已经很快且依赖编辑器状态
+        cache_prefix = None if incremental else (current_lang, self.SYNTAX_CHECKER_VERSION)
+        
+        # 提交到后台线程，结果带上当前版本号
+        generation = getattr(editor, 'syntax_generation', 0)
+        task = SyntaxCheckTask(checker, content, editor, generation, self.syntax_signals,
+                               self.syntax_cache, cache_prefix)
+        self.syntax_thread_pool.start(task)
+    
+    def prepare_python_check(self, editor, incremental=True):
+        """准备Python检查任务，返回(检查函数, 文本快照, 是否为增量检查)
+        
+        增量模式下只读取脏行，不需要重新compile时不复制整个文档。
+        """
+        state = editor.python_checker
+        line_count = editor.lines()
+        needs_compile = None
+        # 脏行过多时直接全量检查，比逐行读取更快
+        if incremental and state.dirty_line_count() * 2 < line_count:
+            needs_compile = state.update(lambda i: self.editor_line_text(editor, i), line_count)
+        
+        if needs_compile is None:
+            # 全量检查，之后的修改通知基于此快照累积
+            state.lines = None
+            state.clear_dirty()
+            return state.check, editor.text(), False
+        
+        line_results = list(state.line_results)
+        content = editor.text() if needs_compile else None
+        return lambda content: state.finish(line_results, content), content, True
+    
+    def editor_line_text(self, editor, line):
+        """获取编辑器中某一行的文本，不含换行符"""
+        text = editor.text(line)
+        if text.endswith('\n'):
+            text = text[:-1]
+        return text
+    
+    def on_syntax_check_finished(self, editor, generation, problems):
+        """后台语法检查完成，丢弃过期结果后显示"""
+        # 编辑器内容已在检查期间改变，结果已过期
+        if getattr(editor, 'syntax_generation', generation) != generation:
+            return
+        # 只显示当前标签页的检查结果
+        if editor is not self.tab_widget.currentWidget():
+            return
         
         # 显示语法检查结果
-        self.show_syntax_errors(problems)
+        self.show_syntax_errors(problems, editor)
+        self.update_syntax_cache_status()
+    
+    def update_syntax_cache_status(self):
+        """在状态栏显示语法检查缓存的命中统计"""
+        hits, misses, entries = self.syntax_cache.stats()
+        label = self.status_info["syntax_cache"]
+        label.setText(f"缓存: {hits}/{misses}")
+        label.setToolTip(f"语法检查缓存 命中 {hits} 次，未命中 {misses} 次，已缓存 {entries} 个结果")
     
     def check_python_syntax(self, content):
         """检查Python语法，提供更精准的错误信息"""
-        problems = []
-        lines = content.split('\n')
-        
-        # 1. 先进行简单的静态检查
-        for line_num, line in enumerate(lines, 1):
-            stripped_line = line.strip()
-            
-            # 检查未闭合的字符串
-            if stripped_line.count('"') % 2 != 0 or stripped_line.count("'") % 2 != 0:
-                # 检查是否是注释
-                if not stripped_line.startswith('#'):
-                    problems.append((line_num, 1, "可能存在未闭合的字符串", "error"))
-            
-            # 检查缩进问题（简单示例）
-            if line and not line.startswith(' ') and not line.startswith('\t') and not stripped_line.startswith('#'):
-                # 检查是否是类或函数定义
-                if not any(keyword in stripped_line for keyword in ['class ', 'def ', 'if ', 'elif ', 'else:', 'for ', 'while ', 'try:', 'except', 'finally:', 'with ', 'lambda ']):
-                    problems.append((line_num, 1, "可能存在缩进问题", "warning"))
-            
-            # 检查print语句（Python 3中应该使用print()函数）
-            if 'print ' in line and not 'print(' in line:
-                problems.append((line_num, line.find('print') + 1, "Python 3中print应该使用括号", "warning"))
-            
-            # 检查比较运算符
-            if '=' in line and not '==' in line and not '!=' in line and not '<=' in line and not '>=' in line and not '+=' in line and not '-=' in line and not '*=' in line and not '/=' in line:
-                # 检查是否是赋值语句
-                if 'if ' in line or 'elif ' in line or 'while ' in line:
-                    problems.append((line_num, line.find('=') + 1, "可能应该使用==而不是=", "warning"))
-        
-        # 2. 使用compile函数进行更精确的语法检查
-        try:
-            compile(content, '<string>', 'exec')
-        except SyntaxError as e:
-            # 解析语法错误，提供更详细的信息
-            error_msg = f"语法错误: {e.msg}"
-            # 根据错误类型提供更友好的提示
-            if "unexpected EOF" in e.msg:
-                error_msg = "语法错误: 遇到了意外的文件结束，可能缺少闭合括号、引号或缩进块"
-            elif "expected an indented block" in e.msg:
-                error_msg = "语法错误: 期望有缩进块，可能缺少冒号或缩进"
-            elif "invalid syntax" in e.msg:
-                error_msg = f"语法错误: 无效的语法，位置 {e.offset}"
-            problems.append((e.lineno, e.offset, error_msg, "error"))
-        except Exception as e:
-            # 其他错误
-            problems.append((1, 1, f"未知错误: {str(e)}", "error"))
-        
-        return problems
+        return PythonSyntaxChecker().check(content)
     
     def check_cpp_syntax(self, content):
         """检查C++语法，提供更精准的错误信息"""
         problems = []
-        lines = content.split('\n')
-        
-        # 跟踪括号匹配
-        brace_stack = []
         
-        for line_num, line in enumerate(lines, 1):
-            stripped_line = line.strip()
-            
-            # 跳过注释行
-            if stripped_line.startswith('//') or stripped_line.startswith('/*') or stripped_line.startswith('*'):
+        # 单遍扫描：括号匹配由扫描器完成，注释和字符串不参与检查
+        for line_num, line, code in self.CPP_SCANNER.scan(content, problems):
+            stripped_line = code.strip()
+            if not stripped_line:
                 continue
-            
-            # 检查括号匹配
-            for char_pos, char in enumerate(line):
-                if char in '([{':
-                    brace_stack.append((char, line_num, char_pos + 1))
-                elif char in ')]}':
-                    if not brace_stack:
-                        problems.append((line_num, char_pos + 1, "多余的右括号", "error"))
-                    else:
-                        open_brace, open_line, open_pos = brace_stack.pop()
-                        if (open_brace == '(' and char != ')') or \
-                           (open_brace == '[' and char != ']') or \
-                           (open_brace == '{' and char != '}'):
-                            problems.append((line_num, char_pos + 1, f"括号不匹配: {open_brace} 和 {char}", "error"))
+            words = CodeScanner.words(code)
             
             # 检查分号
-            if stripped_line and not stripped_line.endswith(';') and not stripped_line.endswith('{') and not stripped_line.endswith('}') and not stripped_line.startswith('#') and not '(' in stripped_line:
+            if not stripped_line.endswith(';') and not stripped_line.endswith('{') and not stripped_line.endswith('}') and not stripped_line.startswith('#') and not '(' in stripped_line:
                 # 检查是否是控制流语句
-                if not any(keyword in stripped_line for keyword in ['if', 'else', 'for', 'while', 'do', 'switch', 'case', 'default', 'break', 'continue', 'return', 'goto', 'try', 'catch', 'throw', 'new', 'delete', 'class', 'struct', 'enum', 'union', 'typedef', 'namespace', 'using', 'template', 'extern', 'inline', 'static', 'const', 'volatile', 'mutable', 'friend', 'virtual', 'override', 'final', 'explicit', 'constexpr', 'consteval', 'constinit', 'noexcept', 'decltype', 'auto', 'declspec', '__declspec', '__attribute__']):
+                if words.isdisjoint(self.CPP_STATEMENT_KEYWORDS):
                     problems.append((line_num, len(line), "可能缺少分号", "warning"))
             
             # 检查常见的C++语法问题
             
             # 检查cout/cin流操作符
-            if 'cout' in line or 'cin' in line:
-                if '<<' not in line and '>>' not in line:
-                    problems.append((line_num, line.find('cout') + 1 if 'cout' in line else line.find('cin') + 1, "可能缺少流操作符 << 或 >>", "warning"))
+            if 'cout' in words or 'cin' in words:
+                if '<<' not in code and '>>' not in code:
+                    problems.append((line_num, code.find('cout') + 1 if 'cout' in words else code.find('cin') + 1, "可能缺少流操作符 << 或 >>", "warning"))
             
             # 检查比较运算符
-            if '=' in line and not '==' in line and not '!=' in line and not '<=' in line and not '>=' in line and not '+=' in line and not '-=' in line and not '*=' in line and not '/=' in line:
+            if '=' in code and not self.COMPOUND_OPERATOR_RE.search(code):
                 # 检查是否是条件语句
-                if any(keyword in stripped_line for keyword in ['if', 'else if', 'while', 'for', 'switch', 'case']):
-                    problems.append((line_num, line.find('=') + 1, "条件语句中可能应该使用==而不是=", "warning"))
+                if not words.isdisjoint(self.CONDITION_KEYWORDS):
+                    problems.append((line_num, code.find('=') + 1, "条件语句中可能应该使用==而不是=", "warning"))
             
             # 检查未初始化的变量
-            if any(type_keyword in line for type_keyword in ['int ', 'float ', 'double ', 'char ', 'bool ', 'short ', 'long ', 'unsigned ', 'signed ', 'void ', 'auto ', 'const ', 'volatile ', 'mutable ', 'static ', 'extern ']) and '=' not in line and '(' not in line:
+            if not words.isdisjoint(self.CPP_TYPE_KEYWORDS) and '=' not in code and '(' not in code:
                 # 检查是否是变量声明
-                if not any(keyword in stripped_line for keyword in ['class', 'struct', 'enum', 'union', 'typedef', 'namespace', 'using', 'template', 'friend', 'virtual', 'override', 'final', 'explicit', 'constexpr', 'consteval', 'constinit', 'noexcept', 'decltype', 'declspec', '__declspec', '__attribute__']):
+                if words.isdisjoint(self.CPP_DECLARATION_KEYWORDS):
                     problems.append((line_num, 1, "可能存在未初始化的变量", "warning"))
         
-        # 检查未闭合的括号
-        for open_brace, open_line, open_pos in brace_stack:
-            problems.append((open_line, open_pos, f"未闭合的括号: {open_brace}", "error"))
-        
         return problems
     
     def check_java_syntax(self, content):
         """检查Java语法，提供更精准的错误信息"""
         problems = []
-        lines = content.split('\n')
-        
-        # 跟踪括号匹配
-        brace_stack = []
         
-        for line_num, line in enumerate(lines, 1):
-            stripped_line = line.strip()
-            
-            # 跳过注释行
-            if stripped_line.startswith('//') or stripped_line.startswith('/*') or stripped_line.startswith('*'):
+        # 单遍扫描：括号匹配由扫描器完成，注释和字符串不参与检查
+        for line_num, line, code in self.JAVA_SCANNER.scan(content, problems):
+            stripped_line = code.strip()
+            if not stripped_line:
                 continue
-            
-            # 检查括号匹配
-            for char_pos, char in enumerate(line):
-                if char in '([{':
-                    brace_stack.append((char, line_num, char_pos + 1))
-                elif char in ')]}':
-                    if not brace_stack:
-                        problems.append((line_num, char_pos + 1, "多余的右括号", "error"))
-                    else:
-                        open_brace, open_line, open_pos = brace_stack.pop()
-                        if (open_brace == '(' and char != ')') or \
-                           (open_brace == '[' and char != ']') or \
-                           (open_brace == '{' and char != '}'):
-                            problems.append((line_num, char_pos + 1, f"括号不匹配: {open_brace} 和 {char}", "error"))
+            words = CodeScanner.words(code)
             
             # 检查分号
-            if stripped_line and not stripped_line.endswith(';') and not stripped_line.endswith('{') and not stripped_line.endswith('}') and not stripped_line.startswith('package') and not stripped_line.startswith('import'):
+            if not stripped_line.endswith(';') and not stripped_line.endswith('{') and not stripped_line.endswith('}') and not stripped_line.startswith('package') and not stripped_line.startswith('import'):
                 # 检查是否是控制流语句
-                if not any(keyword in stripped_line for keyword in ['if', 'else', 'for', 'while', 'do', 'switch', 'case', 'default', 'break', 'continue', 'return', 'throw', 'try', 'catch', 'finally', 'synchronized', 'class', 'interface', 'enum', 'record', 'annotation', 'extends', 'implements', 'throws', 'native', 'abstract', 'final', 'static', 'private', 'protected', 'public', 'default', 'strictfp', 'transient', 'volatile', 'synchronized', 'instanceof', 'new', 'super', 'this', 'assert', 'var', 'const', 'goto']):
+                if words.isdisjoint(self.JAVA_STATEMENT_KEYWORDS):
                     problems.append((line_num, len(line), "可能缺少分号", "warning"))
             
             # 检查常见的Java语法问题
             
             # 检查比较运算符
-            if '=' in line and not '==' in line and not '!=' in line and not '<=' in line and not '>=' in line and not '+=' in line and not '-=' in line and not '*=' in line and not '/=' in line:
+            if '=' in code and not self.COMPOUND_OPERATOR_RE.search(code):
                 # 检查是否是条件语句
-                if any(keyword in stripped_line for keyword in ['if', 'else if', 'while', 'for', 'switch', 'case']):
-                    problems.append((line_num, line.find('=') + 1, "条件语句中可能应该使用==而不是=", "warning"))
+                if not words.isdisjoint(self.CONDITION_KEYWORDS):
+                    problems.append((line_num, code.find('=') + 1, "条件语句中可能应该使用==而不是=", "warning"))
             
             # 检查未初始化的变量
-            if any(type_keyword in line for type_keyword in ['int ', 'float ', 'double ', 'char ', 'boolean ', 'short ', 'long ', 'byte ', 'void ', 'var ', 'private ', 'protected ', 'public ', 'static ', 'final ', 'abstract ', 'synchronized ', 'transient ', 'volatile ', 'native ', 'strictfp ', 'default ', 'record ', 'enum ', 'interface ', 'class ']) and '=' not in line and '(' not in line:
+            if not words.isdisjoint(self.JAVA_TYPE_KEYWORDS) and '=' not in code and '(' not in code:
                 # 检查是否是变量声明
-                if not any(keyword in stripped_line for keyword in ['class', 'interface', 'enum', 'record', 'annotation', 'extends', 'implements', 'throws', 'native', 'abstract', 'final', 'static', 'private', 'protected', 'public', 'default', 'strictfp', 'transient', 'volatile', 'synchronized', 'instanceof', 'new', 'super', 'this', 'assert', 'var', 'const', 'goto']):
+                if words.isdisjoint(self.JAVA_DECLARATION_KEYWORDS):
                     problems.append((line_num, 1, "可能存在未初始化的变量", "warning"))
             
             # 检查Java关键字使用
-            if 'public' in line or 'protected' in line or 'private' in line:
+            modifier = next((word for word in self.JAVA_ACCESS_MODIFIERS if word in words), None)
+            if modifier:
                 # 检查访问修饰符位置
-                if not any(keyword in line for keyword in ['class ', 'interface ', 'enum ', 'record ', 'annotation ', 'void ', 'int ', 'float ', 'double ', 'char ', 'boolean ', 'short ', 'long ', 'byte ', 'var ']):
-                    problems.append((line_num, line.find('public') + 1 if 'public' in line else line.find('protected') + 1 if 'protected' in line else line.find('private') + 1, "访问修饰符应该用于类、接口或方法", "warning"))
-        
-        # 检查未闭合的括号
-        for open_brace, open_line, open_pos in brace_stack:
-            problems.append((open_line, open_pos, f"未闭合的括号: {open_brace}", "error"))
+                if words.isdisjoint(self.JAVA_MEMBER_KEYWORDS):
+                    problems.append((line_num, code.find(modifier) + 1, "访问修饰符应该用于类、接口或方法", "warning"))
         
         return problems
     
@@ -2705,121 +9912,74 @@ class MyIDE(QMainWindow):
     def check_javascript_syntax(self, content):
         """检查JavaScript语法，提供更精准的错误信息"""
         problems = []
-        lines = content.split('\n')
-        
-        # 跟踪括号匹配
-        brace_stack = []
         
-        # 1. 先进行静态检查
-        for line_num, line in enumerate(lines, 1):
-            stripped_line = line.strip()
-            
-            # 跳过注释行
-            if stripped_line.startswith('//') or stripped_line.startswith('/*') or stripped_line.startswith('*'):
+        # 1. 先进行静态检查，单遍扫描同时完成括号匹配
+        for line_num, line, code in self.JAVASCRIPT_SCANNER.scan(content, problems):
+            stripped_line = code.strip()
+            if not stripped_line:
                 continue
-            
-            # 检查括号匹配
-            for char_pos, char in enumerate(line):
-                if char in '([{':
-                    brace_stack.append((char, line_num, char_pos + 1))
-                elif char in ')]}':
-                    if not brace_stack:
-                        problems.append((line_num, char_pos + 1, "多余的右括号", "error"))
-                    else:
-                        open_brace, open_line, open_pos = brace_stack.pop()
-                        if (open_brace == '(' and char != ')') or \
-                           (open_brace == '[' and char != ']') or \
-                           (open_brace == '{' and char != '}'):
-                            problems.append((line_num, char_pos + 1, f"括号不匹配: {open_brace} 和 {char}", "error"))
+            words = CodeScanner.words(code)
             
             # 检查常见的JavaScript语法问题
             
             # 检查比较运算符
-            if '=' in line and not '==' in line and not '!=' in line and not '<=' in line and not '>=' in line and not '+=' in line and not '-=' in line and not '*=' in line and not '/=' in line:
+            if '=' in code and not self.COMPOUND_OPERATOR_RE.search(code):
                 # 检查是否是条件语句
-                if any(keyword in stripped_line for keyword in ['if', 'else if', 'while', 'for', 'switch', 'case']):
-                    problems.append((line_num, line.find('=') + 1, "条件语句中可能应该使用==而不是=", "warning"))
+                if not words.isdisjoint(self.CONDITION_KEYWORDS):
+                    problems.append((line_num, code.find('=') + 1, "条件语句中可能应该使用==而不是=", "warning"))
             
             # 检查var关键字（建议使用let或const）
-            if 'var ' in line:
-                problems.append((line_num, line.find('var') + 1, "建议使用let或const代替var", "warning"))
+            if 'var' in words:
+                problems.append((line_num, code.find('var') + 1, "建议使用let或const代替var", "warning"))
             
             # JavaScript不需要强制分号，移除分号警告
             # 只检查其他语法问题
         
-        # 检查未闭合的括号
-        for open_brace, open_line, open_pos in brace_stack:
-            problems.append((open_line, open_pos, f"未闭合的括号: {open_brace}", "error"))
+        # 2. 使用语法验证器进行精确的语法检查（只解析，不执行代码）
+        error = JavaScriptValidator().validate(content)
+        if error:
+            problems.append(error)
         
-        # 2. 使用eval进行更精确的语法检查
+        return problems
+    
+    def check_json_syntax(self, content, json5=False):
+        """检查JSON语法，JSON5允许注释和尾随逗号，只检查括号匹配"""
+        problems = []
+        if json5:
+            for _ in self.JAVASCRIPT_SCANNER.scan(content, problems):
+                pass
+            return problems
         try:
-            # 简单的JavaScript语法检查，使用eval尝试执行（仅用于语法检查）
-            eval(content)
-        except SyntaxError as e:
-            # 解析语法错误，提供更详细的信息
-            error_msg = f"语法错误: {e.msg}"
-            # 根据错误类型提供更友好的提示
-            if "unexpected end of input" in e.msg:
-                error_msg = "语法错误: 遇到了意外的输入结束，可能缺少闭合括号、引号或代码块"
-            elif "expected expression" in e.msg:
-                error_msg = "语法错误: 期望有表达式，可能缺少运算符或括号"
-            elif "invalid left-hand side in assignment" in e.msg:
-                error_msg = "语法错误: 赋值语句左侧无效，可能是语法错误或使用了保留字"
-            problems.append((1, 1, error_msg, "error"))
-        except Exception:
-            # 忽略运行时错误，只关注语法错误
-            pass
-        
+            json.loads(content)
+        except json.JSONDecodeError as e:
+            problems.append((e.lineno, e.colno, f"JSON语法错误: {e.msg}", "error"))
         return problems
     
     def check_css_syntax(self, content):
         """检查CSS语法，提供更精准的错误信息"""
         problems = []
-        lines = content.split('\n')
-        
-        # 跟踪CSS括号匹配
-        brace_stack = []
         
-        for line_num, line in enumerate(lines, 1):
-            stripped_line = line.strip()
-            
-            # 跳过注释行
-            if stripped_line.startswith('/*') or stripped_line.startswith('//'):
+        # 单遍扫描：大括号匹配由扫描器完成，注释和字符串不参与检查
+        for line_num, line, code in self.CSS_SCANNER.scan(content, problems):
+            if not code.strip():
                 continue
             
-            # 检查括号匹配
-            for char_pos, char in enumerate(line):
-                if char == '{':
-                    brace_stack.append((char, line_num, char_pos + 1))
-                elif char == '}':
-                    if not brace_stack:
-                        problems.append((line_num, char_pos + 1, "多余的右括号", "error"))
-                    else:
-                        open_brace, open_line, open_pos = brace_stack.pop()
-            
             # 检查常见的CSS语法问题
             
             # 检查CSS属性格式
-            if ':' in line and not line.strip().startswith('/*') and not line.strip().startswith('//'):
+            if ':' in code:
                 # 检查是否有多个冒号
-                if line.count(':') > 1:
-                    problems.append((line_num, line.find(':') + 1, "CSS属性中不应有多个冒号", "warning"))
+                if code.count(':') > 1:
+                    problems.append((line_num, code.find(':') + 1, "CSS属性中不应有多个冒号", "warning"))
                 
                 # CSS不需要强制分号，移除分号警告
             
             # 检查CSS选择器
-            if '{' in line and not line.strip().startswith('/*') and not line.strip().startswith('//'):
-                selector = line.split('{')[0].strip()
-                if selector:
-                    # 检查选择器是否包含非法字符
-                    if any(char in selector for char in ['(', ')', '^', '$', '*', '+', '?', '.', '|', '\\', '!', '@', '#', '$', '%', '^', '&', '*', '(', ')', '_', '+', '=', '[', ']', '{', '}', '|', '\\', ';', ':', '"', "'", '<', '>', ',', '.', '/', '?', '~', '`', '!', '@', '#', '$', '%', '^', '&', '*', '(', ')', '-', '_', '+', '=', '[', ']', '{', '}', '|', '\\', ';', ':', '"', "'", '<', '>', ',', '.', '/', '?', '~', '`']):
-                        # 跳过合法的CSS选择器符号
-                        if not any(keyword in selector for keyword in ['#', '.', '>', '+', '~', ' ', '*', '[', ']', ':', '::', '^=', '$=', '*=', '~=', '|=', '=']):
-                            problems.append((line_num, 1, "可能存在无效的CSS选择器", "warning"))
-        
-        # 检查未闭合的括号
-        for open_brace, open_line, open_pos in brace_stack:
-            problems.append((open_line, open_pos, "未闭合的左括号", "error"))
+            if '{' in code:
+                selector = code.split('{')[0].strip()
+                # 检查选择器是否包含非法字符，跳过合法的CSS选择器符号
+                if selector and not self.CSS_SELECTOR_SPECIAL.isdisjoint(selector) and self.CSS_SELECTOR_COMBINATORS.isdisjoint(selector):
+                    problems.append((line_num, 1, "可能存在无效的CSS选择器", "warning"))
         
         return problems
     
@@ -2898,8 +10058,6 @@ class MyIDE(QMainWindow):
             if '\t' in line:
                 problems.append((line_num, line.find('\t') + 1, "建议使用空格代替制表符", "warning"))
         
-        # 在状态栏显示信息
-        self.statusBar().showMessage(f"{language}语法检查完成，发现 {len(problems)} 个问题")
         return problems
     
     def apply_initial_theme(self):
@@ -2949,11 +10107,16 @@ class MyIDE(QMainWindow):
         list_bg = editor_bg
         list_fg = editor_fg
         
+        # 只读查看器使用的颜色，新打开的查看器也会使用
+        self.viewer_colors = (editor_bg, editor_fg, margin_bg, caret_line_bg)
+        
         # 更新所有编辑器的主题
         if hasattr(self, 'tab_widget') and self.tab_widget is not None:
             for i in range(self.tab_widget.count()):
                 editor = self.tab_widget.widget(i)
-                if hasattr(editor, "setPaper"):
+                if isinstance(editor, MappedFileViewer):
+                    editor.set_colors(*self.viewer_colors)
+                elif hasattr(editor, "setPaper"):
                     # 更新编辑器背景色
                     editor.setPaper(editor_bg)
                     editor.setColor(editor_fg)
@@ -3138,13 +10301,13 @@ class MyIDE(QMainWindow):
             self.resource_explorer.tree.setPalette(palette)
         
         # 更新问题选项卡的主题
-        if hasattr(self, 'problems_list') and self.problems_list is not None:
-            palette = self.problems_list.palette()
+        if hasattr(self, 'problems_view') and self.problems_view is not None:
+            palette = self.problems_view.palette()
             palette.setColor(QPalette.ColorRole.Window, list_bg)
             palette.setColor(QPalette.ColorRole.WindowText, list_fg)
             palette.setColor(QPalette.ColorRole.Base, list_bg)
             palette.setColor(QPalette.ColorRole.Text, list_fg)
-            self.problems_list.setPalette(palette)
+            self.problems_view.setPalette(palette)
         
         # 更新状态栏信息
         self.statusBar().showMessage("主题已更新")
@@ -3357,10 +10520,22 @@ class MyIDE(QMainWindow):
             # 重新应用lexer
             editor.setLexer(lexer)
     
-    def show_syntax_errors(self, problems):
+    def show_syntax_errors(self, problems, editor=None):
         """显示语法错误和警告，提供详细的错误信息和修复建议"""
-        # 清空问题列表
-        self.problems_list.clear()
+        editor = editor or self.tab_widget.currentWidget()
+        self.problems_editor = editor
+        
+        # 问题所属的文件名
+        file_name = ""
+        if editor is not None:
+            current_file = getattr(editor, 'current_file', None)
+            if current_file:
+                file_name = os.path.basename(current_file)
+            else:
+                file_name = self.tab_widget.tabText(self.tab_widget.indexOf(editor))
+        
+        # 更新模型，只有变化的行会被重绘
+        self.problems_model.set_problems(problems, file_name)
         
         if not problems:
             # 没有问题，恢复原始标题
@@ -3368,52 +10543,8 @@ class MyIDE(QMainWindow):
             self.statusBar().showMessage("语法检查通过，未发现问题")
             return
         
-        # 统计错误和警告数量
-        error_count = 0
-        warning_count = 0
-        
-        # 在问题选项卡中显示问题信息
-        for line, col, msg, severity in problems:
-            # 生成更详细的错误信息，包括可能的修复建议
-            detailed_msg = msg
-            
-            # 添加错误代码和修复建议
-            if "未闭合" in msg:
-                detailed_msg += " (修复建议: 检查并添加缺失的闭合符号)"
-            elif "括号不匹配" in msg:
-                detailed_msg += " (修复建议: 检查括号配对)"
-            elif "缺少分号" in msg:
-                detailed_msg += " (修复建议: 在行尾添加分号)"
-            elif "可能应该使用==" in msg:
-                detailed_msg += " (修复建议: 将 = 替换为 ==)"
-            elif "未初始化" in msg:
-                detailed_msg += " (修复建议: 初始化变量或分配默认值)"
-            elif "无效的" in msg:
-                detailed_msg += " (修复建议: 检查语法或拼写)"
-            elif "缩进问题" in msg:
-                detailed_msg += " (修复建议: 检查缩进是否一致)"
-            elif "未闭合的字符串" in msg:
-                detailed_msg += " (修复建议: 检查字符串引号是否匹配)"
-            elif "print " in msg:
-                detailed_msg += " (修复建议: 使用 print() 函数)"
-            
-            # 添加错误代码
-            error_code = f"ERR_{severity.upper()}_{line}_{col}"
-            
-            # 创建列表项
-            if severity == "error":
-                error_item = QListWidgetItem(f"错误 [{error_code}]: 行 {line}, 列 {col}: {detailed_msg}")
-                error_item.setForeground(Qt.GlobalColor.red)
-                error_count += 1
-            else:  # warning
-                warning_item = QListWidgetItem(f"警告 [{error_code}]: 行 {line}, 列 {col}: {detailed_msg}")
-                warning_item.setForeground(Qt.GlobalColor.darkYellow)
-                warning_count += 1
-            
-            self.problems_list.addItem(error_item if severity == "error" else warning_item)
-        
         # 在状态栏显示简要信息
-        total_count = error_count + warning_count
+        error_count, warning_count = self.problems_model.counts()
         if error_count > 0:
             self.statusBar().showMessage(f"发现 {error_count} 个错误和 {warning_count} 个警告")
         else:
@@ -3422,64 +10553,49 @@ class MyIDE(QMainWindow):
         # 有问题，在标题中添加红点
         self.problems_dock.setWindowTitle("问题 ●")
     
+    def apply_problems_filter(self):
+        """根据过滤选项和设置中的显示错误/显示警告决定问题列表显示的严重程度"""
+        severities = set()
+        if self.settings.get("show_errors", True):
+            severities.add("error")
+        if self.settings.get("show_warnings", True):
+            severities.add("warning")
+        index = self.problems_filter_combo.currentIndex()
+        if index == 1:
+            severities &= {"error"}
+        elif index == 2:
+            severities &= {"warning"}
+        self.problems_model.set_severities(severities)
+    
+    def jump_to_problem(self, index):
+        """双击问题时跳转到编辑器中的对应位置"""
+        problem = self.problems_model.problem_at(index.row())
+        editor = self.problems_editor
+        if problem is None or editor is None or self.tab_widget.indexOf(editor) == -1:
+            return
+        line, col = problem[0], problem[1]
+        self.tab_widget.setCurrentWidget(editor)
+        editor.setCursorPosition(max(line - 1, 0), max(col - 1, 0))
+        editor.ensureLineVisible(max(line - 1, 0))
+        editor.setFocus()
+    
     def check_qml_syntax(self, content):
         """检查QML语法，提供更精准的错误信息"""
         problems = []
-        lines = content.split('\n')
-        
-        # 1. 检查括号和引号匹配
-        brace_stack = []
-        quote_stack = []
-        
-        for line_num, line in enumerate(lines, 1):
-            for char_pos, char in enumerate(line):
-                # 检查引号
-                if char in ['"', "'"]:
-                    if not quote_stack or quote_stack[-1] != char:
-                        quote_stack.append(char)
-                    else:
-                        quote_stack.pop()
-                
-                # 检查括号
-                if char in '([{':
-                    brace_stack.append((char, line_num, char_pos + 1))
-                elif char in ')]}':
-                    if not brace_stack:
-                        problems.append((line_num, char_pos + 1, "多余的右括号", "error"))
-                    else:
-                        open_brace, open_line, open_pos = brace_stack.pop()
-                        if (open_brace == '(' and char != ')') or \
-                           (open_brace == '[' and char != ']') or \
-                           (open_brace == '{' and char != '}'):
-                            problems.append((line_num, char_pos + 1, f"括号不匹配: {open_brace} 和 {char}", "error"))
-        
-        # 检查未闭合的括号
-        for open_brace, open_line, open_pos in brace_stack:
-            problems.append((open_line, open_pos, f"未闭合的括号: {open_brace}", "error"))
-        
-        # 检查未闭合的引号
-        if quote_stack:
-            problems.append((1, 1, f"未闭合的引号: {quote_stack[-1]}", "error"))
-        
-        # 2. 检查QML特定的语法问题
-        
-        # 检查是否有根元素
         has_root = False
-        for line_num, line in enumerate(lines, 1):
-            stripped_line = line.strip()
-            if stripped_line and not stripped_line.startswith('//') and not stripped_line.startswith('/*') and not stripped_line.startswith('*'):
-                # 简单检查是否有根元素
-                if stripped_line.endswith('{') and not stripped_line.startswith('import'):
-                    has_root = True
-                    break
-        
-        if not has_root and content.strip():
-            problems.append((1, 1, "QML文件缺少根元素", "error"))
-        
-        # 检查导入语句
         has_import = False
-        for line_num, line in enumerate(lines, 1):
-            stripped_line = line.strip()
+        
+        # 单遍扫描：括号和引号匹配由扫描器完成，注释和字符串不参与检查
+        for line_num, line, code in self.QML_SCANNER.scan(content, problems):
+            stripped_line = code.strip()
+            if not stripped_line:
+                continue
+            
+            # 检查是否有根元素
+            if not has_root and stripped_line.endswith('{') and not stripped_line.startswith('import'):
+                has_root = True
+            
+            # 检查导入语句
             if stripped_line.startswith('import'):
                 has_import = True
                 # 检查导入语句格式
@@ -3492,15 +10608,8 @@ class MyIDE(QMainWindow):
                         problems.append((line_num, 1, "导入语句缺少模块名", "error"))
                     elif len(import_parts) == 2 and import_parts[1] in ['QtQuick', 'QtWidgets', 'QtCore', 'QtGui', 'QtQml']:
                         problems.append((line_num, len(stripped_line), "建议为Qt模块添加版本号", "warning"))
-        
-        if not has_import and content.strip():
-            problems.append((1, 1, "建议添加导入语句", "warning"))
-        
-        # 检查常见的QML语法问题
-        for line_num, line in enumerate(lines, 1):
-            stripped_line = line.strip()
-            if not stripped_line or stripped_line.startswith('//') or stripped_line.startswith('/*') or stripped_line.startswith('*'):
-                continue
+            
+            # 检查常见的QML语法问题
             
             # 检查属性赋值
             if ':' in stripped_line and not stripped_line.startswith('import'):
@@ -3520,15 +10629,23 @@ class MyIDE(QMainWindow):
                     problems.append((line_num, len(stripped_line), "建议添加分号", "warning"))
             
             # 检查比较运算符
-            if '=' in line and not '==' in line and not '!=' in line and not '<=' in line and not '>=' in line and not '+=' in line and not '-=' in line and not '*=' in line and not '/=' in line:
+            if '=' in code and not self.COMPOUND_OPERATOR_RE.search(code):
                 # 检查是否是条件语句
-                if 'if ' in line or 'else if ' in line or 'while ' in line:
-                    problems.append((line_num, line.find('=') + 1, "条件语句中可能应该使用==而不是=", "warning"))
+                if 'if ' in code or 'while ' in code:
+                    problems.append((line_num, code.find('=') + 1, "条件语句中可能应该使用==而不是=", "warning"))
+        
+        if not has_root and content.strip():
+            problems.append((1, 1, "QML文件缺少根元素", "error"))
+        
+        if not has_import and content.strip():
+            problems.append((1, 1, "建议添加导入语句", "warning"))
         
         return problems
 
 # 程序入口点
 if __name__ == "__main__":
+    # 打包为可执行文件后，在文件中查找的子进程从这里启动
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MyIDE()
     window.show()